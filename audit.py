@@ -1,6 +1,5 @@
 """Check for missing papers in the index."""
 
-import time
 import os
 import csv
 from multiprocessing import Pool
@@ -33,11 +32,7 @@ def exists(chunk: List[str]) -> List[Tuple[str, bool]]:
     with app.app_context():
         from search.services import index
 
-        status = []
-        for ident in chunk:
-            time.sleep(0.05)  # TODO: make this configurable?
-            status.append((ident, index.SearchSession.exists(ident)))
-        return status
+        return list(zip(chunk, index.SearchSession.exists_many(chunk)))
 
 
 @app.cli.command()
@@ -57,9 +52,9 @@ def audit(id_list: str, batch_size: int, n_workers: int, output: str):
     """
     Check the index for missing papers.
 
-    Uses HEAD requests to the document endpoint using each paper ID in the
-    provided list. Uses multiprocessing with a configurable number of worker
-    processes to speed things up.
+    Looks up the paper IDs in the provided list with ``_mget`` requests, which
+    do not retrieve the documents themselves. Uses multiprocessing with a
+    configurable number of worker processes to speed things up.
 
     Parameters
     ----------
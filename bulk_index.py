@@ -3,9 +3,7 @@
 import os
 import json
 import tempfile
-import operator
 from typing import List
-from itertools import groupby
 
 import click
 
@@ -35,7 +33,7 @@ app = create_ui_web_app()
     is_flag=True,
     help="Install papers from a cache on disk. Note: this will"
     " preempt checking for new versions of papers that are"
-    " in the cache.",
+    " in the cache, until they expire (METADATA_CACHE_TTL).",
 )
 @click.option("--cache-dir", "-c", help="Specify the cache directory.")
 def populate(
@@ -46,7 +44,9 @@ def populate(
     cache_dir: str,
 ) -> None:
     """Populate the search index with some test data."""
-    cache_dir = init_cache(cache_dir)
+    cache_dir = init_cache(cache_dir or app.config.get("METADATA_CACHE_DIR"))
+    # Papers are cached by the docmeta session.
+    app.config["METADATA_CACHE_DIR"] = cache_dir
     index_count = 0
     if paper_id:  # Index a single paper.
         TO_INDEX = [paper_id]
@@ -56,40 +56,23 @@ def populate(
         TO_INDEX = load_id_sample()
     approx_size = len(TO_INDEX)
 
-    retrieve_chunk_size = 50
+    retrieve_chunk_size = 250  # Split into concurrent requests by metadata.
     index_chunk_size = 250
     chunk: List[str] = []
     meta: List[DocMeta] = []
     index.SearchSession.create_index()
     try:
-        with click.progressbar(
+        with index.SearchSession.bulk_load_mode(
+            force_merge=True
+        ), click.progressbar(
             length=approx_size, label="Papers indexed"
         ) as index_bar:
             last = len(TO_INDEX) - 1
             for i, paper_id in enumerate(TO_INDEX):
-                this_meta = []
-                if load_cache:
-                    try:
-                        this_meta = from_cache(cache_dir, paper_id)
-                    except RuntimeError:  # No document.
-                        pass
-
-                if this_meta:
-                    meta += this_meta
-                else:
-                    chunk.append(paper_id)
+                chunk.append(paper_id)
 
                 if len(chunk) == retrieve_chunk_size or i == last:
-                    try:
-                        new_meta = metadata.bulk_retrieve(chunk)
-                    except metadata.ConnectionFailed:  # Try again.
-                        new_meta = metadata.bulk_retrieve(chunk)
-                    # Add metadata to the cache.
-                    key = operator.attrgetter("paper_id")
-                    new_meta_srt = sorted(new_meta, key=key)
-                    for paper_id, grp in groupby(new_meta_srt, key):
-                        to_cache(cache_dir, paper_id, [dm for dm in grp])
-                    meta += new_meta
+                    meta += retrieve(chunk, refresh=not load_cache)
                     chunk = []
 
                 # Index papers on a different chunk cycle, and at the very end.
@@ -119,6 +102,23 @@ def populate(
         )
 
 
+def retrieve(paper_ids: List[str], refresh: bool) -> List[DocMeta]:
+    """
+    Retrieve metadata for papers, and add it to the cache.
+
+    Papers that could not be retrieved are reported, and skipped.
+    """
+    try:
+        try:
+            return metadata.bulk_retrieve(paper_ids, refresh=refresh)
+        except metadata.ConnectionFailed:  # Try again.
+            return metadata.bulk_retrieve(paper_ids, refresh=refresh)
+    except metadata.PartialFailure as ex:
+        for failed_id, reason in ex.failures.items():
+            click.echo(f"Failed: {failed_id}: {reason}")
+        return ex.results
+
+
 def init_cache(cache_dir: str) -> None:
     """Configure the processor to use a local cache for docmeta."""
     # Create cache directory if it doesn't exist
@@ -131,61 +131,6 @@ def init_cache(cache_dir: str) -> None:
     return cache_dir
 
 
-def from_cache(cache_dir: str, arxiv_id: str) -> List[DocMeta]:
-    """
-    Get the docmeta document from a local cache, if available.
-
-    Parameters
-    ----------
-    arxiv_id : str
-
-    Returns
-    -------
-    :class:`.DocMeta`
-
-    Raises
-    ------
-    RuntimeError
-        Raised when the cache is not available, or the document could not
-        be found in the cache.
-
-    """
-    fname = "%s.json" % arxiv_id.replace("/", "_")
-    cache_path = os.path.join(cache_dir, fname)
-    if not os.path.exists(cache_path):
-        raise RuntimeError("No cached document")
-
-    with open(cache_path) as f:
-        data: dict = json.load(f)
-        return [DocMeta(**datum) for datum in data]  # type: ignore
-        # See https://github.com/python/mypy/issues/3937
-
-
-def to_cache(cache_dir: str, arxiv_id: str, docmeta: List[DocMeta]) -> None:
-    """
-    Add a document to the local cache, if available.
-
-    Parameters
-    ----------
-    arxiv_id : str
-    docmeta : :class:`.DocMeta`
-
-    Raises
-    ------
-    RuntimeError
-        Raised when the cache is not available, or the document could not
-        be added to the cache.
-
-    """
-    fname = "%s.json" % arxiv_id.replace("/", "_")
-    cache_path = os.path.join(cache_dir, fname)
-    try:
-        with open(cache_path, "w") as f:
-            json.dump([asdict(dm) for dm in docmeta], f)
-    except Exception as ex:
-        raise RuntimeError(str(ex)) from ex
-
-
 def load_id_list(path: str) -> List[str]:
     """Load a list of paper IDs from ``path``."""
     if not os.path.exists(path):
@@ -1,5 +1,8 @@
 """Use this to initialize the search index for testing."""
 
+from typing import Optional
+
+import click
 
 from search.factory import create_ui_web_app
 from search.services import index
@@ -9,9 +12,16 @@ app.app_context().push()
 
 
 @app.cli.command()
-def create_index():
+@click.option(
+    "--aliased",
+    help="Create an index with this name, behind the read and write aliases.",
+)
+def create_index(aliased: Optional[str]):
     """Initialize the search index."""
-    index.SearchSession.create_index()
+    if aliased:
+        index.SearchSession.create_aliased_index(aliased)
+    else:
+        index.SearchSession.create_index()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,12 @@
 """Helper script to reindex all arXiv papers."""
 
 import click
-import time
+from datetime import timedelta
+from typing import Optional
 
 from search.factory import create_ui_web_app
 from search.services import index
+from search.services.index.tasks import TaskProgress, watch
 
 app = create_ui_web_app()
 
@@ -12,39 +14,135 @@ app = create_ui_web_app()
 @app.cli.command()
 @click.argument("old_index", nargs=1)
 @click.argument("new_index", nargs=1)
-def reindex(old_index: str, new_index: str):
+@click.option(
+    "--cutover",
+    is_flag=True,
+    help="Switch the read and write aliases to `new_index` when done.",
+)
+@click.option(
+    "--slices",
+    default="auto",
+    help="Number of slices to copy in parallel; `auto` is one per shard.",
+)
+@click.option(
+    "--requests-per-second",
+    "-r",
+    default=-1.0,
+    type=float,
+    help="Throttle for the reindex task; -1 means no throttle.",
+)
+@click.option(
+    "--interval",
+    "-i",
+    default=10.0,
+    type=float,
+    help="Seconds between progress updates.",
+)
+@click.option(
+    "--task",
+    "task_id",
+    help="Follow a reindex task that is already running, instead of"
+    " starting a new one.",
+)
+def reindex(
+    old_index: str,
+    new_index: str,
+    cutover: bool,
+    slices: str,
+    requests_per_second: float,
+    interval: float,
+    task_id: Optional[str],
+):
     """
     Reindex the documents in `old_index` to `new_index`.
 
     This will create `new_index` with the current configured mappings if it
     does not already exist.
+
+    With `--cutover`, `new_index` is added to the write alias first, so that
+    the indexing agent writes to both indices while documents are copied.
+    Once the copy is done and the document counts match, the read and write
+    aliases are switched over to `new_index`. `old_index` is kept, so that
+    the cut-over can be rolled back.
+
+    If this script is interrupted, the reindex task keeps running; use
+    `--task` to pick up where it left off, and the `rethrottle` and `cancel`
+    commands to control the task.
     """
     click.echo(f"Reindex papers in `{old_index}` to `{new_index}`")
     if not index.SearchSession.index_exists(old_index):
         click.echo(f"Source index `{old_index}` does not exist.")
 
-    r = index.SearchSession.reindex(old_index, new_index)
-    if not r:
-        raise click.ClickException("Failed to get or create new index")
-
-    click.echo(f"Started reindexing task")
-    task_id = r["task"]
-    with click.progressbar(length=100, label="percent complete") as progress:
-        while True:
-            status = index.SearchSession.get_task_status(task_id)
-            total = float(status["task"]["status"]["total"])
-            if status["completed"] or total == 0:
-                progress.update(100)
-                break
-
-            updated = status["task"]["status"]["updated"]
-            created = status["task"]["status"]["created"]
-            deleted = status["task"]["status"]["deleted"]
-            complete = (updated + created + deleted) / total
-            progress.update(complete * 100)
-            if complete == 1:
-                break
-            time.sleep(2)
+    if task_id is None:
+        if cutover:
+            index.SearchSession.begin_migration(new_index)
+            click.echo(f"Writing to `{new_index}` alongside the current index")
+        r = index.SearchSession.reindex(
+            old_index,
+            new_index,
+            slices=int(slices) if slices.isdigit() else slices,
+            requests_per_second=requests_per_second,
+        )
+        if not r:
+            raise click.ClickException("Failed to get or create new index")
+        task_id = r["task"]
+        click.echo(f"Started reindexing task {task_id}")
+    else:
+        click.echo(f"Following reindexing task {task_id}")
+
+    progress: Optional[TaskProgress] = None
+    with index.SearchSession.bulk_load_mode(
+        new_index, force_merge=True, wait_for_green=cutover
+    ):
+        try:
+            for progress in watch(
+                task_id, index.SearchSession.get_task_status, interval
+            ):
+                click.echo(_describe(progress))
+        except KeyboardInterrupt:
+            raise click.ClickException(
+                f"Stopped following task {task_id}, which is still running."
+                f" Resume with `--task {task_id}`."
+            )
+        if progress is None or not progress.completed:
+            raise click.ClickException(f"Task {task_id} did not complete")
+        if progress.failures:
+            raise click.ClickException(
+                f"{progress.failures} documents failed to copy"
+            )
+
+    if cutover:
+        try:
+            old = index.SearchSession.cut_over(new_index)
+        except index.CutoverFailed as ex:
+            raise click.ClickException(f"Did not cut over: {ex}") from ex
+        click.echo(f"Cut over to `{new_index}`; previously `{old}`")
+
+
+@app.cli.command()
+@click.argument("task_id", nargs=1)
+@click.argument("requests_per_second", nargs=1, type=float)
+def rethrottle(task_id: str, requests_per_second: float):
+    """Change the throttle of a running reindex task (-1 for none)."""
+    index.SearchSession.rethrottle(task_id, requests_per_second)
+
+
+@app.cli.command()
+@click.argument("task_id", nargs=1)
+def cancel(task_id: str):
+    """Cancel a running reindex task."""
+    index.SearchSession.cancel_task(task_id)
+
+
+def _describe(progress: TaskProgress) -> str:
+    """Describe the progress of a reindex task, for humans."""
+    eta = progress.eta
+    return (
+        f"{progress.fraction:6.1%} ({progress.done:,} of {progress.total:,})"
+        f" {progress.rate:,.0f} docs/s"
+        f" ETA {timedelta(seconds=round(eta)) if eta is not None else '?'}"
+        + (" (done)" if progress.completed else "")
+    )
 
 
 if __name__ == "__main__":
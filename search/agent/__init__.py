@@ -30,5 +30,32 @@ def process_stream(duration: Optional[int] = None) -> None:
     # We use the Flask application instance for configuration, and to manage
     # integrations with metadata service, search index.
     agent.process_stream(
-        MetadataRecordProcessor, app.config, duration=duration
+        MetadataRecordProcessor,
+        app.config,
+        duration=duration,
+        extra={
+            "max_rate": float(app.config.get("KINESIS_MAX_RATE", 100)),
+            "min_rate": float(app.config.get("KINESIS_MIN_RATE", 1)),
+            "index_latency_target": float(
+                app.config.get("KINESIS_INDEX_LATENCY_TARGET", 2)
+            ),
+            "metadata_latency_target": float(
+                app.config.get("KINESIS_METADATA_LATENCY_TARGET", 1)
+            ),
+            "index_batch_size": int(
+                app.config.get("KINESIS_INDEX_BATCH_SIZE", 0)
+            ),
+            "index_batch_wait": float(
+                app.config.get("KINESIS_INDEX_BATCH_WAIT", 5)
+            ),
+            "pipeline_depth": int(
+                app.config.get("KINESIS_INDEX_PIPELINE_DEPTH", 0)
+            ),
+            "pipeline_workers": int(
+                app.config.get("KINESIS_INDEX_PIPELINE_WORKERS", 1)
+            ),
+            "generation_interval": float(
+                app.config.get("KINESIS_GENERATION_INTERVAL", 5)
+            ),
+        },
     )
@@ -2,15 +2,21 @@
 
 import json
 import time
-from typing import List, Dict, Any
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple, Deque, Callable
+
+from dataclasses import dataclass, field
 
 from retry.api import retry_call
 
 from arxiv.base import logging
-from arxiv.base.agent import BaseConsumer
+from arxiv.base.agent import BaseConsumer, StopProcessing
 from search.services import metadata, index
 from search.process import transform
 from search.domain import DocMeta, Document
+from search.agent.pipeline import Pipeline, Stage, WorkItem
+from search.agent.throttle import Throttle
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +31,35 @@ class IndexingFailed(RuntimeError):
     """Raised when indexing failed such that future success is unlikely."""
 
 
+class SomeDocumentsFailed(DocumentFailed):
+    """Raised when metadata could be retrieved for only some of the papers."""
+
+    def __init__(
+        self, message: str, docmeta: List[DocMeta], failed: List[str]
+    ) -> None:
+        """Keep track of what was retrieved, and what was not."""
+        super(SomeDocumentsFailed, self).__init__(message)
+        self.docmeta = docmeta
+        """Metadata that was retrieved successfully."""
+        self.failed = failed
+        """IDs of the papers for which metadata could not be retrieved."""
+
+
+@dataclass
+class IndexBatch:
+    """A micro-batch of papers on its way into the index."""
+
+    arxiv_ids: List[str]
+    position: str
+    """Sequence number of the last record in the batch."""
+    size: int
+    """Number of records in the batch."""
+    docmeta: List[DocMeta] = field(default_factory=list)
+    documents: List[Document] = field(default_factory=list)
+    failed: int = 0
+    """Number of individual documents that could not be indexed."""
+
+
 class MetadataRecordProcessor(BaseConsumer):
     """Consumes ``MetadataIsAvailable`` notifications, updates the index."""
 
@@ -32,12 +67,123 @@ class MetadataRecordProcessor(BaseConsumer):
     """Max number of individual document failures before aborting entirely."""
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
-        """Initialize exception counter."""
-        self.sleep: float = kwargs.pop("sleep", 0.1)
+        """
+        Initialize exception counter and the micro-batch buffer.
+
+        In addition to the parameters accepted by :class:`.BaseConsumer`, the
+        following keyword arguments are supported.
+
+        Parameters
+        ----------
+        max_rate : float
+            Maximum number of records to process per second. Processing is
+            slowed down adaptively when the search index or the metadata
+            service respond slowly, or when the search index rejects requests
+            because it is overloaded (see :class:`.Throttle`). Default: 100.
+        min_rate : float
+            The rate is never reduced below this many records per second.
+            Default: 1.
+        index_latency_target : float
+            Index requests slower than this (in seconds) per document cause the
+            rate to be reduced. Default: 2.
+        metadata_latency_target : float
+            Metadata requests slower than this (in seconds) per paper cause the
+            rate to be reduced. Default: 1.
+        index_batch_size : int
+            If greater than zero, records are collected into a buffer and
+            indexed together once the buffer holds this many records (see
+            :meth:`.flush`). Default: 0 (one paper per record).
+        index_batch_wait : float
+            Maximum time (in seconds) that a record may wait in the buffer
+            before the buffer is flushed, regardless of its size. Default: 5.
+        pipeline_depth : int
+            If greater than zero (and ``index_batch_size`` is set), flushed
+            batches are passed through a :class:`.Pipeline` with separate
+            fetch, transform, and index stages, each of which can hold up to
+            this many batches in its queue. Default: 0 (no pipeline).
+        pipeline_workers : int
+            Number of worker threads per pipeline stage. Default: 1.
+        generation_interval : float
+            Minimum time (in seconds) between changes to the generation of
+            the index, which tell the search service that cached results are
+            stale (see :meth:`.SearchSession.bump_generation`). Default: 5.
+
+        """
+        self.throttle = Throttle(
+            kwargs.pop("max_rate", 100.0), kwargs.pop("min_rate", 1.0)
+        )
+        self.index_latency_target: float = kwargs.pop(
+            "index_latency_target", 2.0
+        )
+        self.metadata_latency_target: float = kwargs.pop(
+            "metadata_latency_target", 1.0
+        )
+        self.index_batch_size: int = kwargs.pop("index_batch_size", 0)
+        self.index_batch_wait: float = kwargs.pop("index_batch_wait", 5.0)
+        self.pipeline_depth: int = kwargs.pop("pipeline_depth", 0)
+        pipeline_workers: int = kwargs.pop("pipeline_workers", 1)
+        self.generation_interval: float = kwargs.pop(
+            "generation_interval", 5.0
+        )
         super(MetadataRecordProcessor, self).__init__(
             *args, **kwargs
         )  # type: ignore
         self._error_count = 0
+        self._buffer: List[Tuple[str, str]] = []
+        """Buffered (sequence number, arXiv ID) pairs, awaiting a flush."""
+        self._buffer_started: Optional[float] = None
+        self._stale = False
+        """Whether documents were written since the generation last changed."""
+        self._generation_bumped = 0.0
+        self._generation_lock = threading.Lock()
+
+        self._pipeline: Optional[Pipeline] = None
+        self._in_flight: Deque[WorkItem] = deque()
+        if self.index_batch_size and self.pipeline_depth:
+            self._pipeline = Pipeline(
+                Stage(
+                    "fetch",
+                    self._fetch_stage,
+                    pipeline_workers,
+                    self.pipeline_depth,
+                ),
+                Stage(
+                    "transform",
+                    self._transform_stage,
+                    pipeline_workers,
+                    self.pipeline_depth,
+                ),
+                Stage(
+                    "index",
+                    self._index_stage,
+                    pipeline_workers,
+                    self.pipeline_depth,
+                ),
+            )
+
+    def _throttled(
+        self, func: Callable, target: float, items: int = 1
+    ) -> Callable:
+        """
+        Wrap a call to a downstream service, so that it informs the throttle.
+
+        The rate is reduced if the call takes longer than ``target`` seconds
+        for each of its ``items`` (e.g. documents in a bulk request), or if
+        the service is unreachable or overloaded. Otherwise, the rate is
+        allowed to increase.
+        """
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            start = time.time()
+            try:
+                result = func(*args, **kwargs)
+            except (metadata.ConnectionFailed, index.IndexOverloaded):
+                self.throttle.backoff()
+                raise
+            self.throttle.observe(time.time() - start, target * items)
+            return result
+
+        return call
 
     # TODO: bring McCabe index down.
     def _get_metadata(self, arxiv_id: str) -> DocMeta:
@@ -68,8 +214,11 @@ class MetadataRecordProcessor(BaseConsumer):
 
         try:
             docmeta: DocMeta = retry_call(
-                metadata.retrieve,
+                self._throttled(
+                    metadata.retrieve, self.metadata_latency_target
+                ),
                 (arxiv_id,),
+                {"refresh": True},
                 exceptions=metadata.ConnectionFailed,
                 tries=2,
             )
@@ -122,8 +271,13 @@ class MetadataRecordProcessor(BaseConsumer):
         meta: List[DocMeta]
         try:
             meta = retry_call(
-                metadata.bulk_retrieve,
+                self._throttled(
+                    metadata.bulk_retrieve,
+                    self.metadata_latency_target,
+                    len(arxiv_ids),
+                ),
                 (arxiv_ids,),
+                {"refresh": True},
                 exceptions=metadata.ConnectionFailed,
                 tries=2,
             )
@@ -132,6 +286,13 @@ class MetadataRecordProcessor(BaseConsumer):
             # trying with subsequent records, so let's abort entirely.
             logger.error("%s: second attempt failed, giving up", arxiv_ids)
             raise IndexingFailed("Metadata endpoint not available") from ex
+        except metadata.PartialFailure as ex:
+            logger.error("%s: request failed", list(ex.failures))
+            raise SomeDocumentsFailed(
+                "Request to metadata service failed for some papers",
+                ex.results,
+                list(ex.failures),
+            ) from ex
         except metadata.RequestFailed as ex:
             logger.error("%s: request failed", arxiv_ids)
             raise DocumentFailed("Request to metadata service failed") from ex
@@ -176,8 +337,7 @@ class MetadataRecordProcessor(BaseConsumer):
 
         return document
 
-    @staticmethod
-    def _add_to_index(document: Document) -> None:
+    def _add_to_index(self, document: Document) -> None:
         """
         Add a :class:`.Document` to the search index.
 
@@ -194,7 +354,10 @@ class MetadataRecordProcessor(BaseConsumer):
         """
         try:
             retry_call(
-                index.SearchSession.add_document,
+                self._throttled(
+                    index.SearchSession.add_document,
+                    self.index_latency_target,
+                ),
                 (document,),
                 exceptions=index.IndexConnectionError,
                 tries=2,
@@ -205,8 +368,7 @@ class MetadataRecordProcessor(BaseConsumer):
             logger.error(f"Unhandled exception from index service: {ex}")
             raise IndexingFailed("Unhandled exception") from ex
 
-    @staticmethod
-    def _bulk_add_to_index(documents: List[Document]) -> None:
+    def _bulk_add_to_index(self, documents: List[Document]) -> int:
         """
         Add :class:`.Document` to the search index.
 
@@ -214,6 +376,12 @@ class MetadataRecordProcessor(BaseConsumer):
         ----------
         documents : :class:`.Document`
 
+        Returns
+        -------
+        int
+            Number of documents that could not be indexed. A document that
+            can't be indexed doesn't prevent the rest from being indexed.
+
         Raises
         ------
         IndexingFailed
@@ -223,16 +391,70 @@ class MetadataRecordProcessor(BaseConsumer):
         """
         try:
             retry_call(
-                index.SearchSession.bulk_add_documents,
+                self._throttled(
+                    index.SearchSession.bulk_add_documents,
+                    self.index_latency_target,
+                    len(documents),
+                ),
                 (documents,),
                 exceptions=index.IndexConnectionError,
                 tries=2,
             )
+        except index.BulkIndexingError as ex:
+            for document_id, reason in ex.failures.items():
+                logger.error("%s: could not index: %s", document_id, reason)
+            return len(ex.failures)
         except index.IndexConnectionError as ex:
             raise IndexingFailed("Could not bulk index documents") from ex
         except Exception as ex:
             logger.error(f"Unhandled exception from index service: {ex}")
             raise IndexingFailed("Unhandled exception") from ex
+        return 0
+
+    def _bulk_update_index(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Update some of the fields of documents in the search index.
+
+        Parameters
+        ----------
+        updates : dict
+            Partial documents, keyed by document ID.
+
+        Returns
+        -------
+        int
+            Number of documents that could not be updated (e.g. because they
+            were deleted). A document that can't be updated doesn't prevent
+            the rest from being updated.
+
+        Raises
+        ------
+        IndexingFailed
+            Indexing of the document failed in a way that indicates recovery
+            is unlikely for subsequent papers.
+
+        """
+        try:
+            retry_call(
+                self._throttled(
+                    index.SearchSession.bulk_update_fields,
+                    self.index_latency_target,
+                    len(updates),
+                ),
+                (updates,),
+                exceptions=index.IndexConnectionError,
+                tries=2,
+            )
+        except index.BulkIndexingError as ex:
+            for document_id, reason in ex.failures.items():
+                logger.error("%s: could not update: %s", document_id, reason)
+            return len(ex.failures)
+        except index.IndexConnectionError as ex:
+            raise IndexingFailed("Could not bulk update documents") from ex
+        except Exception as ex:
+            logger.error(f"Unhandled exception from index service: {ex}")
+            raise IndexingFailed("Unhandled exception") from ex
+        return 0
 
     def index_paper(self, arxiv_id: str) -> None:
         """
@@ -266,20 +488,423 @@ class MetadataRecordProcessor(BaseConsumer):
 
         """
         try:
-            documents = []
-            for docmeta in self._get_bulk_metadata(arxiv_ids):
-                logger.debug("%s: transform to Document", docmeta.paper_id)
-                document = MetadataRecordProcessor._transform_to_document(
-                    docmeta
-                )
-                documents.append(document)
+            documents, failed = self._transform_documents(
+                self._get_bulk_metadata(arxiv_ids)
+            )
+            self._error_count += failed
+            if not documents:
+                logger.debug("%s: nothing to index", arxiv_ids)
+                return
             logger.debug("add to index in bulk")
-            MetadataRecordProcessor._bulk_add_to_index(documents)
+            self._error_count += self._write_to_index(documents)
         except (DocumentFailed, IndexingFailed) as ex:
             # We just pass these along so that process_record() can keep track.
             logger.debug(f"{arxiv_ids}: Document failed: {ex}")
             raise ex
 
+    @staticmethod
+    def _plan_writes(
+        documents: List[Document],
+    ) -> Tuple[List[Document], Dict[str, Dict[str, Any]]]:
+        """
+        Decide how each document should be written to the index.
+
+        The fingerprints of the indexed documents are retrieved in one cheap
+        request. Documents that are already in the index unchanged are
+        dropped, so that replays and duplicate notifications don't result in
+        a full write. When only :const:`.transform.VERSION_FIELDS` have changed
+        (e.g. on the previous versions of a paper when a new version is
+        announced), those fields are updated in place. If the fingerprints
+        can't be retrieved, all of the documents are written in full.
+
+        Returns
+        -------
+        list
+            Documents to add to the index in full.
+        dict
+            Partial documents with changed :const:`.transform.VERSION_FIELDS`,
+            keyed by document ID.
+
+        """
+        try:
+            document_ids = [document["id"] for document in documents]
+            # MetaIntegration routes class-level calls to the current session.
+            indexed = index.SearchSession.get_fingerprints(
+                document_ids, transform.VERSION_FIELDS  # type: ignore
+            )
+        except Exception as ex:
+            logger.warning("Could not get fingerprints: %s", ex)
+            return documents, {}
+        full: List[Document] = []
+        partial: Dict[str, Dict[str, Any]] = {}
+        for document in documents:
+            stored = indexed.get(document["id"], {})
+            if document.get("fingerprint") is None or stored.get(
+                "fingerprint"
+            ) != document.get("fingerprint"):
+                full.append(document)
+                continue
+            values: Dict[str, Any] = dict(document)  # Fields aren't literals.
+            changed = {
+                field: values[field]
+                for field in transform.VERSION_FIELDS
+                if field in values and stored.get(field) != values[field]
+            }
+            if changed:
+                partial[document["id"]] = changed
+        logger.debug(
+            "%i to add, %i to update, %i unchanged",
+            len(full),
+            len(partial),
+            len(documents) - len(full) - len(partial),
+        )
+        return full, partial
+
+    def _write_to_index(self, documents: List[Document]) -> int:
+        """
+        Add new and changed documents to the index.
+
+        See :meth:`._plan_writes`.
+
+        Returns
+        -------
+        int
+            Number of documents that could not be indexed.
+
+        """
+        failed = 0
+        full, partial = self._plan_writes(documents)
+        if full:
+            failed += self._bulk_add_to_index(full)
+        if partial:
+            failed += self._bulk_update_index(partial)
+        if len(full) + len(partial) > failed:
+            self._stale = True
+            self._bump_generation()
+        return failed
+
+    def _bump_generation(self, force: bool = False) -> None:
+        """
+        Let the search service know that cached results are stale.
+
+        Each change to the generation is a mapping update, which ES applies
+        to the cluster state, so the generation is changed at most once every
+        :attr:`.generation_interval` seconds (unless ``force`` is True).
+        Writes in the meantime are covered by the next change, which is made
+        as records are processed.
+        """
+        with self._generation_lock:
+            if not self._stale or (
+                not force
+                and time.time() - self._generation_bumped
+                < self.generation_interval
+            ):
+                return
+            self._stale = False
+            self._generation_bumped = time.time()
+        try:
+            # MetaIntegration routes class-level calls to the current session.
+            index.SearchSession.bump_generation()  # type: ignore
+        except Exception as ex:
+            # Cached results will expire anyway; not worth failing over.
+            logger.warning("Could not bump index generation: %s", ex)
+
+    @staticmethod
+    def _transform_documents(
+        docmetas: List[DocMeta],
+    ) -> Tuple[List[Document], int]:
+        """
+        Transform metadata for several papers to search documents.
+
+        A document that can't be transformed doesn't prevent the rest from
+        being indexed.
+
+        Returns
+        -------
+        list
+            Search documents that were transformed successfully.
+        int
+            Number of documents that could not be transformed.
+
+        """
+        documents = []
+        failed = 0
+        for docmeta in docmetas:
+            logger.debug("%s: transform to Document", docmeta.paper_id)
+            try:
+                document = MetadataRecordProcessor._transform_to_document(
+                    docmeta
+                )
+            except DocumentFailed as ex:
+                logger.error("%s: %s", docmeta.paper_id, ex)
+                failed += 1
+                continue
+            documents.append(document)
+        return documents, failed
+
+    def _fetch_stage(self, batch: "IndexBatch") -> None:
+        """
+        Retrieve metadata for a batch of papers.
+
+        If the bulk request fails in a way that is specific to the documents
+        requested, each paper that failed is requested on its own so that
+        failures are tracked per document.
+        """
+        retry = batch.arxiv_ids
+        try:
+            batch.docmeta = self._get_bulk_metadata(batch.arxiv_ids)
+            return
+        except SomeDocumentsFailed as ex:
+            logger.debug("%i papers failed; fetch one by one", len(ex.failed))
+            batch.docmeta = ex.docmeta
+            retry = ex.failed
+        except DocumentFailed as ex:
+            logger.debug("batch failed (%s); fetch papers one by one", ex)
+        for arxiv_id in retry:
+            try:
+                batch.docmeta += self._get_bulk_metadata([arxiv_id])
+            except DocumentFailed as ex:
+                logger.debug("%s: failed to get metadata: %s", arxiv_id, ex)
+                batch.failed += 1
+
+    def _transform_stage(self, batch: "IndexBatch") -> None:
+        """Transform the metadata in a batch into search documents."""
+        batch.documents, failed = self._transform_documents(batch.docmeta)
+        batch.failed += failed
+
+    def _index_stage(self, batch: "IndexBatch") -> None:
+        """Add the search documents in a batch to the index."""
+        if batch.documents:
+            batch.failed += self._write_to_index(batch.documents)
+
+    def _complete(self, batch: "IndexBatch") -> int:
+        """Account for a batch that made it into the index."""
+        self._error_count += batch.failed
+        self.position = batch.position
+        return batch.size
+
+    def flush(self) -> int:
+        """
+        Index all of the papers in the micro-batch buffer.
+
+        Metadata for the whole buffer is retrieved with a single bulk request,
+        and the resulting documents are added to the index with a single bulk
+        request. If the bulk metadata request fails in a way that is specific
+        to the documents requested, each paper is retrieved on its own so that
+        failures are tracked per document.
+
+        If :attr:`.pipeline_depth` is set, the buffer is handed off to the
+        indexing :class:`.Pipeline` instead, and this method only accounts for
+        batches that have already made it through the pipeline (see
+        :meth:`.collect`).
+
+        The stream position only advances once a batch has been indexed, so a
+        checkpoint never includes records that were not flushed.
+
+        Returns
+        -------
+        int
+            Number of records that were indexed.
+
+        Raises
+        ------
+        IndexingFailed
+            Indexing failed in a way that indicates recovery is unlikely for
+            subsequent papers, or too many individual documents failed. The
+            buffer is left intact, and the last flushed position is
+            checkpointed.
+
+        """
+        if not self._buffer:
+            return self.collect()
+        if self._error_count > self.MAX_ERRORS:
+            self._checkpoint()
+            raise IndexingFailed("Too many errors")
+
+        # The same paper may be announced more than once in a single batch.
+        batch = IndexBatch(
+            arxiv_ids=list(dict.fromkeys(ident for _, ident in self._buffer)),
+            position=self._buffer[-1][0],
+            size=len(self._buffer),
+        )
+        logger.info("Flushing %i records", batch.size)
+        if self._pipeline is not None:
+            # Blocks if the pipeline is full.
+            self._in_flight.append(self._pipeline.submit(batch))
+            self._buffer = []
+            self._buffer_started = None
+            return self.collect()
+
+        try:
+            self._fetch_stage(batch)
+            self._transform_stage(batch)
+            self._index_stage(batch)
+        except IndexingFailed as ex:
+            logger.error("Indexing failed: %s", ex)
+            self._checkpoint()
+            raise
+
+        self._buffer = []
+        self._buffer_started = None
+        return self._complete(batch)
+
+    def collect(self, wait: bool = False) -> int:
+        """
+        Account for batches that have made it through the indexing pipeline.
+
+        Batches are collected in the order that they were submitted, so that
+        the stream position never advances past a batch that is still in
+        flight.
+
+        Parameters
+        ----------
+        wait : bool
+            If True, block until all batches in flight are done.
+
+        Returns
+        -------
+        int
+            Number of records that were indexed.
+
+        Raises
+        ------
+        IndexingFailed
+            A batch could not be indexed. The last position that was indexed
+            successfully is checkpointed.
+
+        """
+        processed = 0
+        while self._in_flight and (wait or self._in_flight[0].done.is_set()):
+            item = self._in_flight[0]
+            item.done.wait()
+            if item.error is not None:
+                logger.error("Indexing failed: %s", item.error)
+                self._checkpoint()
+                if isinstance(item.error, IndexingFailed):
+                    raise item.error
+                raise IndexingFailed("Unhandled exception") from item.error
+            self._in_flight.popleft()
+            processed += self._complete(item.payload)
+        if self._pipeline is not None and processed:
+            logger.info("Pipeline stats: %s", self.pipeline_stats())
+        return processed
+
+    def pipeline_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the queue depth and latency of each indexing pipeline stage.
+
+        Returns an empty dict if the pipeline is not enabled.
+        """
+        if self._pipeline is None:
+            return {}
+        return self._pipeline.stats()
+
+    def _buffer_record(self, record: Dict[Any, Any]) -> None:
+        """Add the paper indicated by a stream ``record`` to the buffer."""
+        if record["SequenceNumber"] in (seq for seq, _ in self._buffer):
+            return  # Kinesis may replay records that we already have.
+        try:
+            deserialized = json.loads(record["Data"].decode("utf-8"))
+        except json.decoder.JSONDecodeError as ex:
+            logger.error("Error while deserializing data %s", ex)
+            logger.error("Data payload: %s", record["Data"])
+            raise DocumentFailed("Could not deserialize record data")
+        if self._buffer_started is None:
+            self._buffer_started = time.time()
+        self._buffer.append(
+            (record["SequenceNumber"], deserialized.get("document_id"))
+        )
+
+    def process_records(self, start: str) -> Tuple[str, int]:
+        """
+        Retrieve and process records starting at ``start``.
+
+        When :attr:`.index_batch_size` is set, records are buffered and
+        indexed in micro-batches (see :meth:`.flush`). The buffer is flushed
+        when it reaches :attr:`.index_batch_size` records, or when its oldest
+        record has waited longer than :attr:`.index_batch_wait` seconds.
+        Otherwise, records are processed one at a time by
+        :meth:`.process_record`.
+        """
+        if not self.index_batch_size:
+            next_start, processed = super(
+                MetadataRecordProcessor, self
+            ).process_records(start)
+            self._bump_generation()
+            return next_start, processed
+
+        logger.debug(f"Get more records, starting at {start}")
+        processed = 0
+        try:
+            time.sleep(self.sleep_time)  # Don't get carried away.
+            next_start, response = self.get_records(  # type: ignore
+                start, self.batch_size, **self.retry_params
+            )
+        except Exception as ex:
+            self._checkpoint()
+            raise StopProcessing("Unhandled exception: %s" % str(ex)) from ex
+
+        logger.debug("Got %i records", len(response["Records"]))
+        for record in response["Records"]:
+            self._check_timeout()
+            if record["SequenceNumber"] == self.position:
+                continue
+            self.throttle.acquire()
+            self._buffer_record(record)
+            if len(self._buffer) >= self.index_batch_size:
+                processed += self.flush()
+
+        if (
+            self._buffer_started is not None
+            and time.time() - self._buffer_started >= self.index_batch_wait
+        ):
+            processed += self.flush()
+        else:
+            processed += self.collect()
+        self._bump_generation()
+        logger.debug(f"Next start is {next_start}")
+        return next_start, processed
+
+    def _check_timeout(self) -> None:
+        """Flush the buffer before exiting, if the duration is exceeded."""
+        if (
+            self.start_time
+            and self.duration
+            and time.time() - self.start_time > self.duration
+        ):
+            if self._buffer or self._in_flight:
+                self.flush()
+            self.close()
+            self._bump_generation(force=True)
+        super(MetadataRecordProcessor, self)._check_timeout()
+
+    def stop(self, signal: int, frame: Any) -> None:
+        """Finish the batches in the pipeline before a graceful stop."""
+        logger.info("Received signal %s; draining the pipeline", signal)
+        try:
+            self.close()
+        finally:
+            self._bump_generation(force=True)
+            super(MetadataRecordProcessor, self).stop(signal, frame)
+
+    def close(self) -> None:
+        """
+        Drain the indexing pipeline (if any), and stop its worker threads.
+
+        Batches that were submitted to the pipeline are indexed, and the
+        stream position is advanced past them, so that they are included in
+        the final checkpoint. Records still in the buffer are not; they will
+        be read from the stream again, as will any batch that failed (and the
+        batches after it).
+        """
+        if self._pipeline is None:
+            return
+        self._pipeline.close()
+        try:
+            self.collect(wait=True)
+        except IndexingFailed:
+            pass  # Already logged; the position stays before the failure.
+
     # FIXME: Argument type.
     def process_record(self, record: Dict[Any, Any]) -> None:
         """
@@ -300,7 +925,7 @@ class MetadataRecordProcessor(BaseConsumer):
             documents failed.
 
         """
-        time.sleep(self.sleep)
+        self.throttle.acquire()
         logger.info(f'Processing record {record["SequenceNumber"]}')
         if self._error_count > self.MAX_ERRORS:
             raise IndexingFailed("Too many errors")
@@ -0,0 +1,184 @@
+"""
+Provides a staged, multi-threaded pipeline for indexing batches of papers.
+
+Each :class:`.Stage` has its own pool of worker threads and a bounded inbox.
+Work items pass from one stage to the next, so that (for example) metadata
+for batch N+1 can be retrieved while batch N is being added to the index.
+When a stage falls behind, its inbox fills up and :meth:`.Pipeline.submit`
+(or the upstream stage) blocks until there is room; this provides
+backpressure all the way back to the stream consumer.
+
+Work items are completed out of band: callers check :attr:`.WorkItem.done`
+to find out whether an item has passed through all of the stages (or
+failed), and :attr:`.WorkItem.error` to find out whether it failed.
+"""
+
+import time
+import threading
+from queue import Queue
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app
+
+from arxiv.base import logging
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+
+
+class WorkItem(object):
+    """A unit of work that passes through the stages of a pipeline."""
+
+    def __init__(self, payload: Any) -> None:
+        """Wrap a payload, which is passed to (and mutated by) each stage."""
+        self.payload = payload
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+class Stage(object):
+    """A pipeline stage, with a bounded inbox and a pool of worker threads."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], None],
+        workers: int = 1,
+        depth: int = 2,
+    ) -> None:
+        """
+        Initialize the stage.
+
+        Parameters
+        ----------
+        name : str
+            Used for logging and statistics.
+        func : callable
+            Called with the payload of each :class:`.WorkItem`. Any exception
+            raised here stops the item from moving on to the next stage.
+        workers : int
+            Number of worker threads for this stage.
+        depth : int
+            Maximum number of items waiting in the inbox of this stage.
+
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox: Queue = Queue(maxsize=depth)
+        self.next: Optional["Stage"] = None
+        self._lock = threading.Lock()
+        self._processed = 0
+        self._failed = 0
+        self._total_latency = 0.0
+        self._last_latency = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the queue depth and latency for this stage."""
+        with self._lock:
+            mean = (
+                self._total_latency / self._processed
+                if self._processed
+                else 0.0
+            )
+            return {
+                "queue_depth": self.inbox.qsize(),
+                "processed": self._processed,
+                "failed": self._failed,
+                "mean_latency": mean,
+                "last_latency": self._last_latency,
+            }
+
+    def run(self, app: Any = None) -> None:
+        """Process items from the inbox until a ``None`` sentinel arrives."""
+        if app is not None:  # Service integrations rely on the app context.
+            with app.app_context():
+                return self._run()
+        return self._run()
+
+    def _run(self) -> None:
+        while True:
+            item: Optional[WorkItem] = self.inbox.get()
+            if item is None:
+                return
+            start = time.time()
+            try:
+                self.func(item.payload)
+            except Exception as ex:
+                logger.error("%s stage failed: %s", self.name, ex)
+                item.error = ex
+            latency = time.time() - start
+            with self._lock:
+                self._processed += 1
+                self._failed += int(item.error is not None)
+                self._total_latency += latency
+                self._last_latency = latency
+
+            if item.error is None and self.next is not None:
+                self.next.inbox.put(item)  # Blocks if the next stage is full.
+            else:
+                item.done.set()
+
+
+class Pipeline(object):
+    """A sequence of :class:`.Stage`s connected by bounded queues."""
+
+    def __init__(self, *stages: Stage) -> None:
+        """Connect ``stages`` in the order given."""
+        self.stages = stages
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.next = downstream
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def running(self) -> bool:
+        """Determine whether the stage worker threads have been started."""
+        return bool(self._threads)
+
+    def start(self) -> None:
+        """Start worker threads for all stages."""
+        app = current_app._get_current_object() if current_app else None
+        for stage in self.stages:
+            for i in range(stage.workers):
+                thread = threading.Thread(
+                    target=stage.run,
+                    args=(app,),
+                    name=f"{stage.name}-{i}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, payload: Any) -> WorkItem:
+        """
+        Add a payload to the first stage of the pipeline.
+
+        Blocks if the first stage is full.
+        """
+        if not self.running:
+            self.start()
+        item = WorkItem(payload)
+        self.stages[0].inbox.put(item)
+        return item
+
+    def close(self) -> None:
+        """
+        Drain the pipeline, then stop its worker threads.
+
+        Blocks until every item already submitted has passed through all of
+        the stages (or failed). Each stage is stopped only once the stages
+        before it have stopped, so that nothing is left in its inbox.
+        """
+        if not self.running:
+            return
+        for stage in self.stages:
+            for _ in range(stage.workers):
+                stage.inbox.put(None)
+            for thread in self._threads:
+                if thread.name.startswith(f"{stage.name}-"):
+                    thread.join()
+        self._threads = []
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get queue depth and latency for each stage, keyed by stage name."""
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -117,7 +117,7 @@ class TestKinesisIntegration(TestCase):
                 StreamName="MetadataIsAvailable", Data=data, PartitionKey="0"
             )
 
-        def retrieve(document_id):
+        def retrieve(document_id, refresh):
             with open(os.path.join(BASE_PATH, f"{document_id}.json")) as f:
                 return DocMeta(**json.load(f))
 
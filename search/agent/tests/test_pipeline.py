@@ -0,0 +1,123 @@
+"""Tests for :mod:`search.agent.pipeline`."""
+
+import threading
+from typing import Any, List
+from unittest import TestCase
+
+from search.agent.pipeline import Pipeline, Stage, WorkItem
+
+
+def _waiter(release: threading.Event) -> Stage:
+    """Make a stage that blocks until ``release`` is set."""
+
+    def wait(payload: Any) -> None:
+        release.wait(5)
+
+    return Stage("slow", wait, depth=1)
+
+
+class TestPipeline(TestCase):
+    """Work items pass through each stage in turn."""
+
+    def test_stages_run_in_order(self) -> None:
+        """Each payload is handled by every stage, in order."""
+
+        def first(payload: List[str]) -> None:
+            payload.append("first")
+
+        def second(payload: List[str]) -> None:
+            payload.append("second")
+
+        pipeline = Pipeline(Stage("first", first), Stage("second", second))
+        items = [pipeline.submit([]) for _ in range(3)]
+        for item in items:
+            self.assertTrue(item.done.wait(5))
+            self.assertIsNone(item.error)
+            self.assertEqual(item.payload, ["first", "second"])
+        pipeline.close()
+
+        stats = pipeline.stats()
+        self.assertEqual(stats["first"]["processed"], 3)
+        self.assertEqual(stats["second"]["processed"], 3)
+        self.assertEqual(stats["second"]["queue_depth"], 0)
+
+    def test_failure(self) -> None:
+        """An item that fails does not move on to the next stage."""
+        second: List[str] = []
+
+        def fail(payload: str) -> None:
+            raise RuntimeError("nope")
+
+        pipeline = Pipeline(
+            Stage("first", fail), Stage("second", second.append)
+        )
+        item = pipeline.submit("foo")
+        self.assertTrue(item.done.wait(5))
+        pipeline.close()
+
+        self.assertIsInstance(item.error, RuntimeError)
+        self.assertEqual(second, [], "Second stage is never reached")
+        self.assertEqual(pipeline.stats()["first"]["failed"], 1)
+
+    def test_stages_overlap(self) -> None:
+        """Upstream stages work on the next item while downstream is busy."""
+        release = threading.Event()
+        fetched = threading.Semaphore(0)
+
+        def fetch(payload: int) -> None:
+            fetched.release()
+
+        pipeline = Pipeline(Stage("fetch", fetch), _waiter(release))
+        first = pipeline.submit(1)
+        second = pipeline.submit(2)
+        self.assertTrue(fetched.acquire(timeout=5))
+        self.assertTrue(
+            fetched.acquire(timeout=5),
+            "The second item is fetched while the first is being indexed",
+        )
+        self.assertFalse(first.done.is_set())
+        release.set()
+        self.assertTrue(second.done.wait(5))
+        pipeline.close()
+
+    def test_backpressure(self) -> None:
+        """Submitting blocks when the first stage is full."""
+        release = threading.Event()
+        pipeline = Pipeline(_waiter(release))
+        pipeline.submit(1)  # Picked up by the worker.
+        submitted: List[WorkItem] = []
+
+        def submit() -> None:
+            for i in range(2, 4):
+                submitted.append(pipeline.submit(i))
+
+        thread = threading.Thread(target=submit, daemon=True)
+        thread.start()
+        thread.join(0.5)
+        self.assertTrue(thread.is_alive(), "Submit blocks")
+        self.assertLess(len(submitted), 2)
+        release.set()
+        thread.join(5)
+        self.assertEqual(len(submitted), 2)
+        pipeline.close()
+
+    def test_close_drains(self) -> None:
+        """Closing waits for submitted items to pass through every stage."""
+        release = threading.Event()
+        indexed: List[int] = []
+        pipeline = Pipeline(_waiter(release), Stage("index", indexed.append))
+        items = [pipeline.submit(i) for i in range(2)]
+        self.assertFalse(any(item.done.is_set() for item in items))
+
+        release.set()
+        pipeline.close()
+
+        self.assertTrue(all(item.done.is_set() for item in items))
+        self.assertEqual(indexed, [0, 1])
+        self.assertFalse(pipeline.running)
+
+    def test_close_not_started(self) -> None:
+        """A pipeline that was never started closes at once."""
+        pipeline = Pipeline(Stage("only", print, workers=4, depth=1))
+        pipeline.close()
+        self.assertFalse(pipeline.running)
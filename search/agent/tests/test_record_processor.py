@@ -1,7 +1,13 @@
 """Unit tests for :mod:`search.agent`."""
 
+import json
+import signal
+import threading
 from unittest import TestCase, mock
 
+from arxiv.base.agent import StopProcessing
+
+from search.process import transform
 from search.domain import DocMeta, Document
 from search.services import metadata, index
 from search.agent import consumer
@@ -279,6 +285,75 @@ class TestBulkAddToIndex(TestCase):
         with self.assertRaises(consumer.IndexingFailed):
             processor._bulk_add_to_index([Document()])
 
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    def test_index_raises_bulk_indexing_error(
+        self, mock_index, mock_client_factory
+    ):
+        """Some documents could not be indexed; the rest were."""
+        processor = consumer.MetadataRecordProcessor(*self.args)
+
+        mock_index.bulk_add_documents.side_effect = index.BulkIndexingError(
+            "1 failed", {"1234.56789v1": "mapper_parsing_exception"}
+        )
+        self.assertEqual(processor._bulk_add_to_index([Document()]), 1)
+        mock_index.bulk_add_documents.assert_called_once()
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    def test_update_raises_bulk_indexing_error(
+        self, mock_index, mock_client_factory
+    ):
+        """Some documents could not be updated; the rest were."""
+        processor = consumer.MetadataRecordProcessor(*self.args)
+
+        mock_index.bulk_update_fields.side_effect = index.BulkIndexingError(
+            "1 failed", {"1234.56789v1": "document_missing_exception"}
+        )
+        updates = {
+            "1234.56789v1": {"is_current": False},
+            "1234.56790v1": {"is_current": False},
+        }
+        self.assertEqual(processor._bulk_update_index(updates), 1)
+        mock_index.bulk_update_fields.assert_called_once()
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    def test_index_overloaded(self, mock_index, mock_client_factory):
+        """The index rejects requests, so the processor slows down."""
+        processor = consumer.MetadataRecordProcessor(*self.args, max_rate=8)
+
+        mock_index.bulk_add_documents.side_effect = index.IndexOverloaded
+        with self.assertRaises(consumer.IndexingFailed):
+            processor._bulk_add_to_index([Document()])
+        self.assertEqual(mock_index.bulk_add_documents.call_count, 2)
+        self.assertEqual(processor.throttle.rate, 2, "Backed off twice")
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.time")
+    def test_index_slow(self, mock_time, mock_index, mock_client_factory):
+        """The index responds slowly, so the processor slows down."""
+        processor = consumer.MetadataRecordProcessor(
+            *self.args, max_rate=8, index_latency_target=2
+        )
+        mock_time.time.side_effect = [100, 105]
+        processor._bulk_add_to_index([Document()])
+        self.assertEqual(processor.throttle.rate, 4)
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.time")
+    def test_index_batch(self, mock_time, mock_index, mock_client_factory):
+        """The latency target of a bulk request scales with its size."""
+        processor = consumer.MetadataRecordProcessor(
+            *self.args, max_rate=8, min_rate=1, index_latency_target=2
+        )
+        processor.throttle.rate = 4
+        mock_time.time.side_effect = [100, 105]
+        processor._bulk_add_to_index([Document(), Document(), Document()])
+        self.assertGreater(processor.throttle.rate, 4, "Not slow for 3 docs")
+
 
 class TestTransformToDocument(TestCase):
     """Transform metadata into a search document."""
@@ -405,3 +480,398 @@ class TestGetMetadata(TestCase):
         mock_metadata.retrieve.side_effect = metadata.BadResponse
         with self.assertRaises(consumer.DocumentFailed):
             processor._get_metadata("1234.5678")
+
+
+def _record(sequence_number, document_id):
+    """Generate a stream record for a ``MetadataIsAvailable`` notification."""
+    return {
+        "SequenceNumber": sequence_number,
+        "Data": bytes(
+            json.dumps({"document_id": document_id}), encoding="utf-8"
+        ),
+    }
+
+
+class TestMicroBatching(TestCase):
+    """Index records in micro-batches, rather than one paper per record."""
+
+    def setUp(self):
+        """Initialize a :class:`.MetadataRecordProcessor`."""
+        self.checkpointer = mock.MagicMock()
+        self.checkpointer.position = None
+        self.args = (
+            "foo",
+            "1",
+            "a1b2c3d4",
+            "qwertyuiop",
+            "us-east-1",
+            self.checkpointer,
+        )
+
+    def _processor(self, records, **kwargs):
+        processor = consumer.MetadataRecordProcessor(*self.args, **kwargs)
+        processor.sleep_time = 0
+        processor.get_records = mock.MagicMock(
+            return_value=("next", {"Records": records})
+        )
+        return processor
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_flush_on_size(self, mock_meta, mock_tx, mock_idx, mock_client):
+        """The buffer is flushed when it reaches the batch size."""
+        records = [_record(str(i), f"1234.5678{i}") for i in range(5)]
+        mock_meta.bulk_retrieve.side_effect = lambda ids, refresh: [
+            DocMeta(paper_id=ident) for ident in ids
+        ]
+        mock_tx.to_search_document.side_effect = lambda dm: Document(
+            paper_id=dm.paper_id
+        )
+        processor = self._processor(
+            records, index_batch_size=2, index_batch_wait=60
+        )
+
+        _, processed = processor.process_records("start")
+
+        self.assertEqual(processed, 4, "Two full batches are flushed")
+        self.assertEqual(mock_meta.bulk_retrieve.call_count, 2)
+        self.assertEqual(mock_idx.bulk_add_documents.call_count, 2)
+        self.assertEqual(
+            mock_idx.bump_generation.call_count,
+            1,
+            "Cached search results are invalidated, but not for every batch",
+        )
+        self.assertEqual(
+            mock_meta.bulk_retrieve.call_args[0][0],
+            ["1234.56782", "1234.56783"],
+        )
+        self.assertEqual(processor.position, "3", "Position is last flushed")
+        self.assertEqual(len(processor._buffer), 1, "One record is waiting")
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_generation(self, mock_meta, mock_tx, mock_idx, mock_client):
+        """The generation is changed at most once per interval."""
+        records = [_record(str(i), f"1234.5678{i}") for i in range(2)]
+        mock_meta.bulk_retrieve.side_effect = lambda ids, refresh: [
+            DocMeta(paper_id=ident) for ident in ids
+        ]
+        mock_tx.to_search_document.side_effect = lambda dm: Document(
+            paper_id=dm.paper_id
+        )
+        processor = self._processor(
+            records, index_batch_size=1, generation_interval=60
+        )
+        processor.process_records("start")
+        self.assertEqual(mock_idx.bump_generation.call_count, 1)
+
+        processor.get_records.return_value = ("next", {"Records": []})
+        processor.process_records("next")
+        self.assertEqual(mock_idx.bump_generation.call_count, 1, "Too soon")
+
+        processor._generation_bumped -= 60
+        processor.process_records("next")
+        self.assertEqual(
+            mock_idx.bump_generation.call_count, 2, "Covers the last batch"
+        )
+        processor._generation_bumped -= 60
+        processor.process_records("next")
+        self.assertEqual(
+            mock_idx.bump_generation.call_count, 2, "Nothing new to cover"
+        )
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_flush_on_time(self, mock_meta, mock_tx, mock_idx, mock_client):
+        """The buffer is flushed when the oldest record has waited too long."""
+        records = [_record("1", "1234.56781"), _record("2", "1234.56781")]
+        mock_meta.bulk_retrieve.return_value = [DocMeta(paper_id="1234.56781")]
+        processor = self._processor(
+            records, index_batch_size=100, index_batch_wait=0
+        )
+
+        _, processed = processor.process_records("start")
+
+        self.assertEqual(processed, 2)
+        mock_meta.bulk_retrieve.assert_called_once_with(
+            ["1234.56781"], refresh=True
+        )
+        mock_idx.bulk_add_documents.assert_called_once()
+        self.assertEqual(processor.position, "2")
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_document_failures(
+        self, mock_meta, mock_tx, mock_idx, mock_client
+    ):
+        """A bad batch is retried paper by paper, tracking each failure."""
+        mock_meta.RequestFailed = metadata.RequestFailed
+        mock_meta.ConnectionFailed = metadata.ConnectionFailed
+        mock_meta.BadResponse = metadata.BadResponse
+        mock_meta.PartialFailure = metadata.PartialFailure
+
+        def bulk_retrieve(ids, refresh):
+            if "1234.56782" in ids:
+                raise metadata.RequestFailed("nope")
+            return [DocMeta(paper_id=ident) for ident in ids]
+
+        mock_meta.bulk_retrieve.side_effect = bulk_retrieve
+        records = [_record(str(i), f"1234.5678{i}") for i in range(3)]
+        processor = self._processor(
+            records, index_batch_size=3, index_batch_wait=60
+        )
+
+        _, processed = processor.process_records("start")
+
+        self.assertEqual(processed, 3)
+        self.assertEqual(processor._error_count, 1, "One paper failed")
+        mock_idx.bulk_add_documents.assert_called_once()
+        self.assertEqual(
+            len(mock_idx.bulk_add_documents.call_args[0][0]),
+            2,
+            "The papers that did not fail are indexed together",
+        )
+        self.assertEqual(processor.position, "2")
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_partial_failure(self, mock_meta, mock_tx, mock_idx, mock_client):
+        """Only the papers that failed in a bulk request are retried."""
+        mock_meta.RequestFailed = metadata.RequestFailed
+        mock_meta.ConnectionFailed = metadata.ConnectionFailed
+        mock_meta.BadResponse = metadata.BadResponse
+        mock_meta.PartialFailure = metadata.PartialFailure
+
+        def bulk_retrieve(ids, refresh):
+            if len(ids) > 1:
+                raise metadata.PartialFailure(
+                    "nope",
+                    [DocMeta(paper_id=ident) for ident in ids[:-1]],
+                    {ids[-1]: metadata.RequestFailed("nope")},
+                )
+            return [DocMeta(paper_id=ident) for ident in ids]
+
+        mock_meta.bulk_retrieve.side_effect = bulk_retrieve
+        records = [_record(str(i), f"1234.5678{i}") for i in range(3)]
+        processor = self._processor(
+            records, index_batch_size=3, index_batch_wait=60
+        )
+
+        _, processed = processor.process_records("start")
+
+        self.assertEqual(processed, 3)
+        self.assertEqual(processor._error_count, 0)
+        self.assertEqual(
+            mock_meta.bulk_retrieve.call_args_list[-1][0][0],
+            ["1234.56782"],
+            "Only the failed paper is retried",
+        )
+        self.assertEqual(mock_meta.bulk_retrieve.call_count, 2)
+        self.assertEqual(len(mock_idx.bulk_add_documents.call_args[0][0]), 3)
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_indexing_failed(self, mock_meta, mock_tx, mock_idx, mock_client):
+        """The position does not advance past a batch that was not indexed."""
+        mock_meta.bulk_retrieve.side_effect = lambda ids, refresh: [
+            DocMeta(paper_id=ident) for ident in ids
+        ]
+        mock_idx.bulk_add_documents.side_effect = [
+            None,
+            index.IndexConnectionError,
+            index.IndexConnectionError,
+        ]
+        records = [_record(str(i), f"1234.5678{i}") for i in range(4)]
+        processor = self._processor(
+            records, index_batch_size=2, index_batch_wait=60
+        )
+
+        with self.assertRaises(consumer.IndexingFailed):
+            processor.process_records("start")
+
+        self.assertEqual(processor.position, "1", "Only first batch indexed")
+        self.checkpointer.checkpoint.assert_called_with("1")
+        self.assertEqual(len(processor._buffer), 2, "Failed batch is kept")
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_skip_unchanged(self, mock_meta, mock_tx, mock_idx, mock_client):
+        """Documents that are already in the index unchanged are skipped."""
+        mock_meta.bulk_retrieve.side_effect = lambda ids, refresh: [
+            DocMeta(paper_id=ident) for ident in ids
+        ]
+        mock_tx.to_search_document.side_effect = lambda dm: Document(
+            id=f"{dm.paper_id}v1", fingerprint=f"{dm.paper_id}-new"
+        )
+        mock_idx.get_fingerprints.return_value = {
+            "1234.56780v1": {"fingerprint": "1234.56780-new"},
+            "1234.56781v1": {"fingerprint": "1234.56781-old"},
+        }
+        records = [_record(str(i), f"1234.5678{i}") for i in range(3)]
+        processor = self._processor(
+            records, index_batch_size=3, index_batch_wait=60
+        )
+
+        processor.process_records("start")
+
+        self.assertEqual(
+            mock_idx.get_fingerprints.call_args[0][0],
+            ["1234.56780v1", "1234.56781v1", "1234.56782v1"],
+        )
+        indexed = mock_idx.bulk_add_documents.call_args[0][0]
+        self.assertEqual(
+            [doc["id"] for doc in indexed],
+            ["1234.56781v1", "1234.56782v1"],
+            "Only changed or new documents are indexed",
+        )
+        self.assertEqual(processor.position, "2")
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_version_pointers_changed(self, mock_meta, mock_idx, mock_client):
+        """Only version pointers changed, so they are updated in place."""
+        old = DocMeta(
+            paper_id="1234.56789",
+            version=1,
+            is_current=False,
+            latest="1234.56789v2",
+            latest_version=2,
+        )
+        new = DocMeta(
+            paper_id="1234.56789",
+            version=2,
+            is_current=True,
+            latest="1234.56789v2",
+            latest_version=2,
+        )
+        mock_meta.bulk_retrieve.return_value = [old, new]
+        stored = transform.to_search_document(
+            DocMeta(
+                paper_id="1234.56789",
+                version=1,
+                is_current=True,
+                latest="1234.56789v1",
+                latest_version=1,
+            )
+        )
+        mock_idx.get_fingerprints.return_value = {"1234.56789v1": stored}
+        processor = self._processor(
+            [_record("1", "1234.56789")],
+            index_batch_size=1,
+            index_batch_wait=60,
+        )
+
+        processor.process_records("start")
+
+        indexed = mock_idx.bulk_add_documents.call_args[0][0]
+        self.assertEqual([doc["id"] for doc in indexed], ["1234.56789v2"])
+        mock_idx.bulk_update_fields.assert_called_once_with(
+            {
+                "1234.56789v1": {
+                    "is_current": False,
+                    "latest": "1234.56789v2",
+                    "latest_version": 2,
+                    "submitted_date_all": None,
+                }
+            }
+        )
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_pipelined(self, mock_meta, mock_tx, mock_idx, mock_client):
+        """Batches pass through the fetch, transform, and index stages."""
+        mock_meta.bulk_retrieve.side_effect = lambda ids, refresh: [
+            DocMeta(paper_id=ident) for ident in ids
+        ]
+        records = [_record(str(i), f"1234.5678{i}") for i in range(6)]
+        processor = self._processor(
+            records, index_batch_size=2, index_batch_wait=60, pipeline_depth=1
+        )
+
+        processor.process_records("start")
+        processed = processor.collect(wait=True)
+        processor.close()
+
+        self.assertGreater(processed, 0)
+        self.assertEqual(mock_idx.bulk_add_documents.call_count, 3)
+        self.assertEqual(processor.position, "5", "Position is last indexed")
+        self.assertEqual(len(processor._in_flight), 0)
+        stats = processor.pipeline_stats()
+        self.assertEqual(list(stats), ["fetch", "transform", "index"])
+        self.assertEqual(stats["index"]["processed"], 3)
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_pipelined_indexing_failed(
+        self, mock_meta, mock_tx, mock_idx, mock_client
+    ):
+        """A failed batch in the pipeline stops the position advancing."""
+        mock_meta.bulk_retrieve.side_effect = lambda ids, refresh: [
+            DocMeta(paper_id=ident) for ident in ids
+        ]
+        mock_idx.bulk_add_documents.side_effect = [
+            None,
+            index.IndexConnectionError,
+            index.IndexConnectionError,
+            None,
+        ]
+        records = [_record(str(i), f"1234.5678{i}") for i in range(6)]
+        processor = self._processor(
+            records, index_batch_size=2, index_batch_wait=60, pipeline_depth=1
+        )
+
+        with self.assertRaises(consumer.IndexingFailed):
+            processor.process_records("start")
+            processor.collect(wait=True)
+        processor.close()
+
+        self.assertEqual(processor.position, "1", "Only first batch indexed")
+        self.checkpointer.checkpoint.assert_called_with("1")
+
+    @mock.patch("boto3.client")
+    @mock.patch("search.agent.consumer.index.SearchSession")
+    @mock.patch("search.agent.consumer.transform")
+    @mock.patch("search.agent.consumer.metadata")
+    def test_stop_drains_pipeline(
+        self, mock_meta, mock_tx, mock_idx, mock_client
+    ):
+        """Batches in the pipeline are indexed before the final checkpoint."""
+        release = threading.Event()
+        mock_meta.bulk_retrieve.side_effect = lambda ids, refresh: [
+            DocMeta(paper_id=ident) for ident in ids
+        ]
+        mock_idx.bulk_add_documents.side_effect = lambda docs: release.wait(5)
+        records = [_record(str(i), f"1234.5678{i}") for i in range(6)]
+        processor = self._processor(
+            records, index_batch_size=2, index_batch_wait=60, pipeline_depth=1
+        )
+        processor.process_records("start")
+        self.assertNotEqual(processor.position, "5", "Still in flight")
+
+        release.set()
+        with self.assertRaises(StopProcessing):
+            processor.stop(signal.SIGTERM, None)
+
+        self.assertEqual(mock_idx.bulk_add_documents.call_count, 3)
+        self.assertEqual(processor.position, "5")
+        self.checkpointer.checkpoint.assert_called_with("5")
+        self.assertFalse(processor._pipeline.running, "Threads are stopped")
@@ -0,0 +1,52 @@
+"""Tests for :mod:`search.agent.throttle`."""
+
+from unittest import TestCase, mock
+
+from search.agent.throttle import Throttle
+
+
+class TestThrottle(TestCase):
+    """The rate adapts to downstream conditions."""
+
+    def test_backoff(self) -> None:
+        """The rate is cut multiplicatively, but not below the minimum."""
+        throttle = Throttle(max_rate=100, min_rate=10)
+        throttle.backoff()
+        self.assertEqual(throttle.rate, 50)
+        for _ in range(5):
+            throttle.backoff()
+        self.assertEqual(throttle.rate, 10)
+        self.assertEqual(throttle.stats()["backoffs"], 6)
+
+    def test_observe(self) -> None:
+        """Slow responses cut the rate; healthy responses restore it."""
+        throttle = Throttle(max_rate=100, increase=10)
+        throttle.observe(latency=5, target=1)
+        self.assertEqual(throttle.rate, 50)
+        throttle.observe(latency=0.5, target=1)
+        self.assertEqual(throttle.rate, 60)
+        for _ in range(10):
+            throttle.observe(latency=0.5, target=1)
+        self.assertEqual(throttle.rate, 100, "Never exceeds the maximum")
+
+    @mock.patch("search.agent.throttle.time")
+    def test_acquire(self, mock_time: mock.MagicMock) -> None:
+        """Callers wait once the bucket is empty."""
+        mock_time.time.return_value = 1000.0
+        throttle = Throttle(max_rate=10)
+        for _ in range(10):
+            self.assertEqual(throttle.acquire(), 0, "Bucket starts full")
+        self.assertAlmostEqual(throttle.acquire(), 0.1)
+        mock_time.sleep.assert_called_once()
+
+        mock_time.time.return_value = 1001.1
+        self.assertEqual(throttle.acquire(), 0, "Bucket has refilled")
+
+    @mock.patch("search.agent.throttle.time")
+    def test_acquire_more_than_capacity(
+        self, mock_time: mock.MagicMock
+    ) -> None:
+        """A request for more tokens than the bucket holds still succeeds."""
+        mock_time.time.return_value = 1000.0
+        throttle = Throttle(max_rate=10)
+        self.assertAlmostEqual(throttle.acquire(30), 2.0)
@@ -0,0 +1,127 @@
+"""
+Provides an adaptive rate limit for the indexing agent.
+
+The agent should go as fast as it can while Elasticsearch and the metadata
+service are healthy, and back off when they are not. :class:`.Throttle` is a
+token bucket whose fill rate is adjusted using additive-increase,
+multiplicative-decrease (AIMD): each healthy response (one that arrives within
+its latency target) nudges the rate up by a fixed amount, while each slow
+response or rejection cuts the rate by a constant factor.
+"""
+
+import time
+import threading
+from typing import Any, Dict, Optional
+
+from arxiv.base import logging
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+
+
+class Throttle(object):
+    """A token bucket with an AIMD-adjusted fill rate."""
+
+    def __init__(
+        self,
+        max_rate: float,
+        min_rate: float = 1.0,
+        increase: Optional[float] = None,
+        decrease: float = 0.5,
+    ) -> None:
+        """
+        Initialize the bucket at its maximum rate.
+
+        Parameters
+        ----------
+        max_rate : float
+            Maximum (and initial) rate, in tokens per second.
+        min_rate : float
+            The rate is never reduced below this value.
+        increase : float
+            Amount by which the rate is increased after a healthy response.
+            Default: 5% of ``max_rate``.
+        decrease : float
+            Factor by which the rate is multiplied after a slow response or a
+            rejection.
+
+        """
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("Must have 0 < min_rate <= max_rate")
+        if not 0 < decrease < 1:
+            raise ValueError("Must have 0 < decrease < 1")
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase if increase is not None else max_rate / 20
+        self.decrease = decrease
+        self.rate = max_rate
+        self._tokens = max_rate
+        self._updated = time.time()
+        self._lock = threading.Lock()
+        self._backoffs = 0
+        self._waited = 0.0
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take ``tokens`` from the bucket, waiting for it to refill if needed.
+
+        The bucket holds at most one second's worth of tokens, so bursts are
+        limited. Tokens are taken immediately, and the caller then waits until
+        the bucket is no longer in debt; this means that a request for more
+        tokens than the bucket can hold still works.
+
+        Returns
+        -------
+        float
+            Time (in seconds) spent waiting.
+
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(
+                self.rate, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+            wait = max(0.0, -self._tokens / self.rate)
+            self._waited += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def observe(self, latency: float, target: float) -> None:
+        """
+        Adjust the rate based on the latency of a downstream response.
+
+        Parameters
+        ----------
+        latency : float
+            Time (in seconds) that the response took.
+        target : float
+            Responses slower than this are treated as a sign of trouble.
+
+        """
+        if latency > target:
+            logger.debug(
+                "Latency %f exceeds %f; slowing down", latency, target
+            )
+            self.backoff()
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def backoff(self) -> None:
+        """Cut the rate, e.g. because a downstream service is overloaded."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._backoffs += 1
+        logger.info("Backing off; rate is now %f per second", self.rate)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the current rate, and the number of times it was reduced."""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "backoffs": self._backoffs,
+                "waited": self._waited,
+            }
@@ -177,11 +177,96 @@ _proto_key = "ELASTICSEARCH_SERVICE_PORT_%s_PROTO" % ELASTICSEARCH_SERVICE_PORT
 locals()[_proto_key] = os.environ.get(_proto_key, "http")
 
 ELASTICSEARCH_INDEX = os.environ.get("ELASTICSEARCH_INDEX", "arxiv")
+"""Name of the index to search; usually an alias (the read alias)."""
+
+ELASTICSEARCH_WRITE_ALIAS = os.environ.get("ELASTICSEARCH_WRITE_ALIAS")
+"""
+Alias of the index (or indices) to which documents are written.
+
+During a migration to a new index, this points to both the old and the new
+index, and the indexing agent writes to both. If not set, documents are
+written to ``ELASTICSEARCH_INDEX``.
+"""
+
 ELASTICSEARCH_USER = os.environ.get("ELASTICSEARCH_USER", None)
 ELASTICSEARCH_PASSWORD = os.environ.get("ELASTICSEARCH_PASSWORD", None)
 ELASTICSEARCH_VERIFY = os.environ.get("ELASTICSEARCH_VERIFY", "true")
 """Indicates whether SSL certificate verification for ES should be enforced."""
 
+ELASTICSEARCH_BULK_THREADS = os.environ.get("ELASTICSEARCH_BULK_THREADS", "4")
+"""Number of concurrent requests when adding documents in bulk."""
+
+ELASTICSEARCH_BULK_MAX_BYTES = os.environ.get(
+    "ELASTICSEARCH_BULK_MAX_BYTES", "10485760"
+)
+"""Max size (in bytes) of a single bulk request."""
+
+ELASTICSEARCH_BULK_MAX_RETRIES = os.environ.get(
+    "ELASTICSEARCH_BULK_MAX_RETRIES", "3"
+)
+"""Number of times to retry documents that ES rejects because it is busy."""
+
+ELASTICSEARCH_EXPORT_SLICES = os.environ.get(
+    "ELASTICSEARCH_EXPORT_SLICES", "4"
+)
+"""
+Number of scroll slices retrieved in parallel by the export endpoint.
+
+Should not exceed the number of shards in the index.
+"""
+
+SEARCH_CACHE_SIZE = os.environ.get("SEARCH_CACHE_SIZE", "0")
+"""
+Number of search results to cache in memory, in each process.
+
+If 0 (default), results are not cached.
+"""
+
+SEARCH_CACHE_TTL = os.environ.get("SEARCH_CACHE_TTL", "60")
+"""Time (in seconds) for which cached search results may be returned."""
+
+SEARCH_CACHE_DIR = os.environ.get("SEARCH_CACHE_DIR")
+"""
+If set, search results are also cached in this directory.
+
+The cache is shared by all of the processes (e.g. uwsgi workers) that use the
+same directory.
+"""
+
+SEARCH_CACHE_CHECK_INTERVAL = os.environ.get(
+    "SEARCH_CACHE_CHECK_INTERVAL", "5"
+)
+"""
+Time (in seconds) between checks for changes to the index.
+
+Cached search results are discarded once the indexing agent has added new
+documents; they may be returned for up to this long afterwards.
+"""
+
+ELASTICSEARCH_SEARCH_TEMPLATES = os.environ.get(
+    "ELASTICSEARCH_SEARCH_TEMPLATES", "false"
+)
+"""
+Whether to send the most common searches as stored search templates.
+
+The templates are registered with the cluster by each process, when first
+needed; they are generated from the query builders, so a template gives the
+same results as the query that it replaces. See
+:mod:`search.services.index.templates`.
+"""
+
+ELASTICSEARCH_MAX_SEEK_OFFSET = os.environ.get(
+    "ELASTICSEARCH_MAX_SEEK_OFFSET", "100000"
+)
+"""
+Deepest ``start`` offset for API and classic API searches.
+
+Pages beyond ``MAX_RESULTS`` are reached by seeking in steps of
+``MAX_RESULTS`` hits, one request to ES per step; requests for deeper pages
+are rejected with a 400. API clients can page through any number of results
+with ``cursor``.
+"""
+
 
 METADATA_ENDPOINT = os.environ.get("METADATA_ENDPOINT", "https://arxiv.org/")
 """
@@ -191,15 +276,68 @@ Multiple endpoints may be provided with comma delimitation.
 """
 
 METADATA_CACHE_DIR = os.environ.get("METADATA_CACHE_DIR")
-"""Cache directory for metadata documents."""
+"""
+Cache directory for metadata documents.
+
+If set, docmeta records are cached in a single SQLite file in this directory,
+and are read from the cache (if fresh) before going to the docmeta service.
+"""
+
+METADATA_CACHE_TTL = os.environ.get("METADATA_CACHE_TTL", "300")
+"""
+Time (in seconds) for which cached docmeta records are considered fresh.
+
+The indexing agent does not read the cache, since a notification means that the
+paper has changed; it only adds the records that it retrieves. If empty,
+cached records never expire.
+"""
 
 METADATA_VERIFY_CERT = os.environ.get("METADATA_VERIFY_CERT", "True")
 """If ``False``, SSL certificate verification will be disabled."""
 
+METADATA_POOL_SIZE = os.environ.get("METADATA_POOL_SIZE", "10")
+"""Max number of pooled connections to each metadata endpoint."""
+
+METADATA_KEEP_ALIVE = os.environ.get("METADATA_KEEP_ALIVE", "True")
+"""If ``False``, connections to the metadata service will not be re-used."""
+
+METADATA_CONNECT_TIMEOUT = os.environ.get("METADATA_CONNECT_TIMEOUT", "5")
+"""Time (seconds) to wait for a connection to the metadata service."""
+
+METADATA_READ_TIMEOUT = os.environ.get("METADATA_READ_TIMEOUT", "30")
+"""Time (seconds) to wait for the metadata service to send a response."""
+
+METADATA_BULK_MAX_URL_LENGTH = os.environ.get(
+    "METADATA_BULK_MAX_URL_LENGTH", "2000"
+)
+"""Max URL length for a single bulk metadata request."""
+
+METADATA_BULK_MAX_IDS = os.environ.get("METADATA_BULK_MAX_IDS", "100")
+"""Max number of paper IDs in a single bulk metadata request."""
+
+METADATA_BULK_CONCURRENCY = os.environ.get("METADATA_BULK_CONCURRENCY", "4")
+"""Max number of concurrent requests for a single bulk metadata lookup."""
+
+METADATA_ASYNC_CONCURRENCY = os.environ.get(
+    "METADATA_ASYNC_CONCURRENCY", "100"
+)
+"""Max number of requests in flight from an asyncio metadata session."""
+
+METADATA_EJECT_AFTER = os.environ.get("METADATA_EJECT_AFTER", "3")
+"""Consecutive failures before a metadata endpoint is taken out of rotation."""
+
+METADATA_EJECT_COOLDOWN = os.environ.get("METADATA_EJECT_COOLDOWN", "30")
+"""Time (seconds) before an ejected metadata endpoint is tried again."""
+
 FULLTEXT_ENDPOINT = os.environ.get(
     "FULLTEXT_ENDPOINT", "https://fulltext.arxiv.org/fulltext/"
 )
 
+FULLTEXT_ASYNC_CONCURRENCY = os.environ.get(
+    "FULLTEXT_ASYNC_CONCURRENCY", "100"
+)
+"""Max number of requests in flight from an asyncio fulltext session."""
+
 # Settings for the indexing agent.
 KINESIS_ENDPOINT = os.environ.get("KINESIS_ENDPOINT")
 """Can be used to set an alternate endpoint, e.g. for testing."""
@@ -217,8 +355,71 @@ KINESIS_CHECKPOINT_VOLUME = os.environ.get("KINESIS_CHECKPOINT_VOLUME", "/tmp")
 KINESIS_START_TYPE = os.environ.get("KINESIS_START_TYPE", "AT_TIMESTAMP")
 KINESIS_START_AT = os.environ.get("KINESIS_START_AT")
 
-KINESIS_SLEEP = os.environ.get("KINESIS_SLEEP", "0.1")
-"""Amount of time to wait before moving on to the next record."""
+KINESIS_MAX_RATE = os.environ.get("KINESIS_MAX_RATE", "100")
+"""
+Max number of records that the indexing agent will process per second.
+
+The agent slows down automatically when the search index or the metadata
+service are struggling, and speeds back up to this rate when they recover.
+"""
+
+KINESIS_MIN_RATE = os.environ.get("KINESIS_MIN_RATE", "1")
+"""The indexing agent never slows down below this many records per second."""
+
+KINESIS_INDEX_LATENCY_TARGET = os.environ.get(
+    "KINESIS_INDEX_LATENCY_TARGET", "2"
+)
+"""
+Index requests slower than this (seconds) slow down the indexing agent.
+
+For bulk requests, the target is multiplied by the number of documents.
+"""
+
+KINESIS_METADATA_LATENCY_TARGET = os.environ.get(
+    "KINESIS_METADATA_LATENCY_TARGET", "1"
+)
+"""
+Metadata requests slower than this (seconds) slow down the agent.
+
+For bulk requests, the target is multiplied by the number of papers.
+"""
+
+KINESIS_INDEX_BATCH_SIZE = os.environ.get("KINESIS_INDEX_BATCH_SIZE", "0")
+"""
+Number of records to index together in micro-batching mode.
+
+If ``0`` (default), the indexing agent indexes one paper per record.
+"""
+
+KINESIS_INDEX_BATCH_WAIT = os.environ.get("KINESIS_INDEX_BATCH_WAIT", "5")
+"""Max time (seconds) that a record may wait in micro-batching mode."""
+
+KINESIS_INDEX_PIPELINE_DEPTH = os.environ.get(
+    "KINESIS_INDEX_PIPELINE_DEPTH", "0"
+)
+"""
+Queue size for each stage (fetch, transform, index) of the indexing pipeline.
+
+Only applies in micro-batching mode. If ``0`` (default), each micro-batch is
+fetched, transformed, and indexed before the next batch is started.
+"""
+
+KINESIS_INDEX_PIPELINE_WORKERS = os.environ.get(
+    "KINESIS_INDEX_PIPELINE_WORKERS", "1"
+)
+"""Number of worker threads for each stage of the indexing pipeline."""
+
+KINESIS_GENERATION_INTERVAL = os.environ.get(
+    "KINESIS_GENERATION_INTERVAL", "5"
+)
+"""
+Minimum time (seconds) between changes to the generation of the index.
+
+The indexing agent changes the generation after writing documents, so that
+cached search results are discarded. Each change is a mapping update, so it
+is made at most this often; there is little point in making it more often
+than ``SEARCH_CACHE_CHECK_INTERVAL``.
+"""
 
 
 """
@@ -30,7 +30,7 @@ def health_check() -> Tuple[str, int, Dict[str, Any]]:
     """
     try:
         document_set = index.SearchSession.search(  # type: ignore
-            SimpleQuery(search_field="all", value="theory")
+            SimpleQuery(search_field="all", value="theory"), use_cache=False
         )
     except Exception:
         return "DOWN", HTTPStatus.INTERNAL_SERVER_ERROR, {}
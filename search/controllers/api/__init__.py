@@ -1,5 +1,9 @@
 """Controller for search API requests."""
 
+import json
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
 import pytz
 from http import HTTPStatus
 from collections import defaultdict
@@ -15,6 +19,7 @@ from arxiv.base import logging
 
 from search import consts
 from search.services import index
+from search.services.index.util import valid_search_after
 from search.controllers.util import paginate
 from search.domain import (
     Query,
@@ -55,6 +60,64 @@ def search(params: MultiDict) -> Tuple[Dict[str, Any], int, Dict[str, Any]]:
     dict
         Extra headers for the response.
     """
+    q, query_terms = _to_query(params)
+    q = paginate(q, params)  # type: ignore
+
+    cursor = params.get("cursor")
+    if cursor:
+        q.search_after, q.page_start = _decode_cursor(cursor)
+        if not valid_search_after(q, q.search_after):
+            raise BadRequest(f"Invalid cursor: {cursor}")
+    try:
+        document_set = index.SearchSession.search(  # type: ignore
+            q, highlight=False
+        )
+    except index.OutsideAllowedRange as ex:
+        raise BadRequest(f"{ex}; use the cursor to page deeper") from ex
+    document_set["metadata"]["query"] = query_terms
+
+    # The sort values of the last result are an efficient pointer to the next
+    # page, no matter how deep.
+    metadata = document_set["metadata"]
+    if "search_after" in metadata:
+        end = q.page_start + len(document_set["results"])
+        if end < metadata["total_results"]:
+            metadata["next"] = _encode_cursor(metadata["search_after"], end)
+    logger.debug(
+        "Got document set with %i results", len(document_set["results"])
+    )
+    return {"results": document_set, "query": q}, HTTPStatus.OK, {}
+
+
+def export(params: MultiDict) -> Tuple[Dict[str, Any], int, Dict[str, Any]]:
+    """
+    Handle a request to export all of the results of an API query.
+
+    Takes the same parameters as :func:`.search`, except for pagination.
+
+    Parameters
+    ----------
+    params : :class:`MultiDict`
+        GET query parameters from the request.
+
+    Returns
+    -------
+    dict
+        Response data (to serialize); ``results`` is a generator of
+        :class:`.Document`s, which retrieves them as it goes.
+    int
+        HTTP status code.
+    dict
+        Extra headers for the response.
+
+    """
+    q, _ = _to_query(params)
+    documents = index.SearchSession.current_session().export(q)
+    return {"results": documents, "query": q}, HTTPStatus.OK, {}
+
+
+def _to_query(params: MultiDict) -> Tuple[APIQuery, List[Dict[str, Any]]]:
+    """Get an :class:`.APIQuery` and a summary of its terms from params."""
     q = APIQuery()
 
     # Parse NG queries utilizing the Classic API syntax.
@@ -103,16 +166,7 @@ def search(params: MultiDict) -> Tuple[Dict[str, Any], int, Dict[str, Any]]:
     include_fields = _get_include_fields(params, query_terms)
     if include_fields:
         q.include_fields += include_fields
-
-    q = paginate(q, params)  # type: ignore
-    document_set = index.SearchSession.search(  # type: ignore
-        q, highlight=False
-    )
-    document_set["metadata"]["query"] = query_terms
-    logger.debug(
-        "Got document set with %i results", len(document_set["results"])
-    )
-    return {"results": document_set, "query": q}, HTTPStatus.OK, {}
+    return q, query_terms
 
 
 def paper(paper_id: str) -> Tuple[Dict[str, Any], int, Dict[str, Any]]:
@@ -149,6 +203,24 @@ def paper(paper_id: str) -> Tuple[Dict[str, Any], int, Dict[str, Any]]:
     return {"results": document}, HTTPStatus.OK, {}
 
 
+def _encode_cursor(search_after: List[Any], start: int) -> str:
+    """Generate an opaque cursor, for the page that starts after a result."""
+    raw = json.dumps([search_after, start], separators=(",", ":"))
+    return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[List[Any], int]:
+    """Get the sort values and offset encoded by :func:`._encode_cursor`."""
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        search_after, start = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise BadRequest(f"Invalid cursor: {cursor}")
+    if not isinstance(search_after, list) or not isinstance(start, int):
+        raise BadRequest(f"Invalid cursor: {cursor}")
+    return search_after, start
+
+
 def _get_include_fields(params: MultiDict, query_terms: List) -> List[str]:
     include_fields: List[str] = params.getlist("include")
     if include_fields:
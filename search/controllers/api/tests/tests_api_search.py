@@ -183,3 +183,48 @@ class TestPaper(TestCase):
     def test_paper(self, mock_index):
         """Request with single parameter paper."""
         _, _, _ = api.paper("1234.56789")
+
+
+class TestCursor(TestCase):
+    """Tests for cursor-based pagination in :func:`.api.search`."""
+
+    @mock.patch(f"{api.__name__}.index.SearchSession")
+    def test_next(self, mock_index):
+        """The metadata includes a cursor for the next page."""
+        mock_index.search.return_value = {
+            "metadata": {"total_results": 100, "search_after": [1, "a"]},
+            "results": [{}] * 10,
+        }
+        data, _, _ = api.search(MultiDict({"start": 20, "size": 10}))
+        cursor = data["results"]["metadata"]["next"]
+
+        data, _, _ = api.search(MultiDict({"size": 10, "cursor": cursor}))
+        query = mock_index.search.call_args[0][0]
+        self.assertEqual(query.search_after, [1, "a"])
+        self.assertEqual(query.page_start, 30)
+
+    @mock.patch(f"{api.__name__}.index.SearchSession")
+    def test_last_page(self, mock_index):
+        """There is no cursor after the last page."""
+        mock_index.search.return_value = {
+            "metadata": {"total_results": 25, "search_after": [1, "a"]},
+            "results": [{}] * 5,
+        }
+        data, _, _ = api.search(MultiDict({"start": 20, "size": 10}))
+        self.assertNotIn("next", data["results"]["metadata"])
+
+    @mock.patch(f"{api.__name__}.index.SearchSession")
+    def test_invalid_cursor(self, mock_index):
+        """The cursor is not one that we generated."""
+        for cursor in ["foo", "Zm9v", "eyJhIjoxfQ"]:
+            with self.assertRaises(BadRequest):
+                api.search(MultiDict({"cursor": cursor}))
+
+    @mock.patch(f"{api.__name__}.index.SearchSession")
+    def test_malformed_sort_values(self, mock_index):
+        """The cursor decodes, but its sort values do not fit the sort."""
+        for search_after in [[], [1], [1, "a", 2], ["a", "b"], [1, 2]]:
+            cursor = api._encode_cursor(search_after, 10)
+            with self.assertRaises(BadRequest):
+                api.search(MultiDict({"cursor": cursor}))
+        mock_index.search.assert_not_called()
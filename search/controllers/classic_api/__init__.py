@@ -37,8 +37,8 @@ def query(
     Then the request is passed to :method:`search()` and returned.
 
     If ``id_list`` is specified in the parameters and ``search_query`` is
-    NOT specified, then each request is passed to :method:`paper()` and
-    results are aggregated.
+    NOT specified, then the papers are looked up by ID, and returned in the
+    order in which they were requested.
 
     If ``id_list`` is specified AND ``search_query`` is also specified,
     then the results from :method:`search()` are filtered by ``id_list``.
@@ -148,10 +148,19 @@ def query(
             " for the classic API."
         )
 
-    # pass to search indexer, which will handle parsing
-    document_set: DocumentSet = index.SearchSession.current_session().search(
-        classic_query
-    )
+    session = index.SearchSession.current_session()
+    if search_query is None:
+        # Only an id_list: the papers can be looked up directly by ID.
+        document_set: DocumentSet = session.get_id_list(classic_query)
+    else:
+        # pass to search indexer, which will handle parsing
+        try:
+            document_set = session.search(classic_query)
+        except index.OutsideAllowedRange as ex:
+            raise ValidationError(
+                message=f"start is too large: {ex}",
+                link="https://arxiv.org/help/api/user-manual#paging",
+            ) from ex
     logger.debug(
         "Got document set with %i results", len(document_set["results"])
     )
@@ -49,6 +49,24 @@ class TestClassicAPISearch(TestCase):
         self.assertIsNotNone(data.results, "Results are returned")
         self.assertIsNotNone(data.query, "Query object is returned")
 
+    @mock.patch(f"{classic_api.__name__}.index.SearchSession")
+    def test_classic_id_list_only(self, mock_index):
+        """Request with id_list only is looked up by ID, not searched."""
+        mock_session = mock_index.current_session.return_value
+        params = MultiDict({"id_list": "1234.56789,1234.56789v3"})
+
+        data, _, _ = classic_api.query(params)
+        self.assertEqual(mock_session.get_id_list.call_count, 1)
+        self.assertEqual(mock_session.search.call_count, 0)
+        self.assertIs(data.results, mock_session.get_id_list.return_value)
+
+        params = MultiDict(
+            {"id_list": "1234.56789", "search_query": "au:Copernicus"}
+        )
+        classic_api.query(params)
+        self.assertEqual(mock_session.get_id_list.call_count, 1)
+        self.assertEqual(mock_session.search.call_count, 1)
+
     @mock.patch(f"{classic_api.__name__}.index.SearchSession")
     def test_classic_start(self, mock_index):
         # Default value
@@ -132,3 +150,14 @@ class TestClassicAPISearch(TestCase):
         )
         with self.assertRaises(ValidationError):
             data, _, _ = classic_api.query(params)
+
+    @mock.patch(f"{classic_api.__name__}.index.SearchSession")
+    def test_classic_start_too_deep(self, mock_index):
+        """The index refuses to seek that far."""
+        mock_session = mock_index.current_session.return_value
+        mock_session.search.side_effect = classic_api.index.OutsideAllowedRange
+        params = MultiDict(
+            {"search_query": "au:Copernicus", "start": "1000000000"}
+        )
+        with self.assertRaises(ValidationError):
+            classic_api.query(params)
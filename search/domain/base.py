@@ -311,6 +311,13 @@ class Query:
     page_start: int = field(default=0)
     include_older_versions: bool = field(default=False)
     hide_abstracts: bool = field(default=False)
+    search_after: Optional[List[Any]] = field(default=None)
+    """
+    Sort values of the last result on the previous page.
+
+    If set, results start immediately after that result, rather than at
+    ``page_start`` (which is then used only to report the offset).
+    """
 
     @property
     def page_end(self) -> int:
@@ -84,6 +84,8 @@ class Document(TypedDict, total=False):
     formats: List[str]
     primary_classification: Classification
     secondary_classification: ClassificationList
+    fingerprint: str
+    """Hash of the indexable content of the document."""
 
     score: float
 
@@ -115,6 +117,10 @@ class DocumentSetMetadata(TypedDict, total=False):
     total_results: int
     total_pages: int
     query: List[Dict[str, Any]]
+    search_after: List[Any]
+    """Sort values of the last result, to request the next page."""
+    next: str
+    """Opaque cursor for the next page, if there is one."""
 
 
 class DocumentSet(TypedDict):
@@ -352,3 +352,29 @@ class TestTransformBulkDocmeta(TestCase):
                 self.assertFalse(doc["is_current"])
                 self.assertEqual(doc["id"], doc["paper_id_v"])
             self.assertEqual(doc["latest_version"], 2)
+
+
+class TestFingerprint(TestCase):
+    """Each search document carries a fingerprint of its content."""
+
+    def test_stable(self):
+        """The fingerprint depends only on the content of the document."""
+        meta = DocMeta(paper_id="1234.56789", title_utf8="foo title")
+        doc = transform.to_search_document(meta)
+        again = transform.to_search_document(meta)
+        self.assertEqual(doc["fingerprint"], again["fingerprint"])
+        self.assertEqual(
+            doc["fingerprint"],
+            transform.fingerprint(dict(reversed(list(doc.items())))),
+            "Order of keys does not matter",
+        )
+
+    def test_changed(self):
+        """The fingerprint changes when the content changes."""
+        doc = transform.to_search_document(
+            DocMeta(paper_id="1234.56789", title_utf8="foo title")
+        )
+        changed = transform.to_search_document(
+            DocMeta(paper_id="1234.56789", title_utf8="bar title")
+        )
+        self.assertNotEqual(doc["fingerprint"], changed["fingerprint"])
@@ -1,6 +1,8 @@
 """Responsible for transforming metadata & fulltext into a search document."""
 
 from string import punctuation
+import hashlib
+import json
 import re
 from typing import Callable, Dict, List, Optional, Tuple, Union
 from search.domain import Document, DocMeta, Fulltext
@@ -140,6 +142,41 @@ _transformations: List[Tuple[str, TransformType, bool]] = [
 ]
 
 
+VERSION_FIELDS = (
+    "is_current",
+    "latest",
+    "latest_version",
+    "submitted_date_all",
+)
+"""
+Fields that depend on which version of a paper is the latest.
+
+``submitted_date_all`` is only populated on the current version. These are
+usually the only fields that change on the previous versions of a paper when
+a new version is announced, so they are not included in the fingerprint; see
+:func:`.fingerprint`.
+"""
+
+
+def fingerprint(document: Document) -> str:
+    """
+    Generate a stable hash of the indexable content of a search document.
+
+    The hash does not depend on the order of keys in the document, so two
+    documents with the same content always have the same fingerprint.
+    :const:`.VERSION_FIELDS` are not included, so that a document whose
+    version pointers have changed can be updated in place rather than
+    re-indexed.
+    """
+    content = {
+        k: v
+        for k, v in document.items()
+        if k != "fingerprint" and k not in VERSION_FIELDS
+    }
+    serialized = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+
 def to_search_document(
     metadata: DocMeta, fulltext: Optional[Fulltext] = None
 ) -> Document:
@@ -172,4 +209,5 @@ def to_search_document(
         data[key] = value
     # if fulltext:
     #     data['fulltext'] = fulltext.content
+    data["fingerprint"] = fingerprint(data)
     return data
@@ -2,7 +2,13 @@
 
 __all__ = ["blueprint", "exceptions"]
 
-from flask import Blueprint, make_response, request, Response
+from flask import (
+    Blueprint,
+    make_response,
+    request,
+    Response,
+    stream_with_context,
+)
 
 from arxiv.base import logging
 
@@ -10,7 +16,7 @@ from arxiv.base import logging
 # from arxiv.users.auth.decorators import scoped
 from search import serialize
 from search.controllers import api
-from search.routes.consts import JSON
+from search.routes.consts import JSON, NDJSON
 from search.routes.api import exceptions
 
 logger = logging.getLogger(__name__)
@@ -34,6 +40,19 @@ def search() -> Response:
     return response
 
 
+@blueprint.route("/export", methods=["GET"])
+# @scoped(required=scopes.READ_PUBLIC)
+def export() -> Response:
+    """Stream all of the results of a query, as newline-delimited JSON."""
+    logger.debug("Got export query: %s", request.args)
+    data, status_code, headers = api.export(request.args)
+    lines = serialize.as_ndjson(data["results"], query=data["query"])
+    headers.update({"Content-type": NDJSON})
+    # Documents are retrieved and serialized as the response is sent; the
+    # request context is needed to generate URLs.
+    return Response(stream_with_context(lines), status_code, headers)
+
+
 @blueprint.route("/<arxiv:paper_id>v<string:version>", methods=["GET"])
 # @scoped(required=scopes.READ_PUBLIC)
 def paper(paper_id: str, version: str) -> Response:
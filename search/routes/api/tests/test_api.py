@@ -13,6 +13,7 @@ from arxiv.users.domain import Scope
 from search import factory
 from search.tests import mocks
 from search.domain.api import APIQuery, get_required_fields
+from search.services.index import IndexConnectionError
 
 
 class TestAPISearchRequests(TestCase):
@@ -141,3 +142,46 @@ class TestAPISearchRequests(TestCase):
 
         for field in get_required_fields():
             self.assertIn(field, data["results"][0])
+
+    @mock.patch(f"{factory.__name__}.api.api")
+    def test_export(self, mock_controller):
+        """All results are streamed as newline-delimited JSON."""
+        query = APIQuery(include_fields=["abstract"])
+        documents = (mocks.document() for _ in range(3))
+        r_data = {"results": documents, "query": query}
+        mock_controller.export.return_value = r_data, HTTPStatus.OK, {}
+
+        response = self.client.get("/export?include=abstract")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(
+            response.headers["Content-Type"],
+            "application/x-ndjson; charset=utf-8",
+        )
+
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 3)
+        for line in lines:
+            self.assertEqual(
+                set(json.loads(line).keys()), set(query.include_fields)
+            )
+
+    @mock.patch(f"{factory.__name__}.api.api")
+    def test_export_fails(self, mock_controller):
+        """An export that fails part of the way through ends with an error."""
+        query = APIQuery(include_fields=["abstract"])
+
+        def documents():
+            yield mocks.document()
+            raise IndexConnectionError("Slice 1 failed")
+
+        r_data = {"results": documents(), "query": query}
+        mock_controller.export.return_value = r_data, HTTPStatus.OK, {}
+
+        response = self.client.get("/export?include=abstract")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("abstract", json.loads(lines[0]))
+        self.assertEqual(json.loads(lines[1])["error"]["code"], 500)
@@ -2,3 +2,4 @@
 
 ATOM_XML = "application/atom+xml; charset=utf-8"
 JSON = "application/json; charset=utf-8"
+NDJSON = "application/x-ndjson; charset=utf-8"
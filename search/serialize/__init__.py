@@ -1,5 +1,11 @@
 """Provides serialization functions for API responses."""
-__all__ = ["JSONSerializer", "as_json", "AtomXMLSerializer", "as_atom"]
+__all__ = [
+    "JSONSerializer",
+    "as_json",
+    "as_ndjson",
+    "AtomXMLSerializer",
+    "as_atom",
+]
 
-from search.serialize.json import JSONSerializer, as_json
+from search.serialize.json import JSONSerializer, as_json, as_ndjson
 from search.serialize.atom import AtomXMLSerializer, as_atom
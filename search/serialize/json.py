@@ -1,11 +1,14 @@
 """Serializers for API responses."""
 
-from typing import Union, Optional, Dict, Any
-from flask import jsonify, url_for, Response
+from typing import Union, Optional, Dict, Any, Iterable, Generator
+from flask import json, jsonify, url_for, Response
 
+from arxiv.base import logging
 from search.serialize.base import BaseSerializer
 from search.domain import DocumentSet, Document, Classification, APIQuery
 
+logger = logging.getLogger(__name__)
+
 
 class JSONSerializer(BaseSerializer):
     """Serializes a :class:`DocumentSet` as JSON."""
@@ -103,19 +106,22 @@ class JSONSerializer(BaseSerializer):
     ) -> Response:
         """Generate JSON for a :class:`DocumentSet`."""
         total_results = int(document_set["metadata"].get("total_results", 0))
+        metadata = {
+            "start": document_set["metadata"].get("start", ""),
+            "end": document_set["metadata"].get("end", ""),
+            "size": document_set["metadata"].get("size", ""),
+            "total_results": total_results,
+            "query": document_set["metadata"].get("query", []),
+        }
+        if "next" in document_set["metadata"]:
+            metadata["next"] = document_set["metadata"]["next"]
         serialized: Response = jsonify(
             {
                 "results": [
                     self.transform_document(doc, query=query)
                     for doc in document_set["results"]
                 ],
-                "metadata": {
-                    "start": document_set["metadata"].get("start", ""),
-                    "end": document_set["metadata"].get("end", ""),
-                    "size": document_set["metadata"].get("size", ""),
-                    "total_results": total_results,
-                    "query": document_set["metadata"].get("query", []),
-                },
+                "metadata": metadata,
             }
         )
         return serialized
@@ -129,6 +135,26 @@ class JSONSerializer(BaseSerializer):
         )
         return serialized
 
+    def serialize_stream(
+        self, documents: Iterable[Document], query: Optional[APIQuery] = None
+    ) -> Generator[str, None, None]:
+        """
+        Generate newline-delimited JSON, one :class:`Document` per line.
+
+        If ``documents`` fails, the response status has already been sent;
+        so the last line is then an error, e.g. ``{"error": {"code": 500,
+        "message": "..."}}``, by which clients can tell an incomplete export
+        from a complete one.
+        """
+        try:
+            for document in documents:
+                data = self.transform_document(document, query=query)
+                yield json.dumps(data) + "\n"
+        except Exception as ex:
+            logger.error("Export failed: %s", ex)
+            error = {"code": 500, "message": "Export failed; incomplete"}
+            yield json.dumps({"error": error}) + "\n"
+
 
 def as_json(
     document_or_set: Union[DocumentSet, Document],
@@ -142,3 +168,10 @@ def as_json(
     return JSONSerializer().serialize(  # type:ignore
         document_or_set, query=query
     )
+
+
+def as_ndjson(
+    documents: Iterable[Document], query: Optional[APIQuery] = None
+) -> Generator[str, None, None]:
+    """Serialize :class:`Document`s as newline-delimited JSON, lazily."""
+    return JSONSerializer().serialize_stream(documents, query=query)
@@ -1,8 +1,10 @@
 """Provides access to fulltext content for arXiv papers."""
 
 import json
+import asyncio
 from http import HTTPStatus
 from functools import wraps
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from urllib.parse import urljoin
 
 import requests
@@ -10,6 +12,42 @@ import requests
 from search.domain import Fulltext
 from search.context import get_application_config, get_application_global
 
+if TYPE_CHECKING:  # Only needed by AsyncFulltextSession; imported there.
+    import aiohttp
+
+
+class RequestFailed(IOError):
+    """The fulltext endpoint returned an unexpected status code."""
+
+
+class ConnectionFailed(IOError):
+    """Could not connect to the fulltext service."""
+
+
+class SecurityException(ConnectionFailed):
+    """Raised when SSL connection fails."""
+
+
+class BadResponse(IOError):
+    """The response from the fulltext service was malformed."""
+
+
+class PartialFailure(RequestFailed):
+    """Fulltext could not be retrieved for some of the requested papers."""
+
+    def __init__(
+        self,
+        message: str,
+        results: Dict[str, Fulltext],
+        failures: Dict[str, Exception],
+    ) -> None:
+        """Keep track of what was retrieved, and what was not."""
+        super(PartialFailure, self).__init__(message)
+        self.results = results
+        """Fulltext that was retrieved, keyed by ID."""
+        self.failures = failures
+        """The exception raised for each ID that could not be retrieved."""
+
 
 class FulltextSession(object):
     """An HTTP session with the fulltext endpoint."""
@@ -54,29 +92,208 @@ class FulltextSession(object):
         try:
             response = requests.get(urljoin(self.endpoint, document_id))
         except requests.exceptions.SSLError as ex:
-            raise IOError("SSL failed: %s" % ex)
+            raise SecurityException("SSL failed: %s" % ex)
+        except requests.exceptions.ConnectionError as ex:
+            raise ConnectionFailed(
+                "Could not connect to fulltext service: %s" % ex
+            ) from ex
 
         if response.status_code != HTTPStatus.OK:
-            raise IOError(
+            raise RequestFailed(
                 "%s: could not retrieve fulltext: %i"
                 % (document_id, response.status_code)
             )
         try:
             data = response.json()
         except json.decoder.JSONDecodeError as ex:
-            raise IOError(
+            raise BadResponse(
                 "%s: could not decode response: %s" % (document_id, ex)
             ) from ex
         return Fulltext(**data)  # type: ignore
         # See https://github.com/python/mypy/issues/3937
 
 
+class AsyncFulltextSession(object):
+    """
+    An asyncio-native session with the fulltext endpoint.
+
+    Raises the same exceptions as :class:`.FulltextSession`, but makes its
+    requests with :mod:`aiohttp` so that many requests can be in flight from
+    a single thread. Must be used from within a running event loop, and
+    closed with :meth:`.close` (or used as an async context manager).
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        max_concurrent: int = 100,
+        connect_timeout: Optional[float] = 5.0,
+        read_timeout: Optional[float] = 30.0,
+        retries: int = 2,
+    ) -> None:
+        """
+        Initialize an asyncio session.
+
+        Parameters
+        ----------
+        endpoint : str
+            Base URL for fulltext endpoint.
+        max_concurrent : int
+            Max number of requests in flight at once. This is also the size of
+            the connection pool.
+        connect_timeout : float
+            Time (in seconds) to wait for a connection to the endpoint.
+        read_timeout : float
+            Time (in seconds) to wait for the endpoint to send data.
+        retries : int
+            Number of times to retry a request that could not connect or
+            timed out, with exponential backoff.
+
+        """
+        if not endpoint[-1] == "/":
+            endpoint += "/"
+        self.endpoint = endpoint
+        self._max_concurrent = max_concurrent
+        self._timeout: Tuple[Optional[float], Optional[float]] = (
+            connect_timeout,
+            read_timeout,
+        )
+        self._retries = retries
+        self._client: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncFulltextSession":
+        """Use the session as an async context manager."""
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        """Close the session on exit."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Close all of the connections held by this session."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def _get_client(self) -> "aiohttp.ClientSession":
+        # aiohttp sessions are bound to the event loop, so are created when
+        # the first request is made.
+        import aiohttp
+
+        if self._client is None:
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_concurrent),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self._timeout[0], sock_read=self._timeout[1]
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self._max_concurrent)
+        return self._client
+
+    async def retrieve(self, document_id: str) -> Fulltext:
+        """
+        Retrieve fulltext content for an arXiv paper.
+
+        See :meth:`.FulltextSession.retrieve`.
+        """
+        if not document_id:  # This could use further elaboration.
+            raise ValueError("Invalid value for document_id")
+        client = self._get_client()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:  # type: ignore
+                    status, content = await self._get(client, document_id)
+                break
+            except SecurityException:
+                raise
+            except ConnectionFailed:
+                if attempt >= self._retries:
+                    raise
+            await asyncio.sleep(0.5 * 2**attempt)
+            attempt += 1
+
+        if status != HTTPStatus.OK:
+            raise RequestFailed(
+                "%s: could not retrieve fulltext: %i" % (document_id, status)
+            )
+        try:
+            data = json.loads(content)
+        except json.decoder.JSONDecodeError as ex:
+            raise BadResponse(
+                "%s: could not decode response: %s" % (document_id, ex)
+            ) from ex
+        return Fulltext(**data)  # type: ignore
+
+    async def retrieve_many(
+        self, document_ids: List[str]
+    ) -> Dict[str, Fulltext]:
+        """
+        Retrieve fulltext content for several papers, concurrently.
+
+        Returns
+        -------
+        dict
+            :class:`.Fulltext` keyed by ID.
+
+        Raises
+        ------
+        PartialFailure
+            Fulltext could not be retrieved for some of the papers.
+        IOError
+            Fulltext could not be retrieved for any of the papers.
+
+        """
+        outcomes = await asyncio.gather(
+            *[self.retrieve(ident) for ident in document_ids],
+            return_exceptions=True,
+        )
+        results: Dict[str, Fulltext] = {}
+        failures: Dict[str, Exception] = {}
+        for ident, outcome in zip(document_ids, outcomes):
+            if isinstance(outcome, Exception):
+                failures[ident] = outcome
+            else:
+                results[ident] = outcome
+        if failures and not results:
+            raise next(iter(failures.values()))
+        if failures:
+            raise PartialFailure(
+                "Failed to retrieve %i papers" % len(failures),
+                results,
+                failures,
+            )
+        return results
+
+    async def _get(
+        self, client: "aiohttp.ClientSession", document_id: str
+    ) -> Any:
+        import aiohttp
+
+        try:
+            target = urljoin(self.endpoint, document_id)
+            async with client.get(target) as response:
+                return response.status, await response.read()
+        except aiohttp.ClientSSLError as ex:
+            raise SecurityException("SSL failed: %s" % ex) from ex
+        except aiohttp.ClientError as ex:
+            raise ConnectionFailed(
+                "Could not connect to fulltext service: %s" % ex
+            ) from ex
+        except asyncio.TimeoutError as ex:
+            raise ConnectionFailed(
+                "Fulltext service did not respond in time: %s" % ex
+            ) from ex
+
+
 def init_app(app: object = None) -> None:
     """Set default configuration parameters for an application instance."""
     config = get_application_config(app)
     config.setdefault(
         "FULLTEXT_ENDPOINT", "https://fulltext.arxiv.org/fulltext/"
     )
+    config.setdefault("FULLTEXT_ASYNC_CONCURRENCY", "100")
 
 
 def get_session(app: object = None) -> FulltextSession:
@@ -88,6 +305,23 @@ def get_session(app: object = None) -> FulltextSession:
     return FulltextSession(endpoint)
 
 
+def get_async_session(app: object = None) -> AsyncFulltextSession:
+    """
+    Get a new asyncio session with the fulltext endpoint.
+
+    Unlike :func:`.get_session`, the session is not bound to the application
+    context; the caller is responsible for closing it.
+    """
+    config = get_application_config(app)
+    endpoint = config.get(
+        "FULLTEXT_ENDPOINT", "https://fulltext.arxiv.org/fulltext/"
+    )
+    return AsyncFulltextSession(
+        endpoint,
+        max_concurrent=int(config.get("FULLTEXT_ASYNC_CONCURRENCY", "100")),
+    )
+
+
 def current_session() -> FulltextSession:
     """Get/create :class:`.FulltextSession` for this context."""
     g = get_application_global()
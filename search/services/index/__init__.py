@@ -14,15 +14,28 @@ for indexing (e.g. by the
 __all__ = ["Q", "SearchSession"]
 
 import json
+import time
 import warnings
 from contextlib import contextmanager
-from typing import Any, Optional, List, Generator, Dict
+from typing import (
+    Any,
+    Optional,
+    List,
+    Generator,
+    Dict,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import urllib3
 from flask import current_app
 from elasticsearch import (
+    ConnectionError as ESConnectionError,
     Elasticsearch,
     ElasticsearchException,
+    NotFoundError,
     SerializationError,
     TransportError,
     helpers,
@@ -47,18 +60,35 @@ from search.domain import (
 from search.services.index.exceptions import (
     QueryError,
     IndexConnectionError,
+    IndexOverloaded,
     DocumentNotFound,
     IndexingError,
+    BulkIndexingError,
     OutsideAllowedRange,
     MappingError,
+    CutoverFailed,
 )
 from search.services.index.util import MAX_RESULTS
 from search.services.index.advanced import advanced_search
 from search.services.index.simple import simple_search
 from search.services.index.api import api_search
 from search.services.index.classic_api import classic_search
+from search.services.index.classic_api.classic_search import (
+    ENDS_WITH_VERSION,
+    current_versions,
+)
 from search.services.index import highlighting
 from search.services.index import results
+from search.services.index import pagination
+from search.services.index import export
+from search.services.index import templates
+from search.services.index.optimize import optimize_search
+from search.services.index.cache import (
+    IN_FLIGHT,
+    ResultCache,
+    fingerprint,
+    get_cache,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +113,27 @@ ALL_SEARCH_FIELDS = [
     "author_id",
 ]
 
+MGET_BATCH_SIZE = 1_000
+"""Maximum number of documents retrieved by a single ``_mget`` request."""
+
+
+def _is_rejection(status: Any, error: Any) -> bool:
+    """Determine whether ES turned down a request because it is too busy."""
+    return status == 429 or (
+        isinstance(error, str) and "es_rejected_execution_exception" in error
+    )
+
+
+def _is_rejected_item(item: Dict[str, Any]) -> bool:
+    """Determine whether an item in a ``_bulk`` response was turned down."""
+    for result in item.values():
+        error = result.get("error")
+        if isinstance(error, dict):
+            error = error.get("type")
+        if _is_rejection(result.get("status"), error):
+            return True
+    return False
+
 
 @contextmanager
 def handle_es_exceptions() -> Generator:
@@ -106,6 +157,9 @@ def handle_es_exceptions() -> Generator:
         elif ex.status_code == 404:
             logger.error("Caught NotFoundError: %s", ex)
             raise DocumentNotFound("No such document")
+        elif _is_rejection(ex.status_code, ex.error):
+            logger.error("ES is overloaded: %s", ex.error)
+            raise IndexOverloaded("ES rejected request: %s" % ex.error) from ex
         logger.error("Problem communicating with ES: %s" % ex.error)
         raise IndexConnectionError(
             "Problem communicating with ES: %s" % ex.error
@@ -115,6 +169,8 @@ def handle_es_exceptions() -> Generator:
         raise IndexingError("Problem serializing document: %s" % ex) from ex
     except BulkIndexError as ex:
         logger.error("BulkIndexError: %s", ex)
+        if any(_is_rejected_item(item) for item in ex.errors):
+            raise IndexOverloaded("ES rejected bulk items: %s" % ex) from ex
         raise IndexingError("Problem with bulk indexing: %s" % ex) from ex
     except Exception as ex:
         logger.error("Unhandled exception: %s" % ex)
@@ -134,6 +190,14 @@ class SearchSession(metaclass=MetaIntegration):
         password: Optional[str] = None,
         mapping: Optional[str] = None,
         verify: bool = True,
+        bulk_threads: int = 4,
+        bulk_max_bytes: int = 10 * 1024 * 1024,
+        bulk_max_retries: int = 3,
+        write_alias: Optional[str] = None,
+        export_slices: int = 4,
+        cache: Optional[ResultCache] = None,
+        search_templates: bool = False,
+        max_seek_offset: int = 100_000,
         **extra: Any,
     ) -> None:
         """
@@ -143,6 +207,8 @@ class SearchSession(metaclass=MetaIntegration):
         ----------
         host : str
         index : str
+            Name (or alias) of the index to read from. Also written to, unless
+            ``write_alias`` is set.
         port : int
             Default: 9200
         scheme: str
@@ -151,6 +217,30 @@ class SearchSession(metaclass=MetaIntegration):
             Default: None
         password: str
             Default: None
+        bulk_threads : int
+            Number of concurrent requests by :meth:`.bulk_add_documents`.
+        bulk_max_bytes : int
+            Max size (in bytes) of a single request by
+            :meth:`.bulk_add_documents`.
+        bulk_max_retries : int
+            Number of times that documents rejected by ES (because it is too
+            busy) are retried by :meth:`.bulk_add_documents`, with exponential
+            backoff.
+        write_alias : str
+            Alias of the index (or indices) to write to. During a migration
+            (see :meth:`.begin_migration`), this points to both the old and
+            the new index, and every document is written to both.
+        export_slices : int
+            Number of slices retrieved in parallel by :meth:`.export`.
+        cache : :class:`.ResultCache`
+            If provided, results of :meth:`.search` are cached here.
+        search_templates : bool
+            Whether to send the most common searches as stored search
+            templates (see :mod:`.templates`).
+        max_seek_offset : int
+            Deepest offset that :meth:`.search` will seek to, for API queries
+            without :attr:`.Query.search_after`. Each step of the seek is a
+            request to ES, so deeper pages must be requested with a cursor.
 
         Raises
         ------
@@ -162,6 +252,15 @@ class SearchSession(metaclass=MetaIntegration):
         self.index = index
         self.mapping = mapping
         self.doc_type = "document"
+        self.bulk_threads = bulk_threads
+        self.bulk_max_bytes = bulk_max_bytes
+        self.bulk_max_retries = bulk_max_retries
+        self.write_alias = write_alias
+        self.export_slices = export_slices
+        self.cache = cache
+        self.search_templates = search_templates
+        self.max_seek_offset = max_seek_offset
+        self._known_indices: Set[str] = set()
         use_ssl = True if scheme == "https" else False
         http_auth = "%s:%s" % (user, password) if user else None
 
@@ -197,6 +296,41 @@ class SearchSession(metaclass=MetaIntegration):
     def _base_search(self) -> Search:
         return Search(using=self.es, index=self.index)
 
+    @property
+    def _cluster(self) -> str:
+        return "%(host)s:%(port)s" % self.conn_params
+
+    def _search_template(
+        self, template_id: str, params: Dict[str, Any], **extra: Any
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Perform a search with a stored template.
+
+        Returns
+        -------
+        dict or None
+            The raw response; or None if the templates are not (or no longer)
+            registered, in which case the search should be built as usual.
+
+        """
+        if not templates.ensure_registered(self.es, self._cluster):
+            return None
+        with handle_es_exceptions():
+            try:
+                resp: Dict[str, Any] = self.es.search_template(
+                    index=self.index,
+                    body={"id": template_id, "params": params},
+                    **extra,
+                )
+                return resp
+            except NotFoundError as ex:
+                # E.g. the cluster was replaced since they were registered.
+                if ex.error != "resource_not_found_exception":
+                    raise
+        logger.warning("Search template %s is missing", template_id)
+        templates.forget(self._cluster)
+        return None
+
     # FIXME: Return type.
     def _load_mapping(self) -> Dict[Any, Any]:
         if not self.mapping or not isinstance(self.mapping, str):
@@ -257,6 +391,171 @@ class SearchSession(metaclass=MetaIntegration):
         with handle_es_exceptions():
             self.es.indices.create(self.index, self._load_mapping())
 
+    def _ensure_index(self) -> None:
+        """Create the index if it does not exist; only checks once."""
+        if self.index in self._known_indices:
+            return
+        if not self.es.indices.exists(index=self.index):
+            logger.debug("index does not exist")
+            self.create_index()
+            logger.debug("created index")
+        self._known_indices.add(self.index)
+
+    def _write_indices(self) -> List[str]:
+        """Get the names of the indices to which documents are written."""
+        if not self.write_alias:
+            self._ensure_index()
+            return [self.index]
+        return self._aliased(self.write_alias)
+
+    def _new_indices(self, targets: List[str]) -> List[str]:
+        """
+        Get the indices among ``targets`` that are not read from yet.
+
+        During a migration, the new index is behind the write alias but not
+        (yet) behind the read alias; see :meth:`.begin_migration`.
+        """
+        if not self.write_alias:
+            return []
+        reading = set(self._aliased(self.index))
+        return [name for name in targets if name not in reading]
+
+    def _concrete(self, names: List[str]) -> List[str]:
+        """Resolve any aliases among ``names`` to the indices behind them."""
+        with handle_es_exceptions():
+            return sorted(self.es.indices.get_alias(index=",".join(names)))
+
+    def _aliased(self, alias: str) -> List[str]:
+        """Get the names of the indices that ``alias`` points to."""
+        try:
+            with handle_es_exceptions():
+                return sorted(self.es.indices.get_alias(name=alias))
+        except DocumentNotFound as ex:
+            raise IndexingError(f"Alias {alias} does not exist") from ex
+
+    def create_aliased_index(self, index: str) -> None:
+        """
+        Create an index behind the read and write aliases of this session.
+
+        Use this to start using aliases; after that, see
+        :meth:`.begin_migration`.
+
+        Parameters
+        ----------
+        index : str
+            Name of the (concrete) index to create.
+
+        """
+        if not self.write_alias:
+            raise ValueError("Write alias is not set")
+        logger.info("create index %s behind aliases", index)
+        with handle_es_exceptions():
+            self.es.indices.create(index, self._load_mapping())
+            self.es.indices.update_aliases(
+                {
+                    "actions": [
+                        {"add": {"index": index, "alias": self.index}},
+                        {"add": {"index": index, "alias": self.write_alias}},
+                    ]
+                }
+            )
+
+    def begin_migration(self, new_index: str) -> List[str]:
+        """
+        Start writing to a new index, alongside the current one(s).
+
+        Creates ``new_index`` with the current mapping, and adds it to the
+        write alias, so that the indexing agent writes each document to both
+        the old and the new index. Reads still go to the old index. Next,
+        copy the old index to the new one (see :meth:`.reindex`), and then
+        switch reads over with :meth:`.cut_over`. Until then, the new index is
+        the one that is behind the write alias but not the read alias.
+
+        Parameters
+        ----------
+        new_index : str
+            Name of the (concrete) index to create.
+
+        Returns
+        -------
+        list
+            Names of the indices that are currently read from.
+
+        """
+        if not self.write_alias:
+            raise ValueError("Write alias is not set")
+        current = self._aliased(self.index)
+        logger.info("begin migration from %s to %s", current, new_index)
+        with handle_es_exceptions():
+            self.es.indices.create(new_index, self._load_mapping())
+            self.es.indices.put_alias(index=new_index, name=self.write_alias)
+        return current
+
+    def cut_over(
+        self, new_index: str, verify: bool = True, max_missing: int = 0
+    ) -> List[str]:
+        """
+        Atomically switch the read and write aliases to ``new_index``.
+
+        The old indices are not deleted, so a cut-over can be rolled back by
+        cutting over to the old index again (with ``verify=False``).
+
+        Parameters
+        ----------
+        new_index : str
+            Name of the (concrete) index that takes over.
+        verify : bool
+            If True (default), check first that the new index has (nearly) as
+            many documents as the old one(s).
+        max_missing : int
+            Number of documents that the new index may lack.
+
+        Returns
+        -------
+        list
+            Names of the indices that were read from before the cut-over.
+
+        Raises
+        ------
+        CutoverFailed
+            The new index has too few documents.
+
+        """
+        old = [name for name in self._aliased(self.index) if name != new_index]
+        with handle_es_exceptions():
+            if verify:
+                self.es.indices.refresh(index=",".join(old + [new_index]))
+                expected = sum(
+                    self.es.count(index=name)["count"] for name in old
+                )
+                actual = self.es.count(index=new_index)["count"]
+                if actual < expected - max_missing:
+                    raise CutoverFailed(
+                        f"{new_index} has {actual} documents; expected"
+                        f" {expected}"
+                    )
+            writing = (
+                self._aliased(self.write_alias) if self.write_alias else []
+            )
+            actions = [
+                {"remove": {"index": name, "alias": self.index}}
+                for name in old
+            ]
+            actions.append({"add": {"index": new_index, "alias": self.index}})
+            if self.write_alias:
+                actions += [
+                    {"remove": {"index": name, "alias": self.write_alias}}
+                    for name in writing
+                    if name != new_index
+                ]
+                actions.append(
+                    {"add": {"index": new_index, "alias": self.write_alias}}
+                )
+            # All of the actions are applied at once.
+            self.es.indices.update_aliases({"actions": actions})
+        logger.info("cut over from %s to %s", old, new_index)
+        return old
+
     def index_exists(self, index_name: str) -> bool:
         """
         Determine whether or not an index exists.
@@ -274,9 +573,108 @@ class SearchSession(metaclass=MetaIntegration):
             _exists: bool = self.es.indices.exists(index_name)
             return _exists
 
+    @contextmanager
+    def bulk_load_mode(
+        self,
+        index: Optional[str] = None,
+        force_merge: bool = False,
+        wait_for_green: bool = False,
+        timeout: str = "30m",
+    ) -> Generator[None, None, None]:
+        """
+        Tune an index for loading lots of documents, e.g. a full rebuild.
+
+        While in this context, the index is not refreshed and has no replicas.
+        On exit (even after an error), the previous settings are restored and
+        the index is refreshed. The index is created with the current mapping
+        if it does not exist. If ``index`` is an alias, the settings of each
+        index that it points to are saved and restored.
+
+        Parameters
+        ----------
+        index : str
+            Name of the index (or alias). Default: the index of this session.
+        force_merge : bool
+            If True, merge the index down to a single segment on exit. Only
+            done if the context exits without an error.
+        wait_for_green : bool
+            If True, wait on exit for the replicas to be allocated.
+        timeout : str
+            Time to wait for the force-merge, and for the index to go green.
+
+        """
+        index = index or self.index
+        with handle_es_exceptions():
+            exists = self.es.indices.exists(index=index)
+        if not exists:
+            logger.debug('create ES index "%s"', index)
+            with handle_es_exceptions():
+                self.es.indices.create(index, self._load_mapping())
+
+        # If ``index`` is an alias, these are keyed by the (concrete) indices
+        # that it points to.
+        with handle_es_exceptions():
+            settings = self.es.indices.get_settings(index=index)
+        restore = {
+            name: {
+                # Resets to the ES default if not set explicitly.
+                "refresh_interval": saved["settings"]["index"].get(
+                    "refresh_interval"
+                ),
+                "number_of_replicas": saved["settings"]["index"][
+                    "number_of_replicas"
+                ],
+            }
+            for name, saved in settings.items()
+        }
+        try:
+            with handle_es_exceptions():
+                for name in sorted(restore):
+                    logger.info(
+                        "%s: bulk load mode; was %s", name, restore[name]
+                    )
+                    self.es.indices.put_settings(
+                        {
+                            "index": {
+                                "refresh_interval": "-1",
+                                "number_of_replicas": 0,
+                            }
+                        },
+                        index=name,
+                    )
+            yield
+        except Exception:
+            force_merge = False
+            raise
+        finally:
+            with handle_es_exceptions():
+                for name in sorted(restore):
+                    self.es.indices.put_settings(
+                        {"index": restore[name]}, index=name
+                    )
+                self.es.indices.refresh(index=index)
+                if force_merge:
+                    logger.info("%s: force merge", index)
+                    self.es.indices.forcemerge(
+                        index=index, max_num_segments=1, request_timeout=3600
+                    )
+                if wait_for_green:
+                    self.es.cluster.health(
+                        index=index,
+                        wait_for_status="green",
+                        timeout=timeout,
+                        request_timeout=3600,
+                    )
+                logger.info("%s: restored settings", index)
+
     # FIXME: Return type.
     def reindex(
-        self, old_index: str, new_index: str, wait_for_completion: bool = False
+        self,
+        old_index: str,
+        new_index: str,
+        wait_for_completion: bool = False,
+        slices: Union[int, str] = "auto",
+        requests_per_second: float = -1,
     ) -> Dict[Any, Any]:
         """
         Create a new index and reindex with the current mappings.
@@ -287,12 +685,23 @@ class SearchSession(metaclass=MetaIntegration):
         up. If the new index already exists, will still attempt to perform
         the reindex operation.
 
+        If ``wait_for_completion`` is True, the new index is in
+        :meth:`.bulk_load_mode` while documents are copied. Otherwise, the
+        caller should wait for the task to finish inside
+        :meth:`.bulk_load_mode`.
+
         Parameters
         ----------
         old_index: str
             Name of the index to copy from.
         new_index: str
             Name of the index to create and copy to.
+        slices : int or str
+            Number of slices to copy in parallel. The default, ``"auto"``,
+            uses one slice per shard of ``old_index``.
+        requests_per_second : float
+            Throttle for the reindex task; -1 (default) means no throttle.
+            Can be changed while the task runs, with :meth:`.rethrottle`.
 
         Returns
         -------
@@ -303,15 +712,56 @@ class SearchSession(metaclass=MetaIntegration):
 
         """
         logger.debug('reindex "%s" as "%s"', old_index, new_index)
+        # Documents already in the new index (e.g. written by the agent during
+        # a migration) are at least as new as the ones in the old index.
+        body = {
+            "source": {"index": old_index},
+            "dest": {"index": new_index, "op_type": "create"},
+            "conflicts": "proceed",
+        }
+        params = {"slices": slices, "requests_per_second": requests_per_second}
+        if wait_for_completion:
+            with self.bulk_load_mode(new_index, force_merge=True):
+                response: dict = self.es.reindex(
+                    body, wait_for_completion=True, **params
+                )
+            return response
+
         with handle_es_exceptions():
             self.es.indices.create(new_index, self._load_mapping())
 
-        response: dict = self.es.reindex(
-            {"source": {"index": old_index}, "dest": {"index": new_index}},
-            wait_for_completion=wait_for_completion,
-        )
+        response = self.es.reindex(body, wait_for_completion=False, **params)
         return response
 
+    def rethrottle(self, task: str, requests_per_second: float) -> None:
+        """
+        Change the throttle of a running reindex task.
+
+        Parameters
+        ----------
+        task : str
+            ID of the reindex task.
+        requests_per_second : float
+            New throttle for the task; -1 means no throttle.
+
+        """
+        logger.info("rethrottle %s to %f/s", task, requests_per_second)
+        with handle_es_exceptions():
+            self.es.reindex_rethrottle(
+                task_id=task, requests_per_second=requests_per_second
+            )
+
+    def cancel_task(self, task: str) -> None:
+        """
+        Cancel a running task in ES (e.g. reindex).
+
+        Any documents that were already copied by a reindex task remain in
+        the new index.
+        """
+        logger.info("cancel task %s", task)
+        with handle_es_exceptions():
+            self.es.tasks.cancel(task_id=task)
+
     # FIXME: Return type.
     def get_task_status(self, task: str) -> Dict[Any, Any]:
         """
@@ -354,25 +804,35 @@ class SearchSession(metaclass=MetaIntegration):
             Problem serializing ``document`` for indexing.
 
         """
-        if not self.es.indices.exists(index=self.index):
-            self.create_index()
-
+        targets = self._write_indices()
         with handle_es_exceptions():
             ident = document["id"] if document["id"] else document["paper_id"]
             logger.debug(f"{ident}: index document")
-            self.es.index(
-                index=self.index,
-                doc_type=self.doc_type,
-                id=ident,
-                body=document,
-            )
+            for target in targets:
+                self.es.index(
+                    index=target,
+                    doc_type=self.doc_type,
+                    id=ident,
+                    body=document,
+                )
 
     def bulk_add_documents(
-        self, documents: List[Document], docs_per_chunk: int = 500
+        self,
+        documents: List[Document],
+        docs_per_chunk: int = 500,
+        backoff: float = 2.0,
     ) -> None:
         """
         Add documents to the search index using the bulk API.
 
+        Documents are sent in chunks of at most ``docs_per_chunk`` documents
+        (and at most :attr:`.bulk_max_bytes`), with :attr:`.bulk_threads`
+        chunks in flight at once. Documents that ES rejects because it is too
+        busy are retried, waiting ``backoff`` seconds (doubling each time).
+
+        During a migration, each document is written to both the old and the
+        new index (see :meth:`.begin_migration`).
+
         Parameters
         ----------
         document : :class:`.Document`
@@ -380,34 +840,209 @@ class SearchSession(metaclass=MetaIntegration):
             ``schema/DocumentMetadata.json``.
         docs_per_chunk: int
             Number of documents to send to ES in a single chunk
+        backoff : float
+            Time (in seconds) to wait before retrying rejected documents.
+
         Raises
         ------
         IndexConnectionError
             Problem communicating with Elasticsearch host.
+        IndexOverloaded
+            Some documents were still rejected after the last retry.
         BulkIndexingError
-            Problem serializing ``document`` for indexing.
+            Some documents could not be indexed. The exception carries the
+            reason for each failed document; the rest were indexed.
 
         """
-        if not self.es.indices.exists(index=self.index):
-            logger.debug("index does not exist")
-            self.create_index()
-            logger.debug("created index")
+        targets = self._write_indices()
+        if not self.write_alias:
+            # ES reports the concrete index of each item, which is what
+            # rejected items are looked up by.
+            targets = self._concrete(targets)
+        pending = {
+            (target, document["id"]): {
+                "_index": target,
+                "_type": self.doc_type,
+                "_id": document["id"],
+                "_source": document,
+            }
+            for target in targets
+            for document in documents
+        }
+        failures: Dict[str, str] = {}
+        with handle_es_exceptions():
+            for attempt in range(self.bulk_max_retries + 1):
+                if attempt:
+                    wait = backoff * 2 ** (attempt - 1)
+                    logger.info(
+                        "%i documents rejected; retry in %f seconds",
+                        len(pending),
+                        wait,
+                    )
+                    time.sleep(wait)
+                rejected = self._parallel_bulk(
+                    list(pending.values()), docs_per_chunk, failures
+                )
+                pending = {key: pending[key] for key in rejected}
+                if not pending:
+                    break
+        logger.debug("added %i documents to index", len(documents))
+        if pending:
+            raise IndexOverloaded(
+                "ES rejected %i documents after %i retries"
+                % (len(pending), self.bulk_max_retries)
+            )
+        if failures:
+            raise BulkIndexingError(
+                "%i documents could not be indexed" % len(failures), failures
+            )
+
+    def _parallel_bulk(
+        self,
+        actions: List[Dict[str, Any]],
+        docs_per_chunk: int,
+        failures: Dict[str, str],
+    ) -> List[Tuple[str, str]]:
+        """
+        Send bulk actions to ES, several chunks at a time.
+
+        Items that fail for a reason other than a rejection are added to
+        ``failures``; the index and ID of each rejected item are returned.
+        """
+        rejected: List[Tuple[str, str]] = []
+        for ok, item in helpers.parallel_bulk(
+            self.es,
+            actions,
+            thread_count=self.bulk_threads,
+            chunk_size=docs_per_chunk,
+            max_chunk_bytes=self.bulk_max_bytes,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            if ok:
+                continue
+            result = next(iter(item.values()))
+            if _is_rejected_item(item):
+                rejected.append((result["_index"], result["_id"]))
+            elif isinstance(result.get("exception"), ESConnectionError):
+                raise result["exception"]  # Not specific to this document.
+            else:
+                logger.error("%s: %s", result["_id"], result.get("error"))
+                failures[result["_id"]] = str(result.get("error"))
+        return rejected
+
+    def bulk_update_fields(
+        self,
+        updates: Dict[str, Dict[str, Any]],
+        docs_per_chunk: int = 500,
+    ) -> None:
+        """
+        Update some of the fields of documents using the bulk API.
+
+        Only the fields provided are sent to ES, so this is much cheaper than
+        :meth:`.bulk_add_documents` when a small part of each document has
+        changed.
+
+        Parameters
+        ----------
+        updates : dict
+            Partial documents (field names and their new values), keyed by the
+            ID of the document to update. The documents must already exist.
+        docs_per_chunk: int
+            Number of documents to send to ES in a single chunk
 
+        Raises
+        ------
+        IndexConnectionError
+            Problem communicating with Elasticsearch host.
+        BulkIndexingError
+            Some documents could not be updated (e.g. because they do not
+            exist). The exception carries the reason for each failed document;
+            the rest were updated.
+
+        """
+        targets = self._write_indices()
         with handle_es_exceptions():
             actions = (
                 {
-                    "_index": self.index,
+                    "_op_type": "update",
+                    "_index": target,
                     "_type": self.doc_type,
-                    "_id": document["id"],
-                    "_source": document,
+                    "_id": document_id,
+                    "doc": fields,
                 }
-                for document in documents
+                for target in targets
+                for document_id, fields in updates.items()
             )
-
-            helpers.bulk(
-                client=self.es, actions=actions, chunk_size=docs_per_chunk
+            _, errors = helpers.bulk(
+                client=self.es,
+                actions=actions,
+                chunk_size=docs_per_chunk,
+                raise_on_error=False,
+            )
+            if errors:
+                errors = self._copy_missing(errors, self._new_indices(targets))
+            if any(_is_rejected_item(error) for error in errors):
+                raise BulkIndexError(
+                    "%i document(s) failed to update" % len(errors), errors
+                )
+        logger.debug("updated %i documents in index", len(updates))
+        if errors:
+            failures: Dict[str, str] = {}
+            for error in errors:
+                result = next(iter(error.values()))
+                logger.error("%s: %s", result["_id"], result.get("error"))
+                failures[result["_id"]] = str(result.get("error"))
+            raise BulkIndexingError(
+                "%i documents could not be updated" % len(failures), failures
             )
-            logger.debug("added %i documents to index", len(documents))
+
+    def _copy_missing(
+        self, errors: List[Dict[str, Any]], targets: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Copy documents that could not be updated in a new index.
+
+        During a migration, a document may not have been copied to the new
+        index yet. Updating it there fails, and copying it later would lose
+        the update, so the whole (updated) document is copied from the index
+        that is being read instead.
+        """
+        missing = [
+            error["update"]
+            for error in errors
+            if error.get("update", {}).get("_index") in targets
+            and error["update"].get("status") == 404
+        ]
+        if not missing:
+            return errors
+        logger.debug("copy %i documents to the new index", len(missing))
+        response = self.es.mget(
+            index=self.index,
+            doc_type=self.doc_type,
+            body={"ids": [item["_id"] for item in missing]},
+        )
+        found = {
+            doc["_id"]: doc["_source"]
+            for doc in response["docs"]
+            if doc.get("found")
+        }
+        helpers.bulk(
+            client=self.es,
+            actions=(
+                {
+                    "_index": item["_index"],
+                    "_type": self.doc_type,
+                    "_id": item["_id"],
+                    "_source": found[item["_id"]],
+                }
+                for item in missing
+                if item["_id"] in found
+            ),
+        )
+        return [
+            error for error in errors if error.get("update") not in missing
+        ]
 
     def get_document(self, document_id: str) -> Document:
         """
@@ -437,16 +1072,183 @@ class SearchSession(metaclass=MetaIntegration):
         if not record:
             logger.error("No such document: %s", document_id)
             raise DocumentNotFound("No such document")
-        return results.to_document(record["_source"], highlight=False)
+        return results.raw_to_document(record, highlight=False)
         # See https://github.com/python/mypy/issues/3937
 
-    def search(self, query: Query, highlight: bool = True) -> DocumentSet:
+    def get_fingerprints(
+        self, document_ids: List[str], fields: Sequence[str] = ()
+    ) -> Dict[str, Document]:
+        """
+        Retrieve the content fingerprints of documents in the index.
+
+        Only the ``fingerprint`` field (plus any additional ``fields``) is
+        retrieved, using a single ``_mget`` request; this is much cheaper than
+        retrieving (or re-indexing) the documents themselves.
+
+        Parameters
+        ----------
+        document_ids : list
+            IDs of the documents to look up.
+        fields : list
+            Additional fields to retrieve along with the fingerprint.
+
+        Returns
+        -------
+        dict
+            Partial documents, with ``fingerprint`` and ``fields``, keyed by
+            document ID. Documents that are not in the index, or that were
+            indexed without a fingerprint, are omitted.
+
+        Raises
+        ------
+        IndexConnectionError
+            Problem communicating with the search index.
+
+        """
+        docs = self._mget(
+            document_ids, _source_include=["fingerprint", *fields]
+        )
+        return {
+            doc["_id"]: doc["_source"]
+            for doc in docs
+            if doc is not None and "fingerprint" in doc.get("_source", {})
+        }
+
+    def get_documents(
+        self, document_ids: List[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Optional[Document]]:
+        """
+        Retrieve several documents from the index by ID.
+
+        This uses one ``_mget`` request per :const:`.MGET_BATCH_SIZE` IDs,
+        rather than one request per document as with :meth:`.get_document`.
+
+        Parameters
+        ----------
+        document_ids : list
+            IDs of the documents to retrieve.
+        fields : list
+            If provided, only these fields are retrieved.
+
+        Returns
+        -------
+        list
+            The documents, in the same order as ``document_ids``. A document
+            that is not in the index is represented by None.
+
+        Raises
+        ------
+        IndexConnectionError
+            Problem communicating with the search index.
+
+        """
+        params = {} if fields is None else {"_source_include": list(fields)}
+        return [
+            None if doc is None else results.raw_to_document(doc, False)
+            for doc in self._mget(document_ids, **params)
+        ]
+
+    def exists_many(self, document_ids: List[str]) -> List[bool]:
+        """
+        Determine whether each of several papers exists in the index.
+
+        Like :meth:`.exists`, but without retrieving the documents, and in
+        one ``_mget`` request per :const:`.MGET_BATCH_SIZE` IDs.
+
+        Returns
+        -------
+        list
+            In the same order as ``document_ids``.
+
+        """
+        docs = self._mget(document_ids, _source=False)
+        return [doc is not None for doc in docs]
+
+    def _mget(
+        self, document_ids: List[str], **params: Any
+    ) -> List[Optional[Dict[str, Any]]]:
+        # Response docs are in request order, with ``found`` false for IDs
+        # that are not in the index.
+        docs: List[Optional[Dict[str, Any]]] = []
+        for i in range(0, len(document_ids), MGET_BATCH_SIZE):
+            with handle_es_exceptions():
+                response = self.es.mget(
+                    index=self.index,
+                    doc_type=self.doc_type,
+                    body={"ids": document_ids[i : i + MGET_BATCH_SIZE]},
+                    **params,
+                )
+            docs += [
+                doc if doc.get("found") else None for doc in response["docs"]
+            ]
+        return docs
+
+    def get_generation(self) -> int:
+        """
+        Get the generation of the index, as set by :meth:`.bump_generation`.
+
+        Returns 0 if the generation has never been set.
+        """
+        with handle_es_exceptions():
+            response = self.es.indices.get_mapping(
+                index=self.index,
+                doc_type=self.doc_type,
+                filter_path=["*.mappings.*._meta.generation"],
+            )
+        return max(
+            [
+                int(mapping["_meta"]["generation"])
+                for idx in response.values()
+                for mapping in idx["mappings"].values()
+            ],
+            default=0,
+        )
+
+    def _current_generation(self) -> int:
+        """Get the index generation, via the result cache if there is one."""
+        if self.cache is None:
+            return self.get_generation()
+        return self.cache.generation(self.get_generation)
+
+    def bump_generation(self) -> int:
+        """
+        Change the generation of the index, e.g. after adding documents.
+
+        Cached search results from earlier generations are discarded (see
+        :mod:`.cache`). The generation is the current time in milliseconds,
+        so that concurrent writers need not coordinate.
+
+        Returns
+        -------
+        int
+            The new generation.
+
+        """
+        generation = int(time.time() * 1000)
+        with handle_es_exceptions():
+            self.es.indices.put_mapping(
+                index=self.write_alias or self.index,
+                doc_type=self.doc_type,
+                body={"_meta": {"generation": generation}},
+            )
+        return generation
+
+    def search(
+        self, query: Query, highlight: bool = True, use_cache: bool = True
+    ) -> DocumentSet:
         """
         Perform a search.
 
+        Results are cached if a :class:`.ResultCache` was provided (unless
+        ``use_cache`` is False). Concurrent calls with identical queries to the
+        same index are coalesced into a single request to ES (see
+        :class:`.SingleFlight`).
+
         Parameters
         ----------
         query : :class:`.Query`
+        highlight : bool
+        use_cache : bool
 
         Returns
         -------
@@ -458,17 +1260,75 @@ class SearchSession(metaclass=MetaIntegration):
             Problem communicating with the search index.
         QueryError
             Invalid query parameters.
+        OutsideAllowedRange
+            The requested page is beyond :const:`.MAX_RESULTS`, and the query
+            does not support deep pagination; or it is beyond
+            :attr:`.max_seek_offset`, and the query has no ``search_after``.
+
+        Notes
+        -----
+        :class:`.APIQuery` and :class:`.ClassicAPIQuery` support deep
+        pagination: either with :attr:`.Query.search_after` (the sort values
+        of the last result on the previous page, reported in the metadata of
+        each :class:`.DocumentSet`), or, if that is not available, by seeking
+        to ``page_start`` (see :mod:`.pagination`).
 
         """
+        # The results depend on the index that is searched, as well as on the
+        # query. Identical searches that are already in flight are coalesced.
+        key = f"{self.index}:{fingerprint(query, highlight)}"
+        flight = f"{key}:{int(self.search_templates)}"
+        if self.cache is None or not use_cache:
+            return IN_FLIGHT.do(flight, lambda: self._search(query, highlight))
+
+        generation = self.cache.generation(self.get_generation)
+        document_set = self.cache.get(key, generation)
+        if document_set is None:
+            document_set = IN_FLIGHT.do(
+                f"{flight}:{generation}",
+                lambda: self._cache_search(key, generation, query, highlight),
+            )
+        return document_set
+
+    def _cache_search(
+        self, key: str, generation: int, query: Query, highlight: bool
+    ) -> DocumentSet:
+        document_set = self._search(query, highlight)
+        self.cache.put(key, generation, document_set)  # type: ignore
+        return document_set
+
+    def _search(self, query: Query, highlight: bool) -> DocumentSet:
+        deep = isinstance(query, (APIQuery, ClassicAPIQuery))
         # Make sure that the user is not requesting a nonexistant page.
         max_pages = int(MAX_RESULTS / query.size)
-        if query.page > max_pages:
+        if not deep and query.page > max_pages:
             _message = f"Requested page {query.page}, but max is {max_pages}"
             logger.error(_message)
             raise OutsideAllowedRange(_message)
+        if (
+            deep
+            and query.search_after is None
+            and query.page_start > self.max_seek_offset
+        ):
+            _message = (
+                f"Requested offset {query.page_start}, but max is"
+                f" {self.max_seek_offset}"
+            )
+            logger.error(_message)
+            raise OutsideAllowedRange(_message)
 
         # Perform the search.
         logger.debug("got current search request %s", str(query))
+        fitted = (
+            templates.fit(query, highlight) if self.search_templates else None
+        )
+        if fitted is not None:
+            raw = self._search_template(*fitted)
+            if raw is not None:
+                return results.raw_to_documentset(
+                    query, raw, highlight=highlight
+                )
+
         current_search = self._base_search()
         try:
             if isinstance(query, AdvancedQuery):
@@ -483,6 +1343,19 @@ class SearchSession(metaclass=MetaIntegration):
             raise ex
             # logger.error('Malformed query: %s', str(e))
             # raise QueryError('Malformed query') from e
+        current_search = optimize_search(current_search)
+
+        search_after = query.search_after
+        # Cursors are only used (and kept) for pages beyond MAX_RESULTS.
+        paged = deep and query.page_end + query.size > MAX_RESULTS
+        if paged:
+            cursor_key = pagination.CURSORS.key(
+                current_search, self.index, self._current_generation()
+            )
+            if search_after is None and query.page_end > MAX_RESULTS:
+                search_after = self._seek(
+                    current_search, cursor_key, query.page_start
+                )
 
         if highlight:
             # Highlighting is performed by Elasticsearch; here we include the
@@ -494,12 +1367,221 @@ class SearchSession(metaclass=MetaIntegration):
                 _source={"include": query.include_fields}
             )
 
+        if search_after is not None:
+            current_search = current_search.extra(search_after=search_after)
+            current_search = current_search[: query.size]
+        elif deep and query.page_end > MAX_RESULTS:  # Seek found nothing.
+            current_search = current_search[:0]
+        else:
+            current_search = current_search[query.page_start : query.page_end]
+
+        # The raw response is used as it is, rather than wrapped in a
+        # Response (and each hit in a Hit), which is costly for a full page.
         with handle_es_exceptions():
-            # Slicing the search adds pagination parameters to the request.
-            resp = current_search[query.page_start : query.page_end].execute()
+            resp = self.es.search(
+                index=self.index, body=current_search.to_dict()
+            )
 
         # Perform post-processing on the search results.
-        return results.to_documentset(query, resp, highlight=highlight)
+        document_set = results.raw_to_documentset(
+            query, resp, highlight=highlight
+        )
+
+        # Remember where this page ended, in case the next page is requested
+        # by offset.
+        last = document_set["metadata"].get("search_after")
+        if paged and last:
+            pagination.CURSORS.put(
+                cursor_key,
+                query.page_start + len(document_set["results"]),
+                last,
+            )
+        return document_set
+
+    def _seek(
+        self, search: Search, cursor_key: str, offset: int
+    ) -> Optional[List[Any]]:
+        """
+        Get the sort values of the hit just before ``offset``.
+
+        Starts from the nearest cursor in :data:`.pagination.CURSORS`, and
+        walks forward in steps of up to :const:`.MAX_RESULTS` hits, retrieving
+        only their sort values.
+
+        Returns
+        -------
+        list or None
+            ``None`` if there are no results at all.
+
+        """
+        position, search_after = pagination.CURSORS.nearest(cursor_key, offset)
+        while position < offset:
+            step = min(MAX_RESULTS, offset - position)
+            skip = search.source(False)[:step]
+            if search_after is not None:
+                skip = skip.extra(search_after=search_after)
+            with handle_es_exceptions():
+                resp = self.es.search(
+                    index=self.index,
+                    body=skip.to_dict(),
+                    filter_path=["hits.hits.sort"],
+                )
+            hits = resp.get("hits", {}).get("hits", [])
+            if not hits:
+                break
+            cursor = hits[-1]["sort"]
+            position += len(hits)
+            pagination.CURSORS.put(cursor_key, position, cursor)
+            search_after = cursor
+            if len(hits) < step:  # There are no more results.
+                break
+        logger.debug("seek to %i stopped at %i", offset, position)
+        return search_after
+
+    def get_id_list(self, query: ClassicAPIQuery) -> DocumentSet:
+        """
+        Retrieve the papers in the ``id_list`` of a classic API query.
+
+        This is much cheaper than :meth:`.search` for queries with an
+        ``id_list`` but no ``search_query``: the papers are retrieved by ID
+        (see :meth:`.get_documents`), without scoring or highlighting.
+
+        Papers are returned in the order in which they were requested. A
+        versioned ID (e.g. ``1234.56789v2``) refers to that version; an
+        unversioned ID refers to the current version. IDs that are not in the
+        index are skipped.
+
+        Parameters
+        ----------
+        query : :class:`.ClassicAPIQuery`
+
+        Returns
+        -------
+        :class:`.DocumentSet`
+
+        Raises
+        ------
+        IndexConnectionError
+            Problem communicating with the search index.
+
+        """
+        paper_ids = list(dict.fromkeys(query.id_list or []))
+        unversioned = [i for i in paper_ids if not ENDS_WITH_VERSION.match(i)]
+        current = self.get_current_versions(unversioned)
+        # The same version may be requested with and without a version affix.
+        paper_ids_vs = list(
+            dict.fromkeys(
+                current.get(i, i)
+                for i in paper_ids
+                if i in current or ENDS_WITH_VERSION.match(i)
+            )
+        )
+        documents = [
+            document
+            for document in self.get_documents(paper_ids_vs)
+            if document is not None
+        ]
+        return results.to_page(
+            query,
+            documents[query.page_start : query.page_end],
+            len(documents),
+        )
+
+    def get_current_versions(self, paper_ids: List[str]) -> Dict[str, str]:
+        """
+        Get the current version of each of several papers.
+
+        Uses one filter-only search per :const:`.MAX_RESULTS` papers, which
+        retrieves only the IDs.
+
+        Parameters
+        ----------
+        paper_ids : list
+            Unversioned paper IDs.
+
+        Returns
+        -------
+        dict
+            Versioned paper IDs (``paper_id_v``), keyed by paper ID. Papers
+            that are not in the index are omitted.
+
+        """
+        versions: Dict[str, str] = {}
+        for i in range(0, len(paper_ids), MAX_RESULTS):
+            versions.update(
+                self._current_versions(paper_ids[i : i + MAX_RESULTS])
+            )
+        return versions
+
+    def _current_versions(self, paper_ids: List[str]) -> Dict[str, str]:
+        filter_path = ["hits.hits._source"]
+        resp = None
+        if self.search_templates:
+            resp = self._search_template(
+                *templates.fit_current_versions(paper_ids),
+                filter_path=filter_path,
+            )
+        if resp is None:
+            search = current_versions(self._base_search(), paper_ids)
+            with handle_es_exceptions():
+                resp = self.es.search(
+                    index=self.index,
+                    body=search[: len(paper_ids)].to_dict(),
+                    filter_path=filter_path,
+                )
+        return {
+            hit["_source"]["paper_id"]: hit["_source"]["paper_id_v"]
+            for hit in resp.get("hits", {}).get("hits", [])
+        }
+
+    def export(
+        self, query: APIQuery, batch_size: int = 1000, scroll: str = "5m"
+    ) -> Generator[Document, None, None]:
+        """
+        Retrieve every document that responds to an API query.
+
+        Results are retrieved with a sliced scroll (see :mod:`.export`), and
+        yielded in no particular order; pagination parameters on ``query``
+        are ignored. Memory use does not depend on the number of results.
+
+        Parameters
+        ----------
+        query : :class:`.APIQuery`
+        batch_size : int
+            Number of documents retrieved per request, in each slice.
+        scroll : str
+            How long ES should keep each scroll context alive between
+            requests.
+
+        Returns
+        -------
+        generator
+            Yields :class:`.Document`s, with only the fields included by
+            ``query``.
+
+        Raises
+        ------
+        IndexConnectionError
+            Problem communicating with the search index.
+        QueryError
+            Invalid query parameters.
+
+        """
+        current_search = optimize_search(
+            api_search(self._base_search(), query)
+        )
+        current_search = current_search.extra(
+            _source={"include": query.include_fields}
+        ).params(size=batch_size, scroll=scroll)
+        hits = export.sliced_scan(
+            current_search, slices=self.export_slices, depth=batch_size
+        )
+        try:
+            with handle_es_exceptions():
+                for hit in hits:
+                    yield results.to_document(hit, highlight=False)
+        finally:
+            hits.close()  # Stops the slices, if the caller gives up early.
 
     def exists(self, paper_id_v: str) -> bool:
         """Determine whether a paper exists in the index."""
@@ -520,6 +1602,17 @@ class SearchSession(metaclass=MetaIntegration):
             "ELASTICSEARCH_MAPPING", "mappings/DocumentMapping.json"
         )
         config.setdefault("ELASTICSEARCH_VERIFY", "true")
+        config.setdefault("ELASTICSEARCH_BULK_THREADS", "4")
+        config.setdefault("ELASTICSEARCH_BULK_MAX_BYTES", "10485760")
+        config.setdefault("ELASTICSEARCH_BULK_MAX_RETRIES", "3")
+        config.setdefault("ELASTICSEARCH_WRITE_ALIAS", None)
+        config.setdefault("ELASTICSEARCH_EXPORT_SLICES", "4")
+        config.setdefault("SEARCH_CACHE_SIZE", "0")
+        config.setdefault("SEARCH_CACHE_TTL", "60")
+        config.setdefault("SEARCH_CACHE_DIR", None)
+        config.setdefault("SEARCH_CACHE_CHECK_INTERVAL", "5")
+        config.setdefault("ELASTICSEARCH_SEARCH_TEMPLATES", "false")
+        config.setdefault("ELASTICSEARCH_MAX_SEEK_OFFSET", "100000")
 
     @classmethod
     def get_session(cls, app: object = None) -> "SearchSession":
@@ -537,8 +1630,40 @@ class SearchSession(metaclass=MetaIntegration):
         mapping = config.get(
             "ELASTICSEARCH_MAPPING", "mappings/DocumentMapping.json"
         )
+        cache_size = int(config.get("SEARCH_CACHE_SIZE", "0"))
+        cache = None
+        if cache_size > 0:
+            cache = get_cache(
+                cache_size,
+                float(config.get("SEARCH_CACHE_TTL", "60")),
+                config.get("SEARCH_CACHE_DIR") or None,
+                float(config.get("SEARCH_CACHE_CHECK_INTERVAL", "5")),
+            )
         return cls(
-            host, index, port, scheme, user, password, mapping, verify=verify
+            host,
+            index,
+            port,
+            scheme,
+            user,
+            password,
+            mapping,
+            verify=verify,
+            bulk_threads=int(config.get("ELASTICSEARCH_BULK_THREADS", "4")),
+            bulk_max_bytes=int(
+                config.get("ELASTICSEARCH_BULK_MAX_BYTES", "10485760")
+            ),
+            bulk_max_retries=int(
+                config.get("ELASTICSEARCH_BULK_MAX_RETRIES", "3")
+            ),
+            write_alias=config.get("ELASTICSEARCH_WRITE_ALIAS") or None,
+            export_slices=int(config.get("ELASTICSEARCH_EXPORT_SLICES", "4")),
+            cache=cache,
+            search_templates=(
+                config.get("ELASTICSEARCH_SEARCH_TEMPLATES", "false") == "true"
+            ),
+            max_seek_offset=int(
+                config.get("ELASTICSEARCH_MAX_SEEK_OFFSET", "100000")
+            ),
         )
 
     @classmethod
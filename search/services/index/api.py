@@ -62,7 +62,7 @@ def api_search(search: Search, query: APIQuery) -> Search:
                 SF({"weight": 5, "filter": Q("term", is_current=True)})
             ],
         )
-    search = sort(query, search)
+    search = sort(query, search, stable=True)
     search = search.query(q)
     return search
 
@@ -7,7 +7,7 @@ from operator import ior, iand
 from elasticsearch_dsl import Q
 
 from arxiv.base import logging
-from search.services.index.util import escape, STRING_LITERAL, has_wildcard
+from search.services.index.util import analyze, fragment
 
 logger = logging.getLogger(__name__)
 logger.propagate = False
@@ -20,7 +20,7 @@ STOP = ["and", "or", "the", "of", "a", "for"]
 
 def _remove_stopwords(term: str) -> str:
     """Remove common stopwords, except in literal queries."""
-    parts = re.split(STRING_LITERAL, term)
+    parts = analyze(term).parts
     for stopword in STOP:
         parts = [
             re.sub(fr"(^|\s+){stopword}(\s+|$)", " ", part)
@@ -33,9 +33,10 @@ def _remove_stopwords(term: str) -> str:
 
 def Q_(qtype: str, field: str, value: str) -> Q:
     """Generate an appropriate :class:`Q` based on wildcard presence."""
-    if has_wildcard(value):
-        return Q("wildcard", **{field: {"value": escape(value)}})
-    return Q(qtype, **{field: escape(value)})
+    analysis = analyze(value)
+    if analysis.has_wildcard:
+        return Q("wildcard", **{field: {"value": analysis.escaped}})
+    return Q(qtype, **{field: analysis.escaped})
 
 
 def part_query(term: str, path: str = "authors") -> Q:
@@ -80,7 +81,7 @@ def part_query(term: str, path: str = "authors") -> Q:
         q_surname = Q(
             "query_string",
             fields=[f"{path}.last_name"],
-            query=escape(surname),
+            query=analyze(surname).escaped,
             default_operator="AND",
             allow_leading_wildcard=False,
         )
@@ -90,11 +91,12 @@ def part_query(term: str, path: str = "authors") -> Q:
             # query string query. This has the disadvantage of losing term
             # order, but the advantage of handling wildcards as expected.
             logger.debug(f"Forename: {forename}")
-            if has_wildcard(forename):
+            forename_analysis = analyze(forename)
+            if forename_analysis.has_wildcard:
                 q_forename = Q(
                     "query_string",
                     fields=[f"{path}.first_name"],
-                    query=escape(forename),
+                    query=forename_analysis.escaped,
                     auto_generate_phrase_queries=True,
                     default_operator="AND",
                     allow_leading_wildcard=False,
@@ -133,7 +135,7 @@ def part_query(term: str, path: str = "authors") -> Q:
             default_operator="AND",
             allow_leading_wildcard=False,
             type="cross_fields",
-            query=escape(term),
+            query=analyze(term).escaped,
         )
     return Q("nested", path=path, query=q, score_mode="sum")
 
@@ -146,11 +148,12 @@ def string_query(term: str, path: str = "authors", operator: str = "AND") -> Q:
         default_operator=operator,
         allow_leading_wildcard=False,
         type="cross_fields",
-        query=escape(term),
+        query=analyze(term).escaped,
     )
     return Q("nested", path=path, query=q, score_mode="sum")
 
 
+@fragment
 def author_query(term: str, operator: str = "and") -> Q:
     """
     Construct a query based on author (and owner) names.
@@ -198,12 +201,13 @@ def author_query(term: str, operator: str = "and") -> Q:
                     string_query(part, operator=operator)
                     | string_query(part, path="owners", operator=operator)
                 )
-                for part in re.split(STRING_LITERAL, term)
+                for part in analyze(term).parts
                 if part.strip()
             ],
         )
 
     term = term.replace('"', "")  # Just ignore unbalanced quotes.
+    analysis = analyze(term)
 
     if ";" in term:  # Authors are individuated.
         logger.debug(f"Authors are individuated: {term}")
@@ -231,7 +235,7 @@ def author_query(term: str, operator: str = "and") -> Q:
     q = Q(
         "query_string",
         fields=["authors_combined"],
-        query=escape(term, quotes=True),
+        query=analysis.escaped_quotes,
         default_operator="and",
     )
 
@@ -246,7 +250,7 @@ def author_query(term: str, operator: str = "and") -> Q:
             fields=["authors.full_name"],
             default_operator=operator,
             allow_leading_wildcard=False,
-            query=escape(term, quotes=True),
+            query=analysis.escaped_quotes,
         ),
     ) | Q(
         "nested",
@@ -257,12 +261,13 @@ def author_query(term: str, operator: str = "and") -> Q:
             fields=["owners.full_name"],
             default_operator=operator,
             allow_leading_wildcard=False,
-            query=escape(term, quotes=True),
+            query=analysis.escaped_quotes,
         ),
     )
     return q
 
 
+@fragment
 def author_id_query(term: str, operator: str = "and") -> Q:
     """Generate a query part for Author ID using the ES DSL."""
     term = term.lower()  # Just in case.
@@ -288,6 +293,7 @@ def author_id_query(term: str, operator: str = "and") -> Q:
     )
 
 
+@fragment
 def orcid_query(term: str, operator: str = "and") -> Q:
     """Generate a query part for ORCID ID using the ES DSL."""
     if operator == "or":
@@ -0,0 +1,350 @@
+"""
+Caches search results.
+
+A small number of queries (new-submission listings, popular authors, and
+harvesters polling the classic API) account for most of our traffic.
+:class:`.ResultCache` keeps the :class:`.DocumentSet`s for recent queries,
+keyed by :func:`.fingerprint`, in an in-process LRU with a TTL; it can also
+keep them in an SQLite database that is shared by all of the worker processes
+on a host.
+
+Each cached result is tagged with the index generation that produced it: an
+opaque number, stored in the ``_meta`` of the index mapping, that the
+indexing agent changes after writing documents, at most once every few
+seconds (see :meth:`.SearchSession.bump_generation`). Once a new generation
+is seen, older results are no longer returned. Since the generation is looked
+up at most once every ``check_interval`` seconds, new documents may take that
+long (plus the agent's interval) to appear.
+
+A cache does not help when many requests for the same (uncached) query
+arrive at once, e.g. when a link to a new listing goes out in a mailing.
+:class:`.SingleFlight` coalesces identical searches that are in flight at the
+same time, so that only the first is sent to ES, and the rest wait for and
+share its result.
+"""
+
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from arxiv.base import logging
+from search.domain import DocumentSet, Query
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+
+CACHE_FILENAME = "results.sqlite3"
+
+T = TypeVar("T")
+
+
+def fingerprint(query: Query, highlight: bool = True) -> str:
+    """
+    Generate a canonical key for a query.
+
+    Two queries have the same fingerprint if and only if they are of the same
+    type and have the same parameters, including pagination.
+    """
+    params = json.dumps(asdict(query), sort_keys=True, default=str)
+    raw = f"{type(query).__name__}:{int(highlight)}:{params}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache(object):
+    """A two-tier cache of :class:`.DocumentSet`s, by query fingerprint."""
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS results ("
+        " key TEXT PRIMARY KEY,"
+        " generation INTEGER NOT NULL,"
+        " expires REAL NOT NULL,"
+        " data BLOB NOT NULL)"
+    )
+
+    _PRUNE_EVERY = 1000
+    """Expired results are removed from the database after this many puts."""
+
+    _LOG_EVERY = 1000
+    """Statistics are logged after this many misses."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 60.0,
+        path: Optional[str] = None,
+        check_interval: float = 5.0,
+    ) -> None:
+        """
+        Initialize an empty cache.
+
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of results kept in memory.
+        ttl : float
+            Time (in seconds) for which results are returned from the cache,
+            even if the generation has not changed.
+        path : str
+            Location of an SQLite database in which results are also kept, to
+            be shared with other processes. If None (default), results are
+            kept only in memory.
+        check_interval : float
+            Minimum time (in seconds) between generation lookups.
+
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.check_interval = check_interval
+        self._results: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._checked = 0.0
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._puts = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._db = sqlite3.connect(
+                path, timeout=5, check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=OFF")  # It's only a cache.
+            with self._db:
+                self._db.execute(self._SCHEMA)
+
+    def generation(self, lookup: Callable[[], int]) -> int:
+        """
+        Get the current index generation.
+
+        Parameters
+        ----------
+        lookup : callable
+            Gets the generation from the index. Called only if the generation
+            was last looked up more than ``check_interval`` seconds ago.
+
+        """
+        now = time.time()
+        with self._lock:
+            if (
+                self._generation is not None
+                and now - self._checked < self.check_interval
+            ):
+                return self._generation
+        generation = lookup()
+        with self._lock:
+            if generation != self._generation:
+                logger.debug("Index generation is now %s", generation)
+                self._results.clear()
+            self._generation = generation
+            self._checked = now
+        return generation
+
+    def get(self, key: str, generation: int) -> Optional[DocumentSet]:
+        """
+        Get a result from the cache.
+
+        Each call returns a new copy, which the caller is free to modify.
+
+        Returns
+        -------
+        :class:`.DocumentSet` or None
+            None if there is no fresh result from ``generation``.
+
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and self._is_fresh(entry, generation, now):
+                self._results.move_to_end(key)
+                self._hits += 1
+                return pickle.loads(entry[2])  # type: ignore
+            entry = self._load(key)
+            if entry is not None and self._is_fresh(entry, generation, now):
+                self._store(key, entry)
+                self._disk_hits += 1
+                return pickle.loads(entry[2])  # type: ignore
+            self._misses += 1
+            self._log_stats()
+        return None
+
+    def put(self, key: str, generation: int, result: DocumentSet) -> None:
+        """Add a result to the cache, as produced by ``generation``."""
+        entry = (generation, time.time() + self.ttl, pickle.dumps(result))
+        with self._lock:
+            self._store(key, entry)
+            if self._db is None:
+                return
+            try:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                        (key, *entry),
+                    )
+                    self._puts += 1
+                    if self._puts % self._PRUNE_EVERY == 0:
+                        self._db.execute(
+                            "DELETE FROM results WHERE expires < ?",
+                            (time.time(),),
+                        )
+            except sqlite3.Error as ex:
+                logger.warning("Could not write to result cache: %s", ex)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of hits and misses, and the hit rate."""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._disk_hits + self._misses
+        return {
+            "size": len(self._results),
+            "hits": self._hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_rate": (
+                (self._hits + self._disk_hits) / lookups if lookups else 0.0
+            ),
+        }
+
+    def _log_stats(self) -> None:
+        if self._misses % self._LOG_EVERY == 0:
+            logger.info("Result cache stats: %s", self._stats())
+
+    @staticmethod
+    def _is_fresh(
+        entry: Tuple[int, float, bytes], generation: int, now: float
+    ) -> bool:
+        return entry[0] == generation and entry[1] > now
+
+    def _store(self, key: str, entry: Tuple[int, float, bytes]) -> None:
+        self._results[key] = entry
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Tuple[int, float, bytes]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT generation, expires, data FROM results WHERE key = ?",
+                (key,),
+            ).fetchone()
+        except sqlite3.Error as ex:
+            logger.warning("Could not read from result cache: %s", ex)
+            return None
+        return None if row is None else (row[0], row[1], row[2])
+
+
+_caches: Dict[Tuple[int, float, Optional[str], float], ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(
+    max_size: int,
+    ttl: float,
+    directory: Optional[str] = None,
+    check_interval: float = 5.0,
+) -> ResultCache:
+    """
+    Get the :class:`.ResultCache` for this process.
+
+    Sessions are created for each request, so the cache is shared by all of
+    the sessions with the same parameters.
+    """
+    path = None if not directory else os.path.join(directory, CACHE_FILENAME)
+    params = (max_size, ttl, path, check_interval)
+    with _caches_lock:
+        if params not in _caches:
+            _caches[params] = ResultCache(max_size, ttl, path, check_interval)
+        return _caches[params]
+
+
+class _Call(object):
+    """A call in flight, and its outcome."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.waiting = 0
+        self.result: Optional[bytes] = None  # Pickled, for the waiting calls.
+        self.error: Optional[Exception] = None
+
+
+class SingleFlight(object):
+    """Coalesces identical calls that are in flight at the same time."""
+
+    def __init__(self) -> None:
+        """Initialize with no calls in flight."""
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: str, func: Callable[[], T]) -> T:
+        """
+        Call ``func``, unless a call with the same ``key`` is in flight.
+
+        If there is such a call, wait for it to finish instead, and return a
+        copy of its result (or raise its exception).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+            else:
+                call.waiting += 1
+                self._coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            if call.result is None:
+                raise RuntimeError(f"Call for {key} did not complete")
+            return pickle.loads(call.result)  # type: ignore
+
+        try:
+            result = func()
+            with self._lock:
+                self._release(key, call)
+                # Every waiting call gets its own copy, since callers may
+                # modify the result.
+                if call.waiting:
+                    call.result = pickle.dumps(result)
+        except Exception as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                self._release(key, call)
+            call.done.set()
+        return result
+
+    def _release(self, key: str, call: _Call) -> None:
+        # A new call with the same key may have started since.
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of calls executed, and the number coalesced."""
+        with self._lock:
+            return {
+                "executed": self._executed,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+IN_FLIGHT = SingleFlight()
+"""Shared by all sessions in the process, since they are per-request."""
@@ -1,10 +1,12 @@
 """Translate classic API `Phrase` objects to Elasticsearch DSL."""
 import re
+from typing import List
 
 from elasticsearch_dsl import Q, Search
 
 from search.domain import ClassicAPIQuery, SortOrder
 from search.services.index.classic_api.query_builder import query_builder
+from search.services.index.util import with_tiebreaker
 
 # FIXME: Use arxiv identifier parsing from arxiv.base when it's ready.
 #        Also this allows version to start with 0 to mimic the old API.
@@ -57,6 +59,22 @@ def classic_search(search: Search, query: ClassicAPIQuery) -> Search:
         # If no id_list, only display current results.
         search = search.filter("term", is_current=True)
 
-    if not isinstance(query, SortOrder):
-        return search.query(dsl_query)
-    return search.query(dsl_query).sort(*query.order.to_es())  # type: ignore
+    # Ties are broken by paper ID, so that deep pages can be retrieved with
+    # ``search_after``.
+    if not isinstance(query.order, SortOrder):
+        return search.query(dsl_query).sort(*with_tiebreaker(["_score"]))
+    return search.query(dsl_query).sort(*with_tiebreaker(query.order.to_es()))
+
+
+def current_versions(search: Search, paper_ids: List[str]) -> Search:
+    """
+    Prepare a :class:`.Search` for the current versions of some papers.
+
+    The search is filter-only, and retrieves only the IDs (``paper_id`` and
+    ``paper_id_v``) of each paper.
+    """
+    return (
+        search.filter("terms", paper_id=paper_ids)
+        .filter("term", is_current=True)
+        .source(["paper_id", "paper_id_v"])
+    )
@@ -0,0 +1,43 @@
+"""Tests for :func:`.classic_search`."""
+
+from unittest import TestCase
+
+from elasticsearch_dsl import Search
+
+from search.domain import (
+    ClassicAPIQuery,
+    SortBy,
+    SortDirection,
+    SortOrder,
+)
+from search.services.index.classic_api.classic_search import classic_search
+from search.services.index.util import TIEBREAKER
+
+
+class TestSortOrder(TestCase):
+    """The sortBy and sortOrder of the query are applied."""
+
+    def test_sort_by(self):
+        """Results are sorted by the requested field and direction."""
+        for by, field in [
+            (SortBy.submitted_date, "submitted_date"),
+            (SortBy.last_updated_date, "updated_date"),
+            (SortBy.relevance, "_score"),
+        ]:
+            for direction, order in [
+                (SortDirection.ascending, "asc"),
+                (SortDirection.descending, "desc"),
+            ]:
+                query = ClassicAPIQuery(
+                    search_query="au:copernicus",
+                    order=SortOrder(by=by, direction=direction),
+                )
+                sort = classic_search(Search(), query).to_dict()["sort"]
+                self.assertEqual(sort, [{field: {"order": order}}, TIEBREAKER])
+
+    def test_default(self):
+        """Without a sortBy, results are sorted by relevance."""
+        query = ClassicAPIQuery(search_query="au:copernicus")
+        sort = classic_search(Search(), query).to_dict()["sort"]
+        self.assertEqual(sort[-1], TIEBREAKER)
+        self.assertEqual(len(sort), 2)
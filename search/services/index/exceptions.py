@@ -1,12 +1,17 @@
 """Exceptions raised by the search index service."""
 
+from typing import Dict
+
 __all__ = (
     "MappingError",
     "IndexConnectionError",
+    "IndexOverloaded",
     "IndexingError",
+    "BulkIndexingError",
     "QueryError",
     "DocumentNotFound",
     "OutsideAllowedRange",
+    "CutoverFailed",
 )
 
 
@@ -18,10 +23,24 @@ class IndexConnectionError(IOError):
     """There was a problem connecting to the search index."""
 
 
+class IndexOverloaded(IndexConnectionError):
+    """The search index rejected a request because it is too busy."""
+
+
 class IndexingError(IOError):
     """There was a problem adding a document to the index."""
 
 
+class BulkIndexingError(IndexingError):
+    """Some of the documents in a bulk request could not be indexed."""
+
+    def __init__(self, message: str, failures: Dict[str, str]) -> None:
+        """Keep track of the documents that were not indexed."""
+        super(BulkIndexingError, self).__init__(message)
+        self.failures = failures
+        """The reason that each document could not be indexed, keyed by ID."""
+
+
 class QueryError(ValueError):
     """
     Elasticsearch could not handle the query.
@@ -37,3 +56,7 @@ class DocumentNotFound(RuntimeError):
 
 class OutsideAllowedRange(RuntimeError):
     """A page outside of the allowed range has been requested."""
+
+
+class CutoverFailed(RuntimeError):
+    """The new index is not ready to take over from the old one."""
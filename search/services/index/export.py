@@ -0,0 +1,105 @@
+"""
+Supports exporting every result of a search.
+
+Paging through a large result set (with ``from``/``size`` or even
+``search_after``) sorts the results again for every page. A scroll instead
+keeps a snapshot of the index for the duration of the export, and retrieves
+results in index order, which needs no sorting at all. A sliced scroll
+partitions the results, so that several slices can be retrieved in parallel.
+
+:func:`.sliced_scan` runs each slice in its own thread, and hands off hits
+through a bounded queue; memory use therefore depends on the batch size and
+number of slices, but not on the number of results.
+"""
+
+import threading
+from queue import Full, Queue
+from typing import Any, Generator, List
+
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Hit
+
+from arxiv.base import logging
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+
+_DONE = object()
+"""Put on the queue by each slice when it has no more hits."""
+
+
+def sliced_scan(
+    search: Search, slices: int = 1, depth: int = 1000
+) -> Generator[Hit, None, None]:
+    """
+    Scroll through all of the hits for ``search``, in parallel slices.
+
+    Hits are yielded in no particular order.
+
+    Parameters
+    ----------
+    search : :class:`.Search`
+        Scroll parameters (e.g. ``size`` and ``scroll``) may be set with
+        :meth:`.Search.params`.
+    slices : int
+        Number of slices to retrieve in parallel. This should not exceed the
+        number of shards in the index.
+    depth : int
+        Maximum number of hits waiting to be yielded.
+
+    """
+    if slices < 2:
+        yield from search.scan()
+        return
+
+    results: Queue = Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(item: Any) -> bool:
+        # Gives up if the consumer has gone away.
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _scan(slice_id: int) -> None:
+        hits = None
+        try:
+            hits = search.extra(slice={"id": slice_id, "max": slices}).scan()
+            for hit in hits:
+                if not _put(hit):
+                    return
+        except Exception as ex:
+            logger.error("Slice %i failed: %s", slice_id, ex)
+            _put(ex)
+        finally:
+            if hits is not None:
+                hits.close()  # Clears the scroll.
+            _put(_DONE)
+
+    threads: List[threading.Thread] = []
+    for slice_id in range(slices):
+        thread = threading.Thread(
+            target=_scan, args=(slice_id,), name=f"scan-{slice_id}"
+        )
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    remaining = slices
+    try:
+        while remaining:
+            item = results.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
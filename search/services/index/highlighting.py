@@ -4,12 +4,13 @@ Provide hit highlighting to the search.
 Highlighting requires amendation of the query as well as post-processing of
 the returned results. :func:`.highlight` adds a highlighting part to the query
 in the Elasticsearch DSL. :func:`.add_highlighting` performs post-processing
-of the search results. :func:`.preview` generates a TeX-safe snippet for
-abridged display in the search results.
+of the search results (as does :func:`.add_raw_highlighting`, for raw hits).
+:func:`.preview` generates a TeX-safe snippet for abridged display in the
+search results.
 """
 
 import re
-from typing import Any, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 from flask import escape
 from elasticsearch_dsl import Search
@@ -176,14 +177,71 @@ def add_highlighting(result: Document, raw: Union[Response, Hit]) -> Document:
     # These are from hits within child documents, e.g.
     # secondary_classification.
     inner_hits = getattr(raw.meta, "inner_hits", None)
+    categories = None
+    if hasattr(inner_hits, "secondary_classification"):
+        categories = [
+            ih.category.id for ih in inner_hits.secondary_classification
+        ]
+
+    # Note that dir(None) won't return anything, so there are no highlights
+    # if there are none from ES.
+    highlights = [
+        (field, getattr(highlighted_fields, field))
+        for field in dir(highlighted_fields)
+        if not field.startswith("_")
+    ]
+    return _add_highlighting(result, highlights, matched_fields, categories)
+
+
+def add_raw_highlighting(result: Document, hit: Dict[str, Any]) -> Document:
+    """
+    Add hit highlighting to a search result, from a raw hit.
+
+    Does the same as :func:`.add_highlighting`, for a hit from a raw response
+    from Elasticsearch rather than a :class:`.Hit`.
+
+    Parameters
+    ----------
+    result : dict
+        Contains processed search result data destined for the caller.
+    hit : dict
+        A hit from a raw response from Elasticsearch.
+
+    Returns
+    -------
+    dict
+        The ``result`` object, updated with ``highlight`` and ``preview``
+        items.
+
+    """
+    highlighted_fields = hit.get("highlight", {})
+    categories = None
+    if "secondary_classification" in hit.get("inner_hits", {}):
+        inner_hits = hit["inner_hits"]["secondary_classification"]
+        categories = [
+            ih["_source"]["category"]["id"]
+            for ih in inner_hits["hits"]["hits"]
+        ]
+    # In the same order as dir() gives them to add_highlighting.
+    highlights = [
+        (field, highlighted_fields[field])
+        for field in sorted(highlighted_fields)
+        if not field.startswith("_")
+    ]
+    return _add_highlighting(
+        result, highlights, hit.get("matched_queries", []), categories
+    )
 
+
+def _add_highlighting(
+    result: Document,
+    highlights: List[Tuple[str, Any]],
+    matched_fields: Iterable[str],
+    categories: Optional[List[str]],
+) -> Document:
     # The values here will (almost) always be list-like. So we need to stitch
-    # them together. Note that dir(None) won't return anything, so this block
-    # is skipped if there are no highlights from ES.
-    for field in dir(highlighted_fields):
-        if field.startswith("_"):
-            continue
-        value = getattr(highlighted_fields, field)
+    # them together.
+    for field, value in highlights:
         if hasattr(value, "__iter__"):
             value = "&hellip;".join(value)
 
@@ -217,10 +275,8 @@ def add_highlighting(result: Document, raw: Union[Response, Hit]) -> Document:
 
     # We're using inner_hits to see which category in particular responded to
     # the query.
-    if hasattr(inner_hits, "secondary_classification"):
-        result["match"]["secondary_classification"] = [
-            ih.category.id for ih in inner_hits.secondary_classification
-        ]
+    if categories is not None:
+        result["match"]["secondary_classification"] = categories
 
     # We just want to know whether there was a hit on the announcement date.
     result["match"]["announced_date_first"] = bool(
@@ -0,0 +1,325 @@
+"""
+Rewrites queries before they are sent to Elasticsearch.
+
+The query builders compose queries freely with ``&``, ``|`` and ``~``, which
+is convenient but yields bools nested in bools, the occasional duplicate
+clause, and constraints (date range, ``is_current``, license, etc.) in
+scoring context. In scoring context ES cannot cache a clause; in filter
+context (or in a ``constant_score``), it is cached per segment.
+
+:func:`.optimize` rewrites a query so that:
+
+- bools are flattened where this does not change matching or scoring (e.g.
+  the ``must`` clauses of a bool that is itself a ``must`` clause);
+- ``range`` and ``terms`` constraints on :const:`.FILTER_FIELDS` that are
+  required in scoring context are wrapped in a ``constant_score``;
+- duplicate clauses are removed from ``filter`` and ``must_not``, where they
+  have no effect;
+- in filter context, the alternatives of a bool (``should`` with
+  ``minimum_should_match`` of 1) are a filter; and
+- ``term`` clauses on the same field that are alternatives (``should`` in
+  filter context, or ``must_not``) are merged into a single ``terms``.
+
+Neither the set of matching documents nor their scores change. ES scores
+``range`` and ``terms`` as constant-score queries anyway, with a score of 1,
+which is also the score of the ``constant_score``. A ``term`` (or ``match``)
+on a keyword field, on the other hand, scores by the IDF of the term, which
+varies from shard to shard; it is left where it is, as are alternatives in
+scoring context (e.g. several classifications): a document that matches more
+of them, or a rarer one, scores higher.
+
+Queries are rewritten without modifying them (they may be shared; see
+:func:`.util.fragment`), and only the bools and function scores on the way
+down are rebuilt.
+"""
+
+from typing import Any, Dict, List
+
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.query import (
+    Bool,
+    ConstantScore,
+    FunctionScore,
+    Match,
+    MatchAll,
+    Query,
+    Range,
+    Term,
+    Terms,
+)
+
+FILTER_FIELDS = frozenset(
+    [
+        "is_current",
+        "license.uri",
+        "announced_date_first",
+        "submitted_date",
+        "submitted_date_first",
+        "primary_classification.group.id",
+        "primary_classification.archive.id",
+        "primary_classification.category.id",
+        "secondary_classification.group.id",
+        "secondary_classification.archive.id",
+        "secondary_classification.category.id",
+    ]
+)
+"""Keyword and date fields, on which ``range`` and ``terms`` always score 1."""
+
+_CLAUSES = ("must", "should", "filter", "must_not")
+
+
+def optimize_search(search: Search) -> Search:
+    """Rewrite the query of ``search`` with :func:`.optimize`."""
+    # Search has no public API for replacing (rather than extending) its
+    # query.
+    query = search.query._proxied
+    optimized = optimize(query)
+    if optimized is query:
+        return search
+    search = search._clone()
+    search.query._proxied = optimized
+    return search
+
+
+def optimize(query: Query, scoring: bool = True) -> Query:
+    """
+    Rewrite a query, without changing the documents that it matches.
+
+    Parameters
+    ----------
+    query : :class:`.Query`
+    scoring : bool
+        Whether ``query`` is in scoring (query) context; if False, it is in
+        filter context.
+
+    Returns
+    -------
+    :class:`.Query`
+        ``query`` itself if there is nothing to rewrite.
+
+    """
+    if isinstance(query, FunctionScore) and "query" in _params(query):
+        inner = optimize(query.query, scoring)
+        if inner is query.query:
+            return query
+        query = query._clone()
+        query.query = inner
+        return query
+    if isinstance(query, Bool):
+        return _optimize_bool(query, scoring)
+    return query
+
+
+def _params(query: Query) -> Dict[str, Any]:
+    # Read-only; attribute access adds empty lists for missing clauses.
+    return query._params  # type: ignore
+
+
+def _is_plain(query: Query, *allowed: str) -> bool:
+    """Determine whether ``query`` has only the ``allowed`` parameters."""
+    return all(
+        param in allowed or not value
+        for param, value in _params(query).items()
+    )
+
+
+def _is_unit(query: Query) -> bool:
+    """
+    Determine whether ``query`` is a constraint that always scores 1.
+
+    ES scores ``terms`` and ``range`` as constant-score queries, with a score
+    of the boost.
+    """
+    if not isinstance(query, (Range, Terms)):
+        return False
+    params = _params(query)
+    if len(params) != 1:  # E.g. a boost or a _name.
+        return False
+    field, value = next(iter(params.items()))
+    return field in FILTER_FIELDS and not (
+        isinstance(value, dict) and ("_name" in value or "boost" in value)
+    )
+
+
+def _optimize_bool(query: Bool, scoring: bool) -> Query:
+    params = _params(query)
+    optional = "minimum_should_match" not in params
+    must: List[Query] = []
+    filters: List[Query] = []
+    should: List[Query] = []
+    must_not: List[Query] = []
+
+    # Without must or filter clauses, at least one should clause must match.
+    # So a bool with only must_not clauses is not lifted into a bool with
+    # should clauses, as that could make them required.
+    has_should = bool(params.get("should"))
+
+    for clause in params.get("must", []):
+        clause = optimize(clause, scoring)
+        if _is_conjunction(clause, has_should):
+            must += _clauses(clause, "must")
+            filters += _clauses(clause, "filter")
+            must_not += _clauses(clause, "must_not")
+        else:
+            must.append(clause)
+
+    for clause in params.get("filter", []):
+        clause = optimize(clause, False)
+        if _is_conjunction(clause, has_should):
+            filters += _clauses(clause, "must")
+            filters += _clauses(clause, "filter")
+            must_not += _clauses(clause, "must_not")
+        elif not isinstance(clause, MatchAll):
+            filters.append(clause)
+
+    for clause in params.get("should", []):
+        clause = optimize(clause, scoring)
+        # Any one of the alternatives is still enough to match.
+        if optional and _is_disjunction(clause):
+            should += _clauses(clause, "should")
+        else:
+            should.append(clause)
+
+    for clause in params.get("must_not", []):
+        clause = optimize(clause, False)
+        # None of the alternatives may match.
+        if _is_disjunction(clause):
+            must_not += _clauses(clause, "should")
+        else:
+            must_not.append(clause)
+
+    # Scores are not needed in filter context, so every required clause is a
+    # filter. In scoring context, constraints that always score 1 get a
+    # constant score (of 1), which is cached like a filter.
+    required = must
+    must, moved = [], []
+    for clause in required:
+        if not scoring:
+            moved.append(clause)
+        elif _is_unit(clause):
+            must.append(ConstantScore(filter=clause))
+        else:
+            must.append(clause)
+    filters = _unique(moved + filters)
+    must_not = _merge_terms(_unique(must_not))
+
+    # The builders combine a conjunction with a disjunction as one bool, with
+    # ``minimum_should_match``. In filter context, the alternatives are a
+    # filter.
+    extra = {p: v for p, v in params.items() if p not in _CLAUSES}
+    disjunction = (
+        not scoring
+        and should
+        and set(extra) == {"minimum_should_match"}
+        and str(extra["minimum_should_match"]) == "1"
+    )
+    if disjunction:
+        filters.append(Bool(should=_merge_terms(should)))
+        should, extra = [], {}
+    plain = not extra
+    if not scoring and plain:
+        should = _merge_terms(should)
+
+    # A bool with a single clause is the same as that clause, provided that
+    # the clause is in the same context.
+    if plain and len(must) + len(filters) + len(should) + len(must_not) == 1:
+        if must:
+            return must[0]
+        if filters and not scoring:
+            return filters[0]
+        if should and optional:
+            return should[0]
+
+    clauses = {
+        "must": must,
+        "filter": filters,
+        "should": should,
+        "must_not": must_not,
+    }
+    if not disjunction and all(
+        _same(clauses[name], params.get(name, [])) for name in _CLAUSES
+    ):
+        return query
+    return Bool(**{name: c for name, c in clauses.items() if c}, **extra)
+
+
+def _clauses(query: Bool, name: str) -> List[Query]:
+    return _params(query).get(name, [])  # type: ignore
+
+
+def _is_conjunction(query: Query, has_should: bool) -> bool:
+    """Determine whether ``query`` is a bool that can be lifted."""
+    return (
+        isinstance(query, Bool)
+        and _is_plain(query, "must", "filter", "must_not")
+        and (
+            not has_should
+            or bool(_clauses(query, "must") or _clauses(query, "filter"))
+        )
+    )
+
+
+def _is_disjunction(query: Query) -> bool:
+    """Determine whether ``query`` is a bool with only should clauses."""
+    return (
+        isinstance(query, Bool)
+        and _is_plain(query, "should")
+        and bool(_clauses(query, "should"))
+    )
+
+
+def _same(a: List[Query], b: List[Query]) -> bool:
+    return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+
+
+def _key(query: Query) -> Any:
+    # Comparing leaf queries is cheap, and finds clauses that were built
+    # separately; anything larger is compared by identity.
+    if isinstance(query, (Term, Terms, Range, Match, MatchAll)):
+        return repr(query.to_dict())
+    return id(query)
+
+
+def _unique(clauses: List[Query]) -> List[Query]:
+    """Remove duplicate clauses, where repetition has no effect."""
+    seen = set()
+    unique = []
+    for clause in clauses:
+        key = _key(clause)
+        if key not in seen:
+            seen.add(key)
+            unique.append(clause)
+    return unique
+
+
+def _merge_terms(clauses: List[Query]) -> List[Query]:
+    """Merge alternative ``term`` and ``terms`` clauses on the same field."""
+    values: Dict[str, List[Any]] = {}
+    merged: List[Any] = []
+    for clause in clauses:
+        params = _params(clause)
+        if isinstance(clause, (Term, Terms)) and len(params) == 1:
+            field, value = next(iter(params.items()))
+            if isinstance(clause, Term) and isinstance(value, dict):
+                if set(value) != {"value"}:
+                    merged.append(clause)
+                    continue
+                value = value["value"]
+            if field not in values:
+                values[field] = []
+                merged.append(field)  # Placeholder, to keep the order.
+            values[field] += value if isinstance(clause, Terms) else [value]
+        else:
+            merged.append(clause)
+    if all(len(v) < 2 for v in values.values()):
+        return clauses
+    return [
+        (
+            Terms(**{item: values[item]})
+            if len(values[item]) > 1
+            else Term(**{item: values[item][0]})
+        )
+        if isinstance(item, str)
+        else item
+        for item in merged
+    ]
@@ -0,0 +1,113 @@
+"""
+Supports deep pagination with ``search_after``.
+
+With ``from``/``size`` pagination, each shard must sort ``from + size`` hits,
+so deep pages get progressively slower; Elasticsearch refuses offsets beyond
+:const:`.util.MAX_RESULTS` altogether. ``search_after`` instead resumes from
+the sort values of the last hit on the previous page, which costs the same on
+every page. This requires a total order, so searches that are paginated this
+way are sorted with :func:`.util.with_tiebreaker`.
+
+Clients that only know an offset (e.g. the classic API's ``start``) are served
+by seeking: walking the results in steps of :const:`.util.MAX_RESULTS`,
+retrieving only their sort values. :class:`.CursorCache` remembers where each
+page ended, so that a client paging sequentially through a result set needs
+only a single request per page. Cursors are kept by index and by index
+generation (see :meth:`.SearchSession.bump_generation`), so once documents are
+added, offsets are sought afresh rather than from cursors that now point
+somewhere else.
+
+Elasticsearch 6 has no point-in-time API, and a scroll context is too
+expensive to keep open between requests from API clients. So a cursor does
+not see a snapshot of the index: documents that are added or updated between
+pages can be skipped, or seen twice.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from elasticsearch_dsl import Search
+
+
+class CursorCache(object):
+    """A bounded LRU cache of cursors (sort values), by search and offset."""
+
+    def __init__(self, max_searches: int = 1024, per_search: int = 16) -> None:
+        """
+        Initialize an empty cache.
+
+        Parameters
+        ----------
+        max_searches : int
+            Maximum number of distinct searches for which cursors are kept.
+        per_search : int
+            Maximum number of cursors kept for each search; the oldest is
+            discarded first.
+
+        """
+        self.max_searches = max_searches
+        self.per_search = per_search
+        self._cursors: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(search: Search, index: str, generation: int) -> str:
+        """
+        Generate a key for ``search`` of ``index`` at ``generation``.
+
+        Pagination parameters are ignored.
+        """
+        body = search.to_dict()
+        for param in ("from", "size", "search_after"):
+            body.pop(param, None)
+        return "%s:%i:%s" % (
+            index,
+            generation,
+            json.dumps(body, sort_keys=True, default=str),
+        )
+
+    def nearest(self, key: str, offset: int) -> Tuple[int, Optional[List]]:
+        """
+        Get the closest cursor at or before ``offset``.
+
+        Returns
+        -------
+        int
+            Offset of the cursor; 0 if there is none.
+        list or None
+            Sort values of the hit just before that offset.
+
+        """
+        with self._lock:
+            cursors = self._cursors.get(key)
+            if not cursors:
+                return 0, None
+            self._cursors.move_to_end(key)
+            best = max((o for o in cursors if o <= offset), default=0)
+            return best, cursors.get(best)
+
+    def put(self, key: str, offset: int, search_after: List[Any]) -> None:
+        """Store the sort values of the hit just before ``offset``."""
+        with self._lock:
+            cursors = self._cursors.setdefault(key, OrderedDict())
+            self._cursors.move_to_end(key)
+            cursors[offset] = search_after
+            cursors.move_to_end(offset)
+            while len(cursors) > self.per_search:
+                cursors.popitem(last=False)
+            while len(self._cursors) > self.max_searches:
+                self._cursors.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of searches and cursors in the cache."""
+        with self._lock:
+            return {
+                "searches": len(self._cursors),
+                "cursors": sum(len(c) for c in self._cursors.values()),
+            }
+
+
+CURSORS = CursorCache()
+"""Shared by all sessions in the process, since they are per-request."""
@@ -11,24 +11,14 @@ import re
 from functools import reduce
 from datetime import datetime
 from operator import ior, iand
-from typing import List, Callable, Dict, Optional
+from typing import List, Callable, Dict, Optional, Tuple
 
 from elasticsearch_dsl import Q, SF
 
 from arxiv.base import logging
 
 from search.domain import Classification, ClassificationList
-from search.services.index.util import (
-    Q_,
-    is_tex_query,
-    is_literal_query,
-    escape,
-    wildcard_escape,
-    has_wildcard,
-    is_old_papernum,
-    parse_date,
-    parse_date_partial,
-)
+from search.services.index.util import Q_, analyze, fragment
 
 from search.services.index.authors import (
     author_query,
@@ -42,42 +32,47 @@ START_YEAR = 1991
 END_YEAR = datetime.now().year
 
 
+@fragment
 def _query_title(term: str, default_operator: str = "AND") -> Q:
-    if is_tex_query(term):
-        return Q("match", **{f"title.tex": {"query": term}})
+    analysis = analyze(term)
+    if analysis.is_tex:
+        return Q("match", **{"title.tex": {"query": term}})
     fields = ["title.english"]
-    if is_literal_query(term):
+    if analysis.is_literal:
         fields += ["title"]
     return Q(
         "query_string",
         fields=fields,
         default_operator=default_operator,
         allow_leading_wildcard=False,
-        query=escape(term),
+        query=analysis.escaped,
     )
 
 
+@fragment
 def _query_abstract(term: str, default_operator: str = "AND") -> Q:
+    analysis = analyze(term)
     fields = ["abstract.english"]
-    if is_literal_query(term):
+    if analysis.is_literal:
         fields += ["abstract"]
     return Q(
         "query_string",
         fields=fields,
         default_operator=default_operator,
         allow_leading_wildcard=False,
-        query=escape(term),
+        query=analysis.escaped,
         _name="abstract",
     )
 
 
+@fragment
 def _query_comments(term: str, default_operator: str = "AND") -> Q:
     return Q(
         "query_string",
         fields=["comments"],
         default_operator=default_operator,
         allow_leading_wildcard=False,
-        query=escape(term),
+        query=analyze(term).escaped,
     )
 
 
@@ -87,40 +82,45 @@ def _tex_query(field: str, term: str, operator: str = "and") -> Q:
     )
 
 
+@fragment
 def _query_journal_ref(term: str, boost: int = 1, operator: str = "and") -> Q:
     return Q(
         "query_string",
         fields=["journal_ref"],
         default_operator=operator,
         allow_leading_wildcard=False,
-        query=escape(term),
+        query=analyze(term).escaped,
     )
 
 
+@fragment
 def _query_report_num(term: str, boost: int = 1, operator: str = "and") -> Q:
     return Q(
         "query_string",
         fields=["report_num"],
         default_operator=operator,
         allow_leading_wildcard=False,
-        query=escape(term),
+        query=analyze(term).escaped,
     )
 
 
+@fragment
 def _query_acm_class(term: str, operator: str = "and") -> Q:
-    if has_wildcard(term):
+    if analyze(term).has_wildcard:
         return Q("wildcard", acm_class=term)
     return Q("match", acm_class={"query": term, "operator": operator})
 
 
+@fragment
 def _query_msc_class(term: str, operator: str = "and") -> Q:
-    if has_wildcard(term):
+    if analyze(term).has_wildcard:
         return Q("wildcard", msc_class=term)
     return Q("match", msc_class={"query": term, "operator": operator})
 
 
+@fragment
 def _query_doi(term: str, operator: str = "and") -> Q:
-    value, wildcard = wildcard_escape(term)
+    _, wildcard = analyze(term).wildcard_escaped
     if wildcard:
         return Q("wildcard", doi={"value": term.lower()})
     return Q("match", doi={"query": term, "operator": operator})
@@ -144,6 +144,7 @@ def _query_announcement_date(term: str) -> Optional[Q]:
     return None
 
 
+@fragment
 def _query_primary(term: str, operator: str = "and") -> Q:
     # This now uses the "primary_classification.combined" field, which is
     # isomorphic to the document-level "combined" field. So we get
@@ -216,6 +217,7 @@ def query_any_subject_exact_raw(term: str) -> Q:
     )
 
 
+@fragment
 def _query_secondary(term: str, operator: str = "and") -> Q:
     return Q(
         "nested",
@@ -234,26 +236,33 @@ def _query_secondary(term: str, operator: str = "and") -> Q:
     )
 
 
+@fragment
 def _query_paper_id(term: str, operator: str = "and") -> Q:
     operator = operator.lower()
     logger.debug(f"query paper ID with: {term}")
-    q = Q_("match", "paper_id", escape(term), operator=operator) | Q_(
-        "match", "paper_id_v", escape(term), operator=operator
+    analysis = analyze(term)
+    q = Q_("match", "paper_id", analysis.escaped, operator=operator) | Q_(
+        "match", "paper_id_v", analysis.escaped, operator=operator
     )
-    if is_old_papernum(term):
+    if analysis.is_old_papernum:
         q |= Q("wildcard", paper_id=f"*/{term}")
     return q
 
 
+@fragment
 def _license_query(term: str, operator: str = "and") -> Q:
     """Search by license, using its URI (exact)."""
     return Q("term", **{"license__uri": term})
 
 
+@fragment
 def _query_combined(term: str) -> Q:
     # Only wildcards in literals should be escaped.
-    wildcard_escaped, has_wildcard = wildcard_escape(term)
-    query_term = (wildcard_escaped if has_wildcard else escape(term)).lower()
+    analysis = analyze(term)
+    wildcard_escaped, has_wildcard = analysis.wildcard_escaped
+    query_term = (
+        wildcard_escaped if has_wildcard else analysis.escaped
+    ).lower()
     # All terms must match in the combined field.
     return Q(
         "query_string",
@@ -264,6 +273,7 @@ def _query_combined(term: str) -> Q:
     )
 
 
+@fragment
 def _query_all_fields(term: str) -> Q:
     """
     Construct a query against all fields.
@@ -307,7 +317,8 @@ def _query_all_fields(term: str) -> Q:
 
     """
     # We only perform TeX queries on title and abstract.
-    if is_tex_query(term):
+    analysis = analyze(term)
+    if analysis.is_tex:
         return _tex_query("title", term) | _tex_query("abstract", term)
 
     match_all_fields = _query_combined(term)
@@ -364,12 +375,7 @@ def _query_all_fields(term: str) -> Q:
     # something that looks like a date fragment, we perform the all-fields
     # search on the remainder and use the fragment to build queries against the
     # announcement-date of the original paper version.
-    date_fragment: Optional[str] = None
-    remainder: Optional[str] = None
-    try:
-        date_fragment, remainder = parse_date(term)
-    except ValueError:
-        pass
+    date_fragment, remainder = analysis.date
 
     if date_fragment:
         logger.debug("date: %s; remainder: %s", date_fragment, remainder)
@@ -380,7 +386,7 @@ def _query_all_fields(term: str) -> Q:
         logger.debug("date_fragment: %s", date_fragment)
 
         # Try to query using legacy yyMM date partial format.
-        date_partial = parse_date_partial(date_fragment)
+        date_partial = analysis.date_partial
         logger.debug("date_partial: %s", date_partial)
         if date_partial is not None:
             match_date_partial = Q("term", announced_date_first=date_partial)
@@ -456,45 +462,32 @@ def limit_by_classification(
     """Generate a :class:`Q` to limit a query by by classification."""
     if len(classifications) == 0:
         return Q()
-
-    def _to_q(classification: Classification) -> Q:
-        _parts = []
-        if "group" in classification and classification["group"] is not None:
-            _parts.append(
-                Q(
-                    "match",
-                    **{f"{field}__group__id": classification["group"]["id"]},
-                )
+    # Classifications are dicts, so the cache is keyed by their IDs.
+    return _limit_by_classification(
+        tuple(
+            tuple(
+                (part, classification[part]["id"])  # type: ignore
+                for part in ["group", "archive", "category"]
+                if part in classification and classification[part] is not None
             )
-        if (
-            "archive" in classification
-            and classification["archive"] is not None
-        ):
-            _parts.append(
-                Q(
-                    "match",
-                    **{
-                        f"{field}__archive__id": classification["archive"][
-                            "id"
-                        ]
-                    },
-                )
-            )
-        if (
-            "category" in classification
-            and classification["category"] is not None
-        ):
-            _parts.append(
-                Q(
-                    "match",
-                    **{
-                        f"{field}__category__id": classification["category"][
-                            "id"
-                        ]
-                    },
-                )
-            )
-        return reduce(iand, _parts)
+            for classification in classifications
+        ),
+        field,
+    )
+
+
+@fragment
+def _limit_by_classification(
+    classifications: Tuple[Tuple[Tuple[str, str], ...], ...], field: str
+) -> Q:
+    def _to_q(classification: Tuple[Tuple[str, str], ...]) -> Q:
+        return reduce(
+            iand,
+            [
+                Q("match", **{f"{field}__{part}__id": value})
+                for part, value in classification
+            ],
+        )
 
     _q = reduce(ior, map(_to_q, classifications))
     if field == "secondary_classification":
@@ -5,7 +5,7 @@ The primary public function in this module is :func:`.to_documentset`.
 """
 
 from math import floor
-from typing import Union
+from typing import Any, Dict, List, Union
 from datetime import datetime
 
 from elasticsearch_dsl.response import Response, Hit
@@ -13,7 +13,11 @@ from elasticsearch_dsl.response import Response, Hit
 from arxiv.base import logging
 from search.domain import Document, Query, DocumentSet
 from search.services.index.util import MAX_RESULTS
-from search.services.index.highlighting import add_highlighting, preview
+from search.services.index.highlighting import (
+    add_highlighting,
+    add_raw_highlighting,
+    preview,
+)
 
 logger = logging.getLogger(__name__)
 logger.propagate = False
@@ -21,52 +25,83 @@ logger.propagate = False
 
 def to_document(raw: Union[Hit, dict], highlight: bool = True) -> Document:
     """Transform an ES search result back into a :class:`.Document`."""
+    result = _to_document(raw.__dict__["_d_"])
+
+    try:
+        result["score"] = raw.meta.score  # type: ignore
+    except AttributeError:
+        pass
+
+    if highlight:  # type(result.get('abstract')) is str and
+        result = add_highlighting(_add_preview(result), raw)
+
+    return result
+
+
+def raw_to_document(hit: Dict[str, Any], highlight: bool = True) -> Document:
+    """
+    Transform a hit from a raw ES response into a :class:`.Document`.
+
+    The result is the same as from :func:`.to_document` for the
+    corresponding :class:`.Hit`, without the cost of wrapping the hit.
+    """
+    source = hit.get("_source", {})
+    if "fields" in hit:
+        source = {**source, **hit["fields"]}
+    result = _to_document(source)
+
+    if "_score" in hit:
+        result["score"] = hit["_score"]
+
+    if highlight:
+        result = add_raw_highlighting(_add_preview(result), hit)
+
+    return result
+
+
+def _to_document(source: Dict[str, Any]) -> Document:
     # typing: ignore
     result: Document = {}
 
     result["match"] = {}  # Hit on field, but no highlighting.
     result["truncated"] = {}  # Preview is truncated.
 
-    result.update(raw.__dict__["_d_"])
+    result.update(source)  # type: ignore
 
     # Parse dates to date/datetime objects.
     if "announced_date_first" in result:
         result["announced_date_first"] = datetime.strptime(
-            raw["announced_date_first"], "%Y-%m"
+            source["announced_date_first"], "%Y-%m"
         ).date()
     for key in ["", "_first", "_latest"]:
         key = f"submitted_date{key}"
         if key not in result:
             continue
         try:
-            result[key] = datetime.strptime(raw[key], "%Y-%m-%dT%H:%M:%S%z")
+            result[key] = datetime.strptime(  # type: ignore
+                source[key], "%Y-%m-%dT%H:%M:%S%z"
+            )
         except (ValueError, TypeError):
             logger.warning(f"Could not parse {key} as datetime")
             pass
 
     for key in ["acm_class", "msc_class"]:
-        if key in result and result[key]:
-            result[key] = "; ".join(result[key])
-
-    try:
-        result["score"] = raw.meta.score  # type: ignore
-    except AttributeError:
-        pass
-
-    if highlight:  # type(result.get('abstract')) is str and
-        result["highlight"] = {}
-        logger.debug("%s: add highlighting to result", result["paper_id"])
+        if key in result and result[key]:  # type: ignore
+            result[key] = "; ".join(result[key])  # type: ignore
+    return result
 
-        if "preview" not in result:
-            result["preview"] = {}
 
-        if "abstract" in result:
-            result["preview"]["abstract"] = preview(result["abstract"])
-            if result["preview"]["abstract"].endswith("&hellip;"):
-                result["truncated"]["abstract"] = True
+def _add_preview(result: Document) -> Document:
+    result["highlight"] = {}
+    logger.debug("%s: add highlighting to result", result["paper_id"])
 
-        result = add_highlighting(result, raw)
+    if "preview" not in result:
+        result["preview"] = {}
 
+    if "abstract" in result:
+        result["preview"]["abstract"] = preview(result["abstract"])
+        if result["preview"]["abstract"].endswith("&hellip;"):
+            result["truncated"]["abstract"] = True
     return result
 
 
@@ -89,22 +124,86 @@ def to_documentset(
         The set of :class:`.Document`s responding to the query on the current
         page, along with pagination metadata.
 
+    """
+    logger.debug("got %i results", response["hits"]["total"])
+    hits = list(response)
+    document_set = to_page(
+        query,
+        [to_document(raw, highlight=highlight) for raw in hits],
+        response["hits"]["total"],
+    )
+    # Sort values are included only if the search was sorted explicitly.
+    if hits and "sort" in hits[-1].meta:
+        document_set["metadata"]["search_after"] = list(hits[-1].meta.sort)
+    return document_set
+
+
+def raw_to_documentset(
+    query: Query, response: Dict[str, Any], highlight: bool = True
+) -> DocumentSet:
+    """
+    Transform a raw response from ES to a :class:`.DocumentSet`.
+
+    The result is the same as from :func:`.to_documentset` for the
+    corresponding :class:`.Response`, without the cost of wrapping each hit
+    (see :func:`.raw_to_document`).
+
+    Parameters
+    ----------
+    query : :class:`.Query`
+        The original search query.
+    response : dict
+        The response from Elasticsearch, as decoded from JSON.
+
+    Returns
+    -------
+    :class:`.DocumentSet`
+
+    """
+    logger.debug("got %i results", response["hits"]["total"])
+    hits = response["hits"]["hits"]
+    document_set = to_page(
+        query,
+        [raw_to_document(hit, highlight=highlight) for hit in hits],
+        response["hits"]["total"],
+    )
+    if hits and "sort" in hits[-1]:
+        document_set["metadata"]["search_after"] = list(hits[-1]["sort"])
+    return document_set
+
+
+def to_page(
+    query: Query, documents: List[Document], total: int
+) -> DocumentSet:
+    """
+    Generate a :class:`.DocumentSet` for one page of results.
+
+    Parameters
+    ----------
+    query : :class:`.Query`
+        The original search query.
+    documents : list
+        The :class:`.Document`s on the current page.
+    total : int
+        Total number of results, on all pages.
+
+    Returns
+    -------
+    :class:`.DocumentSet`
+
     """
     max_pages = int(MAX_RESULTS / query.size)
-    n_pages_raw = response["hits"]["total"] / query.size
+    n_pages_raw = total / query.size
     n_pages = int(floor(n_pages_raw)) + int(n_pages_raw % query.size > 0)
-    logger.debug("got %i results", response["hits"]["total"])
     return {
         "metadata": {
             "start": query.page_start,
-            "end": min(
-                query.page_start + query.size, response["hits"]["total"]
-            ),
-            "total_results": response["hits"]["total"],
+            "end": min(query.page_start + query.size, total),
+            "total_results": total,
             "current_page": query.page,
             "total_pages": n_pages,
             "size": query.size,
             "max_pages": max_pages,
         },
-        "results": [to_document(raw, highlight=highlight) for raw in response],
+        "results": documents,
     }
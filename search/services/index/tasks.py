@@ -0,0 +1,95 @@
+"""Helpers for following long-running ES tasks, such as a reindex."""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from search.services.index.exceptions import IndexConnectionError
+
+
+@dataclass
+class TaskProgress:
+    """A snapshot of the progress of a reindex (or similar) task."""
+
+    task: str
+    total: int
+    """Number of documents to process."""
+    done: int
+    """Number of documents processed so far."""
+    running_time: float
+    """Time (in seconds) since the task started."""
+    requests_per_second: float
+    """Current throttle; -1 means no throttle."""
+    completed: bool
+    failures: int = 0
+    """Number of documents that could not be processed."""
+
+    @classmethod
+    def from_status(cls, task: str, status: Dict[str, Any]) -> "TaskProgress":
+        """Parse a response from the ES tasks API."""
+        info = status["task"]
+        counts = info.get("status", {})
+        done = sum(
+            counts.get(key, 0)
+            for key in ("created", "updated", "deleted", "version_conflicts")
+        )
+        return cls(
+            task=task,
+            total=counts.get("total", 0),
+            done=done,
+            running_time=info.get("running_time_in_nanos", 0) / 1e9,
+            requests_per_second=counts.get("requests_per_second", -1),
+            completed=status.get("completed", False),
+            failures=len(status.get("response", {}).get("failures", [])),
+        )
+
+    @property
+    def fraction(self) -> float:
+        """Fraction of the documents that have been processed."""
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def rate(self) -> float:
+        """Documents processed per second, since the task started."""
+        return self.done / self.running_time if self.running_time else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated time (in seconds) until the task is done."""
+        if self.completed or self.done >= self.total:
+            return 0.0
+        if not self.rate:
+            return None
+        return (self.total - self.done) / self.rate
+
+
+def watch(
+    task: str,
+    get_status: Callable[[str], Dict[str, Any]],
+    interval: float = 10.0,
+) -> Iterator[TaskProgress]:
+    """
+    Poll a task until it completes, yielding its progress after each poll.
+
+    Parameters
+    ----------
+    task : str
+        ID of the task.
+    get_status : callable
+        Gets the status of the task from the ES tasks API, e.g.
+        :meth:`.SearchSession.get_task_status`.
+    interval : float
+        Time (in seconds) between polls. Transient errors are retried after
+        the same interval.
+
+    """
+    while True:
+        try:
+            progress = TaskProgress.from_status(task, get_status(task))
+        except IndexConnectionError:
+            time.sleep(interval)
+            continue
+        yield progress
+        if progress.completed:
+            return
+        time.sleep(interval)
@@ -0,0 +1,242 @@
+"""
+Stored search templates for the most common searches.
+
+For each search, the query builders build a large body (the all-fields query
+alone has dozens of clauses, and highlighting adds 17 fields), which is
+serialized and sent to ES. A stored search template is sent to ES once;
+after that, each search sends only the ID of the template and a few
+parameters (e.g. the search terms), which ES renders into the body.
+
+Templates are generated from the query builders themselves: each is the body
+that the builders produce for a query with placeholder words, with the
+placeholders replaced by mustache tags. For a query that a template fits
+(see :func:`.fit`), the template therefore renders to the same body as the
+builders would produce. Anything else is built by the query builders as
+usual.
+
+The ID of each template includes a hash of its source, so that processes
+with different versions of the query builders (e.g. during a deploy) do not
+overwrite each other's templates.
+"""
+
+import re
+import json
+import time
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from elasticsearch import Elasticsearch, ElasticsearchException
+from elasticsearch_dsl import Search
+
+from arxiv.base import logging
+from search.domain import Query, SimpleQuery
+from search.services.index import highlighting
+from search.services.index.authors import STOP
+from search.services.index.classic_api.classic_search import (
+    current_versions,
+)
+from search.services.index.optimize import optimize_search
+from search.services.index.simple import simple_search
+from search.services.index.util import sort
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+
+FIELDS = ("all", "author", "title")
+"""Simple search fields for which templates are registered."""
+
+MAX_WORDS = 3
+"""Templates are registered for simple searches of up to this many words."""
+
+RETRY_INTERVAL = 60.0
+"""Time (in seconds) to wait before trying again to register templates."""
+
+CURRENT_VERSIONS = "current-versions"
+"""Name of the template for :func:`.current_versions`."""
+
+_WORDS = ["ZqxWordOne", "ZqxWordTwo", "ZqxWordThree"]
+"""Placeholder words, which no query builder treats as special."""
+
+_PLAIN = re.compile(r"^[A-Za-z]+$")
+
+_LIST = re.compile(r'\["@@(\w+)@@"\]')
+_VALUE = re.compile(r'"@@(\w+)@@"')
+
+_registered: Dict[str, bool] = {}
+_failed: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _marker(name: str) -> str:
+    return f"@@{name}@@"
+
+
+def _source(body: Dict[str, Any], highlight: bool = False) -> str:
+    """
+    Generate the source of a template from a body with placeholders.
+
+    Placeholder words are replaced with tags for the words of the query (or
+    the same words in lowercase), which ES escapes for JSON. A list of one
+    placeholder value (see :func:`._marker`) is replaced with its parameter,
+    serialized as JSON; a placeholder value on its own, with its parameter as
+    it is (so, a number). If ``highlight`` is set, the highlight configuration
+    is included only if the ``highlight`` parameter is true.
+    """
+    if highlight:
+        config = highlighting.highlight(Search()).to_dict()["highlight"]
+        section = json.dumps({"highlight": config})[1:-1]
+        source = json.dumps(body)
+        # Not "{{{", which is a mustache tag of its own.
+        source = "{ {{#highlight}}%s, {{/highlight}}%s" % (
+            section,
+            source[1:],
+        )
+    else:
+        source = json.dumps(body)
+    for i, word in enumerate(_WORDS):
+        source = source.replace(word, "{{w%i}}" % i)
+        source = source.replace(word.lower(), "{{l%i}}" % i)
+    source = _LIST.sub(r"{{#toJson}}\1{{/toJson}}", source)
+    return _VALUE.sub(r"{{\1}}", source)
+
+
+def _simple(field: str, words: int) -> str:
+    query = SimpleQuery(search_field=field, value=" ".join(_WORDS[:words]))
+    # As built by SearchSession.search.
+    body = optimize_search(simple_search(Search(), query)).to_dict()
+    body.update(
+        sort=[_marker("sort")],
+        size=_marker("size"),
+        **{"from": _marker("from")},
+    )
+    return _source(body, highlight=True)
+
+
+def _current_versions() -> str:
+    search = current_versions(Search(), [_marker("paper_ids")])
+    body = search[:1].to_dict()
+    body["size"] = _marker("size")
+    return _source(body)
+
+
+@lru_cache(maxsize=1)
+def get_templates() -> Dict[str, Tuple[str, str]]:
+    """
+    Generate the templates.
+
+    Returns
+    -------
+    dict
+        The ID and source of each template, by name.
+
+    """
+    sources = {CURRENT_VERSIONS: _current_versions()}
+    for field in FIELDS:
+        for words in range(1, MAX_WORDS + 1):
+            sources[f"simple-{field}-{words}"] = _simple(field, words)
+    return {
+        name: (
+            "search-%s-%s"
+            % (name, hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]),
+            source,
+        )
+        for name, source in sources.items()
+    }
+
+
+def fit(query: Query, highlight: bool) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Find the template for a search, if there is one.
+
+    A template fits a :class:`.SimpleQuery` on one of :const:`.FIELDS`,
+    without classifications, of up to :const:`.MAX_WORDS` plain words (only
+    letters, other than the stopwords that are removed from author names),
+    separated by single spaces.
+
+    Returns
+    -------
+    tuple or None
+        The ID of the template, and its parameters; or None if no template
+        fits ``query``.
+
+    """
+    if (
+        not isinstance(query, SimpleQuery)
+        or query.search_field not in FIELDS
+        or query.classification
+    ):
+        return None
+    words = query.value.split(" ")
+    if len(words) > MAX_WORDS or not all(
+        _PLAIN.match(word) and word not in STOP for word in words
+    ):
+        return None
+    template_id, _ = get_templates()[
+        f"simple-{query.search_field}-{len(words)}"
+    ]
+    params: Dict[str, Any] = {}
+    for i, word in enumerate(words):
+        params.update({f"w{i}": word, f"l{i}": word.lower()})
+    params.update(
+        highlight=highlight,
+        sort=sort(query, Search()).to_dict()["sort"],
+        size=query.size,
+        **{"from": query.page_start},
+    )
+    return template_id, params
+
+
+def fit_current_versions(paper_ids: List[str]) -> Tuple[str, Dict[str, Any]]:
+    """Get the template and parameters for :func:`.current_versions`."""
+    template_id, _ = get_templates()[CURRENT_VERSIONS]
+    return template_id, {"paper_ids": paper_ids, "size": len(paper_ids)}
+
+
+def register(es: Elasticsearch) -> None:
+    """Store all of the templates in the cluster."""
+    for template_id, source in get_templates().values():
+        es.put_script(
+            id=template_id,
+            body={"script": {"lang": "mustache", "source": source}},
+        )
+
+
+def ensure_registered(es: Elasticsearch, cluster: str) -> bool:
+    """
+    Make sure that the templates are stored in ``cluster``.
+
+    The templates are registered once by each process, when they are first
+    needed. If that fails, this is tried again after
+    :const:`.RETRY_INTERVAL`; until then, searches are built as usual.
+
+    Returns
+    -------
+    bool
+        Whether the templates are registered.
+
+    """
+    with _lock:
+        if _registered.get(cluster):
+            return True
+        if time.time() - _failed.get(cluster, 0.0) < RETRY_INTERVAL:
+            return False
+    try:
+        register(es)
+    except ElasticsearchException as ex:
+        logger.warning("Could not register search templates: %s", ex)
+        with _lock:
+            _failed[cluster] = time.time()
+        return False
+    logger.info("Registered search templates with %s", cluster)
+    with _lock:
+        _registered[cluster] = True
+        _failed.pop(cluster, None)
+    return True
+
+
+def forget(cluster: str) -> None:
+    """Register the templates again, e.g. if the cluster was replaced."""
+    with _lock:
+        _registered.pop(cluster, None)
@@ -0,0 +1,140 @@
+"""Tests for blue/green index management with aliases."""
+
+from unittest import TestCase, mock
+
+from search.domain import Document
+from search.services import index
+
+
+class TestAliases(TestCase):
+    """Reads and writes go through aliases, which are swapped atomically."""
+
+    def setUp(self):
+        """Create a session with read and write aliases."""
+        self.session = index.SearchSession(
+            "foohost", "arxiv", mapping=None, write_alias="arxiv-write"
+        )
+        self.session._load_mapping = mock.MagicMock(return_value={})
+        self.mock_es = mock.MagicMock()
+        self.aliases = {
+            "arxiv": {"arxiv-1": {}},
+            "arxiv-write": {"arxiv-1": {}, "arxiv-2": {}},
+        }
+        self.mock_es.indices.get_alias.side_effect = lambda name: self.aliases[
+            name
+        ]
+
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_dual_write(self, mock_Elasticsearch, mock_helpers):
+        """Documents are written to each index behind the write alias."""
+        mock_Elasticsearch.return_value = self.mock_es
+        mock_helpers.parallel_bulk.return_value = []
+        self.session.bulk_add_documents([Document(id="1234.56789v1")])
+
+        args, _ = mock_helpers.parallel_bulk.call_args
+        self.assertEqual(
+            sorted(action["_index"] for action in args[1]),
+            ["arxiv-1", "arxiv-2"],
+        )
+
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_update_missing(self, mock_Elasticsearch, mock_helpers):
+        """A document not yet in the new index is copied there in full."""
+        mock_Elasticsearch.return_value = self.mock_es
+        missing = {
+            "_index": "arxiv-2",
+            "_id": "1234.56789v1",
+            "status": 404,
+            "error": {"type": "document_missing_exception"},
+        }
+        mock_helpers.bulk.side_effect = [(1, [{"update": missing}]), (1, [])]
+        self.mock_es.mget.return_value = {
+            "docs": [
+                {"_id": "1234.56789v1", "found": True, "_source": {"a": 1}}
+            ]
+        }
+        self.session.bulk_update_fields({"1234.56789v1": {"latest": "v2"}})
+
+        _, kwargs = mock_helpers.bulk.call_args
+        copied = list(kwargs["actions"])
+        self.assertEqual(len(copied), 1)
+        self.assertEqual(copied[0]["_index"], "arxiv-2")
+        self.assertEqual(copied[0]["_source"], {"a": 1})
+        _, kwargs = self.mock_es.mget.call_args
+        self.assertEqual(kwargs["index"], "arxiv", "Read from the old index")
+
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_update_missing_by_alias(self, mock_Elasticsearch, mock_helpers):
+        """The new index is found by its aliases, not by its name."""
+        mock_Elasticsearch.return_value = self.mock_es
+        self.aliases = {
+            "arxiv": {"arxiv-v9": {}},
+            "arxiv-write": {"arxiv-v9": {}, "arxiv-v10": {}},
+        }
+        missing = {
+            "_index": "arxiv-v10",
+            "_id": "1234.56789v1",
+            "status": 404,
+            "error": {"type": "document_missing_exception"},
+        }
+        mock_helpers.bulk.side_effect = [(1, [{"update": missing}]), (1, [])]
+        self.mock_es.mget.return_value = {
+            "docs": [
+                {"_id": "1234.56789v1", "found": True, "_source": {"a": 1}}
+            ]
+        }
+        self.session.bulk_update_fields({"1234.56789v1": {"latest": "v2"}})
+
+        _, kwargs = mock_helpers.bulk.call_args
+        copied = list(kwargs["actions"])
+        self.assertEqual(len(copied), 1)
+        self.assertEqual(copied[0]["_index"], "arxiv-v10")
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_begin_migration(self, mock_Elasticsearch):
+        """The new index is created, and added to the write alias."""
+        mock_Elasticsearch.return_value = self.mock_es
+        self.assertEqual(self.session.begin_migration("arxiv-2"), ["arxiv-1"])
+        self.assertEqual(
+            self.mock_es.indices.create.call_args[0][0], "arxiv-2"
+        )
+        self.mock_es.indices.put_alias.assert_called_once_with(
+            index="arxiv-2", name="arxiv-write"
+        )
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_cut_over(self, mock_Elasticsearch):
+        """Both aliases are moved to the new index in one request."""
+        mock_Elasticsearch.return_value = self.mock_es
+        self.mock_es.count.return_value = {"count": 100}
+        self.assertEqual(self.session.cut_over("arxiv-2"), ["arxiv-1"])
+
+        self.mock_es.indices.update_aliases.assert_called_once()
+        args, _ = self.mock_es.indices.update_aliases.call_args
+        self.assertEqual(
+            args[0]["actions"],
+            [
+                {"remove": {"index": "arxiv-1", "alias": "arxiv"}},
+                {"add": {"index": "arxiv-2", "alias": "arxiv"}},
+                {"remove": {"index": "arxiv-1", "alias": "arxiv-write"}},
+                {"add": {"index": "arxiv-2", "alias": "arxiv-write"}},
+            ],
+        )
+        self.mock_es.indices.delete.assert_not_called()
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_cut_over_missing_documents(self, mock_Elasticsearch):
+        """The aliases are not moved if the new index is incomplete."""
+        mock_Elasticsearch.return_value = self.mock_es
+        self.mock_es.count.side_effect = lambda index: {
+            "count": 100 if index == "arxiv-1" else 90
+        }
+        with self.assertRaises(index.CutoverFailed):
+            self.session.cut_over("arxiv-2")
+        self.mock_es.indices.update_aliases.assert_not_called()
+
+        self.session.cut_over("arxiv-2", max_missing=10)
+        self.mock_es.indices.update_aliases.assert_called_once()
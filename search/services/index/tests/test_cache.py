@@ -0,0 +1,327 @@
+"""Tests for :mod:`search.services.index.cache`."""
+
+import os
+import time
+import tempfile
+import threading
+from unittest import TestCase, mock
+
+from search.domain import SimpleQuery, SortBy, SortOrder, ClassicAPIQuery
+from search.services import index
+from search.services.index import cache
+
+
+def _document_set(paper_id="1234.56789"):
+    return {
+        "metadata": {"total_results": 1},
+        "results": [{"paper_id": paper_id}],
+    }
+
+
+class TestFingerprint(TestCase):
+    """Tests for :func:`.cache.fingerprint`."""
+
+    def test_same_query(self):
+        """Equal queries have the same fingerprint."""
+        self.assertEqual(
+            cache.fingerprint(SimpleQuery(search_field="all", value="foo")),
+            cache.fingerprint(SimpleQuery(search_field="all", value="foo")),
+        )
+        self.assertEqual(
+            cache.fingerprint(
+                ClassicAPIQuery(
+                    search_query="au:del_maestro AND ti:checkerboard",
+                    order=SortOrder(by=SortBy.submitted_date),
+                )
+            ),
+            cache.fingerprint(
+                ClassicAPIQuery(
+                    search_query="au:del_maestro AND ti:checkerboard",
+                    order=SortOrder(by=SortBy.submitted_date),
+                )
+            ),
+        )
+
+    def test_different_query(self):
+        """Parameters, pagination and highlighting all matter."""
+        query = SimpleQuery(search_field="all", value="foo")
+        fingerprints = {
+            cache.fingerprint(query),
+            cache.fingerprint(query, highlight=False),
+            cache.fingerprint(SimpleQuery(search_field="all", value="bar")),
+            cache.fingerprint(
+                SimpleQuery(search_field="all", value="foo", page_start=50)
+            ),
+            cache.fingerprint(
+                ClassicAPIQuery(
+                    search_query="all:foo",
+                    order=SortOrder(by=SortBy.submitted_date),
+                )
+            ),
+            cache.fingerprint(
+                ClassicAPIQuery(
+                    search_query="all:foo",
+                    order=SortOrder(by=SortBy.last_updated_date),
+                )
+            ),
+        }
+        self.assertEqual(len(fingerprints), 6)
+
+
+class TestResultCache(TestCase):
+    """Tests for :class:`.cache.ResultCache`."""
+
+    def test_get(self):
+        """Results are returned for the same generation only."""
+        results = cache.ResultCache()
+        self.assertIsNone(results.get("foo", 1))
+        results.put("foo", 1, _document_set())
+        self.assertEqual(results.get("foo", 1), _document_set())
+        self.assertIsNone(results.get("foo", 2))
+        self.assertEqual(
+            results.stats(),
+            {
+                "size": 1,
+                "hits": 1,
+                "disk_hits": 0,
+                "misses": 2,
+                "hit_rate": 1 / 3,
+            },
+        )
+
+    def test_copies(self):
+        """Callers can't modify the cached result."""
+        results = cache.ResultCache()
+        results.put("foo", 1, _document_set())
+        results.get("foo", 1)["metadata"]["query"] = "bar"
+        self.assertNotIn("query", results.get("foo", 1)["metadata"])
+
+    @mock.patch(f"{cache.__name__}.time")
+    def test_ttl(self, mock_time):
+        """Results expire after the TTL."""
+        mock_time.time.return_value = 100
+        results = cache.ResultCache(ttl=10)
+        results.put("foo", 1, _document_set())
+        mock_time.time.return_value = 109
+        self.assertIsNotNone(results.get("foo", 1))
+        mock_time.time.return_value = 111
+        self.assertIsNone(results.get("foo", 1))
+
+    def test_lru(self):
+        """The least recently used result is discarded first."""
+        results = cache.ResultCache(max_size=2)
+        results.put("foo", 1, _document_set("1"))
+        results.put("bar", 1, _document_set("2"))
+        results.get("foo", 1)
+        results.put("baz", 1, _document_set("3"))
+        self.assertIsNone(results.get("bar", 1))
+        self.assertIsNotNone(results.get("foo", 1))
+        self.assertIsNotNone(results.get("baz", 1))
+
+    @mock.patch(f"{cache.__name__}.time")
+    def test_generation(self, mock_time):
+        """The generation is looked up at most once per interval."""
+        mock_time.time.return_value = 100
+        lookup = mock.MagicMock(return_value=1)
+        results = cache.ResultCache(check_interval=5)
+        self.assertEqual(results.generation(lookup), 1)
+        results.put("foo", 1, _document_set())
+
+        lookup.return_value = 2
+        mock_time.time.return_value = 104
+        self.assertEqual(results.generation(lookup), 1)
+        self.assertEqual(lookup.call_count, 1)
+
+        mock_time.time.return_value = 106
+        self.assertEqual(results.generation(lookup), 2)
+        self.assertEqual(lookup.call_count, 2)
+        self.assertEqual(results.stats()["size"], 0)
+
+    def test_shared_on_disk(self):
+        """Results are shared by caches with the same database."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, cache.CACHE_FILENAME)
+            results = cache.ResultCache(path=path)
+            other = cache.ResultCache(path=path)
+            results.put("foo", 1, _document_set())
+
+            self.assertEqual(other.get("foo", 1), _document_set())
+            self.assertIsNone(other.get("foo", 2))
+            self.assertEqual(other.get("foo", 1), _document_set())
+            self.assertEqual(other.stats()["disk_hits"], 1)
+            self.assertEqual(other.stats()["hits"], 1)
+
+
+@mock.patch("search.services.index.Elasticsearch")
+class TestCachedSearch(TestCase):
+    """Tests for :meth:`.SearchSession.search` with a result cache."""
+
+    def setUp(self):
+        """Create a session with a result cache."""
+        self.cache = cache.ResultCache()
+        self.query = SimpleQuery(search_field="all", value="foo")
+
+    def _session(self):
+        return index.SearchSession("localhost", "arxiv", cache=self.cache)
+
+    def test_hit(self, mock_Elasticsearch):
+        """An identical search is answered from the cache."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.indices.get_mapping.return_value = {
+            "arxiv": {"mappings": {"document": {"_meta": {"generation": 123}}}}
+        }
+        session = self._session()
+        with mock.patch.object(session, "_search") as mock_search:
+            mock_search.return_value = _document_set()
+            first = session.search(self.query)
+            second = self._session().search(self.query)
+            self.assertEqual(mock_search.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_new_generation(self, mock_Elasticsearch):
+        """Results from an earlier generation are not used."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.indices.get_mapping.return_value = {}
+        self.cache.check_interval = 0
+        session = self._session()
+        with mock.patch.object(session, "_search") as mock_search:
+            mock_search.return_value = _document_set()
+            session.search(self.query)
+            mock_es.indices.get_mapping.return_value = {
+                "arxiv": {
+                    "mappings": {"document": {"_meta": {"generation": 1}}}
+                }
+            }
+            session.search(self.query)
+            self.assertEqual(mock_search.call_count, 2)
+
+    def test_without_cache(self, mock_Elasticsearch):
+        """The cache can be bypassed, e.g. for health checks."""
+        session = self._session()
+        with mock.patch.object(session, "_search") as mock_search:
+            mock_search.return_value = _document_set()
+            session.search(self.query)
+            session.search(self.query, use_cache=False)
+            self.assertEqual(mock_search.call_count, 2)
+
+    @mock.patch("search.services.index.IN_FLIGHT")
+    def test_coalesced(self, mock_in_flight, mock_Elasticsearch):
+        """Searches are coalesced by index and query fingerprint."""
+        mock_in_flight.do.return_value = _document_set()
+        session = index.SearchSession("localhost", "arxiv")
+        self.assertEqual(session.search(self.query), _document_set())
+        key, _ = mock_in_flight.do.call_args[0]
+        self.assertIn(cache.fingerprint(self.query), key)
+
+        index.SearchSession("localhost", "arxiv-2").search(self.query)
+        other, _ = mock_in_flight.do.call_args[0]
+        self.assertNotEqual(key, other, "Not coalesced across indices")
+
+    @mock.patch("search.services.index.IN_FLIGHT")
+    def test_coalesced_by_generation(self, mock_in_flight, mock_Elasticsearch):
+        """Searches of different generations are not coalesced."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_in_flight.do.return_value = _document_set()
+        self.cache.check_interval = 0
+        keys = []
+        for generation in (1, 2):
+            mock_es.indices.get_mapping.return_value = {
+                "arxiv": {
+                    "mappings": {
+                        "document": {"_meta": {"generation": generation}}
+                    }
+                }
+            }
+            self._session().search(self.query)
+            keys.append(mock_in_flight.do.call_args[0][0])
+        self.assertNotEqual(keys[0], keys[1])
+
+    def test_bump_generation(self, mock_Elasticsearch):
+        """The generation is stored in the mapping of the write indices."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        session = index.SearchSession(
+            "localhost", "arxiv", write_alias="arxiv-write"
+        )
+        generation = session.bump_generation()
+        mock_es.indices.put_mapping.assert_called_once_with(
+            index="arxiv-write",
+            doc_type="document",
+            body={"_meta": {"generation": generation}},
+        )
+
+
+class TestSingleFlight(TestCase):
+    """Tests for :class:`.cache.SingleFlight`."""
+
+    def _concurrently(self, flight, func, n=5):
+        """Make ``n`` calls, all of which start while the first is running."""
+        started = threading.Event()
+        release = threading.Event()
+        outcomes = []
+
+        def _func():
+            started.set()
+            release.wait(5)
+            return func()
+
+        def _call():
+            try:
+                outcomes.append(flight.do("foo", _func))
+            except Exception as ex:
+                outcomes.append(ex)
+
+        threads = [threading.Thread(target=_call) for _ in range(n)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while flight.stats()["coalesced"] < n - 1:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_coalesced(self):
+        """Concurrent calls share a single execution."""
+        flight = cache.SingleFlight()
+        func = mock.MagicMock(side_effect=_document_set)
+
+        outcomes = self._concurrently(flight, func)
+
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(outcomes, [_document_set()] * 5)
+        self.assertEqual(
+            len({id(outcome) for outcome in outcomes}),
+            5,
+            "Each caller gets its own copy",
+        )
+        self.assertEqual(
+            flight.stats(), {"executed": 1, "coalesced": 4, "in_flight": 0}
+        )
+
+    def test_error(self):
+        """All of the concurrent calls raise the exception."""
+        flight = cache.SingleFlight()
+        func = mock.MagicMock(side_effect=index.IndexConnectionError)
+
+        outcomes = self._concurrently(flight, func)
+
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(len(outcomes), 5)
+        for outcome in outcomes:
+            self.assertIsInstance(outcome, index.IndexConnectionError)
+
+    def test_sequential(self):
+        """Calls that are not concurrent are not coalesced."""
+        flight = cache.SingleFlight()
+        func = mock.MagicMock(side_effect=_document_set)
+        flight.do("foo", func)
+        flight.do("foo", func)
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(flight.stats()["coalesced"], 0)
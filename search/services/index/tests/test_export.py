@@ -0,0 +1,127 @@
+"""Tests for :mod:`search.services.index.export`."""
+
+from unittest import TestCase, mock
+
+from search.domain import APIQuery
+from search.services import index
+from search.services.index import export
+
+
+class TestSlicedScan(TestCase):
+    """Tests for :func:`.export.sliced_scan`."""
+
+    def setUp(self):
+        """Each slice yields three hits."""
+        self.closed = []
+
+        def _extra(**kwargs):
+            slice_id = kwargs["slice"]["id"]
+
+            def _scan():
+                try:
+                    for i in range(3):
+                        yield (slice_id, i)
+                finally:
+                    self.closed.append(slice_id)
+
+            sliced = mock.MagicMock()
+            sliced.scan.side_effect = _scan
+            return sliced
+
+        self.search = mock.MagicMock()
+        self.search.extra.side_effect = _extra
+
+    def test_slices(self):
+        """All of the hits from every slice are yielded."""
+        hits = list(export.sliced_scan(self.search, slices=4, depth=2))
+        self.assertEqual(
+            sorted(hits), [(s, i) for s in range(4) for i in range(3)]
+        )
+        slices = [kw["slice"] for _, kw in self.search.extra.call_args_list]
+        self.assertEqual(
+            sorted(s["id"] for s in slices),
+            [0, 1, 2, 3],
+        )
+        self.assertTrue(all(s["max"] == 4 for s in slices))
+        self.assertEqual(sorted(self.closed), [0, 1, 2, 3])
+
+    def test_stop_early(self):
+        """The slices stop (and clear their scrolls) if the caller stops."""
+        hits = export.sliced_scan(self.search, slices=4, depth=1)
+        next(hits)
+        hits.close()
+        self.assertEqual(sorted(self.closed), [0, 1, 2, 3])
+
+    def test_slice_fails(self):
+        """An exception in one of the slices is raised to the caller."""
+        failing = mock.MagicMock()
+        failing.scan.side_effect = RuntimeError
+        self.search.extra.side_effect = None
+        self.search.extra.return_value = failing
+        with self.assertRaises(RuntimeError):
+            list(export.sliced_scan(self.search, slices=2))
+
+    def test_one_slice(self):
+        """Without slices, the search is scanned directly."""
+        self.search.scan.return_value = iter(["foo", "bar"])
+        hits = list(export.sliced_scan(self.search, slices=1))
+        self.assertEqual(hits, ["foo", "bar"])
+        self.assertEqual(self.search.extra.call_count, 0)
+
+
+class TestExport(TestCase):
+    """Tests for :meth:`.SearchSession.export`."""
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_export(self, mock_Elasticsearch):
+        """Documents are retrieved with a sliced scroll."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+
+        def _search(body, **kwargs):
+            slice_id = body["slice"]["id"]
+            return {
+                "_scroll_id": f"scroll{slice_id}",
+                "_shards": {"successful": 1, "total": 1},
+                "hits": {
+                    "total": 2,
+                    "hits": [
+                        {
+                            "_index": "arxiv",
+                            "_type": "document",
+                            "_id": f"123{slice_id}.0000{i}v1",
+                            "_source": {
+                                "paper_id": f"123{slice_id}.0000{i}",
+                                "title": "foo",
+                            },
+                        }
+                        for i in range(2)
+                    ],
+                },
+            }
+
+        mock_es.search.side_effect = _search
+        mock_es.scroll.return_value = {
+            "_scroll_id": "done",
+            "_shards": {"successful": 1, "total": 1},
+            "hits": {"hits": []},
+        }
+        session = index.SearchSession("localhost", "arxiv", export_slices=2)
+        query = APIQuery(include_fields=["title"])
+
+        documents = list(session.export(query, batch_size=10))
+
+        self.assertEqual(
+            sorted(doc["paper_id"] for doc in documents),
+            ["1230.00000", "1230.00001", "1231.00000", "1231.00001"],
+        )
+        self.assertEqual(mock_es.search.call_count, 2)
+        for _, kwargs in mock_es.search.call_args_list:
+            self.assertEqual(kwargs["size"], 10)
+            self.assertIn("scroll", kwargs)
+            self.assertEqual(
+                set(kwargs["body"]["_source"]["include"]),
+                set(query.include_fields),
+            )
+            self.assertEqual(kwargs["body"]["sort"], "_doc")
+        self.assertEqual(mock_es.clear_scroll.call_count, 2)
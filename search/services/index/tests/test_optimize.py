@@ -0,0 +1,618 @@
+"""Tests for :mod:`search.services.index.optimize`."""
+
+import json
+import math
+import random
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from unittest import TestCase
+
+from elasticsearch_dsl import Q, Search
+
+from search.domain import (
+    AdvancedQuery,
+    APIQuery,
+    ClassicAPIQuery,
+    Classification,
+    ClassificationList,
+    DateRange,
+    FieldedSearchList,
+    FieldedSearchTerm,
+    SimpleQuery,
+)
+from search.services.index.advanced import advanced_search
+from search.services.index.api import api_search
+from search.services.index.classic_api import classic_search
+from search.services.index.optimize import (
+    FILTER_FIELDS,
+    optimize,
+    optimize_search,
+)
+from search.services.index.simple import simple_search
+
+CLASSIFICATIONS = [
+    ("grp_physics", "astro-ph", "astro-ph.GA"),
+    ("grp_physics", "astro-ph", "astro-ph.CO"),
+    ("grp_physics", "hep-th", "hep-th"),
+    ("grp_cs", "cs", "cs.AI"),
+    ("grp_cs", "cs", "cs.LG"),
+    ("grp_math", "math", "math.CO"),
+]
+LICENSES = [
+    "http://creativecommons.org/licenses/by/4.0/",
+    "http://arxiv.org/licenses/nonexclusive-distrib/1.0/",
+]
+
+
+def classification(field: str, group: str, archive: str, category: str):
+    """Generate the classification fields of a document."""
+    return {
+        f"{field}.group.id": group,
+        f"{field}.archive.id": archive,
+        f"{field}.category.id": category,
+    }
+
+
+def make_documents(n: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Generate documents with random classifications, dates and versions."""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(n):
+        date = f"{rng.randint(2017, 2021)}-{rng.randint(1, 12):02}-01"
+        secondary = rng.sample(CLASSIFICATIONS, rng.randint(0, 2))
+        documents.append(
+            {
+                "id": str(i),
+                "paper_id": f"1801.{i:05}",
+                "paper_id_v": f"1801.{i:05}v1",
+                "is_current": rng.random() < 0.7,
+                "license.uri": rng.choice(LICENSES),
+                "submitted_date": date,
+                "submitted_date_first": date,
+                "announced_date_first": date[:7],
+                **classification(
+                    "primary_classification", *rng.choice(CLASSIFICATIONS)
+                ),
+                "secondary_classification": [
+                    classification("secondary_classification", *c)
+                    for c in secondary
+                ],
+            }
+        )
+    return documents
+
+
+DATE_FIELDS = frozenset(
+    ["announced_date_first", "submitted_date", "submitted_date_first"]
+)
+
+
+def _value(value: Any, key: str) -> Any:
+    return value.get(key) if isinstance(value, dict) else value
+
+
+def _boost(params: Dict[str, Any]) -> float:
+    return float(params.get("boost", 1))
+
+
+class Index(object):
+    """
+    Scores documents as ES 6 (on a single shard) would, roughly.
+
+    A ``term`` or ``match`` on a keyword (or boolean) field scores the BM25
+    IDF of the term, as these fields have no norms; on a date field, it is a
+    constant-score range, as are ``terms`` and ``range``. Text queries match,
+    and score, at random (but always the same for the same query and
+    document).
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]]) -> None:
+        """Count the documents in which each term occurs."""
+        self.documents = documents
+        self.doc_freq: Dict[Any, int] = Counter()
+        self.doc_count: Dict[str, int] = Counter()
+        for doc in documents:
+            for nested in [doc] + doc["secondary_classification"]:
+                for field, value in nested.items():
+                    if field in FILTER_FIELDS:
+                        self.doc_freq[field, value] += 1
+                        self.doc_count[field] += 1
+
+    def idf(self, field: str, value: Any) -> float:
+        """Get the IDF of a term, as Lucene's BM25 does."""
+        n, df = self.doc_count[field], self.doc_freq[field, value]
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: Dict[str, Any]) -> Dict[str, float]:
+        """Get the score of each matching document, by ID."""
+        return {
+            doc["id"]: round(s, 9)
+            for doc in self.documents
+            for s in [self.score(query, doc)]
+            if s is not None
+        }
+
+    def rank(self, query: Dict[str, Any]) -> List[str]:
+        """Get the IDs of the matching documents, in order of score."""
+        scores = [
+            (self.score(query, doc), doc["id"]) for doc in self.documents
+        ]
+        return [
+            doc_id
+            for s, doc_id in sorted(
+                ((s, doc_id) for s, doc_id in scores if s is not None),
+                key=lambda item: (-round(item[0], 9), item[1]),
+            )
+        ]
+
+    def score(
+        self, query: Dict[str, Any], doc: Dict[str, Any], scoring: bool = True
+    ) -> Optional[float]:
+        """Score a document; None if it does not match."""
+        ((kind, params),) = query.items()
+        if kind == "match_all":
+            return _boost(params)
+        if kind == "bool":
+            return self._score_bool(params, doc, scoring)
+        if kind == "constant_score":
+            if self.score(params["filter"], doc, False) is None:
+                return None
+            return _boost(params)
+        if kind == "function_score":
+            return self._score_function(params, doc, scoring)
+        if kind == "nested" and params["path"] == "secondary_classification":
+            scores = [
+                s
+                for nested in doc["secondary_classification"]
+                for s in [self.score(params["query"], nested, scoring)]
+                if s is not None
+            ]
+            if not scores:
+                return None
+            if params.get("score_mode") == "sum":
+                return sum(scores)
+            return sum(scores) / len(scores)
+        return self._leaf(kind, params, doc)
+
+    def _score_function(
+        self, params: Dict[str, Any], doc: Dict[str, Any], scoring: bool
+    ) -> Optional[float]:
+        query = params.get("query", {"match_all": {}})
+        inner = self.score(query, doc, scoring)
+        if inner is None:
+            return None
+        weights = [
+            function["weight"]
+            for function in params.get("functions", [])
+            if "filter" not in function
+            or self.score(function["filter"], doc, False) is not None
+        ]
+        mode = params.get("score_mode", "multiply")
+        factor = 1.0
+        if weights and mode == "sum":
+            factor = sum(weights)
+        elif weights and mode == "max":
+            factor = max(weights)
+        elif weights:
+            factor = 1.0
+            for weight in weights:
+                factor *= weight
+        boost_mode = params.get("boost_mode", "multiply")
+        if boost_mode == "sum":
+            combined = inner + factor
+        elif boost_mode == "replace":
+            combined = factor
+        else:
+            combined = inner * factor
+        return combined * _boost(params)
+
+    def _score_bool(
+        self, params: Dict[str, Any], doc: Dict[str, Any], scoring: bool
+    ) -> Optional[float]:
+        def clauses(name: str) -> List[Dict[str, Any]]:
+            value = params.get(name, [])
+            return value if isinstance(value, list) else [value]
+
+        total = 0.0
+        for clause in clauses("must"):
+            s = self.score(clause, doc, scoring)
+            if s is None:
+                return None
+            total += s
+        for clause in clauses("filter"):
+            if self.score(clause, doc, False) is None:
+                return None
+        for clause in clauses("must_not"):
+            if self.score(clause, doc, False) is not None:
+                return None
+        should = [self.score(c, doc, scoring) for c in clauses("should")]
+        matched = [s for s in should if s is not None]
+        if "minimum_should_match" in params:
+            required = int(params["minimum_should_match"])
+        elif should and (
+            not scoring or not (clauses("must") or clauses("filter"))
+        ):
+            required = 1
+        else:
+            required = 0
+        if len(matched) < required:
+            return None
+        return (total + sum(matched)) * _boost(params)
+
+    def _leaf(
+        self, kind: str, params: Dict[str, Any], doc: Dict[str, Any]
+    ) -> Optional[float]:
+        if len(params) == 1:
+            field, value = next(iter(params.items()))
+            if field in FILTER_FIELDS:
+                boost = float(
+                    value.get("boost", 1) if isinstance(value, dict) else 1
+                )
+                if kind == "range":
+                    found = doc[field]
+                    matches = all(
+                        {
+                            "gte": found >= bound,
+                            "gt": found > bound,
+                            "lte": found <= bound,
+                            "lt": found < bound,
+                        }[op]
+                        for op, bound in value.items()
+                        if op in ("gte", "gt", "lte", "lt")
+                    )
+                    return boost if matches else None
+                if kind == "terms":
+                    return boost if doc.get(field) in value else None
+                key = "value" if kind == "term" else "query"
+                if doc.get(field) != _value(value, key):
+                    return None
+                if field in DATE_FIELDS:
+                    return boost
+                return boost * self.idf(field, doc[field])
+        if kind == "terms" and "paper_id" in params:
+            return 1.0 if doc["paper_id"] in params["paper_id"] else None
+        raw = json.dumps({kind: params}, sort_keys=True) + doc.get("id", "")
+        h = zlib.crc32(raw.encode("utf-8"))
+        if h % 5 >= 3:
+            return None
+        return 1 + (h >> 8) % 1000 / 100
+
+
+class TestRankingEquivalence(TestCase):
+    """Optimized queries match the same documents, with the same scores."""
+
+    CLASSIFICATIONS = ClassificationList(
+        [
+            Classification(archive={"id": "astro-ph"}),
+            Classification(group={"id": "grp_cs"}),
+        ]
+    )
+
+    def setUp(self):
+        """Generate documents."""
+        self.documents = make_documents(500)
+        self.index = Index(self.documents)
+
+    def assertSameRanking(self, search: Search):
+        """Compare the scores and rankings for a search, before and after."""
+        before = search.to_dict()["query"]
+        optimized = optimize_search(search)
+        after = optimized.to_dict()["query"]
+        self.assertNotEqual(before, after, "Query should be rewritten")
+        self.assertEqual(
+            search.to_dict()["query"], before, "Should not be modified"
+        )
+        ranking = self.index.rank(before)
+        self.assertGreater(len(ranking), 5, "Test needs some matches")
+        self.assertEqual(self.index.rank(after), ranking)
+        self.assertEqual(self.index.scores(after), self.index.scores(before))
+        self.assertEqual(
+            optimize_search(optimized).to_dict()["query"],
+            after,
+            "Should be idempotent",
+        )
+
+    def advanced(self, **params):
+        """Generate an advanced search."""
+        terms = FieldedSearchList(
+            [
+                FieldedSearchTerm(operator="AND", field="title", term="dark"),
+                FieldedSearchTerm(operator="OR", field="all", term="matter"),
+                FieldedSearchTerm(operator="NOT", field="author", term="jo"),
+            ]
+        )
+        query = AdvancedQuery(order="relevance", terms=terms, **params)
+        return advanced_search(Search(), query)
+
+    def test_advanced(self):
+        """Advanced search with classifications and a date range."""
+        search = self.advanced(
+            classification=self.CLASSIFICATIONS,
+            include_cross_list=True,
+            date_range=DateRange(
+                start_date=datetime(2018, 1, 1),
+                end_date=datetime(2020, 1, 1),
+            ),
+        )
+        self.assertSameRanking(search)
+
+    def test_advanced_older_versions(self):
+        """Older versions are boosted less, so scores are multiplied."""
+        search = self.advanced(
+            classification=self.CLASSIFICATIONS,
+            include_cross_list=False,
+            include_older_versions=True,
+            date_range=DateRange(
+                start_date=datetime(2018, 1, 1),
+                end_date=datetime(2020, 1, 1),
+            ),
+        )
+        self.assertSameRanking(search)
+
+    def test_multiplied(self):
+        """Constraints with an IDF, where scores are multiplied."""
+        query = Q(
+            "function_score",
+            query=Q("match", title="dark")
+            & Q("term", **{"primary_classification.archive.id": "astro-ph"})
+            & Q("range", submitted_date={"gte": "2018-01-01"}),
+            functions=[
+                {"filter": Q("term", is_current=True), "weight": 5},
+                {
+                    "filter": Q("term", **{"license.uri": LICENSES[0]}),
+                    "weight": 2,
+                },
+            ],
+        ) | (
+            Q("match", abstract="dark")
+            & Q("term", **{"primary_classification.archive.id": "cs"})
+        )
+        self.assertSameRanking(Search().query(query))
+
+    def test_api(self):
+        """API search with a date range."""
+        query = APIQuery(
+            terms=FieldedSearchList(
+                [
+                    FieldedSearchTerm(operator="AND", field="title", term="a"),
+                    FieldedSearchTerm(operator="OR", field="author", term="b"),
+                    FieldedSearchTerm(operator="AND", field="all", term="c"),
+                ]
+            ),
+            date_range=DateRange(
+                start_date=datetime(2017, 6, 1),
+                end_date=datetime(2021, 1, 1),
+                date_type=DateRange.SUBMITTED_ORIGINAL,
+            ),
+        )
+        self.assertSameRanking(api_search(Search(), query))
+
+    def test_classic(self):
+        """Classic API search, with an ID list."""
+        query = ClassicAPIQuery(
+            search_query="ti:dark AND (au:smith OR co:matter) ANDNOT ti:x",
+            id_list=[doc["paper_id"] for doc in self.documents[::2]],
+        )
+        self.assertSameRanking(classic_search(Search(), query))
+
+    def test_simple(self):
+        """Simple search, with a classification."""
+        query = SimpleQuery(
+            search_field="all",
+            value="dark matter 2019",
+            classification=self.CLASSIFICATIONS,
+            include_cross_list=True,
+        )
+        self.assertSameRanking(simple_search(Search(), query))
+
+
+class TestOptimize(TestCase):
+    """Tests for :func:`.optimize`."""
+
+    def test_leaf(self):
+        """Leaf queries are returned as they are."""
+        query = Q("match", title="foo")
+        self.assertIs(optimize(query), query)
+
+    def test_unchanged(self):
+        """A query with nothing to rewrite is returned as it is."""
+        query = Q("match", title="foo") | Q("match", abstract="foo")
+        self.assertIs(optimize(query), query)
+
+    def test_flatten_must(self):
+        """The must clauses of a must clause are lifted."""
+        a, b, c = [Q("match", title=t) for t in "abc"]
+        query = Q("bool", must=[a, Q("bool", must=[b, Q("bool", must=[c])])])
+        self.assertEqual(optimize(query), Q("bool", must=[a, b, c]))
+
+    def test_flatten_should(self):
+        """The alternatives of an alternative are lifted."""
+        a, b, c = [Q("match", title=t) for t in "abc"]
+        query = Q("bool", should=[a, Q("bool", should=[b, c])])
+        self.assertEqual(optimize(query), Q("bool", should=[a, b, c]))
+
+    def test_should_not_lifted_into_conjunction(self):
+        """A bool with only must_not clauses is not lifted beside should."""
+        a, b, c = [Q("match", title=t) for t in "abc"]
+        query = Q("bool", must=[Q("bool", must_not=[a])], should=[b, c])
+        self.assertIs(optimize(query), query)
+
+    def test_filter_fields(self):
+        """Constraints on filter fields that score 1 get a constant score."""
+        title = Q("match", title="foo")
+        submitted = Q("range", submitted_date={"gte": "2019"})
+        archive = Q("terms", **{"primary_classification.archive.id": ["cs"]})
+        query = Q("bool", must=[title, submitted, archive])
+        self.assertEqual(
+            optimize(query),
+            Q(
+                "bool",
+                must=[
+                    title,
+                    Q("constant_score", filter=submitted),
+                    Q("constant_score", filter=archive),
+                ],
+            ),
+        )
+
+    def test_term_filter_field(self):
+        """A term scores by its IDF, so it is not moved."""
+        title = Q("match", title="foo")
+        current = Q("term", is_current=True)
+        query = Q("bool", must=[title, current], filter=[current])
+        self.assertIs(optimize(query), query)
+
+    def test_boosted_filter_field(self):
+        """A boosted constraint does not score 1, so it is not moved."""
+        title = Q("match", title="foo")
+        submitted = Q("range", submitted_date={"gte": "2019", "boost": 2})
+        query = Q("bool", must=[title, submitted])
+        self.assertIs(optimize(query), query)
+
+    def test_dedupe_must_not(self):
+        """Duplicate must_not clauses are removed."""
+        title = Q("match", title="foo")
+        query = title & ~Q("match", abstract="x") & ~Q("match", abstract="x")
+        self.assertEqual(
+            optimize(query).to_dict(),
+            {
+                "bool": {
+                    "must": [{"match": {"title": "foo"}}],
+                    "must_not": [{"match": {"abstract": "x"}}],
+                }
+            },
+        )
+
+    def test_merge_terms(self):
+        """Excluded terms on the same field are merged."""
+        title = Q("match", title="foo")
+        query = Q(
+            "bool",
+            must=[title],
+            must_not=[
+                Q("term", paper_id="1"),
+                Q("term", license="x"),
+                Q("terms", paper_id=["2", "3"]),
+            ],
+        )
+        self.assertEqual(
+            optimize(query).to_dict()["bool"]["must_not"],
+            [
+                {"terms": {"paper_id": ["1", "2", "3"]}},
+                {"term": {"license": "x"}},
+            ],
+        )
+
+    def test_alternatives_in_filter_context(self):
+        """Alternatives in filter context are a filter."""
+        title = Q("match", title="foo")
+        alternatives = [
+            Q("match", **{"primary_classification.archive.id": "cs"}),
+            Q("match", **{"primary_classification.group.id": "grp_q"}),
+        ]
+        query = Q(
+            "bool",
+            must=[title],
+            filter=[
+                Q("bool", should=alternatives, minimum_should_match=1),
+            ],
+        )
+        self.assertEqual(
+            optimize(query),
+            Q("bool", must=[title], filter=[Q("bool", should=alternatives)]),
+        )
+
+    def test_alternative_classifications(self):
+        """Alternatives in scoring context stay where they are."""
+        title = Q("match", title="foo")
+        query = Q(
+            "bool",
+            must=[title],
+            should=[
+                Q("match", **{"primary_classification.archive.id": "cs"}),
+                Q("match", **{"primary_classification.group.id": "grp_q"}),
+            ],
+            minimum_should_match=1,
+        )
+        self.assertIs(optimize(query), query)
+
+    def test_single_alternative(self):
+        """A single alternative in scoring context still scores."""
+        title = Q("match", title="foo")
+        archive = Q("match", **{"primary_classification.archive.id": "cs"})
+        query = Q(
+            "bool", must=[title], should=[archive], minimum_should_match=1
+        )
+        self.assertIs(optimize(query), query)
+
+    def test_scoring_alternatives(self):
+        """Alternatives that affect the ranking stay where they are."""
+        title = Q("match", title="foo")
+        query = Q(
+            "bool",
+            must=[title],
+            should=[Q("match", abstract="a"), Q("match", comments="b")],
+            minimum_should_match=1,
+        )
+        self.assertIs(optimize(query), query)
+
+    def test_multiplied(self):
+        """Where scores are multiplied, they are still the same."""
+        title = Q("match", title="foo")
+        current = Q("term", is_current=True)
+        archive = Q("term", **{"primary_classification.archive.id": "cs"})
+        submitted = Q("range", submitted_date={"gte": "2019"})
+        query = Q(
+            "function_score",
+            query=title & archive & submitted,
+            functions=[{"filter": current, "weight": 5}],
+        )
+        self.assertEqual(
+            optimize(query).query,
+            Q(
+                "bool",
+                must=[title, archive, Q("constant_score", filter=submitted)],
+            ),
+        )
+
+    def test_multiplied_alternatives(self):
+        """Where scores are multiplied, alternatives stay where they are."""
+        title = Q("match", title="foo")
+        current = Q("term", is_current=True)
+        query = Q(
+            "function_score",
+            query=Q(
+                "bool",
+                must=[title],
+                should=[
+                    Q("terms", **{"primary_classification.archive.id": ["a"]}),
+                    Q("terms", **{"primary_classification.archive.id": ["b"]}),
+                ],
+                minimum_should_match=1,
+            ),
+            functions=[{"filter": current, "weight": 5}],
+        )
+        self.assertIs(optimize(query), query)
+
+    def test_not_modified(self):
+        """The original query is not modified."""
+        title = Q("match", title="foo")
+        current = Q("term", is_current=True)
+        inner = Q("bool", must=[title, current])
+        query = Q("bool", must=[inner], filter=[current])
+        expected = query.to_dict()
+        optimize(query)
+        self.assertEqual(query.to_dict(), expected)
+        self.assertEqual(
+            inner.to_dict(),
+            {
+                "bool": {
+                    "must": [
+                        {"match": {"title": "foo"}},
+                        {"term": {"is_current": True}},
+                    ]
+                }
+            },
+        )
@@ -0,0 +1,245 @@
+"""Tests for deep pagination in :mod:`search.services.index`."""
+
+from unittest import TestCase, mock
+
+from search.domain import (
+    APIQuery,
+    ClassicAPIQuery,
+    SimpleQuery,
+    SortBy,
+    SortOrder,
+)
+from search.services import index
+from search.services.index import pagination, util
+
+
+def _hit(i, source=True):
+    hit = {"sort": [100000 - i, f"{i}v1"]}
+    if source:
+        hit.update(
+            {
+                "_index": "arxiv",
+                "_type": "document",
+                "_id": f"{i}v1",
+                "_score": None,
+                "_source": {"paper_id": str(i), "paper_id_v": f"{i}v1"},
+            }
+        )
+    return hit
+
+
+def _response(start, n, total=30000, source=True):
+    return {
+        "hits": {
+            "total": total,
+            "max_score": None,
+            "hits": [_hit(i, source) for i in range(start, start + n)],
+        }
+    }
+
+
+class TestWithTiebreaker(TestCase):
+    """Tests for :func:`.util.with_tiebreaker`."""
+
+    def test_default_order(self):
+        """``_doc`` is replaced by the paper ID."""
+        self.assertEqual(
+            util.with_tiebreaker(
+                [
+                    {"announced_date_first": {"order": "desc"}},
+                    {"_doc": {"order": "asc"}},
+                ]
+            ),
+            [{"announced_date_first": {"order": "desc"}}, util.TIEBREAKER],
+        )
+
+    def test_already_stable(self):
+        """A sort that already ends with the paper ID is left alone."""
+        self.assertEqual(
+            util.with_tiebreaker(["submitted_date", "-paper_id_v"]),
+            ["submitted_date", "-paper_id_v"],
+        )
+
+
+class TestCursorCache(TestCase):
+    """Tests for :class:`.pagination.CursorCache`."""
+
+    def test_nearest(self):
+        """The closest cursor at or before the offset is returned."""
+        cache = pagination.CursorCache()
+        self.assertEqual(cache.nearest("foo", 100), (0, None))
+        cache.put("foo", 10, [1])
+        cache.put("foo", 50, [2])
+        cache.put("foo", 200, [3])
+        self.assertEqual(cache.nearest("foo", 100), (50, [2]))
+        self.assertEqual(cache.nearest("foo", 9), (0, None))
+        self.assertEqual(cache.nearest("bar", 100), (0, None))
+
+    def test_bounded(self):
+        """The least recently used searches and cursors are discarded."""
+        cache = pagination.CursorCache(max_searches=2, per_search=2)
+        for offset in (10, 20, 30):
+            cache.put("foo", offset, [offset])
+        self.assertEqual(cache.nearest("foo", 15), (0, None))
+        cache.put("bar", 10, [10])
+        cache.nearest("foo", 30)
+        cache.put("baz", 10, [10])
+        self.assertEqual(cache.nearest("bar", 10), (0, None))
+        self.assertEqual(cache.nearest("foo", 30), (30, [30]))
+        self.assertEqual(cache.stats(), {"searches": 2, "cursors": 3})
+
+
+@mock.patch("search.services.index.Elasticsearch")
+class TestDeepPagination(TestCase):
+    """Pages beyond :const:`.MAX_RESULTS` are retrieved with search_after."""
+
+    def setUp(self):
+        """Use a fresh cursor cache for each test."""
+        patcher = mock.patch.object(
+            pagination, "CURSORS", pagination.CursorCache()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.query = ClassicAPIQuery(
+            search_query="au:copernicus",
+            order=SortOrder(by=SortBy.submitted_date),
+            page_start=25000,
+            size=10,
+        )
+
+    def test_search_after(self, mock_Elasticsearch):
+        """The client provides the sort values of the previous result."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.search.return_value = _response(25000, 10)
+        query = APIQuery(page_start=25000, size=10, search_after=[1, "a"])
+
+        document_set = index.SearchSession.search(query, highlight=False)
+
+        self.assertEqual(mock_es.search.call_count, 1)
+        _, kwargs = mock_es.search.call_args
+        self.assertEqual(kwargs["body"]["search_after"], [1, "a"])
+        self.assertEqual(kwargs["body"]["from"], 0)
+        self.assertEqual(kwargs["body"]["size"], 10)
+        self.assertEqual(kwargs["body"]["sort"][-1], util.TIEBREAKER)
+        self.assertEqual(document_set["metadata"]["start"], 25000)
+        self.assertEqual(
+            document_set["metadata"]["search_after"],
+            [100000 - 25009, "25009v1"],
+        )
+
+    def test_seek(self, mock_Elasticsearch):
+        """The classic API requests a page by offset."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.search.side_effect = [
+            _response(0, 10000, source=False),
+            _response(10000, 10000, source=False),
+            _response(20000, 5000, source=False),
+            _response(25000, 10),
+        ]
+
+        document_set = index.SearchSession.search(self.query)
+
+        self.assertEqual(len(document_set["results"]), 10)
+        self.assertEqual(document_set["results"][0]["paper_id"], "25000")
+        self.assertEqual(mock_es.search.call_count, 4)
+        bodies = [kw["body"] for _, kw in mock_es.search.call_args_list]
+        self.assertNotIn("search_after", bodies[0])
+        self.assertEqual([b["size"] for b in bodies], [10000, 10000, 5000, 10])
+        for body in bodies[:3]:
+            self.assertIs(body["_source"], False)
+            self.assertNotIn("highlight", body)
+        self.assertEqual(bodies[1]["search_after"], _hit(9999)["sort"])
+        self.assertEqual(bodies[2]["search_after"], _hit(19999)["sort"])
+        self.assertEqual(bodies[3]["search_after"], _hit(24999)["sort"])
+
+    def test_next_page(self, mock_Elasticsearch):
+        """The next page starts from where the previous page ended."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.search.side_effect = [
+            _response(0, 10000, source=False),
+            _response(10000, 10000, source=False),
+            _response(20000, 5000, source=False),
+            _response(25000, 10),
+            _response(25010, 10),
+        ]
+        index.SearchSession.search(self.query)
+        self.query.page_start = 25010
+
+        document_set = index.SearchSession.search(self.query)
+
+        self.assertEqual(mock_es.search.call_count, 5)
+        _, kwargs = mock_es.search.call_args
+        self.assertEqual(kwargs["body"]["search_after"], _hit(25009)["sort"])
+        self.assertEqual(document_set["results"][0]["paper_id"], "25010")
+
+    def test_next_page_new_generation(self, mock_Elasticsearch):
+        """Cursors from before documents were added are not used."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.indices.get_mapping.side_effect = [
+            {"arxiv": {"mappings": {"document": {"_meta": {"generation": g}}}}}
+            for g in (1, 2)
+        ]
+        mock_es.search.side_effect = [
+            _response(0, 10000, source=False),
+            _response(10000, 10000, source=False),
+            _response(20000, 5000, source=False),
+            _response(25000, 10),
+            _response(0, 10000, source=False),
+            _response(10000, 10000, source=False),
+            _response(20000, 5010, source=False),
+            _response(25010, 10),
+        ]
+        index.SearchSession.search(self.query)
+        self.query.page_start = 25010
+
+        document_set = index.SearchSession.search(self.query)
+
+        self.assertEqual(mock_es.search.call_count, 8, "Sought afresh")
+        bodies = [kw["body"] for _, kw in mock_es.search.call_args_list]
+        self.assertNotIn("search_after", bodies[4])
+        self.assertEqual(document_set["results"][0]["paper_id"], "25010")
+
+    def test_seek_past_the_end(self, mock_Elasticsearch):
+        """There are fewer results than the requested offset."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.search.side_effect = [
+            _response(0, 3, total=3, source=False),
+            _response(3, 0, total=3),
+        ]
+
+        document_set = index.SearchSession.search(self.query)
+
+        self.assertEqual(mock_es.search.call_count, 2)
+        _, kwargs = mock_es.search.call_args
+        self.assertEqual(kwargs["body"]["search_after"], _hit(2)["sort"])
+        self.assertEqual(document_set["results"], [])
+        self.assertEqual(document_set["metadata"]["total_results"], 3)
+
+    def test_seek_too_deep(self, mock_Elasticsearch):
+        """Seeking is limited; deeper pages need ``search_after``."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        session = index.SearchSession(
+            "foohost", "arxiv", max_seek_offset=20000
+        )
+        with self.assertRaises(index.OutsideAllowedRange):
+            session.search(self.query)
+        mock_es.search.assert_not_called()
+
+        mock_es.search.return_value = _response(25000, 10)
+        self.query.search_after = [1, "a"]
+        session.search(self.query)
+        self.assertEqual(mock_es.search.call_count, 1)
+
+    def test_ui_query(self, mock_Elasticsearch):
+        """Deep pagination is not supported for the search UI."""
+        query = SimpleQuery(
+            search_field="all", value="foo", page_start=25000, size=10
+        )
+        with self.assertRaises(index.OutsideAllowedRange):
+            index.SearchSession.search(query)
@@ -94,3 +94,156 @@ class TestTaskStatus(TestCase):
             task_id,
             "Should call the task status endpoint with task ID",
         )
+
+
+class TestBulkLoadMode(TestCase):
+    """Tests for :func:`.index.SearchSession.bulk_load_mode`."""
+
+    def setUp(self):
+        """Mock the ES client."""
+        self.mock_es = mock.MagicMock()
+        self.mock_es.indices.get_settings.return_value = {
+            "bazindex": {
+                "settings": {
+                    "index": {"number_of_replicas": "2", "number_of_shards": 5}
+                }
+            }
+        }
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_bulk_load_mode(self, mock_Elasticsearch):
+        """Refresh and replicas are turned off, then restored."""
+        mock_Elasticsearch.return_value = self.mock_es
+        with index.SearchSession.bulk_load_mode(
+            "bazindex", force_merge=True, wait_for_green=True
+        ):
+            self.assertEqual(self.mock_es.indices.put_settings.call_count, 1)
+            args, kwargs = self.mock_es.indices.put_settings.call_args
+            self.assertEqual(
+                args[0],
+                {"index": {"refresh_interval": "-1", "number_of_replicas": 0}},
+            )
+            self.assertEqual(kwargs["index"], "bazindex")
+            self.mock_es.indices.forcemerge.assert_not_called()
+
+        args, _ = self.mock_es.indices.put_settings.call_args
+        self.assertEqual(
+            args[0],
+            {"index": {"refresh_interval": None, "number_of_replicas": "2"}},
+        )
+        self.mock_es.indices.refresh.assert_called_once_with(index="bazindex")
+        self.mock_es.indices.forcemerge.assert_called_once()
+        _, kwargs = self.mock_es.cluster.health.call_args
+        self.assertEqual(kwargs["wait_for_status"], "green")
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_restored_after_error(self, mock_Elasticsearch):
+        """Settings are restored even if loading fails."""
+        mock_Elasticsearch.return_value = self.mock_es
+        with self.assertRaises(RuntimeError):
+            with index.SearchSession.bulk_load_mode(
+                "bazindex", force_merge=True
+            ):
+                raise RuntimeError("Oops")
+
+        self.assertEqual(self.mock_es.indices.put_settings.call_count, 2)
+        args, _ = self.mock_es.indices.put_settings.call_args
+        self.assertEqual(args[0]["index"]["number_of_replicas"], "2")
+        self.mock_es.indices.forcemerge.assert_not_called()
+        self.mock_es.cluster.health.assert_not_called()
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_existing_index(self, mock_Elasticsearch):
+        """An existing index is tuned, not created."""
+        mock_Elasticsearch.return_value = self.mock_es
+        self.mock_es.indices.exists.return_value = True
+        self.mock_es.indices.create.side_effect = raise_index_exists
+        with index.SearchSession.bulk_load_mode("bazindex"):
+            self.assertEqual(self.mock_es.indices.put_settings.call_count, 1)
+
+        self.mock_es.indices.create.assert_not_called()
+        self.assertEqual(self.mock_es.indices.put_settings.call_count, 2)
+        args, kwargs = self.mock_es.indices.put_settings.call_args
+        self.assertEqual(args[0]["index"]["number_of_replicas"], "2")
+        self.assertEqual(kwargs["index"], "bazindex")
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_missing_index(self, mock_Elasticsearch):
+        """An index that does not exist is created first."""
+        mock_Elasticsearch.return_value = self.mock_es
+        self.mock_es.indices.exists.return_value = False
+        with index.SearchSession.bulk_load_mode("bazindex"):
+            pass
+
+        self.assertEqual(self.mock_es.indices.create.call_count, 1)
+        self.assertEqual(
+            self.mock_es.indices.create.call_args[0][0], "bazindex"
+        )
+        self.assertEqual(self.mock_es.indices.put_settings.call_count, 2)
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_alias(self, mock_Elasticsearch):
+        """The settings of each index behind an alias are restored."""
+        mock_Elasticsearch.return_value = self.mock_es
+        self.mock_es.indices.exists.return_value = True
+        self.mock_es.indices.get_settings.return_value = {
+            "bazindex-1": {"settings": {"index": {"number_of_replicas": "2"}}},
+            "bazindex-2": {
+                "settings": {
+                    "index": {
+                        "number_of_replicas": "1",
+                        "refresh_interval": "30s",
+                    }
+                }
+            },
+        }
+        with index.SearchSession.bulk_load_mode("bazalias"):
+            pass
+
+        restored = {
+            kwargs["index"]: args[0]["index"]
+            for args, kwargs in (
+                self.mock_es.indices.put_settings.call_args_list[2:]
+            )
+        }
+        self.assertEqual(
+            restored,
+            {
+                "bazindex-1": {
+                    "refresh_interval": None,
+                    "number_of_replicas": "2",
+                },
+                "bazindex-2": {
+                    "refresh_interval": "30s",
+                    "number_of_replicas": "1",
+                },
+            },
+        )
+
+
+class TestReindexTask(TestCase):
+    """A reindex task is sliced, and can be rethrottled or cancelled."""
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_sliced(self, mock_Elasticsearch):
+        """The reindex task is sliced automatically by default."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        index.SearchSession.reindex(
+            "barindex", "bazindex", requests_per_second=500
+        )
+        _, kwargs = mock_es.reindex.call_args
+        self.assertEqual(kwargs["slices"], "auto")
+        self.assertEqual(kwargs["requests_per_second"], 500)
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_rethrottle_and_cancel(self, mock_Elasticsearch):
+        """A running task is rethrottled or cancelled by ID."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        index.SearchSession.rethrottle("node:1", -1)
+        mock_es.reindex_rethrottle.assert_called_once_with(
+            task_id="node:1", requests_per_second=-1
+        )
+        index.SearchSession.cancel_task("node:1")
+        mock_es.tasks.cancel.assert_called_once_with(task_id="node:1")
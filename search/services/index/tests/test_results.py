@@ -1,7 +1,14 @@
 """Tests for :mod:`search.services.index`."""
 
+import copy
+import pickle
 from unittest import TestCase
-from search.services.index import highlighting
+
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Hit, Response
+
+from search.domain import SimpleQuery
+from search.services.index import highlighting, results
 
 
 class TestResultsHighlightAbstract(TestCase):
@@ -101,3 +108,144 @@ class TestResultsEndSafely(TestCase):
             self.value, 275, start_tag=self.start_tag, end_tag=self.end_tag
         )
         self.assertEqual(end, 275, "Should end after the closing tag.")
+
+
+TAG = highlighting.HIGHLIGHT_TAG_OPEN
+END = highlighting.HIGHLIGHT_TAG_CLOSE
+
+
+def raw_response():
+    """Generate a raw response from ES, with hits of every kind we expect."""
+    abstract = "We study $\\lambda < 1$ for " + "dark matter & more " * 30
+    return {
+        "took": 3,
+        "hits": {
+            "total": 1234,
+            "max_score": 2.5,
+            "hits": [
+                {
+                    "_index": "arxiv",
+                    "_type": "document",
+                    "_id": "1234.56789v2",
+                    "_score": 2.5,
+                    "_source": {
+                        "paper_id": "1234.56789",
+                        "paper_id_v": "1234.56789v2",
+                        "title": "Dark matter & $\\lambda$",
+                        "abstract": abstract,
+                        "announced_date_first": "2019-01",
+                        "submitted_date": "2019-01-02T03:04:05-0500",
+                        "submitted_date_first": "not a date",
+                        "acm_class": ["F.2.2", "I.2.7"],
+                        "msc_class": [],
+                        "authors": [{"full_name": "N. Ame"}],
+                    },
+                    "highlight": {
+                        "title": [f"{TAG}Dark{END} matter & $\\lambda$"],
+                        "title.english": [f"{TAG}Dark{END} matter"],
+                        "abstract.tex": [
+                            f"$\\lam{TAG}bda{END} < 1$ for <dark>",
+                            f"{TAG}dark{END} matter",
+                        ],
+                        "authors.full_name": [f"N. {TAG}Ame{END}"],
+                        "submitter.name": [f"{TAG}Ame{END}"],
+                        "comments": [f"{TAG}12{END} pages"],
+                    },
+                    "matched_queries": ["announced_date_first", "doi"],
+                    "inner_hits": {
+                        "secondary_classification": {
+                            "hits": {
+                                "total": 2,
+                                "max_score": 1.0,
+                                "hits": [
+                                    {
+                                        "_nested": {"offset": i},
+                                        "_score": 1.0,
+                                        "_source": {
+                                            "category": {
+                                                "id": category,
+                                                "name": category,
+                                            }
+                                        },
+                                    }
+                                    for i, category in enumerate(
+                                        ["hep-th", "astro-ph.CO"]
+                                    )
+                                ],
+                            }
+                        }
+                    },
+                    "sort": [2.5, "1234.56789v2"],
+                },
+                {
+                    "_index": "arxiv",
+                    "_type": "document",
+                    "_id": "1234.56790v1",
+                    "_score": None,
+                    "_source": {
+                        "paper_id": "1234.56790",
+                        "paper_id_v": "1234.56790v1",
+                        "title": "Nothing & nothing",
+                    },
+                    "fields": {"version": [1]},
+                    "inner_hits": {
+                        "secondary_classification": {
+                            "hits": {"total": 0, "hits": []}
+                        }
+                    },
+                    "sort": [None, "1234.56790v1"],
+                },
+            ],
+        },
+    }
+
+
+class TestRawResults(TestCase):
+    """Raw responses are transformed just as :class:`.Response` is."""
+
+    def assertSame(self, raw, wrapped):
+        """Results are equal, and pickle to the same bytes."""
+        self.assertEqual(raw, wrapped)
+        self.assertEqual(pickle.dumps(raw), pickle.dumps(wrapped))
+
+    def test_documentset(self):
+        """A raw response is transformed to the same :class:`.DocumentSet`."""
+        query = SimpleQuery(search_field="all", value="dark", size=25)
+        for highlight in (True, False):
+            with self.subTest(highlight=highlight):
+                response = raw_response()
+                self.assertSame(
+                    results.raw_to_documentset(query, response, highlight),
+                    results.to_documentset(
+                        query,
+                        Response(Search(), copy.deepcopy(response)),
+                        highlight,
+                    ),
+                )
+                self.assertEqual(response, raw_response(), "Not modified")
+
+    def test_document(self):
+        """A document from the index is transformed to the same result."""
+        record = {
+            "_index": "arxiv",
+            "_type": "document",
+            "_id": "1234.56789",
+            "_version": 1,
+            "found": True,
+            "_source": raw_response()["hits"]["hits"][0]["_source"],
+        }
+        self.assertSame(
+            results.raw_to_document(record, highlight=False),
+            results.to_document(Hit(copy.deepcopy(record)), highlight=False),
+        )
+
+    def test_empty(self):
+        """A response without hits."""
+        query = SimpleQuery(search_field="all", value="dark")
+        response = {"hits": {"total": 0, "max_score": None, "hits": []}}
+        self.assertSame(
+            results.raw_to_documentset(query, response),
+            results.to_documentset(
+                query, Response(Search(), copy.deepcopy(response))
+            ),
+        )
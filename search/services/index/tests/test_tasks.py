@@ -0,0 +1,70 @@
+"""Tests for :mod:`search.services.index.tasks`."""
+
+from unittest import TestCase, mock
+
+from search.services.index import IndexConnectionError
+from search.services.index.tasks import TaskProgress, watch
+
+
+def _status(created, total=1000, seconds=10.0, completed=False):
+    return {
+        "completed": completed,
+        "task": {
+            "status": {
+                "total": total,
+                "created": created,
+                "updated": 0,
+                "deleted": 0,
+                "version_conflicts": 0,
+                "requests_per_second": -1.0,
+            },
+            "running_time_in_nanos": int(seconds * 1e9),
+        },
+    }
+
+
+class TestTaskProgress(TestCase):
+    """Progress is parsed from the tasks API."""
+
+    def test_rate_and_eta(self):
+        """Documents per second and time remaining are estimated."""
+        progress = TaskProgress.from_status("a:1", _status(250))
+        self.assertEqual(progress.done, 250)
+        self.assertEqual(progress.fraction, 0.25)
+        self.assertEqual(progress.rate, 25.0)
+        self.assertEqual(progress.eta, 30.0)
+
+    def test_not_started(self):
+        """The ETA is unknown until some documents are processed."""
+        progress = TaskProgress.from_status("a:1", _status(0, seconds=0))
+        self.assertEqual(progress.rate, 0.0)
+        self.assertIsNone(progress.eta)
+
+    def test_failures(self):
+        """Failures are counted when the task completes."""
+        status = _status(1000, completed=True)
+        status["response"] = {"failures": [{"id": "1"}, {"id": "2"}]}
+        progress = TaskProgress.from_status("a:1", status)
+        self.assertEqual(progress.failures, 2)
+        self.assertEqual(progress.eta, 0.0)
+
+
+class TestWatch(TestCase):
+    """A task is polled at an interval until it completes."""
+
+    @mock.patch("search.services.index.tasks.time")
+    def test_watch(self, mock_time):
+        """Transient errors are retried, and polling stops when done."""
+        get_status = mock.MagicMock(
+            side_effect=[
+                _status(100),
+                IndexConnectionError("nope"),
+                _status(1000, completed=True),
+            ]
+        )
+        progress = list(watch("a:1", get_status, interval=5))
+        self.assertEqual([p.done for p in progress], [100, 1000])
+        self.assertEqual(get_status.call_count, 3)
+        self.assertEqual(
+            mock_time.sleep.call_args_list, [mock.call(5), mock.call(5)]
+        )
@@ -0,0 +1,305 @@
+"""Tests for :mod:`search.services.index.templates`."""
+
+import re
+import json
+from unittest import TestCase, mock
+
+from elasticsearch import NotFoundError, TransportError
+from elasticsearch_dsl import Search
+
+from search.domain import (
+    AdvancedQuery,
+    Classification,
+    ClassificationList,
+    SimpleQuery,
+)
+from search.services import index
+from search.services.index import highlighting, templates
+from search.services.index.authors import STOP
+from search.services.index.classic_api.classic_search import (
+    current_versions,
+)
+from search.services.index.optimize import optimize_search
+from search.services.index.simple import simple_search
+
+WORDS = [
+    "dark",
+    "Matter",
+    "AND",
+    "Or",
+    "not",
+    "x",
+    "I",
+    "to",
+    "And",
+    "OF",
+    "of",
+    "schrodinger",
+    "TeX",
+    "SMITH",
+    "mcDonald",
+]
+
+
+def render(source, params):
+    """Render a template as ES would (only what our templates use)."""
+
+    def section(match):
+        return match.group(2) if params.get(match.group(1)) else ""
+
+    source = re.sub(r"{{#(\w+)}}(.*?){{/\1}}", _to_json(params), source)
+    source = re.sub(r"{{#(\w+)}}(.*?){{/\1}}", section, source, flags=re.S)
+    return json.loads(
+        re.sub(
+            r"{{(\w+)}}",
+            lambda m: json.dumps(params[m.group(1)]).strip('"'),
+            source,
+        )
+    )
+
+
+def _to_json(params):
+    def to_json(match):
+        if match.group(1) != "toJson":
+            return match.group(0)
+        return json.dumps(params[match.group(2)])
+
+    return to_json
+
+
+def build(query, highlight):
+    """Build the body for a simple search, as :class:`.SearchSession` does."""
+    search = optimize_search(simple_search(Search(), query))
+    if highlight:
+        search = highlighting.highlight(search)
+    return search[query.page_start : query.page_end].to_dict()
+
+
+class TestTemplates(TestCase):
+    """Templates render to the bodies built by the query builders."""
+
+    def test_simple(self):
+        """Each simple search template, for plain words."""
+        for field in templates.FIELDS:
+            for n in range(1, templates.MAX_WORDS + 1):
+                for i in range(len(WORDS)):
+                    value = " ".join(WORDS[i : i + n])
+                    for highlight in (True, False):
+                        query = SimpleQuery(
+                            search_field=field,
+                            value=value,
+                            page_start=i * 25,
+                            size=25,
+                            order=["", "-announced_date_first"][i % 2],
+                        )
+                        fitted = templates.fit(query, highlight)
+                        if any(w in STOP for w in value.split(" ")):
+                            self.assertIsNone(fitted)
+                            continue
+                        with self.subTest(field=field, value=value):
+                            self.assertIsNotNone(fitted)
+                            self.assertEqual(
+                                render(self.source(fitted[0]), fitted[1]),
+                                build(query, highlight),
+                            )
+
+    def test_current_versions(self):
+        """The template for the current versions of some papers."""
+        paper_ids = ["1234.56789", 'hep-th/9901001"']
+        template_id, params = templates.fit_current_versions(paper_ids)
+        self.assertEqual(
+            render(self.source(template_id), params),
+            current_versions(Search(), paper_ids)[:2].to_dict(),
+        )
+
+    def test_no_fit(self):
+        """Anything unusual is built by the query builders."""
+        for value in [
+            "dark matter 2019",
+            "dark*",
+            '"dark matter"',
+            "$\\lambda$",
+            "dark and matter",
+            "dark  matter",
+            " dark",
+            "smith, j",
+            "one two three four",
+            "",
+        ]:
+            with self.subTest(value=value):
+                query = SimpleQuery(search_field="all", value=value)
+                self.assertIsNone(templates.fit(query, True))
+        query = SimpleQuery(search_field="abstract", value="dark")
+        self.assertIsNone(templates.fit(query, True))
+        query = SimpleQuery(
+            search_field="all",
+            value="dark",
+            classification=ClassificationList(
+                [Classification(archive={"id": "astro-ph"})]
+            ),
+        )
+        self.assertIsNone(templates.fit(query, True))
+        self.assertIsNone(templates.fit(AdvancedQuery(), True))
+
+    def test_ids(self):
+        """Template IDs change with their source."""
+        ids = [i for i, _ in templates.get_templates().values()]
+        self.assertEqual(len(set(ids)), len(ids))
+        for name, (template_id, source) in templates.get_templates().items():
+            self.assertTrue(template_id.startswith(f"search-{name}-"))
+
+    def source(self, template_id):
+        """Get the source of a template by its ID."""
+        for i, source in templates.get_templates().values():
+            if i == template_id:
+                return source
+        self.fail(f"No template {template_id}")
+
+
+def mock_response(paper_id="1234.56789"):
+    """Generate a raw response with one hit."""
+    return {
+        "took": 1,
+        "hits": {
+            "total": 1,
+            "max_score": 1.0,
+            "hits": [
+                {
+                    "_id": paper_id + "v1",
+                    "_score": 1.0,
+                    "_source": {
+                        "paper_id": paper_id,
+                        "paper_id_v": paper_id + "v1",
+                        "title": "Dark matter",
+                    },
+                    "highlight": {"title": ["<span>Dark</span> matter"]},
+                }
+            ],
+        },
+    }
+
+
+class TestSearchWithTemplates(TestCase):
+    """:class:`.SearchSession` sends common searches as templates."""
+
+    def setUp(self):
+        """Forget about earlier registrations."""
+        templates._registered.clear()
+        templates._failed.clear()
+        self.session = index.SearchSession(
+            "localhost", "arxiv", search_templates=True
+        )
+        self.es = mock.MagicMock()
+        self.session.new_connection = mock.MagicMock(return_value=self.es)
+
+    def test_search(self):
+        """A simple search is sent as a template."""
+        self.es.search_template.return_value = mock_response()
+        query = SimpleQuery(search_field="title", value="dark matter")
+
+        document_set = self.session.search(query, use_cache=False)
+        self.session.search(query, use_cache=False)
+
+        self.assertEqual(len(document_set["results"]), 1)
+        self.assertEqual(document_set["metadata"]["total_results"], 1)
+        self.assertEqual(document_set["results"][0]["paper_id"], "1234.56789")
+        self.assertEqual(
+            self.es.put_script.call_count,
+            len(templates.get_templates()),
+            "Templates are registered once",
+        )
+        _, kwargs = self.es.search_template.call_args
+        template_id, params = templates.fit(query, True)
+        self.assertEqual(kwargs["body"], {"id": template_id, "params": params})
+        self.assertEqual(self.es.search.call_count, 0)
+
+    def test_missing_template(self):
+        """If a template has gone missing, the search is built as usual."""
+        self.es.search_template.side_effect = NotFoundError(
+            404, "resource_not_found_exception", {}
+        )
+        self.es.search.return_value = {"hits": {"total": 0, "hits": []}}
+
+        query = SimpleQuery(search_field="title", value="dark matter")
+        self.session.search(query, use_cache=False)
+
+        self.assertEqual(self.es.search.call_count, 1)
+        _, kwargs = self.es.search.call_args
+        self.assertEqual(kwargs["body"], build(query, True))
+        self.assertNotIn("localhost:9200", templates._registered)
+
+    def test_not_registered(self):
+        """If the templates cannot be registered, they are not used."""
+        self.es.put_script.side_effect = TransportError(500, "oops", {})
+        self.es.search.return_value = {"hits": {"hits": []}}
+
+        self.session.get_current_versions(["1234.56789"])
+        self.session.get_current_versions(["1234.56789"])
+
+        self.assertEqual(self.es.search_template.call_count, 0)
+        self.assertEqual(self.es.search.call_count, 2)
+        self.assertEqual(
+            self.es.put_script.call_count, 1, "Not retried right away"
+        )
+
+    def test_current_versions(self):
+        """The current versions of papers are found with a template."""
+        self.es.search_template.return_value = {
+            "hits": {
+                "hits": [
+                    {
+                        "_source": {
+                            "paper_id": "1234.56789",
+                            "paper_id_v": "1234.56789v2",
+                        }
+                    }
+                ]
+            }
+        }
+        self.assertEqual(
+            self.session.get_current_versions(["1234.56789"]),
+            {"1234.56789": "1234.56789v2"},
+        )
+        _, kwargs = self.es.search_template.call_args
+        self.assertEqual(
+            kwargs["body"]["params"],
+            {"paper_ids": ["1234.56789"], "size": 1},
+        )
+        self.assertEqual(kwargs["filter_path"], ["hits.hits._source"])
+
+    @mock.patch.object(index, "MAX_RESULTS", 2)
+    def test_current_versions_chunked(self):
+        """No more than :const:`.MAX_RESULTS` papers are looked up at once."""
+        self.es.search_template.return_value = {"hits": {"hits": []}}
+        self.es.search.return_value = {"hits": {"hits": []}}
+        paper_ids = ["1234.56781", "1234.56782", "1234.56783"]
+        self.session.get_current_versions(paper_ids)
+        self.assertEqual(
+            [
+                kwargs["body"]["params"]
+                for _, kwargs in self.es.search_template.call_args_list
+            ],
+            [
+                {"paper_ids": paper_ids[:2], "size": 2},
+                {"paper_ids": paper_ids[2:], "size": 1},
+            ],
+        )
+
+        self.session.search_templates = False
+        self.session.get_current_versions(paper_ids)
+        self.assertEqual(
+            [
+                kwargs["body"]["size"]
+                for _, kwargs in self.es.search.call_args_list
+            ],
+            [2, 1],
+        )
+
+    def test_disabled(self):
+        """Templates are not used unless enabled."""
+        session = index.SearchSession("localhost", "arxiv")
+        session.new_connection = mock.MagicMock(return_value=self.es)
+        self.es.search.return_value = {"hits": {"hits": []}}
+        session.get_current_versions(["1234.56789"])
+        self.assertEqual(self.es.put_script.call_count, 0)
+        self.assertEqual(self.es.search_template.call_count, 0)
@@ -1,8 +1,11 @@
 """Tests for :mod:`search.services.index.util`."""
 
+import re
 from unittest import TestCase
 
-from search.services.index import util
+from search.domain import Classification, ClassificationList
+from search.services.index import authors, prepare, util
+from search.services.index.exceptions import QueryError
 
 
 class TestMatchDatePartial(TestCase):
@@ -51,3 +54,134 @@ class TestOldPapernumDetection(TestCase):
         self.assertTrue(util.is_old_papernum("9201001"))
         self.assertTrue(util.is_old_papernum("0703999"))
         self.assertFalse(util.is_old_papernum("0704001"))
+
+
+class TestFragment(TestCase):
+    """Tests for :func:`.index.util.fragment`."""
+
+    def setUp(self):
+        """Start with empty caches."""
+        util.clear_fragment_caches()
+
+    def test_memoized(self):
+        """The same fragment is returned for the same term and operator."""
+        q = prepare.SEARCH_FIELDS["all"]("dark matter")
+        self.assertIs(q, prepare.SEARCH_FIELDS["all"]("dark matter"))
+        self.assertIsNot(q, prepare.SEARCH_FIELDS["all"]("matter"))
+        self.assertIsNot(
+            authors.author_query("foo", "and"),
+            authors.author_query("foo", "or"),
+        )
+        self.assertGreater(util.fragment_cache_info()["hits"], 0)
+
+    def test_combined(self):
+        """Combining a fragment with another does not modify it."""
+        q = prepare.SEARCH_FIELDS["title"]("dark matter")
+        expected = q.to_dict()
+        q & prepare.SEARCH_FIELDS["author"]("foo")
+        q | prepare.SEARCH_FIELDS["abstract"]("foo")
+        ~q
+        self.assertEqual(q.to_dict(), expected)
+        self.assertEqual(
+            prepare.SEARCH_FIELDS["title"]("dark matter").to_dict(), expected
+        )
+
+    def test_classification(self):
+        """Classifications are cached by ID."""
+        classification = Classification(
+            group={"id": "grp_physics"},
+            archive={"id": "physics"},
+            category=None,
+        )
+        q = prepare.limit_by_classification(
+            ClassificationList([classification])
+        )
+        self.assertEqual(
+            q.to_dict(),
+            {
+                "bool": {
+                    "must": [
+                        {
+                            "match": {
+                                "primary_classification.group.id": (
+                                    "grp_physics"
+                                )
+                            }
+                        },
+                        {
+                            "match": {
+                                "primary_classification.archive.id": "physics"
+                            }
+                        },
+                    ]
+                }
+            },
+        )
+        self.assertIs(
+            q,
+            prepare.limit_by_classification(
+                ClassificationList([dict(classification)])
+            ),
+        )
+
+
+class TestTermAnalysis(TestCase):
+    """:class:`.index.util.TermAnalysis` agrees with the individual helpers."""
+
+    TERMS = [
+        "dark matter",
+        "$z_1$ foo",
+        "foo $$\\lambda$$",
+        '"black hole" entropy',
+        '"unbalanced',
+        "schr*dinger",
+        '"sch*" ro?',
+        "smith, j*; doe, jane",
+        "9901001",
+        "hep-th/9901001 2001",
+        "0901 bar",
+        "2019-03 quux",
+        "a+b (c) [d] {e} ~f ^g",
+        "",
+    ]
+
+    def test_equivalent(self):
+        """Each feature is the same as from the corresponding helper."""
+        for term in self.TERMS:
+            analysis = util.TermAnalysis(term)
+            self.assertEqual(
+                analysis.parts, re.split(util.STRING_LITERAL, term)
+            )
+            self.assertEqual(analysis.is_literal, util.is_literal_query(term))
+            self.assertEqual(analysis.is_tex, util.is_tex_query(term))
+            self.assertEqual(analysis.has_wildcard, util.has_wildcard(term))
+            self.assertEqual(
+                analysis.is_old_papernum, util.is_old_papernum(term)
+            )
+            self.assertEqual(analysis.escaped, util.escape(term))
+            self.assertEqual(
+                analysis.escaped_quotes, util.escape(term, quotes=True)
+            )
+            self.assertEqual(
+                analysis.wildcard_escaped, util.wildcard_escape(term)
+            )
+            try:
+                date_fragment, remainder = util.parse_date(term)
+            except ValueError:
+                date_fragment, remainder = None, None
+            self.assertEqual(analysis.date, (date_fragment, remainder))
+            self.assertEqual(
+                analysis.date_partial,
+                date_fragment and util.parse_date_partial(date_fragment),
+            )
+
+    def test_leading_wildcard(self):
+        """Only the wildcard-escaped form is refused for a leading wildcard."""
+        analysis = util.TermAnalysis("*foo")
+        self.assertEqual(analysis.escaped, "*foo")
+        with self.assertRaises(QueryError):
+            analysis.wildcard_escaped
+
+    def test_shared(self):
+        """The analysis of a term is computed once."""
+        self.assertIs(util.analyze("dark matter"), util.analyze("dark matter"))
@@ -20,6 +20,7 @@ from search.domain import (
     Term,
     ClassicAPIQuery,
     Operator,
+    Document,
 )
 
 
@@ -103,6 +104,16 @@ def mock_rdata():
     }
 
 
+def mock_response():
+    """Provides a mock raw response from ES, with one hit."""
+    return {
+        "hits": {
+            "total": 53,
+            "hits": [{"_score": 1, "_source": mock_rdata()}],
+        }
+    }
+
+
 class TestSearch(TestCase):
     """Tests for :func:`.index.search`."""
 
@@ -110,13 +121,9 @@ class TestSearch(TestCase):
     @mock.patch("search.services.index.Elasticsearch")
     def test_advanced_query(self, mock_Elasticsearch, mock_Search):
         """:class:`.index.search` supports :class:`AdvancedQuery`."""
-        mock_results = mock.MagicMock()
-        mock_results.__getitem__.return_value = {"total": 53}
-        rdata = mock_rdata()
-        mock_result = mock.MagicMock(_d_=rdata, **rdata)
-        mock_result.meta.score = 1
-        mock_results.__iter__.return_value = [mock_result]
-        mock_Search.execute.return_value = mock_results
+        mock_es = mock.MagicMock()
+        mock_es.search.return_value = mock_response()
+        mock_Elasticsearch.return_value = mock_es
 
         # Support the chaining API for py-ES.
         mock_Search.return_value = mock_Search
@@ -198,13 +205,9 @@ class TestSearch(TestCase):
     @mock.patch("search.services.index.Elasticsearch")
     def test_simple_query(self, mock_Elasticsearch, mock_Search):
         """:class:`.index.search` supports :class:`SimpleQuery`."""
-        mock_results = mock.MagicMock()
-        mock_results.__getitem__.return_value = {"total": 53}
-        rdata = mock_rdata()
-        mock_result = mock.MagicMock(_d_=rdata, **rdata)
-        mock_result.meta.score = 1
-        mock_results.__iter__.return_value = [mock_result]
-        mock_Search.execute.return_value = mock_results
+        mock_es = mock.MagicMock()
+        mock_es.search.return_value = mock_response()
+        mock_Elasticsearch.return_value = mock_es
 
         # Support the chaining API for py-ES.
         mock_Search.return_value = mock_Search
@@ -231,13 +234,9 @@ class TestSearch(TestCase):
     @mock.patch("search.services.index.Elasticsearch")
     def test_classic_query(self, mock_Elasticsearch, mock_Search):
         """:class:`.index.search` supports :class:`SimpleQuery`."""
-        mock_results = mock.MagicMock()
-        mock_results.__getitem__.return_value = {"total": 53}
-        rdata = mock_rdata()
-        mock_result = mock.MagicMock(_d_=rdata, **rdata)
-        mock_result.meta.score = 1
-        mock_results.__iter__.return_value = [mock_result]
-        mock_Search.execute.return_value = mock_results
+        mock_es = mock.MagicMock()
+        mock_es.search.return_value = mock_response()
+        mock_Elasticsearch.return_value = mock_es
 
         # Support the chaining API for py-ES.
         mock_Search.return_value = mock_Search
@@ -267,13 +266,9 @@ class TestSearch(TestCase):
     @mock.patch("search.services.index.Elasticsearch")
     def test_classic_query_complex(self, mock_Elasticsearch, mock_Search):
         """:class:`.index.search` supports :class:`SimpleQuery`."""
-        mock_results = mock.MagicMock()
-        mock_results.__getitem__.return_value = {"total": 53}
-        rdata = mock_rdata()
-        mock_result = mock.MagicMock(_d_=rdata, **rdata)
-        mock_result.meta.score = 1
-        mock_results.__iter__.return_value = [mock_result]
-        mock_Search.execute.return_value = mock_results
+        mock_es = mock.MagicMock()
+        mock_es.search.return_value = mock_response()
+        mock_Elasticsearch.return_value = mock_es
 
         # Support the chaining API for py-ES.
         mock_Search.return_value = mock_Search
@@ -307,13 +302,9 @@ class TestSearch(TestCase):
     @mock.patch("search.services.index.Elasticsearch")
     def test_classic_query_id_list(self, mock_Elasticsearch, mock_Search):
         """:class:`.index.search` supports :class:`SimpleQuery`."""
-        mock_results = mock.MagicMock()
-        mock_results.__getitem__.return_value = {"total": 53}
-        rdata = mock_rdata()
-        mock_result = mock.MagicMock(_d_=rdata, **rdata)
-        mock_result.meta.score = 1
-        mock_results.__iter__.return_value = [mock_result]
-        mock_Search.execute.return_value = mock_results
+        mock_es = mock.MagicMock()
+        mock_es.search.return_value = mock_response()
+        mock_Elasticsearch.return_value = mock_es
 
         # Support the chaining API for py-ES.
         mock_Search.return_value = mock_Search
@@ -343,13 +334,9 @@ class TestSearch(TestCase):
     @mock.patch("search.services.index.Elasticsearch")
     def test_classic_query_phrases(self, mock_Elasticsearch, mock_Search):
         """:class:`.index.search` supports :class:`SimpleQuery`."""
-        mock_results = mock.MagicMock()
-        mock_results.__getitem__.return_value = {"total": 53}
-        rdata = mock_rdata()
-        mock_result = mock.MagicMock(_d_=rdata, **rdata)
-        mock_result.meta.score = 1
-        mock_results.__iter__.return_value = [mock_result]
-        mock_Search.execute.return_value = mock_results
+        mock_es = mock.MagicMock()
+        mock_es.search.return_value = mock_response()
+        mock_Elasticsearch.return_value = mock_es
 
         # Support the chaining API for py-ES.
         mock_Search.return_value = mock_Search
@@ -380,6 +367,447 @@ class TestSearch(TestCase):
         self.assertEqual(len(document_set["results"]), 1)
 
 
+class TestHandleESExceptions(TestCase):
+    """Errors from ES are translated into service exceptions."""
+
+    def test_rejected(self):
+        """ES is too busy to handle the request."""
+        with self.assertRaises(index.IndexOverloaded):
+            with index.handle_es_exceptions():
+                raise index.TransportError(
+                    429, "es_rejected_execution_exception", {}
+                )
+
+    def test_bulk_items_rejected(self):
+        """ES is too busy to handle some of the items in a bulk request."""
+        errors = [
+            {
+                "index": {
+                    "_id": "1234.56789v1",
+                    "status": 429,
+                    "error": {"type": "es_rejected_execution_exception"},
+                }
+            }
+        ]
+        with self.assertRaises(index.IndexOverloaded):
+            with index.handle_es_exceptions():
+                raise index.BulkIndexError("1 document(s) failed", errors)
+
+    def test_bulk_items_failed(self):
+        """Some items in a bulk request could not be indexed."""
+        errors = [
+            {
+                "index": {
+                    "_id": "1234.56789v1",
+                    "status": 400,
+                    "error": {"type": "mapper_parsing_exception"},
+                }
+            }
+        ]
+        with self.assertRaises(index.IndexingError) as ctx:
+            with index.handle_es_exceptions():
+                raise index.BulkIndexError("1 document(s) failed", errors)
+        self.assertNotIsInstance(ctx.exception, index.IndexOverloaded)
+
+
+class TestGetFingerprints(TestCase):
+    """Tests for :func:`.index.SearchSession.get_fingerprints`."""
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_get_fingerprints(self, mock_Elasticsearch):
+        """Fingerprints are retrieved in a single request."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.mget.return_value = {
+            "docs": [
+                {
+                    "_id": "1234.56789v1",
+                    "found": True,
+                    "_source": {"fingerprint": "abc"},
+                },
+                {"_id": "1234.56789v2", "found": True, "_source": {}},
+                {"_id": "1234.56789v3", "found": False},
+            ]
+        }
+        ids = ["1234.56789v1", "1234.56789v2", "1234.56789v3"]
+        fingerprints = index.SearchSession.get_fingerprints(ids)
+
+        self.assertEqual(
+            fingerprints, {"1234.56789v1": {"fingerprint": "abc"}}
+        )
+        self.assertEqual(mock_es.mget.call_count, 1)
+        _, kwargs = mock_es.mget.call_args
+        self.assertEqual(kwargs["body"], {"ids": ids})
+        self.assertEqual(kwargs["_source_include"], ["fingerprint"])
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_get_fingerprints_with_fields(self, mock_Elasticsearch):
+        """Additional fields are retrieved along with the fingerprint."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        index.SearchSession.get_fingerprints(["1234.56789v1"], ["latest"])
+        _, kwargs = mock_es.mget.call_args
+        self.assertEqual(kwargs["_source_include"], ["fingerprint", "latest"])
+
+
+class TestGetDocuments(TestCase):
+    """Tests for :func:`.index.SearchSession.get_documents`."""
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_get_documents(self, mock_Elasticsearch):
+        """Documents are returned in order, with None if not found."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.mget.return_value = {
+            "docs": [
+                {"_id": "1234.56789v2", "found": False},
+                {
+                    "_id": "1234.56789v1",
+                    "found": True,
+                    "_source": {"paper_id": "1234.56789", "title": "foo"},
+                },
+            ]
+        }
+        ids = ["1234.56789v2", "1234.56789v1"]
+        documents = index.SearchSession.get_documents(ids, ["title"])
+
+        self.assertIsNone(documents[0])
+        self.assertEqual(documents[1]["paper_id"], "1234.56789")
+        self.assertEqual(documents[1]["title"], "foo")
+        _, kwargs = mock_es.mget.call_args
+        self.assertEqual(kwargs["body"], {"ids": ids})
+        self.assertEqual(kwargs["_source_include"], ["title"])
+
+    @mock.patch("search.services.index.MGET_BATCH_SIZE", 2)
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_exists_many(self, mock_Elasticsearch):
+        """Sources are not retrieved, and large requests are batched."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.mget.side_effect = [
+            {"docs": [{"_id": "1", "found": True}, {"_id": "2"}]},
+            {"docs": [{"_id": "3", "found": True}]},
+        ]
+
+        self.assertEqual(
+            index.SearchSession.exists_many(["1", "2", "3"]),
+            [True, False, True],
+        )
+        self.assertEqual(mock_es.mget.call_count, 2)
+        bodies = [kw["body"] for _, kw in mock_es.mget.call_args_list]
+        self.assertEqual(bodies, [{"ids": ["1", "2"]}, {"ids": ["3"]}])
+        for _, kwargs in mock_es.mget.call_args_list:
+            self.assertIs(kwargs["_source"], False)
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_no_ids(self, mock_Elasticsearch):
+        """No request is made if there are no IDs."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        self.assertEqual(index.SearchSession.get_documents([]), [])
+        self.assertEqual(mock_es.mget.call_count, 0)
+
+
+class TestGetIdList(TestCase):
+    """Tests for :func:`.index.SearchSession.get_id_list`."""
+
+    @staticmethod
+    def _doc(paper_id_v):
+        return {
+            "_id": paper_id_v,
+            "found": True,
+            "_source": {
+                "paper_id": paper_id_v.split("v")[0],
+                "paper_id_v": paper_id_v,
+            },
+        }
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_get_id_list(self, mock_Elasticsearch):
+        """Papers are retrieved by ID, in the requested order."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        mock_es.search.return_value = {
+            "hits": {
+                "hits": [
+                    {"_source": self._doc("1234.56789v3")["_source"]},
+                ]
+            }
+        }
+        mock_es.mget.return_value = {
+            "docs": [
+                self._doc("2345.67890v1"),
+                self._doc("1234.56789v3"),
+                {"_id": "1234.56789v1", "found": False},
+            ]
+        }
+        query = ClassicAPIQuery(
+            id_list=[
+                "2345.67890v1",
+                "1234.56789",
+                "1111.11111",
+                "1234.56789v3",
+                "1234.56789v1",
+            ],
+            size=10,
+        )
+
+        document_set = index.SearchSession.get_id_list(query)
+
+        self.assertEqual(
+            [doc["paper_id_v"] for doc in document_set["results"]],
+            ["2345.67890v1", "1234.56789v3"],
+        )
+        self.assertEqual(document_set["metadata"]["total_results"], 2)
+        self.assertEqual(document_set["metadata"]["end"], 2)
+        self.assertNotIn("highlight", document_set["results"][0])
+
+        # The current versions are found with a single filter-only search.
+        self.assertEqual(mock_es.search.call_count, 1)
+        _, kwargs = mock_es.search.call_args
+        self.assertNotIn("query", kwargs["body"]["query"]["bool"])
+        self.assertIn(
+            {"terms": {"paper_id": ["1234.56789", "1111.11111"]}},
+            kwargs["body"]["query"]["bool"]["filter"],
+        )
+        self.assertEqual(mock_es.mget.call_count, 1)
+        _, kwargs = mock_es.mget.call_args
+        self.assertEqual(
+            kwargs["body"],
+            {"ids": ["2345.67890v1", "1234.56789v3", "1234.56789v1"]},
+        )
+
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_page(self, mock_Elasticsearch):
+        """Only versioned IDs: no search is needed."""
+        mock_es = mock.MagicMock()
+        mock_Elasticsearch.return_value = mock_es
+        ids = [f"1234.5678{i}v1" for i in range(5)]
+        mock_es.mget.return_value = {"docs": [self._doc(i) for i in ids]}
+        query = ClassicAPIQuery(id_list=ids, page_start=2, size=2)
+
+        document_set = index.SearchSession.get_id_list(query)
+
+        self.assertEqual(mock_es.search.call_count, 0)
+        self.assertEqual(
+            [doc["paper_id_v"] for doc in document_set["results"]], ids[2:4]
+        )
+        self.assertEqual(document_set["metadata"]["start"], 2)
+        self.assertEqual(document_set["metadata"]["end"], 4)
+        self.assertEqual(document_set["metadata"]["total_results"], 5)
+
+
+class TestBulkAddDocuments(TestCase):
+    """Tests for :func:`.index.SearchSession.bulk_add_documents`."""
+
+    def setUp(self):
+        """Create a session, and some documents to add."""
+        self.session = index.SearchSession("foohost", "fooindex")
+        self.mock_es = mock.MagicMock()
+        self.mock_es.indices.get_alias.return_value = {"fooindex": {}}
+        self.documents = [
+            Document(id="1234.56789v1"),
+            Document(id="1234.56789v2"),
+            Document(id="1234.56790v1"),
+        ]
+
+    @staticmethod
+    def _item(document_id, status=201, error=None, index_name="fooindex"):
+        item = {"_index": index_name, "_id": document_id, "status": status}
+        if error:
+            item["error"] = error
+        return (status < 300, {"index": item})
+
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_parallel(self, mock_Elasticsearch, mock_helpers):
+        """Documents are sent in parallel, in chunks bounded by size."""
+        mock_es = self.mock_es
+        mock_Elasticsearch.return_value = mock_es
+        mock_helpers.parallel_bulk.return_value = [
+            self._item(doc["id"]) for doc in self.documents
+        ]
+        self.session.bulk_add_documents(self.documents, docs_per_chunk=2)
+        self.session.bulk_add_documents(self.documents)
+
+        args, kwargs = mock_helpers.parallel_bulk.call_args_list[0]
+        self.assertEqual(len(args[1]), 3)
+        self.assertEqual(kwargs["chunk_size"], 2)
+        self.assertEqual(kwargs["thread_count"], self.session.bulk_threads)
+        self.assertEqual(
+            kwargs["max_chunk_bytes"], self.session.bulk_max_bytes
+        )
+        self.assertEqual(
+            mock_es.indices.exists.call_count, 1, "Index is checked once"
+        )
+
+    @mock.patch("search.services.index.time")
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_retry_rejected(self, mock_Elasticsearch, mock_helpers, mock_time):
+        """Documents rejected with a 429 are retried with backoff."""
+        mock_Elasticsearch.return_value = self.mock_es
+        mock_helpers.parallel_bulk.side_effect = [
+            [
+                self._item("1234.56789v1"),
+                self._item("1234.56789v2", 429, "es_rejected_execution"),
+                self._item("1234.56790v1", 429, "es_rejected_execution"),
+            ],
+            [
+                self._item("1234.56789v2"),
+                self._item("1234.56790v1", 429, "es_rejected_execution"),
+            ],
+            [self._item("1234.56790v1")],
+        ]
+        self.session.bulk_add_documents(self.documents, backoff=1)
+
+        retried = mock_helpers.parallel_bulk.call_args_list[2][0][1]
+        self.assertEqual([a["_id"] for a in retried], ["1234.56790v1"])
+        self.assertEqual(
+            [c[0][0] for c in mock_time.sleep.call_args_list], [1, 2]
+        )
+
+    @mock.patch("search.services.index.time")
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_still_rejected(self, mock_Elasticsearch, mock_helpers, mock_time):
+        """Documents still rejected after the last retry."""
+        mock_Elasticsearch.return_value = self.mock_es
+        mock_helpers.parallel_bulk.return_value = [
+            self._item("1234.56789v1", 429, "es_rejected_execution")
+        ]
+        with self.assertRaises(index.IndexOverloaded):
+            self.session.bulk_add_documents(self.documents[:1])
+        self.assertEqual(
+            mock_helpers.parallel_bulk.call_count,
+            self.session.bulk_max_retries + 1,
+        )
+
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_item_failures(self, mock_Elasticsearch, mock_helpers):
+        """The reason that each document failed is reported."""
+        mock_Elasticsearch.return_value = self.mock_es
+        mock_helpers.parallel_bulk.return_value = [
+            self._item("1234.56789v1"),
+            self._item("1234.56789v2", 400, "mapper_parsing_exception"),
+            self._item("1234.56790v1"),
+        ]
+        with self.assertRaises(index.BulkIndexingError) as ctx:
+            self.session.bulk_add_documents(self.documents)
+        self.assertEqual(
+            ctx.exception.failures,
+            {"1234.56789v2": "mapper_parsing_exception"},
+        )
+
+    @mock.patch("search.services.index.time")
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_retry_through_alias(
+        self, mock_Elasticsearch, mock_helpers, mock_time
+    ):
+        """Rejected documents are retried when the index is an alias."""
+        mock_Elasticsearch.return_value = self.mock_es
+        self.mock_es.indices.get_alias.return_value = {"fooindex-1": {}}
+        mock_helpers.parallel_bulk.side_effect = [
+            [
+                self._item(
+                    "1234.56789v1",
+                    429,
+                    "es_rejected_execution",
+                    index_name="fooindex-1",
+                )
+            ],
+            [self._item("1234.56789v1", index_name="fooindex-1")],
+        ]
+        self.session.bulk_add_documents(self.documents[:1], backoff=1)
+
+        retried = mock_helpers.parallel_bulk.call_args_list[1][0][1]
+        self.assertEqual(
+            [(a["_index"], a["_id"]) for a in retried],
+            [("fooindex-1", "1234.56789v1")],
+        )
+
+
+class TestBulkUpdateFields(TestCase):
+    """Tests for :func:`.index.SearchSession.bulk_update_fields`."""
+
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_bulk_update_fields(self, mock_Elasticsearch, mock_helpers):
+        """Partial documents are sent as bulk update actions."""
+        mock_helpers.bulk.return_value = (1, [])
+        index.SearchSession.bulk_update_fields(
+            {"1234.56789v1": {"is_current": False, "latest": "1234.56789v2"}}
+        )
+        _, kwargs = mock_helpers.bulk.call_args
+        actions = list(kwargs["actions"])
+        self.assertEqual(len(actions), 1)
+        self.assertEqual(actions[0]["_op_type"], "update")
+        self.assertEqual(actions[0]["_id"], "1234.56789v1")
+        self.assertEqual(
+            actions[0]["doc"],
+            {"is_current": False, "latest": "1234.56789v2"},
+        )
+
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_item_failures(self, mock_Elasticsearch, mock_helpers):
+        """The reason that each document failed is reported."""
+        mock_es = mock.MagicMock()
+        mock_es.indices.get_alias.return_value = {}
+        mock_Elasticsearch.return_value = mock_es
+        mock_helpers.bulk.return_value = (
+            1,
+            [
+                {
+                    "update": {
+                        "_index": "arxiv",
+                        "_id": "1234.56789v1",
+                        "status": 404,
+                        "error": "document_missing_exception",
+                    }
+                }
+            ],
+        )
+        with self.assertRaises(index.BulkIndexingError) as ctx:
+            index.SearchSession.bulk_update_fields(
+                {
+                    "1234.56789v1": {"is_current": False},
+                    "1234.56790v1": {"is_current": False},
+                }
+            )
+        self.assertEqual(
+            ctx.exception.failures,
+            {"1234.56789v1": "document_missing_exception"},
+        )
+
+    @mock.patch("search.services.index.helpers")
+    @mock.patch("search.services.index.Elasticsearch")
+    def test_items_rejected(self, mock_Elasticsearch, mock_helpers):
+        """ES is too busy to update some of the documents."""
+        mock_es = mock.MagicMock()
+        mock_es.indices.get_alias.return_value = {}
+        mock_Elasticsearch.return_value = mock_es
+        mock_helpers.bulk.return_value = (
+            0,
+            [
+                {
+                    "update": {
+                        "_index": "arxiv",
+                        "_id": "1234.56789v1",
+                        "status": 429,
+                        "error": {"type": "es_rejected_execution_exception"},
+                    }
+                }
+            ],
+        )
+        with self.assertRaises(index.IndexOverloaded):
+            index.SearchSession.bulk_update_fields(
+                {"1234.56789v1": {"is_current": False}}
+            )
+
+
 class TestWildcardSearch(TestCase):
     """A wildcard [*?] character is present in a querystring."""
 
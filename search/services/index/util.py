@@ -1,8 +1,20 @@
 """Helpers for building ES queries."""
 
 import re
+from functools import lru_cache
 from string import punctuation
-from typing import Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+    overload,
+)
 
 
 from elasticsearch_dsl import Search, Q
@@ -18,10 +30,32 @@ STRING_LITERAL = re.compile(r"([\"][^\"]*[\"])")
 
 TEXISM = re.compile(r"(([\$]{2}[^\$]+[\$]{2})|([\$]{1}[^\$]+[\$]{1}))")
 
+WILDCARD = re.compile(r"(?<!\\)([\*\?])")
+"""Pattern for wildcard characters that are not escaped."""
+
 # TODO: make this configurable.
 MAX_RESULTS = 10_000
 """This is the maximum result offset for pagination."""
 
+TIEBREAKER = {"paper_id_v": {"order": "desc"}}
+"""
+Sorts results that are otherwise tied.
+
+``paper_id_v`` is unique, so a sort that ends with it is a total order over
+the results; ``search_after`` relies on this to resume where the previous page
+ended.
+"""
+
+KEYWORD_SORT_FIELDS = frozenset(["paper_id", "paper_id_v"])
+"""Fields that results may be sorted by, whose sort values are strings."""
+
+FRAGMENT_CACHE_SIZE = 256
+"""
+Maximum number of fragments cached by each :func:`.fragment` builder.
+
+An all-fields query (with its sub-queries) takes about 60 KiB.
+"""
+
 SPECIAL_CHARACTERS = [
     "+",
     "=",
@@ -59,6 +93,173 @@ The old arXiv identifier scheme was used between 1991-07 and 2007-03
 """
 
 
+F = TypeVar("F", bound=Callable[..., Any])
+T = TypeVar("T")
+
+_fragment_builders: List[Any] = []
+
+
+def fragment(builder: F) -> F:
+    """
+    Memoize a query-fragment builder, in a bounded LRU cache.
+
+    The same terms are searched for over and over, and building a fragment
+    (escaping the term, checking it for literals, wildcards, etc, and
+    assembling the :class:`.Q`) is not free. The cache is keyed by the
+    arguments of the builder, which must be hashable (e.g. the term and the
+    operator).
+
+    The same :class:`.Q` instance is returned each time, so it must be treated
+    as immutable. Combining fragments with ``&``, ``|`` and ``~`` is fine, as
+    these return new objects, but the attributes of a fragment must never be
+    modified in place.
+    """
+    # The wrapper has the signature of ``builder``, plus the cache methods.
+    cached: Any = lru_cache(maxsize=FRAGMENT_CACHE_SIZE)(builder)
+    _fragment_builders.append(cached)
+    return cast(F, cached)
+
+
+def fragment_cache_info() -> Dict[str, int]:
+    """Get the hits, misses and size of all of the fragment caches."""
+    info = {"hits": 0, "misses": 0, "size": 0}
+    for builder in _fragment_builders:
+        hits, misses, _, size = builder.cache_info()
+        info["hits"] += hits
+        info["misses"] += misses
+        info["size"] += size
+    return info
+
+
+def clear_fragment_caches() -> None:
+    """Discard all cached query fragments."""
+    for builder in _fragment_builders:
+        builder.cache_clear()
+
+
+class _once(Generic[T]):
+    """A read-only attribute that is computed on first access."""
+
+    def __init__(self, func: Callable[[Any], T]) -> None:
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    @overload
+    def __get__(self, obj: None, cls: Any = None) -> "_once[T]":
+        ...
+
+    @overload
+    def __get__(self, obj: object, cls: Any = None) -> T:
+        ...
+
+    def __get__(self, obj: Any, cls: Any = None) -> Any:
+        if obj is None:
+            return self
+        # Stored on the instance, which takes precedence from now on.
+        value = obj.__dict__[self.func.__name__] = self.func(obj)
+        return value
+
+
+class TermAnalysis(object):
+    """
+    The features of a search term that determine how it is queried.
+
+    An all-fields search calls dozens of query builders with the same term,
+    each of which needs to know, e.g., whether the term contains literals,
+    TeX or wildcards, and how it is escaped. Each of these features is worked
+    out once, on first access, and then shared by all of the builders; use
+    :func:`.analyze` to get the analysis of a term.
+
+    The analysis of a term is shared, so it must not be modified.
+    """
+
+    def __init__(self, term: str) -> None:
+        """Analyze ``term``; features are computed as they are needed."""
+        self.term = term
+
+    @_once
+    def parts(self) -> List[str]:
+        """The term split around string literals, which keep their quotes."""
+        return STRING_LITERAL.split(self.term)
+
+    @_once
+    def is_literal(self) -> bool:
+        """Whether the term is intended to be treated as a literal."""
+        return '"' in self.term
+
+    @_once
+    def is_tex(self) -> bool:
+        """Whether the term is intended as a TeX query."""
+        return TEXISM.match(self.term) is not None
+
+    @_once
+    def has_wildcard(self) -> bool:
+        """Whether the term contains a wildcard (other than at the start)."""
+        return has_wildcard(self.term)
+
+    @_once
+    def is_old_papernum(self) -> bool:
+        """Whether the term looks like the number of an old arXiv ID."""
+        return is_old_papernum(self.term)
+
+    @_once
+    def escaped(self) -> str:
+        """The term with special characters escaped."""
+        return escape(self.term)
+
+    @_once
+    def escaped_quotes(self) -> str:
+        """The term with special characters and double quotes escaped."""
+        return escape(self.term, quotes=True)
+
+    @property
+    def wildcard_escaped(self) -> Tuple[str, bool]:
+        """
+        The term with wildcards in literals escaped, and whether any remain.
+
+        See :func:`.wildcard_escape`.
+
+        Raises
+        ------
+        :class:`.QueryError`
+            The term starts with a wildcard.
+
+        """
+        if self.term.startswith("?") or self.term.startswith("*"):
+            raise QueryError("Query cannot start with a wildcard")
+        return self._wildcard_escaped
+
+    @_once
+    def _wildcard_escaped(self) -> Tuple[str, bool]:
+        return _escape_literal_wildcards(self.parts)
+
+    @_once
+    def date(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        A date-like fragment of the term, and the remainder of the term.
+
+        Both are None if there is no such fragment. See :func:`.parse_date`.
+        """
+        try:
+            return parse_date(self.term)
+        except ValueError:
+            return None, None
+
+    @_once
+    def date_partial(self) -> Optional[str]:
+        """The year and month encoded by a ``yyMM`` date fragment, if any."""
+        date_fragment, _ = self.date
+        if date_fragment is None:
+            return None
+        return parse_date_partial(date_fragment)
+
+
+@fragment
+def analyze(term: str) -> TermAnalysis:
+    """Get the (shared) :class:`.TermAnalysis` of ``term``."""
+    return TermAnalysis(term)
+
+
 def wildcard_escape(querystring: str) -> Tuple[str, bool]:
     """
     Detect wildcard characters, and escape any that occur within a literal.
@@ -79,10 +280,12 @@ def wildcard_escape(querystring: str) -> Tuple[str, bool]:
     # in case we should check for it here.
     if querystring.startswith("?") or querystring.startswith("*"):
         raise QueryError("Query cannot start with a wildcard")
+    return _escape_literal_wildcards(re.split(STRING_LITERAL, querystring))
+
 
+def _escape_literal_wildcards(parts: List[str]) -> Tuple[str, bool]:
     # Escape wildcard characters within string literals.
     # re.sub() can't handle the complexity, sadly...
-    parts = re.split(STRING_LITERAL, querystring)
     parts = [
         part.replace("*", r"\*").replace("?", r"\?")
         if part.startswith('"') or part.startswith("'")
@@ -92,7 +295,7 @@ def wildcard_escape(querystring: str) -> Tuple[str, bool]:
     querystring = "".join(parts)
 
     # Only unescaped wildcard characters should remain.
-    wildcard = re.search(r"(?<!\\)([\*\?])", querystring) is not None
+    wildcard = WILDCARD.search(querystring) is not None
     return querystring, wildcard
 
 
@@ -126,7 +329,7 @@ def strip_tex(term: str) -> str:
 
 def Q_(qtype: str, field: str, value: str, operator: str = "or") -> Q:
     """Construct a :class:`.Q`, but handle wildcards first."""
-    value, wildcard = wildcard_escape(value)
+    value, wildcard = analyze(value).wildcard_escaped
     if wildcard:
         return Q("wildcard", **{field: {"value": value.lower()}})
     if "match" in qtype:
@@ -156,8 +359,26 @@ def remove_single_characters(term: str) -> str:
     )
 
 
-def sort(query: Query, search: Search) -> Search:
-    """Apply sorting to a :class:`.Search`."""
+def _sort_field(param: Any) -> str:
+    if isinstance(param, dict):
+        return str(next(iter(param)))
+    return str(param).lstrip("-")
+
+
+def with_tiebreaker(sort_params: List[Any]) -> List[Any]:
+    """
+    Make a sort deterministic, by ending it with :const:`.TIEBREAKER`.
+
+    ``_doc`` is dropped, since index order differs between shard copies and
+    changes as segments are merged.
+    """
+    sort_params = [p for p in sort_params if _sort_field(p) != "_doc"]
+    if not any(_sort_field(p) == "paper_id_v" for p in sort_params):
+        sort_params.append(TIEBREAKER)
+    return sort_params
+
+
+def _sort_params(query: Query, stable: bool = False) -> List[Any]:
     if not query.order:
         sort_params = consts.DEFAULT_SORT_ORDER
     else:
@@ -167,9 +388,38 @@ def sort(query: Query, search: Search) -> Search:
             else ""
         )
         sort_params = [query.order, f"{direction}paper_id_v"]  # type:ignore
-    if sort_params is not None:
-        search = search.sort(*sort_params)
-    return search
+    if stable:
+        sort_params = with_tiebreaker(sort_params)
+    return sort_params
+
+
+def sort(query: Query, search: Search, stable: bool = False) -> Search:
+    """
+    Apply sorting to a :class:`.Search`.
+
+    If ``stable`` is set, ties are broken by :const:`.TIEBREAKER`, so that
+    the search can be paginated with ``search_after``.
+    """
+    return search.sort(*_sort_params(query, stable))
+
+
+def valid_search_after(query: Query, search_after: Any) -> bool:
+    """
+    Determine whether ``search_after`` could be the sort values of a result.
+
+    There must be a value for each field of the stable sort of ``query``
+    (see :func:`.sort`): a string for :const:`.KEYWORD_SORT_FIELDS`, and a
+    number for the others (dates, and the score).
+    """
+    fields = [_sort_field(p) for p in _sort_params(query, stable=True)]
+    if not isinstance(search_after, list) or len(search_after) != len(fields):
+        return False
+    return all(
+        isinstance(value, str)
+        if field in KEYWORD_SORT_FIELDS
+        else isinstance(value, (int, float)) and not isinstance(value, bool)
+        for field, value in zip(fields, search_after)
+    )
 
 
 def parse_date(term: str) -> Tuple[str, str]:
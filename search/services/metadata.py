@@ -11,10 +11,16 @@ depending on the context of the request.
 """
 
 import ast
+import asyncio
 import json
-from typing import List
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Tuple
 from http import HTTPStatus
-from itertools import cycle
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from urllib.parse import urljoin
 
@@ -22,12 +28,19 @@ import requests
 from requests.packages.urllib3.util.retry import Retry
 
 from arxiv.base import logging
-from search.domain import DocMeta
-from search.context import get_application_config, get_application_global
+from search.domain import DocMeta, asdict
+from search.context import get_application_config
 
+if TYPE_CHECKING:  # Only needed by AsyncDocMetaSession; imported there.
+    import aiohttp
 
 logger = logging.getLogger(__name__)
 
+CACHE_FILENAME = "docmeta.sqlite3"
+"""Name of the cache file in ``METADATA_CACHE_DIR``."""
+
+USER_AGENT = "arXiv/system"
+
 
 class RequestFailed(IOError):
     """The metadata endpoint returned an unexpected status code."""
@@ -45,50 +58,548 @@ class BadResponse(IOError):
     """The response from the metadata service was malformed."""
 
 
-class DocMetaSession(object):
+class PartialFailure(RequestFailed):
+    """Metadata could not be retrieved for some of the requested papers."""
+
+    def __init__(
+        self,
+        message: str,
+        results: List[DocMeta],
+        failures: Dict[str, Exception],
+    ) -> None:
+        """Keep track of what was retrieved, and what was not."""
+        super(PartialFailure, self).__init__(message)
+        self.results = results
+        """Metadata that was retrieved, in the order requested."""
+        self.failures = failures
+        """The exception raised for each ID that could not be retrieved."""
+
+
+class DocMetaCache(object):
+    """
+    A persistent, single-file cache of docmeta records.
+
+    Records are stored in an SQLite database, keyed by paper ID and version.
+    A record is only replaced by one with the same or a newer ``metadata_id``
+    (or ``modified_date``), so a stale response never clobbers fresh data.
+
+    A paper is a cache hit only if all of its versions are in the cache and
+    were retrieved less than ``ttl`` seconds ago.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS docmeta ("
+        " paper_id TEXT NOT NULL,"
+        " version INTEGER NOT NULL,"
+        " metadata_id INTEGER NOT NULL,"
+        " modified_date TEXT NOT NULL,"
+        " data TEXT NOT NULL,"
+        " PRIMARY KEY (paper_id, version))",
+        "CREATE TABLE IF NOT EXISTS papers ("
+        " paper_id TEXT PRIMARY KEY,"
+        " latest_version INTEGER NOT NULL,"
+        " cached_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path: str, ttl: Optional[float] = None) -> None:
+        """
+        Open (or create) the cache.
+
+        Parameters
+        ----------
+        path : str
+            Location of the cache file.
+        ttl : float
+            Time (in seconds) for which cached records are considered fresh.
+            If None (default), records never expire.
+
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            for statement in self._SCHEMA:
+                self._db.execute(statement)
+
+    def get(self, document_id: str) -> Optional[DocMeta]:
+        """
+        Get cached metadata for a paper.
+
+        Parameters
+        ----------
+        document_id : str
+            An arXiv ID, with or without a version affix. If there is no
+            version affix, the latest version is returned.
+
+        Returns
+        -------
+        :class:`.DocMeta` or None
+            None if the paper is not in the cache, or is stale.
+
+        """
+        paper_id, version = _split_version(document_id)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT latest_version, cached_at FROM papers"
+                " WHERE paper_id = ?",
+                (paper_id,),
+            ).fetchone()
+            if row is None or not self._is_fresh(row[1]):
+                return None
+            row = self._db.execute(
+                "SELECT data FROM docmeta WHERE paper_id = ? AND version = ?",
+                (paper_id, version or row[0]),
+            ).fetchone()
+        if row is None:
+            return None
+        return DocMeta(**json.loads(row[0]))  # type: ignore
+
+    def get_many(self, paper_ids: List[str]) -> Dict[str, List[DocMeta]]:
+        """
+        Get cached metadata for all of the versions of several papers.
+
+        Parameters
+        ----------
+        paper_ids : list
+            arXiv IDs, without version affixes.
+
+        Returns
+        -------
+        dict
+            :class:`.DocMeta` for each version, in order, keyed by paper ID.
+            Papers that are not in the cache (or are stale, or are missing
+            versions) are omitted.
+
+        """
+        found: Dict[str, List[DocMeta]] = {}
+        latest: Dict[str, int] = {}
+        with self._lock:
+            # Stay well within SQLite's limit on the number of parameters.
+            for start in range(0, len(paper_ids), 500):
+                chunk = paper_ids[start : start + 500]
+                marks = ",".join("?" * len(chunk))
+                for paper_id, latest_version, cached_at in self._db.execute(
+                    "SELECT paper_id, latest_version, cached_at FROM papers"
+                    f" WHERE paper_id IN ({marks})",
+                    chunk,
+                ):
+                    if self._is_fresh(cached_at):
+                        latest[paper_id] = latest_version
+                fresh = [paper_id for paper_id in chunk if paper_id in latest]
+                marks = ",".join("?" * len(fresh))
+                for paper_id, data in self._db.execute(
+                    "SELECT paper_id, data FROM docmeta"
+                    f" WHERE paper_id IN ({marks}) ORDER BY paper_id, version",
+                    fresh,
+                ):
+                    found.setdefault(paper_id, []).append(
+                        DocMeta(**json.loads(data))  # type: ignore
+                    )
+        return {
+            paper_id: docmeta
+            for paper_id, docmeta in found.items()
+            if len(docmeta) >= latest[paper_id]
+        }
+
+    def put(self, docmeta: List[DocMeta]) -> None:
+        """
+        Add metadata to the cache, in a single transaction.
+
+        A cached record is not replaced by one with an older ``metadata_id``
+        or ``modified_date``.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            for dm in docmeta:
+                stored = self._db.execute(
+                    "SELECT metadata_id, modified_date FROM docmeta"
+                    " WHERE paper_id = ? AND version = ?",
+                    (dm.paper_id, dm.version),
+                ).fetchone()
+                if stored and (dm.metadata_id, dm.modified_date) < stored:
+                    logger.debug("%s: cached record is newer", dm.paper_id)
+                else:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO docmeta"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (
+                            dm.paper_id,
+                            dm.version,
+                            dm.metadata_id,
+                            dm.modified_date,
+                            json.dumps(asdict(dm)),
+                        ),
+                    )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO papers VALUES (?, ?, ?)",
+                    (dm.paper_id, max(dm.latest_version, dm.version), now),
+                )
+
+    def _is_fresh(self, cached_at: float) -> bool:
+        return self.ttl is None or time.time() - cached_at < self.ttl
+
+
+def _split_version(document_id: str) -> Tuple[str, Optional[int]]:
+    """Split an arXiv ID into the paper ID and version (if any)."""
+    match = re.match(r"^(.+)v(\d+)$", document_id)
+    if match is None:
+        return document_id, None
+    return match.group(1), int(match.group(2))
+
+
+class EndpointHealth(object):
+    """Tracks the latency and error rate of a single docmeta endpoint."""
+
+    ALPHA = 0.3
+    """Weight of the most recent request in the moving averages."""
+
+    def __init__(self, url: str) -> None:
+        """Start with no history, so the endpoint is tried right away."""
+        self.url = url
+        self.latency = 0.0
+        """Exponentially-weighted moving average of latency (seconds)."""
+        self.error_rate = 0.0
+        """Exponentially-weighted moving average of the failure rate."""
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.in_flight = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.probing = False
+
+    @property
+    def score(self) -> float:
+        """Expected cost of sending another request; lower is better."""
+        return self.latency * (self.in_flight + 1)
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Update the moving averages with the outcome of a request."""
+        if self.requests == 0:
+            self.latency = latency
+        else:
+            self.latency += self.ALPHA * (latency - self.latency)
+        self.error_rate += self.ALPHA * (
+            (0.0 if ok else 1.0) - self.error_rate
+        )
+        self.requests += 1
+        if ok:
+            self.consecutive_errors = 0
+        else:
+            self.errors += 1
+            self.consecutive_errors += 1
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        """Get a summary of the health of this endpoint."""
+        return {
+            "endpoint": self.url,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "ejected": self.ejected_until > now,
+            "ejected_for": max(0.0, self.ejected_until - now),
+            "ejections": self.ejections,
+        }
+
+
+_health: Dict[str, EndpointHealth] = {}
+"""Shared by all sessions in the process, whatever their configuration."""
+_health_lock = threading.Lock()
+
+
+class _BaseDocMetaSession(object):
+    """
+    Endpoint selection, chunking, and caching for docmeta sessions.
+
+    Shared by :class:`.DocMetaSession` and :class:`.AsyncDocMetaSession`,
+    which make the requests themselves. The health of each endpoint is shared
+    by all of the sessions in the process, so that an endpoint that one
+    session ejects is avoided by the others.
+    """
+
+    def __init__(
+        self,
+        *endpoints: str,
+        verify_cert: bool = True,
+        keep_alive: bool = True,
+        connect_timeout: Optional[float] = 5.0,
+        read_timeout: Optional[float] = 30.0,
+        max_url_length: int = 2000,
+        max_ids_per_request: int = 100,
+        max_concurrent: int = 4,
+        eject_after: int = 3,
+        eject_cooldown: float = 30.0,
+        cache: Optional[DocMetaCache] = None,
+    ) -> None:
+        """Keep track of the endpoints, and of the limits on requests."""
+        self._verify_cert = verify_cert
+        self._keep_alive = keep_alive
+        self._timeout: Tuple[Optional[float], Optional[float]] = (
+            connect_timeout,
+            read_timeout,
+        )
+        endpoints = tuple(
+            endpoint if endpoint.endswith("/") else endpoint + "/"
+            for endpoint in endpoints
+        )
+        logger.debug(f"New DocMeta session with endpoints {endpoints}")
+        with _health_lock:
+            self._endpoints = [
+                _health.setdefault(endpoint, EndpointHealth(endpoint))
+                for endpoint in endpoints
+            ]
+        self._endpoints_lock = _health_lock
+        self._eject_after = eject_after
+        self._eject_cooldown = eject_cooldown
+        self._cache = cache
+        self._max_url_length = max_url_length
+        self._max_ids_per_request = max_ids_per_request
+        self._max_concurrent = max_concurrent
+
+    def endpoint_stats(self) -> List[Dict[str, Any]]:
+        """
+        Get the latency, error rate, and status of each endpoint.
+
+        Returns
+        -------
+        list
+            A dict for each endpoint, with ``latency`` and ``error_rate``
+            (moving averages), the total number of ``requests`` and
+            ``errors``, the number of requests ``in_flight``, and whether the
+            endpoint is currently ``ejected`` from rotation (and for how many
+            more seconds, ``ejected_for``).
+
+        """
+        now = time.time()
+        with self._endpoints_lock:
+            return [endpoint.stats(now) for endpoint in self._endpoints]
+
+    def _select_endpoint(self) -> EndpointHealth:
+        """
+        Choose an endpoint for the next request.
+
+        Endpoints that have been ejected are skipped until their cooldown has
+        elapsed, after which a single probe request is let through. Otherwise
+        the endpoint with the lowest expected latency, given the requests
+        already in flight, is chosen. If all of the endpoints are ejected, the
+        one that is due back the soonest is used anyway.
+        """
+        now = time.time()
+        with self._endpoints_lock:
+            available = [
+                endpoint
+                for endpoint in self._endpoints
+                if endpoint.ejected_until <= now and not endpoint.probing
+            ]
+            probes = [ep for ep in available if ep.ejected_until]
+            if probes:
+                selected = probes[0]
+                selected.probing = True
+                logger.info("Probing metadata endpoint %s", selected.url)
+            elif available:
+                selected = min(available, key=lambda ep: ep.score)
+            else:
+                selected = min(
+                    self._endpoints, key=lambda ep: ep.ejected_until
+                )
+            selected.in_flight += 1
+            return selected
+
+    def _release_endpoint(
+        self, endpoint: EndpointHealth, latency: float, ok: bool
+    ) -> None:
+        """Record the outcome of a request; eject the endpoint if needed."""
+        with self._endpoints_lock:
+            endpoint.in_flight -= 1
+            endpoint.record(latency, ok)
+            if ok and (endpoint.probing or endpoint.ejected_until):
+                logger.info("Metadata endpoint %s is back", endpoint.url)
+                endpoint.ejected_until = 0.0
+            elif not ok and (
+                endpoint.probing
+                or endpoint.consecutive_errors >= self._eject_after
+                or (
+                    endpoint.requests >= self._eject_after
+                    and endpoint.error_rate > 0.5
+                )
+            ):
+                logger.error("Ejecting metadata endpoint %s", endpoint.url)
+                endpoint.ejected_until = time.time() + self._eject_cooldown
+                endpoint.ejections += 1
+            endpoint.probing = False
+
+    def _chunk(self, document_ids: List[str]) -> List[List[str]]:
+        """Split IDs into chunks that fit within the request size limits."""
+        # Allow for the longest endpoint, plus the path.
+        base = max(len(ep.url) for ep in self._endpoints) + len(
+            "docmeta_bulk?"
+        )
+        chunks: List[List[str]] = []
+        chunk: List[str] = []
+        length = base
+        for document_id in document_ids:
+            size = len(f"id={document_id}&")
+            if chunk and (
+                length + size > self._max_url_length
+                or len(chunk) >= self._max_ids_per_request
+            ):
+                chunks.append(chunk)
+                chunk = []
+                length = base
+            chunk.append(document_id)
+            length += size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _bulk_path(self, document_ids: List[str]) -> str:
+        return "/docmeta_bulk?" + "&".join(
+            f"id={document_id}" for document_id in document_ids
+        )
+
+    def _handle_response(
+        self, document_id: Any, status: int, content: bytes
+    ) -> Any:
+        """Check the status of a response, and decode its JSON content."""
+        if status not in [HTTPStatus.OK, HTTPStatus.PARTIAL_CONTENT]:
+            logger.error("Request failed: %s", content)
+            raise RequestFailed(
+                "%s: failed with %i: %r" % (document_id, status, content)
+            )
+        logger.debug(f"{document_id}: response OK")
+        try:
+            return json.loads(content)
+        except json.decoder.JSONDecodeError as ex:
+            logger.error("JSONDecodeError: %s", ex)
+            raise BadResponse(
+                "%s: could not decode response: %s" % (document_id, ex)
+            ) from ex
+
+
+class DocMetaSession(_BaseDocMetaSession):
     """An HTTP session with the docmeta endpoint."""
 
-    def __init__(self, *endpoints: str, verify_cert: bool = True) -> None:
+    def __init__(
+        self, *endpoints: str, pool_size: int = 10, **kwargs: Any
+    ) -> None:
         """
         Initialize an HTTP session.
 
+        All requests are made through a single :class:`requests.Session`, so
+        that connections to the metadata endpoints are pooled and re-used.
+
         Parameters
         ----------
         endpoints : str
             One or more endpoints for metadata retrieval. If more than one
-            are provided, calls to :meth:`.retrieve` will cycle through those
-            endpoints for each call.
+            are provided, each request goes to the healthy endpoint that is
+            expected to respond the fastest (see :meth:`.endpoint_stats`).
+        pool_size : int
+            Max number of connections to keep open for each endpoint. This
+            should be at least the number of threads that share the session.
         verify_cert : bool
             Whether or not SSL certificate verification should enforced.
+        keep_alive : bool
+            If False, connections are closed after each request.
+        connect_timeout : float
+            Time (in seconds) to wait for a connection to an endpoint.
+        read_timeout : float
+            Time (in seconds) to wait for the endpoint to send data.
+        max_url_length : int
+            Max length of the URL of a single request by
+            :meth:`.bulk_retrieve`.
+        max_ids_per_request : int
+            Max number of IDs in a single request by :meth:`.bulk_retrieve`.
+        max_concurrent : int
+            Max number of concurrent requests by :meth:`.bulk_retrieve`.
+        eject_after : int
+            An endpoint that fails this many times in a row (or fails more
+            often than not) is taken out of rotation.
+        eject_cooldown : float
+            Time (in seconds) before an endpoint that was taken out of rotation
+            is probed with a single request. If the probe succeeds, the
+            endpoint is back in rotation.
+        cache : :class:`.DocMetaCache`
+            If provided, fresh records are read from the cache before going to
+            the network, and records from the network are added to the cache.
 
         """
+        super(DocMetaSession, self).__init__(*endpoints, **kwargs)
         self._session = requests.Session()
-        self._verify_cert = verify_cert
+        # If there are other endpoints, give up on one that can't be reached
+        # right away, so that it is ejected (and others used) without delay.
+        connect = 1 if len(self._endpoints) > 1 else 10
         self._retry = Retry(  # type: ignore
-            total=10, read=10, connect=10, status=10, backoff_factor=0.5
+            total=10, read=10, connect=connect, status=10, backoff_factor=0.5
+        )
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=len(self._endpoints) or 1,
+            pool_maxsize=pool_size,
+            max_retries=self._retry,
         )
-        self._adapter = requests.adapters.HTTPAdapter(max_retries=self._retry)
         self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+        self._session.headers.update({"User-Agent": USER_AGENT})
+        if not self._keep_alive:
+            self._session.headers.update({"Connection": "close"})
 
-        for endpoint in endpoints:
-            if not endpoint[-1] == "/":
-                endpoint += "/"
-        logger.debug(f"New DocMeta session with endpoints {endpoints}")
-        self._endpoints = cycle(endpoints)
+    def _get(self, path: str) -> requests.Response:
+        """
+        Make a GET request to the best available endpoint.
 
-    @property
-    def endpoint(self) -> str:
-        """Get a metadata endpoint."""
-        logger.debug("get next endpoint")
-        return self._endpoints.__next__()
+        Raises
+        ------
+        SecurityException
+            SSL failed.
+        ConnectionFailed
+            Could not connect to the endpoint, or it did not respond in time.
+
+        """
+        endpoint = self._select_endpoint()
+        target = urljoin(endpoint.url, path)
+        logger.debug(
+            f"retrieve metadata from {target} with SSL"
+            f" verify {self._verify_cert}"
+        )
+        start = time.time()
+        ok = False
+        try:
+            response = self._session.get(
+                target, verify=self._verify_cert, timeout=self._timeout
+            )
+            ok = response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR
+        except requests.exceptions.SSLError as ex:
+            logger.error("SSLError: %s", ex)
+            raise SecurityException("SSL failed: %s" % ex) from ex
+        except requests.exceptions.ConnectionError as ex:
+            logger.error("ConnectionError: %s", ex)
+            raise ConnectionFailed(
+                "Could not connect to metadata service: %s" % ex
+            ) from ex
+        except requests.exceptions.Timeout as ex:
+            logger.error("Timeout: %s", ex)
+            raise ConnectionFailed(
+                "Metadata service did not respond in time: %s" % ex
+            ) from ex
+        finally:
+            self._release_endpoint(endpoint, time.time() - start, ok)
+        return response
 
-    def retrieve(self, document_id: str) -> DocMeta:
+    def retrieve(self, document_id: str, refresh: bool = False) -> DocMeta:
         """
         Retrieve metadata for an arXiv paper.
 
         Parameters
         ----------
         document_id : str
+        refresh : bool
+            If True, the cache (if any) is not read, only updated. Use this
+            when the paper is known to have changed.
 
         Returns
         -------
@@ -101,28 +612,13 @@ class DocMetaSession(object):
         """
         if not document_id:  # This could use further elaboration.
             raise ValueError("Invalid value for document_id")
+        if self._cache is not None and not refresh:
+            cached = self._cache.get(document_id)
+            if cached is not None:
+                logger.debug(f"{document_id}: cache hit")
+                return cached
 
-        try:
-            target = urljoin(self.endpoint, "/docmeta/")
-            target = urljoin(target, document_id)
-            logger.debug(
-                f"{document_id}: retrieve metadata from {target} with SSL"
-                f" verify {self._verify_cert}"
-            )
-            response = requests.get(
-                target,
-                verify=self._verify_cert,
-                headers={"User-Agent": "arXiv/system"},
-            )
-        except requests.exceptions.SSLError as ex:
-            logger.error("SSLError: %s", ex)
-            raise SecurityException("SSL failed: %s" % ex) from ex
-        except requests.exceptions.ConnectionError as ex:
-            logger.error("ConnectionError: %s", ex)
-            raise ConnectionFailed(
-                "Could not connect to metadata service: %s" % ex
-            ) from ex
-
+        response = self._get(f"/docmeta/{document_id}")
         if response.status_code not in [
             HTTPStatus.OK,
             HTTPStatus.PARTIAL_CONTENT,
@@ -142,47 +638,106 @@ class DocMetaSession(object):
                 "%s: could not decode response: %s" % (document_id, ex)
             ) from ex
         logger.debug(f"{document_id}: response decoded; done!")
+        if self._cache is not None:
+            self._cache.put([data])
         return data
 
-    def bulk_retrieve(self, document_ids: List[str]) -> List[DocMeta]:
+    def bulk_retrieve(
+        self, document_ids: List[str], refresh: bool = False
+    ) -> List[DocMeta]:
         """
-        Retrieve metadata for an arXiv paper.
+        Retrieve metadata for several arXiv papers.
+
+        The IDs are split into chunks, so that no request exceeds
+        :attr:`.max_url_length` or :attr:`.max_ids_per_request`. Chunks are
+        retrieved concurrently, spread across the configured endpoints, and
+        the results are merged in the order of ``document_ids``.
 
         Parameters
         ----------
         document_ids : List[str]
+        refresh : bool
+            If True, the cache (if any) is not read, only updated.
 
         Returns
         -------
-        dict
+        list
+            :class:`.DocMeta` for each paper, in the order requested.
 
         Raises
         ------
+        PartialFailure
+            Metadata could not be retrieved for some of the papers. The
+            exception carries the metadata that was retrieved, and the reason
+            for each failed ID.
         IOError
+            Metadata could not be retrieved for any of the papers. The
+            exception from the first chunk is raised.
         ValueError
+
         """
         if not document_ids:  # This could use further elaboration.
             raise ValueError("Invalid value for document_ids")
+        if self._cache is None:
+            return self._fetch_many(document_ids)
 
-        query_string = "/docmeta_bulk?" + "&".join(
-            f"id={document_id}" for document_id in document_ids
-        )
+        cached = {} if refresh else self._cache.get_many(document_ids)
+        logger.debug("%i of %i in cache", len(cached), len(document_ids))
+        missing = [ident for ident in document_ids if ident not in cached]
+        fetched: List[DocMeta] = []
+        failures: Dict[str, Exception] = {}
+        if missing:
+            try:
+                fetched = self._fetch_many(missing)
+            except PartialFailure as ex:
+                fetched, failures = ex.results, ex.failures
+            except IOError as ex:
+                if not cached:
+                    raise
+                failures = {ident: ex for ident in missing}
+            self._cache.put(fetched)
+        return _merge(document_ids, cached, fetched, failures)
 
-        try:
-            target = urljoin(self.endpoint, query_string)
-            logger.debug(
-                f"{document_ids}: retrieve metadata from {target} with SSL"
-                f" verify {self._verify_cert}"
+    def _fetch_many(self, document_ids: List[str]) -> List[DocMeta]:
+        """Retrieve metadata for several papers from the docmeta service."""
+        chunks = self._chunk(document_ids)
+        if len(chunks) == 1:
+            return self._bulk_retrieve(chunks[0])
+
+        # Each request picks its own endpoint; the number of requests in
+        # flight to each endpoint is taken into account, so that concurrent
+        # requests are spread across endpoints.
+        workers = min(self._max_concurrent, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._bulk_retrieve, chunk) for chunk in chunks
+            ]
+        results: List[DocMeta] = []
+        failures: Dict[str, Exception] = {}
+        errors: List[Exception] = []
+        for chunk, future in zip(chunks, futures):
+            error = future.exception()
+            if error is None:
+                results += future.result()
+                continue
+            if not isinstance(error, Exception):
+                raise error  # E.g. KeyboardInterrupt, not a failed request.
+            errors.append(error)
+            failures.update({document_id: error for document_id in chunk})
+        if errors and not results:
+            raise errors[0]
+        if failures:
+            logger.error("Failed to retrieve %i papers", len(failures))
+            raise PartialFailure(
+                "Failed to retrieve %i papers" % len(failures),
+                results,
+                failures,
             )
-            response = self._session.get(target, verify=self._verify_cert)
-        except requests.exceptions.SSLError as ex:
-            logger.error("SSLError: %s", ex)
-            raise SecurityException("SSL failed: %s" % ex) from ex
-        except requests.exceptions.ConnectionError as ex:
-            logger.error("ConnectionError: %s", ex)
-            raise ConnectionFailed(
-                "Could not connect to metadata service: %s" % ex
-            ) from ex
+        return results
+
+    def _bulk_retrieve(self, document_ids: List[str]) -> List[DocMeta]:
+        """Retrieve metadata for a single chunk of papers."""
+        response = self._get(self._bulk_path(document_ids))
 
         if response.status_code not in [
             HTTPStatus.OK,
@@ -207,42 +762,426 @@ class DocMetaSession(object):
         return data
 
 
+class AsyncDocMetaSession(_BaseDocMetaSession):
+    """
+    An asyncio-native session with the docmeta endpoint.
+
+    Shares endpoint selection, chunking, and caching with
+    :class:`.DocMetaSession`, and raises the same exceptions, but its methods
+    are coroutines: requests are made with :mod:`aiohttp` so that many
+    requests can be in flight from a single thread. Must be used from within
+    a running event loop, and closed with :meth:`.close` (or used as an async
+    context manager).
+    """
+
+    def __init__(
+        self,
+        *endpoints: str,
+        max_concurrent: int = 100,
+        retries: int = 2,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize an asyncio session.
+
+        Parameters
+        ----------
+        endpoints : str
+            One or more endpoints for metadata retrieval.
+        max_concurrent : int
+            Max number of requests in flight at once, across all of the
+            methods of this session. This is also the size of the connection
+            pool.
+        retries : int
+            Number of times to retry a request that could not connect or
+            timed out, with exponential backoff.
+        kwargs
+            As for :class:`.DocMetaSession`, other than ``pool_size``.
+
+        """
+        super(AsyncDocMetaSession, self).__init__(
+            *endpoints, max_concurrent=max_concurrent, **kwargs
+        )
+        self._retries = retries
+        self._client: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncDocMetaSession":
+        """Use the session as an async context manager."""
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        """Close the session on exit."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Close all of the connections held by this session."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def _get_client(self) -> "aiohttp.ClientSession":
+        # aiohttp sessions are bound to the event loop, so are created when
+        # the first request is made.
+        import aiohttp
+
+        if self._client is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._max_concurrent,
+                ssl=None if self._verify_cert else False,
+                force_close=not self._keep_alive,
+            )
+            self._client = aiohttp.ClientSession(
+                connector=connector,
+                headers={"User-Agent": USER_AGENT},
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self._timeout[0], sock_read=self._timeout[1]
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self._max_concurrent)
+        return self._client
+
+    async def _get(self, path: str) -> Tuple[int, bytes]:
+        """
+        Make a GET request to the best available endpoint.
+
+        Returns
+        -------
+        int
+            Status code of the response.
+        bytes
+            Content of the response.
+
+        Raises
+        ------
+        SecurityException
+            SSL failed.
+        ConnectionFailed
+            Could not connect to the endpoint, or it did not respond in time.
+
+        """
+        client = self._get_client()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:  # type: ignore
+                    return await self._get_once(client, path)
+            except SecurityException:
+                raise
+            except ConnectionFailed:
+                if attempt >= self._retries:
+                    raise
+            await asyncio.sleep(0.5 * 2**attempt)
+            attempt += 1
+
+    async def _get_once(
+        self, client: "aiohttp.ClientSession", path: str
+    ) -> Tuple[int, bytes]:
+        import aiohttp
+
+        endpoint = self._select_endpoint()
+        target = urljoin(endpoint.url, path)
+        logger.debug(f"retrieve metadata from {target}")
+        start = time.time()
+        ok = False
+        try:
+            async with client.get(target) as response:
+                content = await response.read()
+            ok = response.status < HTTPStatus.INTERNAL_SERVER_ERROR
+        except aiohttp.ClientSSLError as ex:
+            logger.error("SSLError: %s", ex)
+            raise SecurityException("SSL failed: %s" % ex) from ex
+        except aiohttp.ClientError as ex:
+            logger.error("ConnectionError: %s", ex)
+            raise ConnectionFailed(
+                "Could not connect to metadata service: %s" % ex
+            ) from ex
+        except asyncio.TimeoutError as ex:
+            logger.error("Timeout: %s", ex)
+            raise ConnectionFailed(
+                "Metadata service did not respond in time: %s" % ex
+            ) from ex
+        finally:
+            self._release_endpoint(endpoint, time.time() - start, ok)
+        return response.status, content
+
+    async def retrieve(
+        self, document_id: str, refresh: bool = False
+    ) -> DocMeta:
+        """
+        Retrieve metadata for an arXiv paper.
+
+        See :meth:`.DocMetaSession.retrieve`.
+        """
+        if not document_id:  # This could use further elaboration.
+            raise ValueError("Invalid value for document_id")
+        if self._cache is not None and not refresh:
+            cached = self._cache.get(document_id)
+            if cached is not None:
+                logger.debug(f"{document_id}: cache hit")
+                return cached
+
+        status, content = await self._get(f"/docmeta/{document_id}")
+        data = DocMeta(  # type: ignore
+            **self._handle_response(document_id, status, content)
+        )
+        if self._cache is not None:
+            self._cache.put([data])
+        return data
+
+    async def retrieve_many(self, document_ids: List[str]) -> List[DocMeta]:
+        """
+        Retrieve metadata for several papers, one request per paper.
+
+        Requests are made concurrently, up to the concurrency limit of the
+        session. Use this for versioned IDs, which :meth:`.bulk_retrieve`
+        does not support.
+
+        Returns
+        -------
+        list
+            :class:`.DocMeta` for each paper, in the order requested.
+
+        Raises
+        ------
+        PartialFailure
+            Metadata could not be retrieved for some of the papers.
+        IOError
+            Metadata could not be retrieved for any of the papers.
+
+        """
+        return _gather(
+            document_ids,
+            await asyncio.gather(
+                *[self.retrieve(ident) for ident in document_ids],
+                return_exceptions=True,
+            ),
+        )
+
+    async def bulk_retrieve(
+        self, document_ids: List[str], refresh: bool = False
+    ) -> List[DocMeta]:
+        """
+        Retrieve metadata for several papers, in chunks.
+
+        See :meth:`.DocMetaSession.bulk_retrieve`. All of the chunks are
+        requested at once, up to the concurrency limit of the session.
+        """
+        if not document_ids:  # This could use further elaboration.
+            raise ValueError("Invalid value for document_ids")
+        if self._cache is None:
+            return await self._fetch_many(document_ids)
+
+        cached = {} if refresh else self._cache.get_many(document_ids)
+        missing = [ident for ident in document_ids if ident not in cached]
+        fetched: List[DocMeta] = []
+        failures: Dict[str, Exception] = {}
+        if missing:
+            try:
+                fetched = await self._fetch_many(missing)
+            except PartialFailure as ex:
+                fetched, failures = ex.results, ex.failures
+            except IOError as ex:
+                if not cached:
+                    raise
+                failures = {ident: ex for ident in missing}
+            self._cache.put(fetched)
+        return _merge(document_ids, cached, fetched, failures)
+
+    async def _fetch_many(self, document_ids: List[str]) -> List[DocMeta]:
+        chunks = self._chunk(document_ids)
+        outcomes = await asyncio.gather(
+            *[self._bulk_retrieve(chunk) for chunk in chunks],
+            return_exceptions=True,
+        )
+        results: List[DocMeta] = []
+        failures: Dict[str, Exception] = {}
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, Exception):
+                failures.update({ident: outcome for ident in chunk})
+            else:
+                results += outcome
+        if failures and not results:
+            raise next(iter(failures.values()))
+        if failures:
+            logger.error("Failed to retrieve %i papers", len(failures))
+            raise PartialFailure(
+                "Failed to retrieve %i papers" % len(failures),
+                results,
+                failures,
+            )
+        return results
+
+    async def _bulk_retrieve(self, document_ids: List[str]) -> List[DocMeta]:
+        status, content = await self._get(self._bulk_path(document_ids))
+        resp = self._handle_response(document_ids, status, content)
+        return [DocMeta(**value) for value in resp]  # type: ignore
+
+
+def _gather(document_ids: List[str], outcomes: List[Any]) -> List[DocMeta]:
+    """Collect the outcomes of per-paper requests, made concurrently."""
+    results = [dm for dm in outcomes if not isinstance(dm, Exception)]
+    failures = {
+        ident: outcome
+        for ident, outcome in zip(document_ids, outcomes)
+        if isinstance(outcome, Exception)
+    }
+    if failures and not results:
+        raise next(iter(failures.values()))
+    if failures:
+        raise PartialFailure(
+            "Failed to retrieve %i papers" % len(failures), results, failures
+        )
+    return results
+
+
+def _merge(
+    document_ids: List[str],
+    cached: Dict[str, List[DocMeta]],
+    fetched: List[DocMeta],
+    failures: Dict[str, Exception],
+) -> List[DocMeta]:
+    """Merge cached and fetched metadata in the order requested."""
+    by_paper: Dict[str, List[DocMeta]] = {}
+    for dm in fetched:
+        by_paper.setdefault(dm.paper_id, []).append(dm)
+    results: List[DocMeta] = []
+    for ident in document_ids:
+        results += cached.get(ident, []) or by_paper.pop(ident, [])
+    for leftover in by_paper.values():  # e.g. IDs with versions.
+        results += leftover
+    if failures:
+        raise PartialFailure(
+            "Failed to retrieve %i papers" % len(failures), results, failures
+        )
+    return results
+
+
 def init_app(app: object = None) -> None:
     """Set default configuration parameters for an application instance."""
     config = get_application_config(app)
     config.setdefault("METADATA_ENDPOINT", "https://arxiv.org/")
     config.setdefault("METADATA_VERIFY_CERT", "True")
+    config.setdefault("METADATA_POOL_SIZE", "10")
+    config.setdefault("METADATA_KEEP_ALIVE", "True")
+    config.setdefault("METADATA_CONNECT_TIMEOUT", "5")
+    config.setdefault("METADATA_READ_TIMEOUT", "30")
+    config.setdefault("METADATA_BULK_MAX_URL_LENGTH", "2000")
+    config.setdefault("METADATA_BULK_MAX_IDS", "100")
+    config.setdefault("METADATA_BULK_CONCURRENCY", "4")
+    config.setdefault("METADATA_ASYNC_CONCURRENCY", "100")
+    config.setdefault("METADATA_EJECT_AFTER", "3")
+    config.setdefault("METADATA_EJECT_COOLDOWN", "30")
+    config.setdefault("METADATA_CACHE_TTL", "300")
+
+
+_sessions: Dict[Tuple[Tuple[str, str], ...], DocMetaSession] = {}
+"""One session per configuration, shared by all threads and app contexts."""
+_sessions_lock = threading.Lock()
+
+_caches: Dict[Tuple[str, Optional[float]], DocMetaCache] = {}
+"""One cache per file and TTL, shared by all of the sessions in the process."""
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: str, ttl: Optional[float] = None) -> DocMetaCache:
+    """Get the :class:`.DocMetaCache` for ``path``, opening it only once."""
+    with _caches_lock:
+        if (path, ttl) not in _caches:
+            _caches[(path, ttl)] = DocMetaCache(path, ttl=ttl)
+        return _caches[(path, ttl)]
+
+
+def _session_kwargs(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Get parameters for a docmeta session from the app config."""
+    cache: Optional[DocMetaCache] = None
+    if config.get("METADATA_CACHE_DIR"):
+        ttl = config.get("METADATA_CACHE_TTL", "300")
+        cache = get_cache(
+            os.path.join(config["METADATA_CACHE_DIR"], CACHE_FILENAME),
+            ttl=float(ttl) if ttl else None,
+        )
+    return dict(
+        verify_cert=bool(
+            ast.literal_eval(config.get("METADATA_VERIFY_CERT", "True"))
+        ),
+        keep_alive=bool(
+            ast.literal_eval(config.get("METADATA_KEEP_ALIVE", "True"))
+        ),
+        connect_timeout=float(config.get("METADATA_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(config.get("METADATA_READ_TIMEOUT", "30")),
+        max_url_length=int(config.get("METADATA_BULK_MAX_URL_LENGTH", "2000")),
+        max_ids_per_request=int(config.get("METADATA_BULK_MAX_IDS", "100")),
+        eject_after=int(config.get("METADATA_EJECT_AFTER", "3")),
+        eject_cooldown=float(config.get("METADATA_EJECT_COOLDOWN", "30")),
+        cache=cache,
+    )
 
 
 def get_session(app: object = None) -> DocMetaSession:
     """Get a new session with the docmeta endpoint."""
     config = get_application_config(app)
     endpoint = config.get("METADATA_ENDPOINT", "https://arxiv.org/")
-    verify_cert = bool(
-        ast.literal_eval(config.get("METADATA_VERIFY_CERT", "True"))
+    return DocMetaSession(
+        *endpoint.split(","),
+        pool_size=int(config.get("METADATA_POOL_SIZE", "10")),
+        max_concurrent=int(config.get("METADATA_BULK_CONCURRENCY", "4")),
+        **_session_kwargs(config),
+    )
+
+
+def get_async_session(app: object = None) -> AsyncDocMetaSession:
+    """
+    Get a new asyncio session with the docmeta endpoint.
+
+    Unlike :func:`.get_session`, the session is not bound to the application
+    context; the caller is responsible for closing it.
+    """
+    config = get_application_config(app)
+    endpoint = config.get("METADATA_ENDPOINT", "https://arxiv.org/")
+    return AsyncDocMetaSession(
+        *endpoint.split(","),
+        max_concurrent=int(config.get("METADATA_ASYNC_CONCURRENCY", "100")),
+        **_session_kwargs(config),
     )
-    if "," in endpoint:
-        return DocMetaSession(*(endpoint.split(",")), verify_cert=verify_cert)
-    return DocMetaSession(endpoint, verify_cert=verify_cert)
 
 
 def current_session() -> DocMetaSession:
-    """Get/create :class:`.DocMetaSession` for this context."""
-    g = get_application_global()
-    if not g:
-        return get_session()
-    elif "docmeta" not in g:
-        g.docmeta = get_session()  # type: ignore
-    return g.docmeta  # type: ignore
+    """
+    Get/create the :class:`.DocMetaSession` for the current configuration.
+
+    The session (and so its connection pool and cache) is created once per
+    process, and shared by all threads and application contexts.
+    """
+    config = get_application_config()
+    key = tuple(
+        sorted(
+            (name, str(value))
+            for name, value in config.items()
+            if name.startswith("METADATA_")
+        )
+    )
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = get_session()
+        return _sessions[key]
 
 
 @wraps(DocMetaSession.retrieve)
-def retrieve(document_id: str) -> DocMeta:
+def retrieve(document_id: str, refresh: bool = False) -> DocMeta:
     """Retrieve an arxiv document by id."""
-    return current_session().retrieve(document_id)
+    return current_session().retrieve(document_id, refresh=refresh)
 
 
 @wraps(DocMetaSession.bulk_retrieve)
-def bulk_retrieve(document_ids: List[str]) -> List[DocMeta]:
+def bulk_retrieve(
+    document_ids: List[str], refresh: bool = False
+) -> List[DocMeta]:
     """Retrieve an arxiv document by id."""
-    return current_session().bulk_retrieve(document_ids)
+    return current_session().bulk_retrieve(document_ids, refresh=refresh)
+
+
+@wraps(DocMetaSession.endpoint_stats)
+def endpoint_stats() -> List[Dict[str, Any]]:
+    """Get the latency, error rate, and status of each endpoint."""
+    return current_session().endpoint_stats()
@@ -1,7 +1,10 @@
 """Tests for :mod:`search.services.fulltext`."""
 
+import asyncio
+import importlib.util
 import unittest
 from unittest import mock
+
 from search.services import fulltext
 
 
@@ -92,3 +95,66 @@ class TestRetrieveMalformedRecord(unittest.TestCase):
         mock_get.return_value = response
         with self.assertRaises(IOError):
             fulltext.retrieve("1234.5678v3")
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("aiohttp"), "aiohttp is not installed"
+)
+class TestAsyncFulltextSession(unittest.TestCase):
+    """:class:`.AsyncFulltextSession` is used from an event loop."""
+
+    def setUp(self):
+        """Start a stub fulltext service."""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        async def handle(request):
+            paper_id = request.match_info["paper_id"]
+            if paper_id == "9999.99999v1":
+                return web.Response(status=404)
+            return web.json_response(
+                {
+                    "content": f"The whole story of {paper_id}",
+                    "version": 0.1,
+                    "created": "2017-08-30T08:24:58.525923",
+                }
+            )
+
+        app = web.Application()
+        app.router.add_get("/fulltext/{paper_id}", handle)
+        self.loop = asyncio.new_event_loop()
+        self.server = TestServer(app, loop=self.loop)
+        self.loop.run_until_complete(self.server.start_server(loop=self.loop))
+        self.endpoint = str(self.server.make_url("/fulltext/"))
+
+    def tearDown(self):
+        """Stop the stub."""
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+
+    def test_retrieve_many(self):
+        """Content is retrieved for each paper, keyed by ID."""
+
+        async def run():
+            async with fulltext.AsyncFulltextSession(self.endpoint) as s:
+                return await s.retrieve_many(["1234.5678v1", "1234.5679v2"])
+
+        results = self.loop.run_until_complete(run())
+        self.assertEqual(
+            results["1234.5679v2"].content, "The whole story of 1234.5679v2"
+        )
+        self.assertEqual(len(results), 2)
+
+    def test_partial_failure(self):
+        """Failures are reported for each ID."""
+
+        async def run():
+            async with fulltext.AsyncFulltextSession(self.endpoint) as s:
+                return await s.retrieve_many(["1234.5678v1", "9999.99999v1"])
+
+        with self.assertRaises(fulltext.PartialFailure) as ctx:
+            self.loop.run_until_complete(run())
+        self.assertEqual(list(ctx.exception.results), ["1234.5678v1"])
+        self.assertIsInstance(
+            ctx.exception.failures["9999.99999v1"], fulltext.RequestFailed
+        )
@@ -1,9 +1,19 @@
 """Tests for :mod:`search.services.metadata`."""
 
 import json
+import os
+import asyncio
+import importlib.util
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
 from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
+from search.domain import asdict
 from search.services import metadata
 from search.factory import create_ui_web_app
 
@@ -11,9 +21,14 @@ from search.factory import create_ui_web_app
 class TestRetrieveExistantMetadata(unittest.TestCase):
     """Metadata is available for a paper."""
 
-    @mock.patch("search.services.metadata.requests.get")
-    def test_calls_metadata_endpoint(self, mock_get):
+    def setUp(self):
+        """Start without any history for the endpoints."""
+        metadata._health.clear()
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_calls_metadata_endpoint(self, mock_Session):
         """:func:`.metadata.retrieve` calls passed endpoint with GET."""
+        mock_get = mock_Session.return_value.get
         base = "https://asdf.com/"
 
         app = create_ui_web_app()
@@ -37,13 +52,14 @@ class TestRetrieveExistantMetadata(unittest.TestCase):
             try:
                 args, _ = mock_get.call_args
             except Exception as ex:
-                self.fail("Did not call requests.get as expected: %s" % ex)
+                self.fail("Did not call session.get as expected: %s" % ex)
 
         self.assertTrue(args[0].startswith(base))
 
-    @mock.patch("search.services.metadata.requests.get")
-    def test_calls_metadata_endpoint_roundrobin(self, mock_get):
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_calls_metadata_endpoint_roundrobin(self, mock_Session):
         """:func:`.metadata.retrieve` calls passed endpoint with GET."""
+        mock_get = mock_Session.return_value.get
         base = ["https://asdf.com/", "https://asdf2.com/"]
         app = create_ui_web_app()
         app.config["METADATA_ENDPOINT"] = ",".join(base)
@@ -67,7 +83,7 @@ class TestRetrieveExistantMetadata(unittest.TestCase):
             try:
                 args, _ = mock_get.call_args
             except Exception as ex:
-                self.fail("Did not call requests.get as expected: %s" % ex)
+                self.fail("Did not call session.get as expected: %s" % ex)
             self.assertTrue(
                 args[0].startswith(base[0]), "Expected call to %s" % base[0]
             )
@@ -79,7 +95,7 @@ class TestRetrieveExistantMetadata(unittest.TestCase):
             try:
                 args, _ = mock_get.call_args
             except Exception as ex:
-                self.fail("Did not call requests.get as expected: %s" % ex)
+                self.fail("Did not call session.get as expected: %s" % ex)
             self.assertTrue(
                 args[0].startswith(base[1]), "Expected call to %s" % base[1]
             )
@@ -88,9 +104,10 @@ class TestRetrieveExistantMetadata(unittest.TestCase):
 class TestRetrieveNonexistantRecord(unittest.TestCase):
     """Metadata is not available for a paper."""
 
-    @mock.patch("search.services.metadata.requests.get")
-    def test_raise_ioerror_on_404(self, mock_get):
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_raise_ioerror_on_404(self, mock_Session):
         """:func:`.metadata.retrieve` raises IOError when unvailable."""
+        mock_get = mock_Session.return_value.get
         response = mock.MagicMock()
         type(response).json = mock.MagicMock(return_value=None)
         response.status_code = 404
@@ -98,9 +115,10 @@ class TestRetrieveNonexistantRecord(unittest.TestCase):
         with self.assertRaises(IOError):
             metadata.retrieve("1234.5678v3")
 
-    @mock.patch("search.services.metadata.requests.get")
-    def test_raise_ioerror_on_503(self, mock_get):
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_raise_ioerror_on_503(self, mock_Session):
         """:func:`.metadata.retrieve` raises IOError when unvailable."""
+        mock_get = mock_Session.return_value.get
         response = mock.MagicMock()
         type(response).json = mock.MagicMock(return_value=None)
         response.status_code = 503
@@ -108,9 +126,10 @@ class TestRetrieveNonexistantRecord(unittest.TestCase):
         with self.assertRaises(IOError):
             metadata.retrieve("1234.5678v3")
 
-    @mock.patch("search.services.metadata.requests.get")
-    def test_raise_ioerror_on_sslerror(self, mock_get):
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_raise_ioerror_on_sslerror(self, mock_Session):
         """:func:`.metadata.retrieve` raises IOError when SSL fails."""
+        mock_get = mock_Session.return_value.get
         from requests.exceptions import SSLError
 
         mock_get.side_effect = SSLError
@@ -126,9 +145,10 @@ class TestRetrieveNonexistantRecord(unittest.TestCase):
 class TestRetrieveMalformedRecord(unittest.TestCase):
     """Metadata endpoint returns non-JSON response."""
 
-    @mock.patch("search.services.metadata.requests.get")
-    def test_response_is_not_json(self, mock_get):
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_response_is_not_json(self, mock_Session):
         """:func:`.metadata.retrieve` raises IOError when not valid JSON."""
+        mock_get = mock_Session.return_value.get
         from json.decoder import JSONDecodeError
 
         response = mock.MagicMock()
@@ -143,3 +163,525 @@ class TestRetrieveMalformedRecord(unittest.TestCase):
         mock_get.return_value = response
         with self.assertRaises(IOError):
             metadata.retrieve("1234.5678v3")
+
+
+class TestConnectionPool(unittest.TestCase):
+    """All requests go through a single pooled session."""
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_session_is_reused(self, mock_Session):
+        """:meth:`.retrieve` and :meth:`.bulk_retrieve` share a session."""
+        mock_get = mock_Session.return_value.get
+        response = mock.MagicMock(status_code=200)
+        with open("tests/data/docmeta.json") as f:
+            mock_content = json.load(f)
+        type(response).json = mock.MagicMock(return_value=mock_content)
+        mock_get.return_value = response
+
+        app = create_ui_web_app()
+        app.config["METADATA_READ_TIMEOUT"] = "12"
+        with app.app_context():
+            metadata.retrieve("1602.00123")
+            type(response).json = mock.MagicMock(return_value=[mock_content])
+            metadata.bulk_retrieve(["1602.00123"])
+
+        self.assertEqual(mock_Session.call_count, 1, "One session is created")
+        self.assertEqual(mock_get.call_count, 2)
+        for _, kwargs in mock_get.call_args_list:
+            self.assertEqual(kwargs["timeout"], (5.0, 12.0))
+
+    def test_pool_is_configured(self):
+        """Pool size and keep-alive are set from the app config."""
+        app = create_ui_web_app()
+        app.config["METADATA_ENDPOINT"] = "http://foo/,http://bar/"
+        app.config["METADATA_POOL_SIZE"] = "42"
+        app.config["METADATA_KEEP_ALIVE"] = "False"
+        with app.app_context():
+            session = metadata.get_session()
+        self.assertEqual(session._adapter._pool_maxsize, 42)
+        self.assertEqual(session._adapter._pool_connections, 2)
+        self.assertIs(
+            session._session.get_adapter("http://foo/"), session._adapter
+        )
+        self.assertEqual(session._session.headers["Connection"], "close")
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_timeout(self, mock_Session):
+        """:func:`.metadata.retrieve` raises ConnectionFailed on timeout."""
+        from requests.exceptions import ReadTimeout
+
+        mock_Session.return_value.get.side_effect = ReadTimeout
+        with self.assertRaises(metadata.ConnectionFailed):
+            metadata.retrieve("1234.5678v3")
+
+
+class TestBulkRetrieve(unittest.TestCase):
+    """Retrieve metadata for many papers at once."""
+
+    def setUp(self):
+        """Respond with metadata for each of the requested IDs."""
+        self.requested = []
+
+        def get(url, **kwargs):
+            ids = parse_qs(urlparse(url).query)["id"]
+            self.requested.append((url, ids))
+            response = mock.MagicMock(status_code=200)
+            if "1234.00013" in ids:
+                response.status_code = 500
+            response.json.return_value = [{"paper_id": i} for i in ids]
+            return response
+
+        self.get = get
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_chunk_by_count(self, mock_Session):
+        """IDs are split into chunks, and results are in order."""
+        mock_Session.return_value.get.side_effect = self.get
+        session = metadata.DocMetaSession(
+            "https://foo/", "https://bar/", max_ids_per_request=3
+        )
+        ids = [f"1234.000{i:02d}" for i in range(10)]
+        docmeta = session.bulk_retrieve(ids)
+
+        self.assertEqual([dm.paper_id for dm in docmeta], ids)
+        self.assertEqual(len(self.requested), 4)
+        self.assertTrue(all(len(chunk) <= 3 for _, chunk in self.requested))
+        endpoints = {
+            url.split("/docmeta_bulk")[0] for url, _ in self.requested
+        }
+        self.assertEqual(endpoints, {"https://foo", "https://bar"})
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_chunk_by_url_length(self, mock_Session):
+        """No request URL exceeds the max length."""
+        mock_Session.return_value.get.side_effect = self.get
+        session = metadata.DocMetaSession("https://foo/", max_url_length=80)
+        ids = [f"1234.000{i:02d}" for i in range(10)]
+        docmeta = session.bulk_retrieve(ids)
+
+        self.assertEqual([dm.paper_id for dm in docmeta], ids)
+        self.assertGreater(len(self.requested), 1)
+        for url, _ in self.requested:
+            self.assertLessEqual(len(url), 80)
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_partial_failure(self, mock_Session):
+        """Failures are reported for each ID in a chunk that failed."""
+        mock_Session.return_value.get.side_effect = self.get
+        session = metadata.DocMetaSession(
+            "https://foo/", max_ids_per_request=2
+        )
+        ids = [f"1234.000{i:02d}" for i in range(10, 16)]
+        with self.assertRaises(metadata.PartialFailure) as ctx:
+            session.bulk_retrieve(ids)
+
+        self.assertEqual(
+            set(ctx.exception.failures), {"1234.00012", "1234.00013"}
+        )
+        for error in ctx.exception.failures.values():
+            self.assertIsInstance(error, metadata.RequestFailed)
+        self.assertEqual(
+            [dm.paper_id for dm in ctx.exception.results],
+            ["1234.00010", "1234.00011", "1234.00014", "1234.00015"],
+        )
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_total_failure(self, mock_Session):
+        """If every chunk fails, the original exception is raised."""
+        from requests.exceptions import ConnectionError
+
+        mock_Session.return_value.get.side_effect = ConnectionError
+        session = metadata.DocMetaSession(
+            "https://foo/", max_ids_per_request=2
+        )
+        with self.assertRaises(metadata.ConnectionFailed):
+            session.bulk_retrieve([f"1234.000{i:02d}" for i in range(6)])
+
+
+class TestEndpointHealth(unittest.TestCase):
+    """Requests go to the healthiest endpoint."""
+
+    def setUp(self):
+        """Endpoint ``https://bad/`` is down."""
+        from requests.exceptions import ConnectionError
+
+        metadata._health.clear()
+
+        self.requested = []
+
+        def get(url, **kwargs):
+            self.requested.append(url)
+            if url.startswith("https://bad/"):
+                raise ConnectionError("nope")
+            response = mock.MagicMock(status_code=200)
+            response.json.return_value = {"paper_id": "1234.56789"}
+            return response
+
+        self.get = get
+
+    @mock.patch("search.services.metadata.time")
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_eject_and_probe(self, mock_Session, mock_time):
+        """A failing endpoint is ejected, then probed after a cooldown."""
+        mock_time.time.return_value = 1000.0
+        mock_Session.return_value.get.side_effect = self.get
+        session = metadata.DocMetaSession(
+            "https://bad/", "https://good/", eject_after=2, eject_cooldown=10
+        )
+        failures = 0
+        for _ in range(10):
+            try:
+                session.retrieve("1234.56789")
+            except metadata.ConnectionFailed:
+                failures += 1
+        self.assertEqual(failures, 2, "Bad endpoint is ejected after 2 fails")
+        stats = {s["endpoint"]: s for s in session.endpoint_stats()}
+        self.assertTrue(stats["https://bad/"]["ejected"])
+        self.assertEqual(stats["https://bad/"]["ejected_for"], 10)
+        self.assertEqual(stats["https://bad/"]["errors"], 2)
+        self.assertFalse(stats["https://good/"]["ejected"])
+        self.assertEqual(stats["https://good/"]["requests"], 8)
+
+        # After the cooldown, a single probe is sent to the bad endpoint.
+        mock_time.time.return_value = 1011.0
+        self.requested = []
+        with self.assertRaises(metadata.ConnectionFailed):
+            session.retrieve("1234.56789")
+        self.assertTrue(self.requested[0].startswith("https://bad/"))
+        session.retrieve("1234.56789")
+        self.assertTrue(self.requested[1].startswith("https://good/"))
+        stats = {s["endpoint"]: s for s in session.endpoint_stats()}
+        self.assertEqual(stats["https://bad/"]["ejections"], 2)
+
+    @mock.patch("search.services.metadata.time")
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_probe_succeeds(self, mock_Session, mock_time):
+        """An ejected endpoint that recovers is back in rotation."""
+        mock_time.time.return_value = 1000.0
+        mock_Session.return_value.get.side_effect = self.get
+        session = metadata.DocMetaSession(
+            "https://bad/", eject_after=1, eject_cooldown=10
+        )
+        with self.assertRaises(metadata.ConnectionFailed):
+            session.retrieve("1234.56789")
+        self.assertTrue(session.endpoint_stats()[0]["ejected"])
+
+        mock_time.time.return_value = 1011.0
+        mock_Session.return_value.get.side_effect = None
+        mock_Session.return_value.get.return_value = mock.MagicMock(
+            status_code=200
+        )
+        session.retrieve("1234.56789")
+        self.assertFalse(session.endpoint_stats()[0]["ejected"])
+
+    def test_prefer_fastest(self):
+        """The endpoint with the lowest latency is preferred."""
+        session = metadata.DocMetaSession("https://slow/", "https://fast/")
+        slow, fast = session._endpoints
+        slow.record(2.0, True)
+        fast.record(0.1, True)
+        self.assertIs(session._select_endpoint(), fast)
+        self.assertIs(
+            session._select_endpoint(), fast, "Fast even with one in flight"
+        )
+        fast.in_flight = 30
+        self.assertIs(session._select_endpoint(), slow, "Unless it's busy")
+
+    @mock.patch("search.services.metadata.time")
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_shared(self, mock_Session, mock_time):
+        """An endpoint ejected by one session is avoided by the others."""
+        mock_time.time.return_value = 1000.0
+        mock_Session.return_value.get.side_effect = self.get
+        session = metadata.DocMetaSession(
+            "https://bad/", "https://good/", eject_after=1
+        )
+        with self.assertRaises(metadata.ConnectionFailed):
+            session.retrieve("1234.56789")
+
+        other = metadata.DocMetaSession(
+            "https://bad/", "https://good/", eject_after=1
+        )
+        self.requested = []
+        other.retrieve("1234.56789")
+        self.assertTrue(self.requested[0].startswith("https://good/"))
+        self.assertTrue(other.endpoint_stats()[0]["ejected"])
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_connect_retries(self, mock_Session):
+        """With more than one endpoint, connections are not retried much."""
+        session = metadata.DocMetaSession("https://bad/", "https://good/")
+        self.assertEqual(session._retry.connect, 1)
+        session = metadata.DocMetaSession("https://good/")
+        self.assertEqual(session._retry.connect, 10)
+
+
+class TestDocMetaCache(unittest.TestCase):
+    """Docmeta records are cached in a single file on disk."""
+
+    def setUp(self):
+        """Create a cache in a temporary directory."""
+        metadata._sessions.clear()
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir, metadata.CACHE_FILENAME)
+        with open("tests/data/docmeta.json") as f:
+            self.content = json.load(f)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.cache_dir)
+
+    def _docmeta(self, **extra):
+        data = {**self.content, "version": 1, "latest_version": 1}
+        return metadata.DocMeta(**{**data, **extra})
+
+    def test_roundtrip(self):
+        """Records can be retrieved after re-opening the cache."""
+        metadata.DocMetaCache(self.path).put(
+            [
+                self._docmeta(version=1, latest_version=2),
+                self._docmeta(version=2, latest_version=2),
+            ]
+        )
+        cache = metadata.DocMetaCache(self.path)
+        self.assertEqual(cache.get("1606.00123v1").version, 1)
+        self.assertEqual(cache.get("1606.00123").version, 2, "Latest version")
+        cached = cache.get_many(["1606.00123", "1602.00124"])
+        self.assertEqual(list(cached), ["1606.00123"])
+        self.assertEqual([dm.version for dm in cached["1606.00123"]], [1, 2])
+        self.assertEqual(
+            cached["1606.00123"][1], self._docmeta(version=2, latest_version=2)
+        )
+
+    def test_missing_version(self):
+        """A paper is not a hit unless all of its versions are cached."""
+        cache = metadata.DocMetaCache(self.path)
+        cache.put([self._docmeta(version=2, latest_version=2)])
+        self.assertEqual(cache.get_many(["1606.00123"]), {})
+
+    @mock.patch("search.services.metadata.time")
+    def test_expiry(self, mock_time):
+        """Records older than the TTL are not returned."""
+        mock_time.time.return_value = 1000.0
+        cache = metadata.DocMetaCache(self.path, ttl=60)
+        cache.put([self._docmeta()])
+        mock_time.time.return_value = 1059.0
+        self.assertIsNotNone(cache.get("1606.00123"))
+        mock_time.time.return_value = 1061.0
+        self.assertIsNone(cache.get("1606.00123"))
+        self.assertEqual(cache.get_many(["1606.00123"]), {})
+
+    def test_stale_write(self):
+        """A cached record is not replaced by an older one."""
+        cache = metadata.DocMetaCache(self.path)
+        cache.put([self._docmeta(metadata_id=5, title="New")])
+        cache.put([self._docmeta(metadata_id=4, title="Old")])
+        self.assertEqual(cache.get("1606.00123").title, "New")
+        cache.put([self._docmeta(metadata_id=6, title="Newer")])
+        self.assertEqual(cache.get("1606.00123").title, "Newer")
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_session_uses_cache(self, mock_Session):
+        """The session only goes to the network for papers not cached."""
+        mock_get = mock_Session.return_value.get
+        response = mock.MagicMock(status_code=200)
+        other = asdict(self._docmeta(paper_id="1602.00124"))
+        type(response).json = mock.MagicMock(return_value=[other])
+        mock_get.return_value = response
+
+        app = create_ui_web_app()
+        app.config["METADATA_CACHE_DIR"] = self.cache_dir
+        with app.app_context():
+            metadata.DocMetaCache(self.path).put([self._docmeta()])
+            self.assertEqual(metadata.retrieve("1606.00123"), self._docmeta())
+            self.assertEqual(mock_get.call_count, 0, "Not retrieved")
+
+            results = metadata.bulk_retrieve(["1602.00124", "1606.00123"])
+            self.assertEqual(
+                [dm.paper_id for dm in results], ["1602.00124", "1606.00123"]
+            )
+            self.assertEqual(mock_get.call_count, 1)
+            args, _ = mock_get.call_args
+            self.assertIn("1602.00124", args[0])
+            self.assertNotIn("1606.00123", args[0])
+
+            metadata.bulk_retrieve(["1602.00124"])
+            self.assertEqual(mock_get.call_count, 1, "Cached after fetching")
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_shared(self, mock_Session):
+        """One session and cache are shared by contexts and threads."""
+        app = create_ui_web_app()
+        app.config["METADATA_CACHE_DIR"] = self.cache_dir
+        sessions = []
+
+        def get_session():
+            with app.app_context():
+                sessions.append(metadata.current_session())
+
+        threads = [threading.Thread(target=get_session) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        get_session()
+        self.assertEqual(len(sessions), 5)
+        self.assertTrue(all(s is sessions[0] for s in sessions))
+        self.assertEqual(mock_Session.call_count, 1, "One pool")
+        self.assertIs(
+            metadata.get_session(app)._cache, sessions[0]._cache, "One cache"
+        )
+
+    @mock.patch("search.services.metadata.requests.Session")
+    def test_refresh(self, mock_Session):
+        """With ``refresh``, the cache is updated but not read."""
+        mock_get = mock_Session.return_value.get
+        response = mock.MagicMock(status_code=200)
+        updated = asdict(self._docmeta(metadata_id=6, title="Updated"))
+        type(response).json = mock.MagicMock(return_value=[updated])
+        mock_get.return_value = response
+
+        app = create_ui_web_app()
+        app.config["METADATA_CACHE_DIR"] = self.cache_dir
+        with app.app_context():
+            metadata.DocMetaCache(self.path).put(
+                [self._docmeta(metadata_id=5, title="Old")]
+            )
+            results = metadata.bulk_retrieve(["1606.00123"], refresh=True)
+            self.assertEqual(results[0].title, "Updated")
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertEqual(
+                metadata.retrieve("1606.00123").title, "Updated", "Cached"
+            )
+            self.assertEqual(mock_get.call_count, 1)
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("aiohttp"), "aiohttp is not installed"
+)
+class TestAsyncDocMetaSession(unittest.TestCase):
+    """:class:`.AsyncDocMetaSession` is used from an event loop."""
+
+    def setUp(self):
+        """Start a stub docmeta service."""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        with open("tests/data/docmeta.json") as f:
+            self.content = json.load(f)
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+
+        async def docmeta(request):
+            self.requests.append(request.path_qs)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            paper_id = request.match_info.get("paper_id")
+            if paper_id == "9999.99999":
+                return web.Response(status=404)
+            if paper_id == "8888.88888":
+                return web.Response(text="not json")
+            return web.json_response({**self.content, "paper_id": paper_id})
+
+        async def docmeta_bulk(request):
+            self.requests.append(request.path_qs)
+            return web.json_response(
+                [
+                    {**self.content, "paper_id": ident}
+                    for ident in request.query.getall("id")
+                ]
+            )
+
+        app = web.Application()
+        app.router.add_get("/docmeta/{paper_id}", docmeta)
+        app.router.add_get("/docmeta_bulk", docmeta_bulk)
+        self.loop = asyncio.new_event_loop()
+        self.server = TestServer(app, loop=self.loop)
+        self.loop.run_until_complete(self.server.start_server(loop=self.loop))
+
+    def tearDown(self):
+        """Stop the stub."""
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+
+    def _run(self, func, *args, **kwargs):
+        async def run():
+            async with metadata.AsyncDocMetaSession(
+                str(self.server.make_url("/")), **kwargs
+            ) as session:
+                return await func(session, *args)
+
+        return self.loop.run_until_complete(run())
+
+    def test_retrieve(self):
+        """Metadata is retrieved for a single paper."""
+        docmeta = self._run(metadata.AsyncDocMetaSession.retrieve, "1234.5678")
+        self.assertEqual(docmeta.paper_id, "1234.5678")
+
+    def test_errors(self):
+        """The same exceptions are raised as by :class:`.DocMetaSession`."""
+        with self.assertRaises(metadata.RequestFailed):
+            self._run(metadata.AsyncDocMetaSession.retrieve, "9999.99999")
+        with self.assertRaises(metadata.BadResponse):
+            self._run(metadata.AsyncDocMetaSession.retrieve, "8888.88888")
+
+    def test_connection_failed(self):
+        """Raises :class:`.ConnectionFailed` if the service is down."""
+        url = str(self.server.make_url("/"))
+        self.loop.run_until_complete(self.server.close())
+
+        async def run():
+            async with metadata.AsyncDocMetaSession(url, retries=0) as s:
+                await s.retrieve("1234.5678")
+
+        with self.assertRaises(metadata.ConnectionFailed):
+            self.loop.run_until_complete(run())
+
+    def test_retrieve_many(self):
+        """Requests are made concurrently, up to the limit."""
+        ids = ["1234.%05i" % i for i in range(20)] + ["9999.99999"]
+        with self.assertRaises(metadata.PartialFailure) as ctx:
+            self._run(
+                metadata.AsyncDocMetaSession.retrieve_many,
+                ids,
+                max_concurrent=5,
+            )
+        self.assertEqual(
+            [dm.paper_id for dm in ctx.exception.results], ids[:-1]
+        )
+        self.assertEqual(list(ctx.exception.failures), ["9999.99999"])
+        self.assertEqual(self.max_in_flight, 5)
+
+    def test_bulk_retrieve(self):
+        """IDs are split into chunks, and results are in order."""
+        ids = ["1234.%05i" % i for i in range(5)]
+        results = self._run(
+            metadata.AsyncDocMetaSession.bulk_retrieve,
+            ids,
+            max_ids_per_request=2,
+        )
+        self.assertEqual([dm.paper_id for dm in results], ids)
+        self.assertEqual(len(self.requests), 3)
+
+
+class TestImport(unittest.TestCase):
+    """The synchronous sessions do not need :mod:`aiohttp`."""
+
+    def test_without_aiohttp(self):
+        """The modules are imported without importing :mod:`aiohttp`."""
+        script = (
+            "import sys\n"
+            "import search.services.metadata\n"
+            "import search.services.fulltext\n"
+            "sys.exit('aiohttp' in sys.modules)\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script])
+        self.assertEqual(result.returncode, 0)
+
+    def test_not_a_subclass(self):
+        """The asyncio session does not stand in for the synchronous one."""
+        self.assertFalse(
+            issubclass(metadata.AsyncDocMetaSession, metadata.DocMetaSession)
+        )
@@ -0,0 +1,134 @@
+"""
+Benchmark connection re-use by :class:`.metadata.DocMetaSession`.
+
+Starts a local stub of the docmeta service, which counts the TCP connections
+that it accepts, and retrieves the same paper repeatedly: first with a new
+connection for each request (as ``requests.get`` does), then through a
+pooled :class:`.metadata.DocMetaSession`.
+
+Over loopback, a new connection is cheap, so the difference is mostly in the
+number of connections; against a real endpoint, every new connection also
+costs at least one round trip (plus the TLS handshake).
+
+Usage::
+
+    python tests/benchmarks/docmeta_pool.py --requests 500 --threads 4
+
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Callable, Tuple
+
+import click
+import requests
+
+from search.services import metadata
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "docmeta.json")
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """A docmeta stub that counts the connections it accepts."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        """Bind to a free port on localhost."""
+        super(StubServer, self).__init__(("127.0.0.1", 0), StubHandler)
+        with open(DATA, "rb") as f:
+            self.content = f.read()
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def process_request(self, request, client_address):  # type: ignore
+        """Count each new connection."""
+        with self._lock:
+            self.connections += 1
+        super(StubServer, self).process_request(request, client_address)
+
+    @property
+    def endpoint(self) -> str:
+        """Base URL of the stub."""
+        return "http://127.0.0.1:%i/" % self.server_address[1]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Responds to every request with the same docmeta record."""
+
+    protocol_version = "HTTP/1.1"  # Supports keep-alive.
+    disable_nagle_algorithm = True
+    wbufsize = -1  # Send headers and body together.
+
+    def do_GET(self) -> None:
+        """Send the docmeta record."""
+        content = self.server.content  # type: ignore
+        if self.path.startswith("/docmeta_bulk"):
+            content = b"[" + content + b"]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:  # type: ignore
+        """Keep quiet."""
+
+
+def unpooled(endpoint: str) -> Callable[[str], None]:
+    """Open a new connection for each request, like ``requests.get``."""
+
+    def retrieve(document_id: str) -> None:
+        response = requests.get(f"{endpoint}docmeta/{document_id}")
+        metadata.DocMeta(**response.json())  # type: ignore
+
+    return retrieve
+
+
+def pooled(endpoint: str, pool_size: int) -> Callable[[str], None]:
+    """Make each request through a shared :class:`.DocMetaSession`."""
+    session = metadata.DocMetaSession(endpoint, pool_size=pool_size)
+    return session.retrieve
+
+
+def run(
+    server: StubServer,
+    retrieve: Callable[[str], None],
+    n_requests: int,
+    threads: int,
+) -> Tuple[float, int]:
+    """Make ``n_requests`` and report elapsed time and new connections."""
+    before = server.connections
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(retrieve, ["1602.00123"] * n_requests))
+    return time.time() - start, server.connections - before
+
+
+@click.command()
+@click.option("--requests", "n_requests", default=500, type=int)
+@click.option("--threads", default=4, type=int)
+def benchmark(n_requests: int, threads: int) -> None:
+    """Compare per-request connections with a pooled session."""
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for label, retrieve in [
+            ("requests.get", unpooled(server.endpoint)),
+            ("DocMetaSession", pooled(server.endpoint, threads)),
+        ]:
+            elapsed, connections = run(server, retrieve, n_requests, threads)
+            click.echo(
+                f"{label:>16}: {n_requests} requests in {elapsed:.2f}s"
+                f" ({n_requests / elapsed:.0f}/s), {connections} connections"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,95 @@
+"""
+Benchmark the memoized query-fragment builders in :mod:`.index.prepare`.
+
+Builds the search body for a stream of simple searches, as
+:func:`.simple_search` does for each request: first with the fragment caches
+cleared before every request (i.e. as if nothing were memoized), then with
+warm caches. Terms are drawn from a small vocabulary with a Zipf-like
+distribution, since a few popular terms account for most of our searches.
+
+The time reported includes serializing the search with ``to_dict()``, which
+is not memoized, since that also happens for every request.
+
+Usage::
+
+    python tests/benchmarks/query_fragments.py --requests 2000 --terms 200
+
+"""
+
+import random
+import time
+from typing import Callable, List
+
+import click
+from elasticsearch_dsl import Search
+
+from search.domain import SimpleQuery
+from search.services.index.simple import simple_search
+from search.services.index.util import (
+    clear_fragment_caches,
+    fragment_cache_info,
+)
+
+WORDS = [
+    "dark",
+    "matter",
+    "neural",
+    "network",
+    "quantum",
+    "gravity",
+    "black",
+    "hole",
+    "graph",
+    "entropy",
+    "1705.09169",
+    "2019",
+    "$\\lambda$",
+    '"string theory"',
+    "schr*dinger",
+]
+FIELDS = ["all", "all", "all", "title", "author", "abstract"]
+
+
+def make_queries(n_requests: int, n_terms: int) -> List[SimpleQuery]:
+    """Generate searches for ``n_terms`` distinct terms, Zipf-distributed."""
+    rng = random.Random(1)
+    terms = [
+        " ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(n_terms)
+    ]
+    weights = [1 / rank for rank in range(1, n_terms + 1)]
+    return [
+        SimpleQuery(search_field=rng.choice(FIELDS), value=term)
+        for term in rng.choices(terms, weights, k=n_requests)
+    ]
+
+
+def run(queries: List[SimpleQuery], before: Callable[[], None]) -> float:
+    """Build the search body for each query; return the elapsed CPU time."""
+    start = time.process_time()
+    for query in queries:
+        before()
+        simple_search(Search(), query).to_dict()
+    return time.process_time() - start
+
+
+@click.command()
+@click.option("--requests", "n_requests", default=2000, type=int)
+@click.option("--terms", "n_terms", default=200, type=int)
+def benchmark(n_requests: int, n_terms: int) -> None:
+    """Compare the CPU time per request with and without memoization."""
+    queries = make_queries(n_requests, n_terms)
+    cold = run(queries, clear_fragment_caches)
+    clear_fragment_caches()
+    warm = run(queries, lambda: None)
+    info = fragment_cache_info()
+    click.echo(f"  uncached: {1000 * cold / n_requests:.3f} ms/request")
+    click.echo(f"  memoized: {1000 * warm / n_requests:.3f} ms/request")
+    click.echo(
+        f"     saved: {1000 * (cold - warm) / n_requests:.3f} ms/request"
+        f" ({1 - warm / cold:.0%}); {info['hits']} hits, {info['misses']}"
+        f" misses, {info['size']} fragments cached"
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
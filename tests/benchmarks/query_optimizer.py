@@ -0,0 +1,127 @@
+"""
+Benchmark :func:`.index.optimize.optimize_search` against a live index.
+
+Sends a few representative searches (advanced, API, classic API and simple)
+to Elasticsearch, both as the query builders generate them and as rewritten
+by the optimizer, and compares the median ``took`` (the time spent in ES, in
+milliseconds) for each. Requests alternate between the two, and bypass the
+shard request cache, so that neither gets the benefit of the other's caching;
+the filter cache is left alone, since using it is the point.
+
+Usage::
+
+    python tests/benchmarks/query_optimizer.py --host localhost:9200
+
+"""
+
+import statistics
+from datetime import datetime
+from typing import Dict, List
+
+import click
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import Search
+
+from search.domain import (
+    AdvancedQuery,
+    APIQuery,
+    ClassicAPIQuery,
+    Classification,
+    ClassificationList,
+    DateRange,
+    FieldedSearchList,
+    FieldedSearchTerm,
+    SimpleQuery,
+)
+from search.services.index.advanced import advanced_search
+from search.services.index.api import api_search
+from search.services.index.classic_api import classic_search
+from search.services.index.optimize import optimize_search
+from search.services.index.simple import simple_search
+
+CLASSIFICATIONS = ClassificationList(
+    [
+        Classification(archive={"id": "astro-ph"}),
+        Classification(group={"id": "grp_cs"}),
+    ]
+)
+DATE_RANGE = DateRange(
+    start_date=datetime(2015, 1, 1), end_date=datetime(2020, 1, 1)
+)
+
+
+def make_searches() -> Dict[str, Search]:
+    """Generate the searches to compare."""
+    terms = FieldedSearchList(
+        [
+            FieldedSearchTerm(operator="AND", field="title", term="dark"),
+            FieldedSearchTerm(operator="AND", field="all", term="matter"),
+            FieldedSearchTerm(operator="NOT", field="author", term="smith"),
+        ]
+    )
+    return {
+        "advanced": advanced_search(
+            Search(),
+            AdvancedQuery(
+                order="relevance",
+                terms=terms,
+                classification=CLASSIFICATIONS,
+                include_cross_list=True,
+                date_range=DATE_RANGE,
+            ),
+        ),
+        "api": api_search(
+            Search(), APIQuery(terms=terms, date_range=DATE_RANGE)
+        ),
+        "classic": classic_search(
+            Search(),
+            ClassicAPIQuery(
+                search_query=(
+                    "ti:dark AND (au:smith OR co:matter) ANDNOT cat:hep-th"
+                )
+            ),
+        ),
+        "simple": simple_search(
+            Search(),
+            SimpleQuery(
+                search_field="all",
+                value="dark matter",
+                classification=CLASSIFICATIONS,
+            ),
+        ),
+    }
+
+
+@click.command()
+@click.option("--host", default="localhost:9200")
+@click.option("--index", default="arxiv")
+@click.option("--repeat", default=50, type=int)
+def benchmark(host: str, index: str, repeat: int) -> None:
+    """Compare the median ``took`` of each search, before and after."""
+    es = Elasticsearch([host])
+    for name, search in make_searches().items():
+        bodies = {
+            "original": search.to_dict(),
+            "optimized": optimize_search(search).to_dict(),
+        }
+        took: Dict[str, List[int]] = {label: [] for label in bodies}
+        for i in range(repeat + 1):
+            for label, body in bodies.items():
+                response = es.search(
+                    index=index,
+                    body=body,
+                    request_cache=False,
+                    filter_path=["took", "hits.total"],
+                )
+                if i > 0:  # The first round warms up.
+                    took[label].append(response["took"])
+        before = statistics.median(took["original"])
+        after = statistics.median(took["optimized"])
+        click.echo(
+            f"{name:>9}: {before:.1f} ms -> {after:.1f} ms"
+            f" ({response['hits']['total']} hits)"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
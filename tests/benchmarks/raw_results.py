@@ -0,0 +1,79 @@
+"""
+Benchmark the transformation of search responses in :mod:`.index.results`.
+
+For a page of highlighted hits, compares the CPU time to transform the
+response into a :class:`.DocumentSet`: first as a :class:`.Response` (each
+hit wrapped in a :class:`.Hit`), as :meth:`.SearchSession.search` did
+before; then as the raw response, with :func:`.results.raw_to_documentset`.
+For scale, also reports the time to decode the response from JSON.
+
+Usage::
+
+    python tests/benchmarks/raw_results.py --hits 50 --repeat 200
+
+"""
+
+import copy
+import json
+import time
+from typing import Any, Callable, Dict
+
+import click
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Response
+
+from search.domain import SimpleQuery
+from search.services.index import results
+from search.services.index.tests.test_results import raw_response
+
+QUERY = SimpleQuery(search_field="all", value="dark matter", size=50)
+
+
+def make_response(n_hits: int) -> Dict[str, Any]:
+    """Generate a raw response with ``n_hits`` hits."""
+    response = raw_response()
+    hits = response["hits"]["hits"]
+    del hits[0]["_source"]["submitted_date_first"]  # Not worth a warning.
+    response["hits"]["hits"] = [
+        copy.deepcopy(hits[i % len(hits)]) for i in range(n_hits)
+    ]
+    return response
+
+
+def run(
+    response: Dict[str, Any], repeat: int, transform: Callable[[Any], Any]
+) -> float:
+    """Transform fresh copies of ``response``; return the ms for each."""
+    payload = json.dumps(response)
+    copies = [json.loads(payload) for _ in range(repeat)]
+    start = time.process_time()
+    for data in copies:
+        transform(data)
+    return 1000 * (time.process_time() - start) / repeat
+
+
+@click.command()
+@click.option("--hits", "n_hits", default=50, type=int)
+@click.option("--repeat", default=200, type=int)
+def benchmark(n_hits: int, repeat: int) -> None:
+    """Compare the cost of transforming each response."""
+    response = make_response(n_hits)
+    payload = json.dumps(response)
+    transforms = [
+        ("decode", lambda data: json.loads(payload)),
+        (
+            "wrapped",
+            lambda data: results.to_documentset(
+                QUERY, Response(Search(), data)
+            ),
+        ),
+        ("raw", lambda data: results.raw_to_documentset(QUERY, data)),
+    ]
+    for label, transform in transforms:
+        click.echo(
+            f"{label:>8}: {run(response, repeat, transform):.2f} ms/response"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
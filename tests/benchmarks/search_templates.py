@@ -0,0 +1,91 @@
+"""
+Benchmark the stored search templates in :mod:`.index.templates`.
+
+For a stream of simple searches that the templates fit, compares the CPU
+time to prepare each request, and the size of the request body: first with
+the body built by the query builders (and optimizer, and highlighting), as
+:meth:`.SearchSession.search` does without templates; then with only the
+template ID and its parameters.
+
+The fragment caches (see :func:`.util.fragment`) are warm in both cases, as
+they would be in a long-running process.
+
+Usage::
+
+    python tests/benchmarks/search_templates.py --requests 2000
+
+"""
+
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+import click
+from elasticsearch_dsl import Search
+
+from search.domain import SimpleQuery
+from search.services.index import highlighting, templates
+from search.services.index.optimize import optimize_search
+from search.services.index.simple import simple_search
+
+WORDS = ["dark", "matter", "neural", "network", "quantum", "Smith", "Hawking"]
+FIELDS = ["all", "all", "all", "title", "author"]
+
+
+def make_queries(n_requests: int) -> List[SimpleQuery]:
+    """Generate simple searches of one to three words."""
+    rng = random.Random(1)
+    return [
+        SimpleQuery(
+            search_field=rng.choice(FIELDS),
+            value=" ".join(rng.sample(WORDS, rng.randint(1, 3))),
+        )
+        for _ in range(n_requests)
+    ]
+
+
+def build(query: SimpleQuery) -> Dict[str, Any]:
+    """Build the body as the query builders do."""
+    search = highlighting.highlight(
+        optimize_search(simple_search(Search(), query))
+    )
+    return search[query.page_start : query.page_end].to_dict()
+
+
+def template(query: SimpleQuery) -> Dict[str, Any]:
+    """Build the body of a request for a template."""
+    template_id, params = templates.fit(query, True)  # type: ignore
+    return {"id": template_id, "params": params}
+
+
+def run(
+    queries: List[SimpleQuery], prepare: Callable[[SimpleQuery], Any]
+) -> Dict[str, float]:
+    """Prepare and serialize each request; return the time and bytes."""
+    prepare(queries[0])  # Warm up.
+    size = 0
+    start = time.process_time()
+    for query in queries:
+        size += len(json.dumps(prepare(query)))
+    elapsed = time.process_time() - start
+    return {"ms": 1000 * elapsed / len(queries), "bytes": size / len(queries)}
+
+
+@click.command()
+@click.option("--requests", "n_requests", default=2000, type=int)
+def benchmark(n_requests: int) -> None:
+    """Compare the cost of each request with and without templates."""
+    queries = make_queries(n_requests)
+    for query in queries:  # Warm the fragment caches.
+        build(query)
+    for label, prepare in [("builders", build), ("template", template)]:
+        result = run(queries, prepare)
+        click.echo(
+            f"{label:>9}: {result['ms']:.3f} ms/request,"
+            f" {result['bytes']:.0f} bytes/request"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()